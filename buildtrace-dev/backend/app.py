@@ -205,6 +205,17 @@ except Exception as e:
     logger.warning(f"Could not register auth blueprint: {e}")
     logger.info("Auth features will not be available")
 
+# Local queue backend: drain the OCR/diff/summary queues inside the API process
+# (skipped in the debug reloader's parent process, which never serves requests)
+_reloader_parent = __name__ == '__main__' and config.DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+if config.QUEUE_BACKEND == 'local' and config.LOCAL_QUEUE_IN_PROCESS and not _reloader_parent:
+    try:
+        from workers.local_pool import start_local_worker_pool
+        start_local_worker_pool()
+    except Exception as e:
+        logger.warning(f"Could not start local worker pool: {e}")
+        logger.info("Queued jobs will wait for workers/local_worker_entry.py")
+
 # Log all registered routes for debugging
 try:
     routes = []
@@ -55,6 +55,10 @@ def upload_drawing():
         user_id = request.form.get('user_id', 'ash-system-0000000000001')
         file = request.files.get('file')
         old_version_id = request.form.get('old_version_id')
+        # 'batch' defers OCR/summary model calls to provider batches (non-urgent jobs)
+        priority = request.form.get('priority', 'interactive')
+        if priority not in ('interactive', 'batch'):
+            return jsonify({'error': "priority must be 'interactive' or 'batch'"}), 400
 
         logger.info(
             "Upload request received",
@@ -156,7 +160,8 @@ def upload_drawing():
                         project_id=upload_result.project_id,
                         user_id=user_id,
                         old_pdf_gcs_path=old_storage_path,
-                        new_pdf_gcs_path=upload_result.storage_path
+                        new_pdf_gcs_path=upload_result.storage_path,
+                        priority=priority,
                     )
                     logger.info("Streaming job created", extra={'job_id': job_id})
                 except Exception as e:
@@ -165,7 +170,8 @@ def upload_drawing():
                         old_version_id=old_version_id,
                         new_drawing_version_id=upload_result.drawing_version_id,
                         project_id=upload_result.project_id,
-                        user_id=user_id
+                        user_id=user_id,
+                        priority=priority,
                     )
                     logger.info("Legacy comparison job created", extra={'job_id': job_id})
             else:
@@ -174,7 +180,8 @@ def upload_drawing():
                     old_version_id=old_version_id,
                     new_drawing_version_id=upload_result.drawing_version_id,
                     project_id=upload_result.project_id,
-                    user_id=user_id
+                    user_id=user_id,
+                    priority=priority,
                 )
                 logger.info("Legacy comparison job created (no storage paths)", extra={'job_id': job_id})
 
@@ -5,6 +5,7 @@ Handles job creation, status queries, and cancellation
 
 from flask import Blueprint, request, jsonify, current_app
 from services.orchestrator import OrchestratorService
+from utils.cancellation import get_cancellation_registry
 from datetime import datetime
 import logging
 
@@ -43,12 +44,18 @@ def create_job():
         if not all([old_version_id, new_drawing_version_id, project_id, user_id]):
             return jsonify({'error': 'Missing required fields'}), 400
         
+        # 'batch' defers OCR/summary model calls to provider batches (non-urgent jobs)
+        priority = data.get('priority', 'interactive')
+        if priority not in ('interactive', 'batch'):
+            return jsonify({'error': "priority must be 'interactive' or 'batch'"}), 400
+        
         orchestrator = OrchestratorService()
         job_id = orchestrator.create_comparison_job(
             old_version_id=old_version_id,
             new_drawing_version_id=new_drawing_version_id,
             project_id=project_id,
-            user_id=user_id
+            user_id=user_id,
+            priority=priority,
         )
         
         # Query the job to get full details
@@ -168,6 +175,8 @@ def get_job(job_id: str):
                 'job_id': job.id,
                 'project_id': job.project_id,
                 'status': job.status,
+                'total_pages': job.total_pages,
+                'completed_pages': job.completed_pages or 0,
                 'old_drawing_version_id': job.old_drawing_version_id,
                 'new_drawing_version_id': job.new_drawing_version_id,
                 'created_at': job.created_at.isoformat() if job.created_at else None,
@@ -216,6 +225,30 @@ def get_job_stages(job_id: str):
         current_app.logger.error(f"Error getting job stages: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@jobs_bp.route('/<job_id>/queue', methods=['GET'])
+def get_job_queue_position(job_id: str):
+    """Where the job's waiting pages stand in the shared stage queues"""
+    if not DB_AVAILABLE:
+        return jsonify({'error': 'Database not available'}), 503
+    try:
+        from services.fair_scheduler import FairScheduler
+
+        with get_db_session() as db:
+            job = db.query(Job).filter_by(id=job_id).first()
+            if not job:
+                return jsonify({'error': 'Job not found'}), 404
+
+            return jsonify({
+                'job_id': job_id,
+                'status': job.status,
+                'priority': (job.job_metadata or {}).get('priority', 'interactive'),
+                'stages': FairScheduler.from_config().estimate(db, job_id),
+            }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error getting job queue position: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @jobs_bp.route('/<job_id>/cancel', methods=['POST'])
 def cancel_job(job_id: str):
     """Cancel a job"""
@@ -236,16 +269,18 @@ def cancel_job(job_id: str):
             job.cancelled_at = datetime.utcnow()
             job.cancelled_by = user_id
             
-            # Cancel all pending stages
-            pending_stages = db.query(JobStage).filter_by(
-                job_id=job_id,
-                status='pending'
+            # Cancel all stages not yet running (queued ones wait for a scheduler slot);
+            # running ones stop at their next cancellation checkpoint
+            pending_stages = db.query(JobStage).filter(
+                JobStage.job_id == job_id,
+                JobStage.status.in_(['pending', 'queued'])
             ).all()
             
             for stage in pending_stages:
                 stage.status = 'skipped'
             
             db.commit()
+            get_cancellation_registry().mark_cancelled(job_id)
             
             return jsonify({
                 'job_id': job_id,
@@ -257,12 +292,73 @@ def cancel_job(job_id: str):
         current_app.logger.error(f"Error cancelling job: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@jobs_bp.route('/<job_id>/resume', methods=['POST'])
+def resume_job(job_id: str):
+    """Re-run only the unfinished stages of a failed or interrupted job (or placeholder summaries of a completed one)"""
+    if not DB_AVAILABLE:
+        return jsonify({'error': 'Database not available'}), 503
+    try:
+        with get_db_session() as db:
+            job = db.query(Job).filter_by(id=job_id).first()
+            if not job:
+                return jsonify({'error': 'Job not found'}), 404
+            
+            if job.status == 'cancelled':
+                return jsonify({'error': f'Job is already {job.status}'}), 400
+        
+        # Completed jobs are refused by the orchestrator unless summaries still await AI analysis
+        result = OrchestratorService().resume_job(job_id)
+        return jsonify(result), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error resuming job: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+def _read_ndjson_ocr_log(storage, drawing_version_id: str, offset: int):
+    """Read OCR log records written after ``offset``; None if the version has no NDJSON log."""
+    from processing.ocr_pipeline import ocr_log_path
+    from utils.ndjson_log import read_ndjson
+    
+    try:
+        data = storage.download_file_range(ocr_log_path(drawing_version_id), offset)
+    except Exception:
+        return None
+    records, next_offset = read_ndjson(data, offset)
+    
+    log = {'pages': [], 'summary': None}
+    for record in records:
+        record_type = record.get('type')
+        if record_type == 'start':
+            log['started_at'] = record.get('started_at')
+        elif record_type == 'page':
+            log['pages'].append({key: value for key, value in record.items() if key != 'type'})
+        elif record_type == 'summary':
+            log['summary'] = record.get('summary')
+            log['completed_at'] = record.get('completed_at')
+    log['pages'].sort(key=lambda page: page.get('page_number') or 0)
+    return log, next_offset
+
+
 @jobs_bp.route('/<job_id>/ocr-log', methods=['GET'])
 def get_ocr_log(job_id: str):
-    """Get OCR log file for a job (for display during processing)"""
+    """
+    Get OCR log for a job (for display during processing)
+    
+    Query params:
+        offset_<drawing_version_id>: Byte offset returned for that version in
+            ``next_offsets`` by a previous call; only pages logged since then are
+            returned (default 0 = whole log). Each version's log has its own offsets.
+        offset: Offset for versions without their own parameter (single-version reads)
+        drawing_version_id: Only return the log of this drawing version
+    """
     if not DB_AVAILABLE:
         return jsonify({'error': 'Database not available'}), 503
     try:
+        default_offset = max(0, request.args.get('offset', 0, type=int))
+        version_filter = request.args.get('drawing_version_id')
+        
         with get_db_session() as db:
             from gcp.database.models import DrawingVersion
             from gcp.storage import StorageService
@@ -280,24 +376,39 @@ def get_ocr_log(job_id: str):
             if not ocr_stages:
                 return jsonify({'error': 'No OCR stages found for this job'}), 404
             
-            # Try to get OCR log from the first drawing version
-            # Check both old and new versions
-            drawing_versions = []
-            if job.old_drawing_version_id:
-                old_version = db.query(DrawingVersion).filter_by(id=job.old_drawing_version_id).first()
-                if old_version and old_version.ocr_result_ref:
-                    drawing_versions.append(old_version)
-            
-            if job.new_drawing_version_id:
-                new_version = db.query(DrawingVersion).filter_by(id=job.new_drawing_version_id).first()
-                if new_version and new_version.ocr_result_ref:
-                    drawing_versions.append(new_version)
+            # Check both old and new versions (the log is readable while OCR is still running)
+            version_ids = [
+                version_id
+                for version_id in (job.old_drawing_version_id, job.new_drawing_version_id)
+                if version_id and (not version_filter or version_id == version_filter)
+            ]
+            drawing_versions = db.query(DrawingVersion).filter(DrawingVersion.id.in_(version_ids)).all() if version_ids else []
+            drawing_versions.sort(key=lambda version: version_ids.index(version.id))
             
             # Get OCR results and extract log file refs
             storage = StorageService()
             ocr_logs = []
+            next_offsets = {}
             
             for version in drawing_versions:
+                offset = max(0, request.args.get(f'offset_{version.id}', default_offset, type=int))
+                ndjson_log = _read_ndjson_ocr_log(storage, version.id, offset)
+                if ndjson_log is not None:
+                    log, next_offset = ndjson_log
+                    next_offsets[version.id] = next_offset
+                    ocr_logs.append({
+                        'drawing_version_id': version.id,
+                        'drawing_name': version.drawing_name,
+                        'log': log,
+                        'offset': offset,
+                        'next_offset': next_offset,
+                        'complete': log['summary'] is not None or version.ocr_status == 'completed',
+                    })
+                    continue
+                
+                # Logs written before NDJSON logging: whole JSON log referenced from the OCR result
+                if not version.ocr_result_ref:
+                    continue
                 try:
                     # Download OCR result
                     ocr_data_bytes = storage.download_file(version.ocr_result_ref)
@@ -346,7 +457,8 @@ def get_ocr_log(job_id: str):
             
             return jsonify({
                 'job_id': job_id,
-                'ocr_logs': ocr_logs
+                'ocr_logs': ocr_logs,
+                'next_offsets': next_offsets,
             }), 200
             
     except Exception as e:
@@ -404,60 +516,9 @@ def get_job_results(job_id: str):
             diff_results = db.query(DiffResult).filter_by(job_id=job_id).order_by(DiffResult.created_at.asc()).all()
             diff_entries = []
             
-            # Helper function to parse change types from summary text
-            def parse_change_types(summary_text: str) -> dict:
-                """Parse added, modified, removed counts from summary text"""
-                if not summary_text:
-                    return {'added': 0, 'modified': 0, 'removed': 0}
-                
-                lower_text = summary_text.lower()
-                added = len([line for line in summary_text.split('\n') if 'added' in line.lower() or 'addition' in line.lower()])
-                removed = len([line for line in summary_text.split('\n') if 'removed' in line.lower() or 'removal' in line.lower()])
-                modified = len([line for line in summary_text.split('\n') if 'modified' in line.lower() or 'modification' in line.lower()])
-                
-                # If no explicit counts, estimate from change_count
-                if added == 0 and removed == 0 and modified == 0:
-                    # Default: assume all changes are modifications
-                    return {'added': 0, 'modified': 1, 'removed': 0}
-                
-                return {
-                    'added': added,
-                    'modified': modified,
-                    'removed': removed
-                }
-            
-            # Helper function to parse categories from summary text
-            def parse_categories(summary_text: str) -> dict:
-                """Parse category counts from summary text"""
-                categories = {
-                    'MEP': 0,
-                    'Drywall': 0,
-                    'Electrical': 0,
-                    'Architectural': 0,
-                    'Structural': 0,
-                    'Concrete': 0,
-                    'Site Work': 0
-                }
-                
-                if not summary_text:
-                    return categories
-                
-                lower_text = summary_text.lower()
-                category_keywords = {
-                    'MEP': ['mep', 'mechanical', 'plumbing', 'hvac', 'duct', 'pipe', 'ventilation'],
-                    'Drywall': ['drywall', 'gypsum', 'sheetrock', 'partition', 'wall board'],
-                    'Electrical': ['electrical', 'wiring', 'conduit', 'outlet', 'switch', 'panel', 'circuit'],
-                    'Architectural': ['architectural', 'floor plan', 'elevation', 'section', 'detail', 'room'],
-                    'Structural': ['structural', 'beam', 'column', 'foundation', 'steel', 'concrete structure'],
-                    'Concrete': ['concrete', 'slab', 'pour', 'cement', 'rebar'],
-                    'Site Work': ['site', 'excavation', 'grading', 'landscaping', 'paving', 'utilities'],
-                }
-                
-                for category, keywords in category_keywords.items():
-                    matches = sum(1 for keyword in keywords if keyword in lower_text)
-                    categories[category] = matches
-                
-                return categories
+            # Change counts were computed when each summary was written; aggregate them in SQL
+            from services.change_metrics import empty_categories, job_change_metrics, job_change_totals
+            metrics_by_diff = job_change_metrics(db, job_id)
             
             for diff_result in diff_results:
                 metadata = diff_result.diff_metadata or {}
@@ -466,8 +527,9 @@ def get_job_results(job_id: str):
                     is_active=True
                 ).first()
                 summary_payload = None
-                change_types = {'added': 0, 'modified': 0, 'removed': 0}
-                categories = parse_categories('')
+                diff_metrics = metrics_by_diff.get(diff_result.id, {})
+                change_types = diff_metrics.get('kpis', {'added': 0, 'modified': 0, 'removed': 0})
+                categories = diff_metrics.get('categories', empty_categories())
                 # Default to pixel-based change count from diff pipeline
                 effective_change_count = diff_result.change_count
                 
@@ -479,10 +541,6 @@ def get_job_results(job_id: str):
                         'source': active_summary.source,
                         'created_at': active_summary.created_at.isoformat() if active_summary.created_at else None
                     }
-                    # Parse change types and categories from summary text
-                    change_types = parse_change_types(active_summary.summary_text)
-                    categories = parse_categories(active_summary.summary_text)
-                    
                     # If AI summary includes a structured change_count, prefer that over raw pixel estimate
                     try:
                         summary_json = active_summary.summary_json or {}
@@ -509,7 +567,8 @@ def get_job_results(job_id: str):
                     'total_pages': metadata.get('total_pages'),
                     'summary': summary_payload,
                     'change_types': change_types,  # Added, Modified, Removed counts
-                    'categories': categories  # Category breakdown
+                    'categories': categories,  # Category breakdown
+                    'keynotes': diff_metrics.get('keynotes', {}),  # Keynote / general note deltas
                 })
 
             if diff_entries:
@@ -519,31 +578,10 @@ def get_job_results(job_id: str):
                 if diff_entries[0].get('summary'):
                     result['summary'] = diff_entries[0]['summary']
                 
-                # Aggregate KPIs across all diffs
-                total_added = sum(d.get('change_types', {}).get('added', 0) for d in diff_entries)
-                total_modified = sum(d.get('change_types', {}).get('modified', 0) for d in diff_entries)
-                total_removed = sum(d.get('change_types', {}).get('removed', 0) for d in diff_entries)
-                
-                # Aggregate categories across all diffs
-                aggregated_categories = {
-                    'MEP': 0,
-                    'Drywall': 0,
-                    'Electrical': 0,
-                    'Architectural': 0,
-                    'Structural': 0,
-                    'Concrete': 0,
-                    'Site Work': 0
-                }
-                for diff_entry in diff_entries:
-                    for category, count in diff_entry.get('categories', {}).items():
-                        aggregated_categories[category] = aggregated_categories.get(category, 0) + count
-                
-                result['kpis'] = {
-                    'added': total_added,
-                    'modified': total_modified,
-                    'removed': total_removed
-                }
-                result['categories'] = aggregated_categories
+                totals = job_change_totals(db, job_id)
+                result['kpis'] = totals['kpis']
+                result['categories'] = totals['categories']
+                result['keynotes'] = totals['keynotes']
             
             return jsonify(result), 200
             
@@ -621,6 +659,7 @@ def get_cost_impact(job_id: str):
         with get_db_session() as db:
             from gcp.database.models import DiffResult, ChangeSummary
             from services.impact_report_service import get_impact_report_service
+            from services.change_metrics import job_change_totals
             
             job = db.query(Job).filter_by(id=job_id).first()
             if not job:
@@ -632,13 +671,11 @@ def get_cost_impact(job_id: str):
             if not diff_results:
                 return jsonify({'error': 'No diff results found for this job'}), 404
             
-            # Aggregate changes summary from all diffs
+            # Aggregate changes summary from all diffs; counts come precomputed from the summaries
             changes_parts = []
-            categories = {
-                'MEP': 0, 'Drywall': 0, 'Electrical': 0,
-                'Architectural': 0, 'Structural': 0, 'Concrete': 0, 'Site Work': 0
-            }
-            kpis = {'added': 0, 'modified': 0, 'removed': 0}
+            totals = job_change_totals(db, job_id)
+            categories = totals['categories']
+            kpis = totals['kpis']
             
             for diff_result in diff_results:
                 metadata = diff_result.diff_metadata or {}
@@ -653,33 +690,6 @@ def get_cost_impact(job_id: str):
                 if active_summary:
                     summary_text = active_summary.summary_text or ''
                     changes_parts.append(f"### {drawing_name}\n{summary_text[:1000]}")
-                    
-                    # Parse categories from summary
-                    lower_text = summary_text.lower()
-                    category_keywords = {
-                        'MEP': ['mep', 'mechanical', 'plumbing', 'hvac', 'duct', 'pipe'],
-                        'Electrical': ['electrical', 'wiring', 'conduit', 'outlet', 'panel'],
-                        'Structural': ['structural', 'beam', 'column', 'foundation', 'steel'],
-                        'Architectural': ['architectural', 'floor plan', 'elevation', 'room'],
-                        'Concrete': ['concrete', 'slab', 'pour', 'rebar'],
-                        'Site Work': ['site', 'excavation', 'grading', 'landscaping'],
-                        'Drywall': ['drywall', 'gypsum', 'partition'],
-                    }
-                    
-                    for cat, keywords in category_keywords.items():
-                        matches = sum(1 for kw in keywords if kw in lower_text)
-                        categories[cat] += matches
-                    
-                    # Parse KPIs
-                    lines = summary_text.split('\n')
-                    for line in lines:
-                        lower_line = line.lower()
-                        if 'added' in lower_line or 'addition' in lower_line:
-                            kpis['added'] += 1
-                        if 'removed' in lower_line or 'removal' in lower_line:
-                            kpis['removed'] += 1
-                        if 'modified' in lower_line or 'change' in lower_line:
-                            kpis['modified'] += 1
             
             changes_summary = "\n\n".join(changes_parts) if changes_parts else "No detailed changes available"
             
@@ -714,6 +724,7 @@ def get_schedule_impact(job_id: str):
         with get_db_session() as db:
             from gcp.database.models import DiffResult, ChangeSummary
             from services.impact_report_service import get_impact_report_service
+            from services.change_metrics import job_change_totals
             
             job = db.query(Job).filter_by(id=job_id).first()
             if not job:
@@ -725,13 +736,11 @@ def get_schedule_impact(job_id: str):
             if not diff_results:
                 return jsonify({'error': 'No diff results found for this job'}), 404
             
-            # Aggregate changes summary from all diffs
+            # Aggregate changes summary from all diffs; counts come precomputed from the summaries
             changes_parts = []
-            categories = {
-                'MEP': 0, 'Drywall': 0, 'Electrical': 0,
-                'Architectural': 0, 'Structural': 0, 'Concrete': 0, 'Site Work': 0
-            }
-            kpis = {'added': 0, 'modified': 0, 'removed': 0}
+            totals = job_change_totals(db, job_id)
+            categories = totals['categories']
+            kpis = totals['kpis']
             
             for diff_result in diff_results:
                 metadata = diff_result.diff_metadata or {}
@@ -746,33 +755,6 @@ def get_schedule_impact(job_id: str):
                 if active_summary:
                     summary_text = active_summary.summary_text or ''
                     changes_parts.append(f"### {drawing_name}\n{summary_text[:1000]}")
-                    
-                    # Parse categories from summary
-                    lower_text = summary_text.lower()
-                    category_keywords = {
-                        'MEP': ['mep', 'mechanical', 'plumbing', 'hvac', 'duct', 'pipe'],
-                        'Electrical': ['electrical', 'wiring', 'conduit', 'outlet', 'panel'],
-                        'Structural': ['structural', 'beam', 'column', 'foundation', 'steel'],
-                        'Architectural': ['architectural', 'floor plan', 'elevation', 'room'],
-                        'Concrete': ['concrete', 'slab', 'pour', 'rebar'],
-                        'Site Work': ['site', 'excavation', 'grading', 'landscaping'],
-                        'Drywall': ['drywall', 'gypsum', 'partition'],
-                    }
-                    
-                    for cat, keywords in category_keywords.items():
-                        matches = sum(1 for kw in keywords if kw in lower_text)
-                        categories[cat] += matches
-                    
-                    # Parse KPIs
-                    lines = summary_text.split('\n')
-                    for line in lines:
-                        lower_line = line.lower()
-                        if 'added' in lower_line or 'addition' in lower_line:
-                            kpis['added'] += 1
-                        if 'removed' in lower_line or 'removal' in lower_line:
-                            kpis['removed'] += 1
-                        if 'modified' in lower_line or 'change' in lower_line:
-                            kpis['modified'] += 1
             
             changes_summary = "\n\n".join(changes_parts) if changes_parts else "No detailed changes available"
             
@@ -9,6 +9,7 @@ from flask import Blueprint, jsonify, request
 try:
     from gcp.database import get_db_session
     from gcp.database.models import ChangeSummary, DiffResult
+    from services.change_metrics import attach_change_metrics
     DB_AVAILABLE = True
 except Exception:  # pragma: no cover
     DB_AVAILABLE = False
@@ -83,6 +84,7 @@ def update_summary(summary_id: str):
         if text:
             summary.summary_text = text
             summary.source = data.get('source', 'human_corrected')
+            attach_change_metrics(summary)
         if 'metadata' in data:
             summary.metadata = data['metadata']
         summary.updated_at = datetime.utcnow()
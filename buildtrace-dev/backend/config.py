@@ -94,6 +94,12 @@ class Config:
         self.MAX_SYNC_PAGES = int(os.getenv('MAX_SYNC_PAGES', '10'))
         self.MEMORY_LIMIT_GB = float(os.getenv('MEMORY_LIMIT_GB', '25.0' if self.IS_PRODUCTION else '10.0'))
 
+        # Diff process isolation (0 workers = run diffs inside the worker process)
+        self.DIFF_EXECUTOR_WORKERS = int(os.getenv('DIFF_EXECUTOR_WORKERS', '0'))
+        self.DIFF_EXECUTOR_MAX_TASKS_PER_CHILD = int(os.getenv('DIFF_EXECUTOR_MAX_TASKS_PER_CHILD', '10'))
+        self.DIFF_EXECUTOR_RSS_LIMIT_MB = int(os.getenv('DIFF_EXECUTOR_RSS_LIMIT_MB', '4096'))
+        self.DIFF_EXECUTOR_TASK_TIMEOUT = int(os.getenv('DIFF_EXECUTOR_TASK_TIMEOUT', '900'))
+
         # OpenAI settings
         # IMPORTANT: Set OPENAI_API_KEY as environment variable for security
         # Do not hardcode API keys in source code
@@ -107,6 +113,63 @@ class Config:
         # Model options: 'models/gemini-2.5-pro' (best quality), 'models/gemini-2.5-flash' (faster)
         self.GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'models/gemini-2.5-pro')
         
+        # LLM request throughput (0 requests/tokens per minute = unlimited)
+        self.OCR_PAGE_CONCURRENCY = int(os.getenv('OCR_PAGE_CONCURRENCY', '4'))
+        self.OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '60'))
+        self.GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))
+        self.OPENAI_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', '0'))
+        self.GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', '0'))
+        # Per-model overrides, e.g. {"openai:gpt-4o": {"rpm": 500, "tpm": 300000}}
+        self.LLM_RATE_LIMITS = os.getenv('LLM_RATE_LIMITS', '')
+        
+        # Vision payload budgets (longest side in px; bytes per encoded image)
+        self.OPENAI_IMAGE_MAX_DIMENSION = int(os.getenv('OPENAI_IMAGE_MAX_DIMENSION', '2048'))
+        self.GEMINI_IMAGE_MAX_DIMENSION = int(os.getenv('GEMINI_IMAGE_MAX_DIMENSION', '1600'))
+        self.GEMINI_OCR_IMAGE_MAX_DIMENSION = int(os.getenv('GEMINI_OCR_IMAGE_MAX_DIMENSION', '3072'))
+        self.IMAGE_PAYLOAD_MAX_BYTES = int(os.getenv('IMAGE_PAYLOAD_MAX_BYTES', str(4 * 1024 * 1024)))
+        self.IMAGE_PAYLOAD_CACHE_SIZE = int(os.getenv('IMAGE_PAYLOAD_CACHE_SIZE', '64'))
+        # Raw diff/page artifacts kept across summary runs, keyed by storage ref (0 = per-run only)
+        self.SUMMARY_ARTIFACT_CACHE_MB = int(os.getenv('SUMMARY_ARTIFACT_CACHE_MB', '0'))
+        # Change-region summaries (SUMMARY_REGION_MODE): a small overview plus crops of each changed region,
+        # used while the diff's regions stay below these limits (otherwise whole sheets are sent)
+        self.SUMMARY_OVERVIEW_MAX_DIMENSION = int(os.getenv('SUMMARY_OVERVIEW_MAX_DIMENSION', '768'))
+        self.SUMMARY_REGION_MAX_REGIONS = int(os.getenv('SUMMARY_REGION_MAX_REGIONS', '8'))
+        self.SUMMARY_REGION_MAX_COVERAGE = float(os.getenv('SUMMARY_REGION_MAX_COVERAGE', '0.35'))
+        # Streaming jobs: settle a page's summary as skipped when its diff found no changes
+        self.SKIP_UNCHANGED_PAGE_SUMMARY = os.getenv('SKIP_UNCHANGED_PAGE_SUMMARY', 'false').lower() == 'true'
+        
+        # OCR progress log: pushed to storage every N pages or N seconds, whichever comes first
+        self.OCR_LOG_FLUSH_PAGES = int(os.getenv('OCR_LOG_FLUSH_PAGES', '5'))
+        self.OCR_LOG_FLUSH_SECONDS = float(os.getenv('OCR_LOG_FLUSH_SECONDS', '10'))
+        
+        # Text-layer OCR: also ask the vision model for sections the text layer never reads
+        # (design team, dimensions, schedules, ...). Off: fully parsed vector pages make no model call.
+        self.OCR_TEXT_LAYER_UNREAD_SECTIONS = os.getenv('OCR_TEXT_LAYER_UNREAD_SECTIONS', 'false').lower() == 'true'
+        
+        # Incremental re-OCR: re-extract only changed regions when they stay below these limits
+        self.OCR_INCREMENTAL_MAX_COVERAGE = float(os.getenv('OCR_INCREMENTAL_MAX_COVERAGE', '0.35'))
+        self.OCR_INCREMENTAL_MAX_REGIONS = int(os.getenv('OCR_INCREMENTAL_MAX_REGIONS', '12'))
+        
+        # Tiled OCR (OCR_TILING_ENABLED): sheets whose longest side exceeds this are read as overlapping tiles
+        self.OCR_TILE_MIN_DIMENSION = int(os.getenv('OCR_TILE_MIN_DIMENSION', '5000'))
+        self.OCR_TILE_OVERLAP = float(os.getenv('OCR_TILE_OVERLAP', '0.1'))
+        
+        # LLM gateway retries, circuit breaker and hedging (0 seconds = no hedged requests)
+        self.LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+        self.LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '1.0'))
+        self.LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '30.0'))
+        self.LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('LLM_CIRCUIT_FAILURE_THRESHOLD', '5'))
+        self.LLM_CIRCUIT_RESET_SECONDS = float(os.getenv('LLM_CIRCUIT_RESET_SECONDS', '60'))
+        self.LLM_HEDGE_AFTER_SECONDS = float(os.getenv('LLM_HEDGE_AFTER_SECONDS', '0'))
+
+        # Batch-priority jobs: OCR/summary requests go through provider batches ('openai' or file-based 'local')
+        self.BATCH_PROVIDER = os.getenv('BATCH_PROVIDER', 'openai')
+        self.BATCH_LOCAL_DIR = os.getenv('BATCH_LOCAL_DIR', 'batches')
+        self.BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '500'))
+        self.BATCH_POLL_SECONDS = float(os.getenv('BATCH_POLL_SECONDS', '60'))
+        # Requests claimed for submission longer than this go back to the queue (the submitter died)
+        self.BATCH_SUBMIT_TIMEOUT_SECONDS = int(os.getenv('BATCH_SUBMIT_TIMEOUT_SECONDS', '900'))
+
         # Warn if API key is not set
         if not self.OPENAI_API_KEY and self.USE_AI_ANALYSIS:
             logger.warning("OPENAI_API_KEY not set - AI analysis features will be disabled")
@@ -122,6 +185,53 @@ class Config:
             self.PUBSUB_OCR_SUBSCRIPTION = os.getenv('PUBSUB_OCR_SUBSCRIPTION', 'buildtrace-dev-ocr-worker-sub')
             self.PUBSUB_DIFF_SUBSCRIPTION = os.getenv('PUBSUB_DIFF_SUBSCRIPTION', 'buildtrace-dev-diff-worker-sub')
             self.PUBSUB_SUMMARY_SUBSCRIPTION = os.getenv('PUBSUB_SUMMARY_SUBSCRIPTION', 'buildtrace-dev-summary-worker-sub')
+            # Client-side publish batching; publish_batch waits up to PUBSUB_PUBLISH_TIMEOUT per message
+            self.PUBSUB_BATCH_MAX_MESSAGES = int(os.getenv('PUBSUB_BATCH_MAX_MESSAGES', '100'))
+            self.PUBSUB_BATCH_MAX_BYTES = int(os.getenv('PUBSUB_BATCH_MAX_BYTES', str(1024 * 1024)))
+            self.PUBSUB_BATCH_MAX_LATENCY = float(os.getenv('PUBSUB_BATCH_MAX_LATENCY', '0.05'))
+            self.PUBSUB_PUBLISH_TIMEOUT = float(os.getenv('PUBSUB_PUBLISH_TIMEOUT', '60'))
+
+        # Adaptive subscriber concurrency: messages handled at once per worker instance follow
+        # CPU, RSS, error rate and queue lag ('io' profile for OCR/summary, 'cpu' for diff).
+        # Off = fixed PUBSUB_MAX_MESSAGES as before
+        self.PUBSUB_ADAPTIVE_CONCURRENCY = os.getenv('PUBSUB_ADAPTIVE_CONCURRENCY', 'true').lower() == 'true'
+        self.PUBSUB_CONCURRENCY_PROFILE = os.getenv('PUBSUB_CONCURRENCY_PROFILE', '')  # overrides the worker's profile
+        self.PUBSUB_MAX_CONCURRENCY = int(os.getenv('PUBSUB_MAX_CONCURRENCY', '0'))  # 0 = profile default
+        self.PUBSUB_TARGET_RSS_MB = int(os.getenv('PUBSUB_TARGET_RSS_MB', str(int(self.MEMORY_LIMIT_GB * 1024 * 0.8))))
+        self.PUBSUB_CONCURRENCY_INTERVAL = float(os.getenv('PUBSUB_CONCURRENCY_INTERVAL', '15'))
+
+        # Task queue backend: 'pubsub', 'local' (durable SQLite queues consumed by a worker pool)
+        # or 'thread' (legacy: one background thread per job)
+        self.QUEUE_BACKEND = os.getenv('QUEUE_BACKEND', 'pubsub' if self.USE_PUBSUB else 'local').lower()
+        self.LOCAL_QUEUE_PATH = os.getenv('LOCAL_QUEUE_PATH', os.path.join('queues', 'tasks.sqlite3'))
+        self.LOCAL_QUEUE_IN_PROCESS = os.getenv('LOCAL_QUEUE_IN_PROCESS', 'true').lower() == 'true'  # pool inside the API
+        self.LOCAL_QUEUE_WORKERS_OCR = int(os.getenv('LOCAL_QUEUE_WORKERS_OCR', '4'))
+        self.LOCAL_QUEUE_WORKERS_DIFF = int(os.getenv('LOCAL_QUEUE_WORKERS_DIFF', '2'))
+        self.LOCAL_QUEUE_WORKERS_SUMMARY = int(os.getenv('LOCAL_QUEUE_WORKERS_SUMMARY', '4'))
+        self.LOCAL_QUEUE_LEASE_SECONDS = float(os.getenv('LOCAL_QUEUE_LEASE_SECONDS', '900'))
+        self.LOCAL_QUEUE_MAX_ATTEMPTS = int(os.getenv('LOCAL_QUEUE_MAX_ATTEMPTS', '5'))
+        self.LOCAL_QUEUE_POLL_SECONDS = float(os.getenv('LOCAL_QUEUE_POLL_SECONDS', '0.5'))
+
+        # Fair scheduling of streaming page tasks: pages wait in job_stages until a
+        # stage has a free slot, then go out by weighted fair share across
+        # organizations/projects and jobs (0 = publish every ready page at once)
+        self.SCHEDULER_MAX_IN_FLIGHT_OCR = int(os.getenv('SCHEDULER_MAX_IN_FLIGHT_OCR', '16'))
+        self.SCHEDULER_MAX_IN_FLIGHT_DIFF = int(os.getenv('SCHEDULER_MAX_IN_FLIGHT_DIFF', '8'))
+        self.SCHEDULER_MAX_IN_FLIGHT_SUMMARY = int(os.getenv('SCHEDULER_MAX_IN_FLIGHT_SUMMARY', '16'))
+        # Share of each priority class, and optional per-organization weights (JSON: {"<org_id>": 2})
+        self.SCHEDULER_PRIORITY_WEIGHTS = os.getenv('SCHEDULER_PRIORITY_WEIGHTS', '{"interactive": 8, "batch": 1}')
+        self.SCHEDULER_TENANT_WEIGHTS = os.getenv('SCHEDULER_TENANT_WEIGHTS', '')
+        # In-flight pages older than this no longer hold a slot (their worker died)
+        self.SCHEDULER_STALE_SECONDS = int(os.getenv('SCHEDULER_STALE_SECONDS', '3600'))
+
+        # Stage execution ledger: workers claim (job, stage, page, inputs) before running, so a
+        # redelivered task replays the stored result; a claim whose lease expired can be taken over
+        self.STAGE_LEDGER_ENABLED = os.getenv('STAGE_LEDGER_ENABLED', 'true').lower() == 'true'
+        self.STAGE_LEDGER_LEASE_SECONDS = int(os.getenv('STAGE_LEDGER_LEASE_SECONDS', '900'))
+        # Workers re-read a job's cancelled flag at most this often (seconds) between expensive steps
+        self.CANCELLATION_CHECK_TTL_SECONDS = float(os.getenv('CANCELLATION_CHECK_TTL_SECONDS', '5'))
+        # POST /jobs/<id>/resume re-runs a failed page stage at most this many times
+        self.JOB_RESUME_MAX_ATTEMPTS = int(os.getenv('JOB_RESUME_MAX_ATTEMPTS', '3'))
 
         # Security settings
         self.ALLOWED_EXTENSIONS = {'pdf', 'dwg', 'dxf', 'png', 'jpg', 'jpeg'}
@@ -12,13 +12,13 @@ from .models import (
     Base, User, Project, DrawingVersion, Session, Drawing,
     Comparison, AnalysisResult, ChatConversation, ChatMessage, ProcessingJob,
     # New models for async architecture
-    Organization, Job, JobStage, DiffResult, ManualOverlay, ChangeSummary, AuditLog
+    Organization, Job, JobStage, DiffResult, ManualOverlay, ChangeSummary, ChangeSummaryMetric, BatchRequest, StageExecution, AuditLog
 )
 
 __all__ = [
     'DatabaseManager', 'get_db', 'init_db', 'get_db_session',
     'Base', 'User', 'Project', 'DrawingVersion', 'Session', 'Drawing',
     'Comparison', 'AnalysisResult', 'ChatConversation', 'ChatMessage', 'ProcessingJob',
-    'Organization', 'Job', 'JobStage', 'DiffResult', 'ManualOverlay', 'ChangeSummary', 'AuditLog'
+    'Organization', 'Job', 'JobStage', 'DiffResult', 'ManualOverlay', 'ChangeSummary', 'ChangeSummaryMetric', 'BatchRequest', 'StageExecution', 'AuditLog'
 ]
 
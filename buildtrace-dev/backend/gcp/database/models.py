@@ -314,6 +314,7 @@ class Job(Base):
     new_drawing_version_id = Column(String(36), ForeignKey('drawing_versions.id'), nullable=False)
     status = Column(String(50), default='created')  # created, in_progress, completed, failed, cancelled
     total_pages = Column(Integer, default=1)  # Number of pages in the PDF (for streaming progress)
+    completed_pages = Column(Integer, default=0)  # Pages whose final stage has settled (atomic counter)
     created_by = Column(String(36), ForeignKey('users.id'), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime)
@@ -349,7 +350,7 @@ class JobStage(Base):
     stage = Column(String(50), nullable=False)  # ocr, diff, summary
     page_number = Column(Integer, nullable=True)  # Which page this stage is for (1-indexed, NULL for whole-job stages)
     drawing_version_id = Column(String(36), ForeignKey('drawing_versions.id'), nullable=True)  # For OCR stage
-    status = Column(String(50), default='pending')  # pending, in_progress, completed, failed, skipped
+    status = Column(String(50), default='pending')  # pending, queued, in_progress, completed, failed, skipped
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
     error_message = Column(Text)
@@ -388,6 +389,7 @@ class DiffResult(Base):
     change_count = Column(Integer, default=0)  # Total number of changes
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(String(36), ForeignKey('users.id'), nullable=True)  # System for machine-generated
+    cache_key = Column(String(64), nullable=True)  # sha256 of (old raster, new raster, alignment config) for memoization
     diff_metadata = Column(JSON)  # Store diff statistics, processing time, etc. (renamed from 'metadata')
 
     # Relationships
@@ -402,6 +404,7 @@ class DiffResult(Base):
         Index('idx_diff_results_job', 'job_id'),
         Index('idx_diff_results_job_page', 'job_id', 'page_number'),
         Index('idx_diff_results_versions', 'old_drawing_version_id', 'new_drawing_version_id'),
+        Index('idx_diff_results_cache_key', 'cache_key'),
     )
 
 
@@ -458,6 +461,7 @@ class ChangeSummary(Base):
     created_by_user = relationship("User", back_populates="change_summaries")
     parent_summary = relationship("ChangeSummary", remote_side=[id])
     child_summaries = relationship("ChangeSummary", back_populates="parent_summary")
+    metrics = relationship("ChangeSummaryMetric", back_populates="summary", cascade="all, delete-orphan")
 
     # Indexes
     __table_args__ = (
@@ -467,6 +471,74 @@ class ChangeSummary(Base):
     )
 
 
+class ChangeSummaryMetric(Base):
+    """Structured change counts of a summary, stored at write time so results can be aggregated in SQL"""
+    __tablename__ = 'change_summary_metrics'
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    summary_id = Column(String(36), ForeignKey('change_summaries.id', ondelete='CASCADE'), nullable=False)
+    metric = Column(String(50), nullable=False)  # 'added', 'keynotes_removed', 'category:MEP', ...
+    value = Column(Integer, nullable=False, default=0)
+
+    # Relationships
+    summary = relationship("ChangeSummary", back_populates="metrics")
+
+    # Indexes
+    __table_args__ = (
+        UniqueConstraint('summary_id', 'metric', name='uq_change_summary_metric'),
+        Index('idx_change_summary_metrics_summary', 'summary_id'),
+    )
+
+
+class BatchRequest(Base):
+    """One deferred LLM request submitted through a provider batch (batch-priority jobs)"""
+    __tablename__ = 'batch_requests'
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))  # Used as the batch custom_id
+    job_id = Column(String(36), ForeignKey('jobs.id', ondelete='CASCADE'), nullable=False)
+    kind = Column(String(50), nullable=False)  # 'ocr', 'summary'
+    status = Column(String(50), default='queued')  # queued, submitting, submitted, completed, failed
+    provider = Column(String(50))  # 'openai', 'local'
+    provider_batch_id = Column(String(255))
+    request_body = Column(JSON, nullable=False)  # Chat completion request body
+    target = Column(JSON)  # Where the result fans back to (page, stage, summary placeholder, ...)
+    error_message = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    submitted_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_batch_requests_status', 'status'),
+        Index('idx_batch_requests_batch', 'provider_batch_id'),
+        Index('idx_batch_requests_job', 'job_id'),
+    )
+
+
+class StageExecution(Base):
+    """Ledger of stage runs per (job, stage, page, inputs) - absorbs queue redeliveries"""
+    __tablename__ = 'stage_executions'
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    claim_key = Column(String(64), nullable=False, unique=True)  # sha256 of job/stage/page/input_hash
+    job_id = Column(String(36), ForeignKey('jobs.id', ondelete='CASCADE'), nullable=False)
+    stage = Column(String(50), nullable=False)
+    page_number = Column(Integer, nullable=True)  # NULL for whole-job stages
+    input_hash = Column(String(64), nullable=False)
+    status = Column(String(50), default='running')  # running, completed
+    owner = Column(String(255))  # claim token of the worker holding the lease
+    lease_expires_at = Column(DateTime)
+    attempts = Column(Integer, default=1)
+    result = Column(JSON)  # what the worker returned, replayed to redeliveries
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_stage_executions_job', 'job_id'),
+    )
+
+
 class AuditLog(Base):
     """Tracks all user actions for compliance and debugging"""
     __tablename__ = 'audit_logs'
@@ -3,18 +3,28 @@ Pub/Sub module for BuildTrace async job processing
 
 Contains:
 - publisher.py: Pub/Sub publisher for enqueueing tasks
+- memory.py: In-memory publisher stand-in for tests
+- local_queue.py: Durable SQLite queues for running without Pub/Sub
 - subscriber.py: Pub/Sub subscriber for worker services
 """
 
+from .memory import InMemoryPublisher
+from .publisher import BatchPublishResult, PublishError
+from .local_queue import LocalQueue, LocalQueuePublisher, LocalQueueSubscriber, get_local_queue
+
+_LOCAL = [
+    'InMemoryPublisher', 'BatchPublishResult', 'PublishError',
+    'LocalQueue', 'LocalQueuePublisher', 'LocalQueueSubscriber', 'get_local_queue',
+]
+
 # Optional imports - only available if google-cloud-pubsub is installed
 try:
     from .publisher import PubSubPublisher
     from .subscriber import PubSubSubscriber
-    __all__ = ['PubSubPublisher', 'PubSubSubscriber']
+    __all__ = ['PubSubPublisher', 'PubSubSubscriber'] + _LOCAL
 except ImportError as e:
     logger = __import__('logging').getLogger(__name__)
     logger.warning(f"Pub/Sub not available: {e}")
     PubSubPublisher = None
     PubSubSubscriber = None
-    __all__ = []
-
+    __all__ = list(_LOCAL)
@@ -0,0 +1,248 @@
+"""
+Local queue backend for BuildTrace job processing
+Durable per-stage task queues in a SQLite file, for deployments without Pub/Sub.
+
+``LocalQueuePublisher`` and ``LocalQueueSubscriber`` mirror ``PubSubPublisher``
+and ``PubSubSubscriber``: the orchestrator publishes OCR/diff/summary tasks and
+a subscriber per stage feeds them to the stage's worker with a configurable
+number of threads, so pages flow through the stages in parallel.
+
+Delivery is at-least-once, like Pub/Sub. A leased message is hidden for
+LOCAL_QUEUE_LEASE_SECONDS; it is deleted when the handler succeeds, retried
+with backoff when it raises, and becomes visible again if the process dies
+mid-task, so queued work survives restarts. After LOCAL_QUEUE_MAX_ATTEMPTS
+failed deliveries a message is parked as 'dead'.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from config import config
+from .publisher import BatchPublishResult, TaskPublisher
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stage TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_queue_messages_ready ON queue_messages(stage, status, available_at);
+"""
+
+
+@dataclass
+class LeasedMessage:
+    """A message handed to one consumer until it is acked, nacked or its lease expires."""
+    id: int
+    stage: str
+    data: Dict[str, Any]
+    attempts: int
+
+
+class LocalQueue:
+    """SQLite-backed visibility-timeout queue, safe across threads and processes."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.LOCAL_QUEUE_PATH
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        # Wakes idle consumers in this process as soon as something is enqueued
+        self._signal = threading.Condition()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def enqueue(self, stage: str, payloads: List[Dict[str, Any]]) -> List[str]:
+        """Append ``payloads`` to ``stage`` in one transaction; returns their message ids."""
+        now = time.time()
+        with self._transaction() as connection:
+            ids = [
+                str(connection.execute(
+                    "INSERT INTO queue_messages (stage, payload, available_at, created_at) VALUES (?, ?, ?, ?)",
+                    (stage, json.dumps(payload), now, now),
+                ).lastrowid)
+                for payload in payloads
+            ]
+        with self._signal:
+            self._signal.notify_all()
+        return ids
+
+    def lease(self, stage: str, lease_seconds: Optional[float] = None) -> Optional[LeasedMessage]:
+        """Take the oldest visible message of ``stage`` (None when the queue is empty)."""
+        lease_seconds = config.LOCAL_QUEUE_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT id, payload, attempts FROM queue_messages "
+                "WHERE stage = ? AND status = 'ready' AND available_at <= ? "
+                "ORDER BY available_at, id LIMIT 1",
+                (stage, now),
+            ).fetchone()
+            if row is None:
+                return None
+            message_id, payload, attempts = row
+            connection.execute(
+                "UPDATE queue_messages SET available_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (now + lease_seconds, message_id),
+            )
+        return LeasedMessage(id=message_id, stage=stage, data=json.loads(payload), attempts=attempts + 1)
+
+    def ack(self, message_id: int) -> None:
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM queue_messages WHERE id = ?", (message_id,))
+
+    def nack(self, message: LeasedMessage, error: str = '', delay: float = 0.0) -> None:
+        """Make ``message`` visible again after ``delay``, or park it once it ran out of attempts."""
+        dead = message.attempts >= config.LOCAL_QUEUE_MAX_ATTEMPTS
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE queue_messages SET status = ?, available_at = ?, last_error = ? WHERE id = ?",
+                ('dead' if dead else 'ready', time.time() + delay, error[:2000], message.id),
+            )
+        if dead:
+            logger.error(f"Parked {message.stage} message {message.id} after {message.attempts} attempts: {error}")
+
+    def wait_for_messages(self, timeout: float) -> None:
+        with self._signal:
+            self._signal.wait(timeout)
+
+    def depth(self, stage: str, status: str = 'ready') -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM queue_messages WHERE stage = ? AND status = ?", (stage, status)
+        ).fetchone()[0]
+
+
+class LocalQueuePublisher(TaskPublisher):
+    """Publishes tasks to the local queue (opened on first publish)."""
+
+    def __init__(self, queue: Optional[LocalQueue] = None):
+        self._queue = queue
+
+    @property
+    def queue(self) -> LocalQueue:
+        if self._queue is None:
+            self._queue = get_local_queue()
+        return self._queue
+
+    def publish_batch(self, stage: str, messages: List[Dict[str, Any]]) -> BatchPublishResult:
+        try:
+            return BatchPublishResult(message_ids=self.queue.enqueue(stage, messages))
+        except Exception as e:
+            logger.error(f"Failed to enqueue {len(messages)} {stage} tasks: {e}")
+            return BatchPublishResult(
+                message_ids=[None] * len(messages),
+                errors={index: str(e) for index in range(len(messages))},
+            )
+
+
+class LocalQueueSubscriber:
+    """Consumes one stage's local queue with ``concurrency`` worker threads."""
+
+    def __init__(self, stage: str, queue: Optional[LocalQueue] = None, concurrency: int = 1):
+        self.stage = stage
+        self.queue = queue or get_local_queue()
+        self.concurrency = max(1, concurrency)
+        self.running = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self, callback: Callable, block: bool = True):
+        """Start the worker threads; with ``block`` wait until ``stop`` (like PubSubSubscriber.start)."""
+        self.running = True
+        self._threads = [
+            threading.Thread(
+                target=self._consume, args=(callback,), name=f"local-{self.stage}-{index}", daemon=True
+            )
+            for index in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Started {self.concurrency} local {self.stage} workers on {self.queue.path}")
+        if block:
+            try:
+                for thread in self._threads:
+                    thread.join()
+            except KeyboardInterrupt:
+                self.stop()
+
+    def _consume(self, callback: Callable) -> None:
+        while self.running:
+            try:
+                message = self.queue.lease(self.stage)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not lease {self.stage} message: {e}")
+                message = None
+            if message is None:
+                self.queue.wait_for_messages(config.LOCAL_QUEUE_POLL_SECONDS)
+                continue
+            logger.info(f"Received message: {message.data.get('job_id', 'unknown')} on local {self.stage} queue")
+            try:
+                callback(message.data)
+                self.queue.ack(message.id)
+            except Exception as e:
+                logger.error(f"Error processing {self.stage} message {message.id}: {e}", exc_info=True)
+                self.queue.nack(message, str(e), delay=self._backoff(message.attempts))
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        return min(60.0, 2.0 ** attempts)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after the in-flight messages finish."""
+        self.running = False
+        for thread in self._threads:
+            thread.join(timeout)
+        logger.info(f"Stopped local {self.stage} workers")
+
+
+_local_queue: Optional[LocalQueue] = None
+_local_queue_lock = threading.Lock()
+
+
+def get_local_queue() -> LocalQueue:
+    """Get the singleton local queue at LOCAL_QUEUE_PATH."""
+    global _local_queue
+    with _local_queue_lock:
+        if _local_queue is None:
+            _local_queue = LocalQueue()
+        return _local_queue
+
+
+__all__ = [
+    'LeasedMessage',
+    'LocalQueue',
+    'LocalQueuePublisher',
+    'LocalQueueSubscriber',
+    'get_local_queue',
+]
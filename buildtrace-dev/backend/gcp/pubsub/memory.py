@@ -0,0 +1,50 @@
+"""
+In-memory task publisher
+Stand-in for PubSubPublisher that records published tasks instead of sending them.
+
+Used by tests (and local tooling) to assert on the message flow between
+stages without a Pub/Sub emulator. Individual publishes can be made to fail
+with ``fail_when``.
+"""
+
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from .publisher import BatchPublishResult, TaskPublisher
+
+
+class InMemoryPublisher(TaskPublisher):
+    """Collects published task messages per stage."""
+
+    def __init__(self, fail_when: Optional[Callable[[str, Dict[str, Any]], bool]] = None):
+        self.fail_when = fail_when
+        self.published: List[Dict[str, Any]] = []  # {'stage', 'message', 'message_id'} in publish order
+        self.batches: List[int] = []  # size of each publish call
+        self._lock = threading.Lock()
+
+    def publish_batch(self, stage: str, messages: List[Dict[str, Any]]) -> BatchPublishResult:
+        result = BatchPublishResult(message_ids=[None] * len(messages))
+        with self._lock:
+            self.batches.append(len(messages))
+            for index, message in enumerate(messages):
+                if self.fail_when and self.fail_when(stage, message):
+                    result.errors[index] = "publish rejected"
+                    continue
+                message_id = str(uuid.uuid4())
+                self.published.append({'stage': stage, 'message': message, 'message_id': message_id})
+                result.message_ids[index] = message_id
+        return result
+
+    def messages(self, stage: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Published message bodies, optionally for one stage only."""
+        with self._lock:
+            return [entry['message'] for entry in self.published if stage is None or entry['stage'] == stage]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.published.clear()
+            self.batches.clear()
+
+
+__all__ = ['InMemoryPublisher']
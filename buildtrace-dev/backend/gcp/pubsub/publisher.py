@@ -1,9 +1,15 @@
 """
 Pub/Sub Publisher for BuildTrace job queue
 Publishes tasks to OCR, Diff, and Summary queues
+
+Tasks for many pages are published with ``publish_batch``: every message is
+handed to the client at once (the client groups them into batched requests
+per its ``BatchSettings``), then the futures are awaited together, so N pages
+cost a few round trips instead of N.
 """
 
-from typing import Dict, Any
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
 import json
 import logging
 from config import config
@@ -18,89 +24,131 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-class PubSubPublisher:
-    """Publishes tasks to Pub/Sub topics"""
-    
-    def __init__(self, project_id: str = None):
-        if not PUBSUB_AVAILABLE:
-            raise ImportError("google-cloud-pubsub is not installed. Install it with: pip install google-cloud-pubsub")
-        self.project_id = project_id or config.GCP_PROJECT_ID
-        self.publisher = pubsub_v1.PublisherClient()
-    
-    def publish_ocr_task(self, job_id: str, drawing_version_id: str, metadata: Dict[str, Any]) -> str:
-        """Publish OCR task to queue"""
-        topic_path = self.publisher.topic_path(
-            self.project_id, 
-            config.PUBSUB_OCR_TOPIC
-        )
-        
-        message_data = {
+
+class PublishError(RuntimeError):
+    """Raised when one or more messages of a publish call were not accepted."""
+
+
+@dataclass
+class BatchPublishResult:
+    """Outcome of ``publish_batch``, aligned with the input messages."""
+    message_ids: List[Optional[str]]
+    errors: Dict[int, str] = field(default_factory=dict)  # input index -> error
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+    def raise_for_failures(self) -> None:
+        if self.errors:
+            index, error = next(iter(self.errors.items()))
+            raise PublishError(f"{self.failed} of {len(self.message_ids)} messages failed to publish (#{index}: {error})")
+
+
+class TaskPublisher:
+    """Builds task messages for each stage; subclasses deliver them via ``publish_batch``."""
+
+    def publish_batch(self, stage: str, messages: List[Dict[str, Any]]) -> BatchPublishResult:
+        """Publish ``messages`` (built with ``*_task_message``) to ``stage``'s queue."""
+        raise NotImplementedError
+
+    @staticmethod
+    def ocr_task_message(job_id: str, drawing_version_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             'job_id': job_id,
             'stage': 'ocr',
             'drawing_version_id': drawing_version_id,
             'metadata': metadata
         }
-        
-        future = self.publisher.publish(
-            topic_path,
-            json.dumps(message_data).encode('utf-8'),
-            job_id=job_id,
-            stage='ocr'
-        )
-        
-        message_id = future.result()
-        logger.info(f"Published OCR task {job_id} as message {message_id}")
-        return message_id
-    
-    def publish_diff_task(self, job_id: str, old_version_id: str, new_version_id: str, metadata: Dict[str, Any]) -> str:
-        """Publish diff task to queue"""
-        topic_path = self.publisher.topic_path(
-            self.project_id,
-            config.PUBSUB_DIFF_TOPIC
-        )
-        
-        message_data = {
+
+    @staticmethod
+    def diff_task_message(job_id: str, old_version_id: str, new_version_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             'job_id': job_id,
             'stage': 'diff',
             'old_drawing_version_id': old_version_id,
             'new_drawing_version_id': new_version_id,
             'metadata': metadata
         }
-        
-        future = self.publisher.publish(
-            topic_path,
-            json.dumps(message_data).encode('utf-8'),
-            job_id=job_id,
-            stage='diff'
-        )
-        
-        message_id = future.result()
-        logger.info(f"Published Diff task {job_id} as message {message_id}")
-        return message_id
-    
-    def publish_summary_task(self, job_id: str, diff_result_id: str, overlay_ref: str = None, metadata: Dict[str, Any] = None) -> str:
-        """Publish summary task to queue"""
-        topic_path = self.publisher.topic_path(
-            self.project_id,
-            config.PUBSUB_SUMMARY_TOPIC
-        )
-        
-        message_data = {
+
+    @staticmethod
+    def summary_task_message(job_id: str, diff_result_id: str, overlay_ref: str = None, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        return {
             'job_id': job_id,
             'stage': 'summary',
             'diff_result_id': diff_result_id,
             'overlay_ref': overlay_ref,
             'metadata': metadata or {}
         }
-        
-        future = self.publisher.publish(
-            topic_path,
-            json.dumps(message_data).encode('utf-8'),
-            job_id=job_id,
-            stage='summary'
-        )
-        
-        message_id = future.result()
-        logger.info(f"Published Summary task {job_id} as message {message_id}")
+
+    def _publish_one(self, stage: str, message: Dict[str, Any]) -> str:
+        result = self.publish_batch(stage, [message])
+        result.raise_for_failures()
+        message_id = result.message_ids[0]
+        logger.info(f"Published {stage} task {message['job_id']} as message {message_id}")
         return message_id
 
+    def publish_ocr_task(self, job_id: str, drawing_version_id: str, metadata: Dict[str, Any]) -> str:
+        """Publish OCR task to queue"""
+        return self._publish_one('ocr', self.ocr_task_message(job_id, drawing_version_id, metadata))
+
+    def publish_diff_task(self, job_id: str, old_version_id: str, new_version_id: str, metadata: Dict[str, Any]) -> str:
+        """Publish diff task to queue"""
+        return self._publish_one('diff', self.diff_task_message(job_id, old_version_id, new_version_id, metadata))
+
+    def publish_summary_task(self, job_id: str, diff_result_id: str, overlay_ref: str = None, metadata: Dict[str, Any] = None) -> str:
+        """Publish summary task to queue"""
+        return self._publish_one('summary', self.summary_task_message(job_id, diff_result_id, overlay_ref, metadata))
+
+
+class PubSubPublisher(TaskPublisher):
+    """Publishes tasks to Pub/Sub topics"""
+
+    def __init__(self, project_id: str = None):
+        if not PUBSUB_AVAILABLE:
+            raise ImportError("google-cloud-pubsub is not installed. Install it with: pip install google-cloud-pubsub")
+        self.project_id = project_id or config.GCP_PROJECT_ID
+        self.publisher = pubsub_v1.PublisherClient(
+            batch_settings=pubsub_v1.types.BatchSettings(
+                max_messages=config.PUBSUB_BATCH_MAX_MESSAGES,
+                max_bytes=config.PUBSUB_BATCH_MAX_BYTES,
+                max_latency=config.PUBSUB_BATCH_MAX_LATENCY,
+            )
+        )
+        self._topics = {
+            'ocr': config.PUBSUB_OCR_TOPIC,
+            'diff': config.PUBSUB_DIFF_TOPIC,
+            'summary': config.PUBSUB_SUMMARY_TOPIC,
+        }
+
+    def publish_batch(self, stage: str, messages: List[Dict[str, Any]]) -> BatchPublishResult:
+        """Hand every message to the client, then wait for all of them once."""
+        topic_path = self.publisher.topic_path(self.project_id, self._topics[stage])
+        result = BatchPublishResult(message_ids=[None] * len(messages))
+
+        futures: List[Tuple[int, Any]] = []
+        for index, message in enumerate(messages):
+            try:
+                futures.append((index, self.publisher.publish(
+                    topic_path,
+                    json.dumps(message).encode('utf-8'),
+                    job_id=message['job_id'],
+                    stage=stage
+                )))
+            except Exception as e:
+                result.errors[index] = str(e)
+
+        for index, future in futures:
+            try:
+                result.message_ids[index] = future.result(timeout=config.PUBSUB_PUBLISH_TIMEOUT)
+            except Exception as e:
+                result.errors[index] = str(e)
+
+        if len(messages) > 1:
+            logger.info(
+                f"Published {len(messages) - result.failed}/{len(messages)} {stage} tasks",
+                extra={"stage": stage, "failed": result.failed},
+            )
+        for index, error in result.errors.items():
+            logger.error(f"Failed to publish {stage} task for job {messages[index].get('job_id')}: {error}")
+        return result
@@ -4,19 +4,27 @@ Subscribes to OCR, Diff, and Summary queues
 """
 
 from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
 from google.cloud.pubsub_v1.types import FlowControl
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Optional
 import json
 import logging
 import threading
 import os
 
+from config import config
+from utils.adaptive_concurrency import AdaptiveConcurrency, profile_for
+from utils.llm_gateway import get_llm_gateway
+
 logger = logging.getLogger(__name__)
 
 class PubSubSubscriber:
     """Subscribes to Pub/Sub topics and processes messages"""
     
-    def __init__(self, project_id: str, subscription_name: str):
+    def __init__(self, project_id: str, subscription_name: str, profile: Optional[str] = None):
+        """``profile`` ('io' or 'cpu') enables adaptive concurrency (PUBSUB_ADAPTIVE_CONCURRENCY)."""
         self.project_id = project_id
         self.subscription_name = subscription_name
         self.subscriber = pubsub_v1.SubscriberClient()
@@ -26,30 +34,55 @@ class PubSubSubscriber:
         )
         self.running = False
         self.streaming_pull_future = None
+        self.concurrency = None
+        if profile and config.PUBSUB_ADAPTIVE_CONCURRENCY:
+            self.concurrency = AdaptiveConcurrency(
+                profile_for(profile),
+                name=subscription_name,
+                provider_stats=lambda: get_llm_gateway().stats(),
+            )
     
     def start(self, callback: Callable):
         """Start listening for messages"""
         self.running = True
         
         def callback_wrapper(message):
+            concurrency = self.concurrency
+            if concurrency:
+                concurrency.acquire(lag_seconds=self._lag_seconds(message))
+            ok = False
             try:
                 data = json.loads(message.data.decode('utf-8'))
                 logger.info(f"Received message: {data.get('job_id', 'unknown')} on {self.subscription_name}")
-                callback(data)
+                result = callback(data)
                 message.ack()
+                # Workers ack a failure they have recorded; it still counts against the limit
+                ok = not (isinstance(result, dict) and result.get('status') == 'failed')
             except Exception as e:
                 logger.error(f"Error processing message: {e}", exc_info=True)
                 message.nack()  # Retry later
+            finally:
+                if concurrency:
+                    concurrency.release(ok)
         
-        # Limit concurrent message processing to prevent OOM
-        # Default to 1 for diff workers (memory intensive), 3 for others
-        max_messages = int(os.getenv('PUBSUB_MAX_MESSAGES', '1'))
+        subscribe_kwargs = {}
+        if self.concurrency:
+            # Lease up to the profile maximum; the adaptive limit decides how many run
+            max_messages = self.concurrency.profile.max_concurrency
+            subscribe_kwargs['scheduler'] = ThreadScheduler(
+                executor=ThreadPoolExecutor(max_workers=max_messages, thread_name_prefix=self.subscription_name)
+            )
+        else:
+            # Limit concurrent message processing to prevent OOM
+            # Default to 1 for diff workers (memory intensive), 3 for others
+            max_messages = int(os.getenv('PUBSUB_MAX_MESSAGES', '1'))
         flow_control = FlowControl(max_messages=max_messages)
         
         self.streaming_pull_future = self.subscriber.subscribe(
             self.subscription_path,
             callback=callback_wrapper,
-            flow_control=flow_control
+            flow_control=flow_control,
+            **subscribe_kwargs
         )
         
         logger.info(f"Started listening on {self.subscription_name}")
@@ -59,6 +92,16 @@ class PubSubSubscriber:
         except KeyboardInterrupt:
             self.stop()
     
+    @staticmethod
+    def _lag_seconds(message) -> float:
+        """How long the message waited in the subscription before delivery."""
+        publish_time = getattr(message, 'publish_time', None)
+        if not publish_time:
+            return 0.0
+        if publish_time.tzinfo is None:
+            publish_time = publish_time.replace(tzinfo=timezone.utc)
+        return max(0.0, (datetime.now(timezone.utc) - publish_time).total_seconds())
+    
     def stop(self):
         """Stop listening"""
         self.running = False
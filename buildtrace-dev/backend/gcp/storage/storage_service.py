@@ -7,6 +7,7 @@ import os
 import io
 import logging
 import tempfile
+import uuid
 from typing import Optional, BinaryIO, List
 from datetime import datetime, timedelta
 # Optional import - only needed if USE_GCS is True
@@ -26,6 +27,9 @@ from config import config
 
 logger = logging.getLogger(__name__)
 
+# A composite GCS object may have at most this many components (one per append)
+GCS_MAX_COMPOSE_COMPONENTS = 1024
+
 class StorageService:
     """Unified storage service for handling file operations"""
 
@@ -154,6 +158,13 @@ class StorageService:
         
         return result
 
+    def append_file(self, content: bytes, destination_path: str, content_type: Optional[str] = None) -> str:
+        """Append bytes to a file in storage, creating it if missing (for growing logs)"""
+        if self.use_gcs and self.bucket:
+            return self._append_to_gcs(content, destination_path, content_type)
+        else:
+            return self._append_local_file(content, destination_path)
+
     def upload_from_filename(self, local_path: str, destination_path: str) -> str:
         """Upload file from local filesystem to storage"""
         if self.use_gcs and self.bucket:
@@ -168,6 +179,13 @@ class StorageService:
         else:
             return self._read_local_file(source_path)
 
+    def download_file_range(self, source_path: str, start: int = 0) -> bytes:
+        """Download file bytes from ``start`` to the end (empty when ``start`` is past the end)"""
+        if self.use_gcs and self.bucket:
+            return self._download_range_from_gcs(source_path, start)
+        else:
+            return self._read_local_file_range(source_path, start)
+
     def download_to_filename(self, source_path: str, local_path: str) -> bool:
         """Download file from storage to local filesystem"""
         if self.use_gcs and self.bucket:
@@ -251,6 +269,28 @@ class StorageService:
             logger.error(f"Failed to upload file to GCS: {str(e)}")
             raise
 
+    def _append_to_gcs(self, content: bytes, destination_path: str, content_type: Optional[str] = None) -> str:
+        """Append to a GCS object: upload the chunk on its own, then compose it onto the object"""
+        blob = self.bucket.get_blob(destination_path)
+        if blob is None:
+            return self._upload_to_gcs(content, destination_path, content_type)
+        if (blob.component_count or 1) >= GCS_MAX_COMPOSE_COMPONENTS:
+            # One more compose would exceed the limit: rewrite as a single component
+            logger.info(f"Rewriting {destination_path} after {blob.component_count} appends")
+            return self._upload_to_gcs(blob.download_as_bytes() + content, destination_path,
+                                       content_type or blob.content_type)
+        chunk = self.bucket.blob(f"{destination_path}.append-{uuid.uuid4().hex}")
+        try:
+            chunk.upload_from_file(io.BytesIO(content), rewind=True, content_type=content_type)
+            blob.content_type = content_type or blob.content_type
+            blob.compose([blob, chunk])
+        finally:
+            try:
+                chunk.delete()
+            except NotFound:
+                pass
+        return f"gs://{self.bucket_name}/{destination_path}"
+
     def _upload_from_filename_to_gcs(self, local_path: str, destination_path: str) -> str:
         """Upload file from local filesystem to GCS"""
         try:
@@ -276,6 +316,14 @@ class StorageService:
             logger.error(f"Failed to download file from GCS: {str(e)}")
             raise
 
+    def _download_range_from_gcs(self, source_path: str, start: int) -> bytes:
+        """Download the tail of a GCS object starting at byte ``start``"""
+        blob = self.bucket.blob(self._normalize_gcs_path(source_path))
+        blob.reload()
+        if start >= (blob.size or 0):
+            return b''
+        return blob.download_as_bytes(start=start)
+
     def _download_from_gcs_to_file(self, source_path: str, local_path: str) -> bool:
         """Download file from GCS to local filesystem"""
         try:
@@ -368,12 +416,26 @@ class StorageService:
         shutil.copy2(source, dest_path)
         return dest_path
 
+    def _append_local_file(self, content: bytes, path: str) -> str:
+        """Append to a local file for development"""
+        local_path = self._get_local_path(path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, 'ab') as f:
+            f.write(content)
+        return path if not os.path.isabs(path) else local_path
+
     def _read_local_file(self, path: str) -> bytes:
         """Read local file for development"""
         local_path = self._get_local_path(path)
         with open(local_path, 'rb') as f:
             return f.read()
 
+    def _read_local_file_range(self, path: str, start: int) -> bytes:
+        """Read local file from byte ``start`` for development"""
+        with open(self._get_local_path(path), 'rb') as f:
+            f.seek(start)
+            return f.read()
+
     def _copy_from_local(self, source: str, dest: str):
         """Copy from local storage to filesystem"""
         import shutil
@@ -0,0 +1,85 @@
+"""
+Migration: Add batch request table for batch-priority jobs
+- batch_requests (deferred OCR/summary requests submitted through provider batches)
+
+Run with: python migrations/add_batch_requests.py
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from gcp.database import get_db_session
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration():
+    """Add batch_requests table and indexes to database."""
+
+    migrations = [
+        {
+            'name': 'Create batch_requests table',
+            'check': "SELECT table_name FROM information_schema.tables WHERE table_name='batch_requests'",
+            'sql': """
+                CREATE TABLE batch_requests (
+                    id VARCHAR(36) PRIMARY KEY,
+                    job_id VARCHAR(36) NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+                    kind VARCHAR(50) NOT NULL,
+                    status VARCHAR(50) DEFAULT 'queued',
+                    provider VARCHAR(50),
+                    provider_batch_id VARCHAR(255),
+                    request_body JSON NOT NULL,
+                    target JSON,
+                    error_message TEXT,
+                    created_at TIMESTAMP DEFAULT NOW(),
+                    submitted_at TIMESTAMP,
+                    completed_at TIMESTAMP
+                )
+            """
+        },
+        {
+            'name': 'Add index idx_batch_requests_status',
+            'check': "SELECT indexname FROM pg_indexes WHERE indexname='idx_batch_requests_status'",
+            'sql': "CREATE INDEX IF NOT EXISTS idx_batch_requests_status ON batch_requests(status)"
+        },
+        {
+            'name': 'Add index idx_batch_requests_batch',
+            'check': "SELECT indexname FROM pg_indexes WHERE indexname='idx_batch_requests_batch'",
+            'sql': "CREATE INDEX IF NOT EXISTS idx_batch_requests_batch ON batch_requests(provider_batch_id)"
+        },
+        {
+            'name': 'Add index idx_batch_requests_job',
+            'check': "SELECT indexname FROM pg_indexes WHERE indexname='idx_batch_requests_job'",
+            'sql': "CREATE INDEX IF NOT EXISTS idx_batch_requests_job ON batch_requests(job_id)"
+        },
+    ]
+
+    with get_db_session() as db:
+        for migration in migrations:
+            try:
+                # Check if migration is needed
+                result = db.execute(text(migration['check'])).fetchone()
+                if result:
+                    logger.info(f"Skipping '{migration['name']}' - already applied")
+                    continue
+
+                # Run migration
+                logger.info(f"Running '{migration['name']}'...")
+                db.execute(text(migration['sql']))
+                db.commit()
+                logger.info(f"✓ Completed '{migration['name']}'")
+
+            except Exception as e:
+                logger.error(f"✗ Failed '{migration['name']}': {e}")
+                db.rollback()
+                # Continue with other migrations
+
+    logger.info("Migration complete!")
+
+
+if __name__ == '__main__':
+    run_migration()
@@ -0,0 +1,70 @@
+"""
+Migration: Add structured change metrics for summaries
+- change_summary_metrics (per-summary change counts aggregated by the results endpoints)
+
+Existing summaries get their metrics computed the first time their job's results are read.
+
+Run with: python migrations/add_change_summary_metrics.py
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from gcp.database import get_db_session
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration():
+    """Add change_summary_metrics table and index to database."""
+
+    migrations = [
+        {
+            'name': 'Create change_summary_metrics table',
+            'check': "SELECT table_name FROM information_schema.tables WHERE table_name='change_summary_metrics'",
+            'sql': """
+                CREATE TABLE change_summary_metrics (
+                    id VARCHAR(36) PRIMARY KEY,
+                    summary_id VARCHAR(36) NOT NULL REFERENCES change_summaries(id) ON DELETE CASCADE,
+                    metric VARCHAR(50) NOT NULL,
+                    value INTEGER NOT NULL DEFAULT 0,
+                    CONSTRAINT uq_change_summary_metric UNIQUE (summary_id, metric)
+                )
+            """
+        },
+        {
+            'name': 'Add index idx_change_summary_metrics_summary',
+            'check': "SELECT indexname FROM pg_indexes WHERE indexname='idx_change_summary_metrics_summary'",
+            'sql': "CREATE INDEX IF NOT EXISTS idx_change_summary_metrics_summary ON change_summary_metrics(summary_id)"
+        },
+    ]
+
+    with get_db_session() as db:
+        for migration in migrations:
+            try:
+                # Check if migration is needed
+                result = db.execute(text(migration['check'])).fetchone()
+                if result:
+                    logger.info(f"Skipping '{migration['name']}' - already applied")
+                    continue
+
+                # Run migration
+                logger.info(f"Running '{migration['name']}'...")
+                db.execute(text(migration['sql']))
+                db.commit()
+                logger.info(f"✓ Completed '{migration['name']}'")
+
+            except Exception as e:
+                logger.error(f"✗ Failed '{migration['name']}': {e}")
+                db.rollback()
+                # Continue with other migrations
+
+    logger.info("Migration complete!")
+
+
+if __name__ == '__main__':
+    run_migration()
@@ -0,0 +1,62 @@
+"""
+Migration: Add diff memoization column
+- DiffResult.cache_key (sha256 of old raster, new raster and alignment config)
+
+Run with: python migrations/add_diff_cache_key.py
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from gcp.database import get_db_session
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration():
+    """Add diff cache key column and index to database."""
+    
+    migrations = [
+        # DiffResult.cache_key
+        {
+            'name': 'Add cache_key to diff_results',
+            'check': "SELECT column_name FROM information_schema.columns WHERE table_name='diff_results' AND column_name='cache_key'",
+            'sql': "ALTER TABLE diff_results ADD COLUMN cache_key VARCHAR(64)"
+        },
+        # Index on diff_results (cache_key)
+        {
+            'name': 'Add index idx_diff_results_cache_key',
+            'check': "SELECT indexname FROM pg_indexes WHERE indexname='idx_diff_results_cache_key'",
+            'sql': "CREATE INDEX IF NOT EXISTS idx_diff_results_cache_key ON diff_results(cache_key)"
+        },
+    ]
+    
+    with get_db_session() as db:
+        for migration in migrations:
+            try:
+                # Check if migration is needed
+                result = db.execute(text(migration['check'])).fetchone()
+                if result:
+                    logger.info(f"Skipping '{migration['name']}' - already applied")
+                    continue
+                
+                # Run migration
+                logger.info(f"Running '{migration['name']}'...")
+                db.execute(text(migration['sql']))
+                db.commit()
+                logger.info(f"✓ Completed '{migration['name']}'")
+                
+            except Exception as e:
+                logger.error(f"✗ Failed '{migration['name']}': {e}")
+                db.rollback()
+                # Continue with other migrations
+    
+    logger.info("Migration complete!")
+
+
+if __name__ == '__main__':
+    run_migration()
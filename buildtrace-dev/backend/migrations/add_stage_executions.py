@@ -0,0 +1,76 @@
+"""
+Migration: Add stage execution ledger
+- stage_executions (claims, leases and results of stage runs; absorbs queue redeliveries)
+
+Run with: python migrations/add_stage_executions.py
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from gcp.database import get_db_session
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration():
+    """Add stage_executions table and indexes to database."""
+
+    migrations = [
+        {
+            'name': 'Create stage_executions table',
+            'check': "SELECT table_name FROM information_schema.tables WHERE table_name='stage_executions'",
+            'sql': """
+                CREATE TABLE stage_executions (
+                    id VARCHAR(36) PRIMARY KEY,
+                    claim_key VARCHAR(64) NOT NULL UNIQUE,
+                    job_id VARCHAR(36) NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+                    stage VARCHAR(50) NOT NULL,
+                    page_number INTEGER,
+                    input_hash VARCHAR(64) NOT NULL,
+                    status VARCHAR(50) DEFAULT 'running',
+                    owner VARCHAR(255),
+                    lease_expires_at TIMESTAMP,
+                    attempts INTEGER DEFAULT 1,
+                    result JSON,
+                    created_at TIMESTAMP DEFAULT NOW(),
+                    completed_at TIMESTAMP
+                )
+            """
+        },
+        {
+            'name': 'Add index idx_stage_executions_job',
+            'check': "SELECT indexname FROM pg_indexes WHERE indexname='idx_stage_executions_job'",
+            'sql': "CREATE INDEX IF NOT EXISTS idx_stage_executions_job ON stage_executions(job_id)"
+        },
+    ]
+
+    with get_db_session() as db:
+        for migration in migrations:
+            try:
+                # Check if migration is needed
+                result = db.execute(text(migration['check'])).fetchone()
+                if result:
+                    logger.info(f"Skipping '{migration['name']}' - already applied")
+                    continue
+
+                # Run migration
+                logger.info(f"Running '{migration['name']}'...")
+                db.execute(text(migration['sql']))
+                db.commit()
+                logger.info(f"✓ Completed '{migration['name']}'")
+
+            except Exception as e:
+                logger.error(f"✗ Failed '{migration['name']}': {e}")
+                db.rollback()
+                # Continue with other migrations
+
+    logger.info("Migration complete!")
+
+
+if __name__ == '__main__':
+    run_migration()
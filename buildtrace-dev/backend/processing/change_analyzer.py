@@ -24,6 +24,7 @@ except ImportError:
     GEMINI_AVAILABLE = False
 
 from config import config
+from utils.llm_gateway import get_llm_gateway
 from utils.local_output_manager import LocalOutputManager
 
 logger = logging.getLogger(__name__)
@@ -87,8 +88,9 @@ class ChangeAnalyzer:
         if not model.startswith('models/'):
             model = f'models/{model}'
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model)
+        # Model clients are shared, rate limited and retried by the LLM gateway
+        self.llm = get_llm_gateway()
+        self.model = self.llm.gemini_model(model, api_key=api_key)
         self.model_name = model
         
         # System prompt - synced with buildtrace-overlay-
@@ -195,7 +197,9 @@ Format each change as: [Aspect] + [Action] + [Detail] + [Location/Reference]
             
             # Call Gemini API with images
             logger.info("Calling Gemini API for analysis...")
-            response = self.model.generate_content(
+            response = self.llm.generate_content(
+                self.model,
+                self.model_name,
                 [
                     self.system_prompt,
                     analysis_prompt,
@@ -5,11 +5,13 @@ Creates alignment overlays by comparing two drawing versions using SIFT feature
 
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import os
 import uuid
 import tempfile
+from dataclasses import asdict
 
 import cv2
 from datetime import datetime
@@ -20,6 +22,8 @@ from gcp.database import get_db_session
 from gcp.database.models import DiffResult, DrawingVersion, Job
 from gcp.storage import StorageService
 from utils.alignment import AlignDrawings, AlignConfig
+from utils.cancellation import JobCancelled, cancellation_scope, checkpoint, get_cancellation_registry
+from utils.change_regions import regions_from_mask
 from utils.image_utils import load_image, create_overlay_image
 from PIL import Image
 from utils.pdf_parser import pdf_to_png, get_pdf_page_count
@@ -44,14 +48,13 @@ class DiffPipeline:
         self.dpi = int(os.environ.get("DIFF_RENDER_DPI", default_dpi))
         self.max_image_dimension = int(os.environ.get("DIFF_MAX_IMAGE_DIMENSION", 5000))
         align_features = int(os.environ.get("DIFF_ALIGNMENT_FEATURES", 4000))
-        self.aligner = AlignDrawings(
-            config=AlignConfig(
-                n_features=align_features,
-                exclude_margin=0.15,
-                ratio_threshold=0.75,
-            ),
-            debug=False,
+        self.align_config = AlignConfig(
+            n_features=align_features,
+            exclude_margin=0.15,
+            ratio_threshold=0.75,
         )
+        self.aligner = AlignDrawings(config=self.align_config, debug=False)
+        self.cache_enabled = os.environ.get("DIFF_CACHE_ENABLED", "true").lower() == "true"
 
     def run(self, job_id: str, old_version_id: str, new_version_id: str) -> Dict:
         logger.info(
@@ -118,6 +121,41 @@ class DiffPipeline:
                             },
                         )
 
+                        with open(old_page["png_path"], "rb") as baseline_file:
+                            baseline_bytes = baseline_file.read()
+                        with open(new_page["png_path"], "rb") as revised_file:
+                            revised_bytes = revised_file.read()
+
+                        cache_key = self._diff_cache_key(baseline_bytes, revised_bytes)
+                        cached = self._find_cached_diff(db, cache_key)
+                        if cached:
+                            diff_result = self._reuse_cached_diff(
+                                cached,
+                                cache_key,
+                                job_id=job_id,
+                                old_version_id=old_version_id,
+                                new_version_id=new_version_id,
+                                page_number=pair_index,
+                                drawing_name=new_page["drawing_name"],
+                                total_pages=len(page_pairs),
+                                created_by=job.created_by,
+                            )
+                            db.add(diff_result)
+                            db.commit()
+                            diff_results.append(
+                                {
+                                    "diff_result_id": diff_result.id,
+                                    "result_ref": diff_result.machine_generated_overlay_ref,
+                                    "overlay_ref": diff_result.diff_metadata.get("overlay_image_ref"),
+                                    "change_count": diff_result.change_count,
+                                    "alignment_score": diff_result.alignment_score,
+                                    "page_number": pair_index,
+                                    "drawing_name": new_page["drawing_name"],
+                                    "total_pages": len(page_pairs),
+                                }
+                            )
+                            continue
+
                         old_img = self._load_page_image(old_page["png_path"])
                         new_img = self._load_page_image(new_page["png_path"])
 
@@ -143,23 +181,26 @@ class DiffPipeline:
                         )
 
                         # Upload baseline and revised PNGs so the frontend can render them directly
-                        with open(old_page["png_path"], "rb") as baseline_file:
-                            baseline_bytes = baseline_file.read()
                         baseline_image_ref = self.storage.upload_diff_overlay(
                             f"{job_id}/page-{pair_index:03d}/baseline.png",
                             baseline_bytes,
                         )
 
-                        with open(new_page["png_path"], "rb") as revised_file:
-                            revised_bytes = revised_file.read()
                         revised_image_ref = self.storage.upload_diff_overlay(
                             f"{job_id}/page-{pair_index:03d}/revised.png",
                             revised_bytes,
                         )
 
+                        # Baseline in the revised sheet's frame, so change-region crops line up
+                        aligned_baseline_image_ref = self.storage.upload_diff_overlay(
+                            f"{job_id}/page-{pair_index:03d}/baseline_aligned.png",
+                            cv2.imencode(".png", aligned_old_img)[1].tobytes(),
+                        )
+
                         alignment_score = self._calculate_alignment_score(old_img, new_img, aligned_old_img)
                         changes_detected = alignment_score < 0.95
                         change_count = 1 if changes_detected else 0
+                        change_regions = regions_from_mask(self._overlay_change_mask(overlay_img)) if changes_detected else []
 
                         diff_payload = {
                             "job_id": job_id,
@@ -193,14 +234,17 @@ class DiffPipeline:
                             alignment_score=float(alignment_score),
                             created_at=datetime.utcnow(),
                             created_by=job.created_by,
+                            cache_key=cache_key,
                             diff_metadata={
                                 "auto_generated": True,
                                 "overlay_image_ref": overlay_ref,
                                 "baseline_image_ref": baseline_image_ref,
+                                "aligned_baseline_image_ref": aligned_baseline_image_ref,
                                 "revised_image_ref": revised_image_ref,
                                 "page_number": pair_index,
                                 "drawing_name": new_page["drawing_name"],
                                 "total_pages": len(page_pairs),
+                                "change_regions": change_regions,
                             },
                         )
                         db.add(diff_result)
@@ -243,6 +287,90 @@ class DiffPipeline:
                 Path(tmp_old_path).unlink(missing_ok=True)
                 Path(tmp_new_path).unlink(missing_ok=True)
     
+    # =========================================================================
+    # MEMOIZATION: reuse diffs for identical page rasters
+    # =========================================================================
+
+    def _alignment_config_hash(self) -> str:
+        """Hash of every setting that influences alignment and overlay output."""
+        settings = {
+            "dpi": self.dpi,
+            "max_image_dimension": self.max_image_dimension,
+            "align": asdict(self.align_config),
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _diff_cache_key(self, old_page_bytes: bytes, new_page_bytes: bytes) -> str:
+        """Cache key over (old raster hash, new raster hash, alignment config hash)."""
+        old_hash = hashlib.sha256(old_page_bytes).hexdigest()
+        new_hash = hashlib.sha256(new_page_bytes).hexdigest()
+        return hashlib.sha256(
+            f"{old_hash}:{new_hash}:{self._alignment_config_hash()}".encode("utf-8")
+        ).hexdigest()
+
+    def _find_cached_diff(self, db, cache_key: str) -> Optional[DiffResult]:
+        """Return the most recent diff computed for the same page pair, if any."""
+        if not self.cache_enabled:
+            return None
+        return (
+            db.query(DiffResult)
+            .filter_by(cache_key=cache_key)
+            .order_by(DiffResult.created_at.desc())
+            .first()
+        )
+
+    def _reuse_cached_diff(
+        self,
+        cached: DiffResult,
+        cache_key: str,
+        *,
+        job_id: str,
+        old_version_id: str,
+        new_version_id: str,
+        page_number: int,
+        drawing_name: str,
+        total_pages: int,
+        created_by: Optional[str] = None,
+        extra_metadata: Optional[Dict] = None,
+    ) -> DiffResult:
+        """Build a new DiffResult row that points at an existing diff's artifacts."""
+        diff_metadata = dict(cached.diff_metadata or {})
+        diff_metadata.update(
+            {
+                "page_number": page_number,
+                "drawing_name": drawing_name,
+                "total_pages": total_pages,
+                "reused_from_diff_result_id": cached.id,
+            }
+        )
+        if extra_metadata:
+            diff_metadata.update(extra_metadata)
+
+        logger.info(
+            "Reusing cached diff result",
+            extra={
+                "job_id": job_id,
+                "page_number": page_number,
+                "cached_diff_result_id": cached.id,
+            },
+        )
+        return DiffResult(
+            id=str(uuid.uuid4()),
+            job_id=job_id,
+            old_drawing_version_id=old_version_id,
+            new_drawing_version_id=new_version_id,
+            page_number=page_number,
+            drawing_name=drawing_name,
+            machine_generated_overlay_ref=cached.machine_generated_overlay_ref,
+            alignment_score=cached.alignment_score,
+            changes_detected=cached.changes_detected,
+            change_count=cached.change_count,
+            created_at=datetime.utcnow(),
+            created_by=created_by,
+            cache_key=cache_key,
+            diff_metadata=diff_metadata,
+        )
+
     def _prepare_pdf_pages(self, pdf_path: str, temp_dir: str, prefix: str) -> List[Dict]:
         """Convert every PDF page to PNG and attach drawing metadata."""
         drawing_info = extract_drawing_names(pdf_path)
@@ -284,6 +412,12 @@ class DiffPipeline:
         )
         return cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
 
+    @staticmethod
+    def _overlay_change_mask(overlay_img):
+        """Added (green) or removed (red) linework in an overlay from ``create_overlay_image``."""
+        blue, green, red = overlay_img[..., 0], overlay_img[..., 1], overlay_img[..., 2]
+        return (blue == 0) & ((green == 0) ^ (red == 0))
+
     def _calculate_alignment_score(self, old_img, new_img, aligned_old_img) -> float:
         """Calculate alignment quality score (0-1, higher is better)"""
         try:
@@ -351,6 +485,39 @@ class DiffPipeline:
         # Download page images
         old_page_bytes = self.storage.download_file(old_page_gcs)
         new_page_bytes = self.storage.download_file(new_page_gcs)
+        checkpoint("after page download")
+        
+        # Identical page pair already diffed (re-run, new session, repeat compare)?
+        cache_key = self._diff_cache_key(old_page_bytes, new_page_bytes)
+        with self.session_factory() as db:
+            cached = self._find_cached_diff(db, cache_key)
+            if cached:
+                diff_result = self._reuse_cached_diff(
+                    cached,
+                    cache_key,
+                    job_id=job_id,
+                    old_version_id=old_version_id,
+                    new_version_id=new_version_id,
+                    page_number=page_number,
+                    drawing_name=drawing_name,
+                    total_pages=metadata.get("total_pages", 1) if metadata else 1,
+                    extra_metadata={
+                        "baseline_image_ref": old_page_gcs,
+                        "revised_image_ref": new_page_gcs,
+                    },
+                )
+                db.add(diff_result)
+                db.commit()
+                return {
+                    "diff_result_id": diff_result.id,
+                    "overlay_ref": diff_result.diff_metadata.get("overlay_image_ref"),
+                    "diff_ref": diff_result.machine_generated_overlay_ref,
+                    "change_count": diff_result.change_count,
+                    "alignment_score": diff_result.alignment_score,
+                    "page_number": page_number,
+                    "drawing_name": drawing_name,
+                    "cache_hit": True,
+                }
         
         with tempfile.TemporaryDirectory() as temp_dir:
             # Save locally for processing
@@ -364,6 +531,7 @@ class DiffPipeline:
             new_img = self._load_page_image(str(new_path))
             
             # Align images using SIFT
+            checkpoint("before alignment")
             aligned_old_img = self.aligner.align(old_img, new_img)
             if aligned_old_img is None:
                 logger.warning("Alignment failed, using original old image")
@@ -398,6 +566,13 @@ class DiffPipeline:
                 content_type='image/png'
             )
             
+            # Old page in the new page's frame, so change-region crops line up
+            aligned_baseline_ref = self.storage.upload_file(
+                cv2.imencode('.png', aligned_old_img)[1].tobytes(),
+                f"overlays/{job_id}/page_{page_number:03d}_baseline_aligned.png",
+                content_type='image/png'
+            )
+            
             # Create diff result payload
             diff_result_id = str(uuid.uuid4())
             diff_payload = {
@@ -431,13 +606,16 @@ class DiffPipeline:
                     alignment_score=float(alignment_score),
                     changes_detected=change_count > 0,
                     change_count=int(change_count),
+                    cache_key=cache_key,
                     diff_metadata={
                         "overlay_image_ref": overlay_ref,
                         "baseline_image_ref": old_page_gcs,
+                        "aligned_baseline_image_ref": aligned_baseline_ref,
                         "revised_image_ref": new_page_gcs,
                         "page_number": page_number,
                         "drawing_name": drawing_name,
                         "total_pages": metadata.get("total_pages", 1) if metadata else 1,
+                        "change_regions": regions_from_mask(self._overlay_change_mask(overlay_img)),
                     }
                 )
                 db.add(diff_result)
@@ -465,4 +643,53 @@ class DiffPipeline:
             }
 
 
-__all__ = ["DiffPipeline"]
+# =============================================================================
+# PROCESS ISOLATION: run page diffs in recycled child processes
+# =============================================================================
+
+_child_pipeline: Optional[DiffPipeline] = None
+_diff_executor = None
+
+
+def run_page_in_child(page_kwargs: Dict) -> Dict:
+    """Entry point executed inside an isolated child process (one pipeline per child)."""
+    global _child_pipeline
+    if _child_pipeline is None:
+        _child_pipeline = DiffPipeline()
+    # Exceptions come back to the parent as IsolatedTaskError, so report cancellation as a result
+    token = get_cancellation_registry().token(page_kwargs["job_id"])
+    try:
+        with cancellation_scope(token):
+            return _child_pipeline.run_page(**page_kwargs)
+    except JobCancelled as exc:
+        return {"status": "cancelled", "page_number": page_kwargs.get("page_number"), "step": exc.step}
+
+
+def get_diff_executor():
+    """Get the shared isolated diff executor, or None when process isolation is disabled."""
+    global _diff_executor
+    from config import config
+
+    if config.DIFF_EXECUTOR_WORKERS <= 0:
+        return None
+    if _diff_executor is None:
+        from utils.process_pool import IsolatedProcessPool
+
+        _diff_executor = IsolatedProcessPool(
+            max_workers=config.DIFF_EXECUTOR_WORKERS,
+            max_tasks_per_child=config.DIFF_EXECUTOR_MAX_TASKS_PER_CHILD,
+            rss_limit_mb=config.DIFF_EXECUTOR_RSS_LIMIT_MB or None,
+            task_timeout=config.DIFF_EXECUTOR_TASK_TIMEOUT or None,
+        )
+        logger.info(
+            "Isolated diff executor enabled",
+            extra={
+                "workers": config.DIFF_EXECUTOR_WORKERS,
+                "max_tasks_per_child": config.DIFF_EXECUTOR_MAX_TASKS_PER_CHILD,
+                "rss_limit_mb": config.DIFF_EXECUTOR_RSS_LIMIT_MB,
+            },
+        )
+    return _diff_executor
+
+
+__all__ = ["DiffPipeline", "run_page_in_child", "get_diff_executor"]
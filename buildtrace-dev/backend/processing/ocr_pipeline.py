@@ -7,25 +7,77 @@ Stores page-by-page logs and generates a summary for display during comparison.
 
 from __future__ import annotations
 
+import copy
 import hashlib
+import io
 import logging
 import tempfile
 import json
-import base64
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
+
+from PIL import Image
 
 from gcp.database import get_db_session
-from gcp.database.models import DrawingVersion
+from gcp.database.models import BatchRequest, DrawingVersion
 from gcp.storage import StorageService
+from services.ocr_result_store import OCRResultStore
 from utils.drawing_extraction import extract_drawing_names
 from utils.pdf_parser import pdf_to_png, process_pdf_with_drawing_names
+from utils.change_regions import find_change_regions, region_coverage
+from utils.cancellation import JobCancelled, checkpoint, submit_with_context
+from utils.image_payload import get_image_budgeter
+from utils.ndjson_log import NDJSONLogWriter
+from utils.text_layer import extract_sections, read_pdf_text_layers
+from utils.llm_gateway import get_llm_gateway
 from config import config
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the extraction prompts change so cached OCR results are not reused
+OCR_PROMPT_VERSION = "v2"
+
+# Result store key suffix for incremental results: patched from a previous revision,
+# they answer repeat lookups of the same raster but never serve as another page's base
+INCREMENTAL_KEY_SUFFIX = "|incremental"
+
+# Prompt for re-extracting a changed region of a page whose previous revision was already extracted
+REGION_EXTRACTION_PROMPT = """This image is a crop of an architectural/construction drawing ({drawing_name}) showing {region_description}.
+
+Extract ONLY the information visible in this crop as JSON, using these keys where they apply:
+TITLE_BLOCK (object), DESIGN_TEAM (object), REVISIONS (list of {{revision_number, date, description, bbox}}), KEYNOTES (list of {{number, description, bbox}}), DIMENSIONS (object), SPECIFICATIONS (object), SCHEDULES (object), GENERAL_NOTES (list), DRAWING_TYPE (string), GRID_LINES (list).
+
+Each bbox is [left, top, right, bottom] as fractions (0-1) of this crop's width and height.
+Omit keys with nothing visible in the crop. Return ONLY valid JSON."""
+
+# What each page section holds, as described to the vision model
+SECTION_DESCRIPTIONS = {
+    'TITLE_BLOCK': "project_name, project_address, project_number, sheet_number, drawing_title, scale, date, revision",
+    'DESIGN_TEAM': "architect_firm, architect_name, engineer_firms, consultants (list all with names, addresses, phones, emails)",
+    'REVISIONS': "list of {revision_number, date, description, bbox}",
+    'KEYNOTES': "list of {number, description, bbox} - EXTRACT ALL numbered keynotes visible",
+    'DIMENSIONS': "overall_dimensions, room_dimensions, key_measurements",
+    'SPECIFICATIONS': "materials, finishes, equipment mentioned",
+    'SCHEDULES': "any door/window/room schedules as structured data",
+    'GENERAL_NOTES': "list of all general notes text",
+    'DRAWING_TYPE': "floor_plan, elevation, section, detail, schedule, site_plan, etc.",
+    'GRID_LINES': "list of grid line labels (A, B, C, 1, 2, 3, etc.)",
+}
+
+# Prompt for the sections a page's PDF text layer could not supply (the rest were read exactly)
+FOCUSED_EXTRACTION_PROMPT = """Analyze this architectural/construction drawing page ({drawing_name}, page {page_num}). The other sections of this page were already read from its text layer; extract ONLY the following information in a structured JSON format:
+
+{section_list}
+
+Each bbox is [left, top, right, bottom] as fractions (0-1) of the page width and height.
+Return ONLY valid JSON with exactly these keys. If a section is not visible, use null or empty array."""
+
+# Title block strip read as its own tile so sheet metadata stays legible
+TITLE_BLOCK_TILE = (0.70, 0.55, 1.0, 1.0)
+
 # Try to import Google Generative AI (Gemini)
 try:
     import google.generativeai as genai
@@ -43,6 +95,141 @@ except ImportError:
     logger.warning("OpenAI library not available - detailed OCR will be limited")
 
 
+def _item_key(item) -> Optional[str]:
+    if isinstance(item, dict):
+        for field in ('number', 'revision_number', 'id', 'label'):
+            if item.get(field) not in (None, ''):
+                return f"{field}:{item[field]}"
+        return None
+    return f"value:{item}"
+
+
+def _valid_bbox(bbox) -> bool:
+    return (
+        isinstance(bbox, (list, tuple))
+        and len(bbox) == 4
+        and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in bbox)
+    )
+
+
+def _bbox_to_page(sections: Dict, region: List[float]) -> Dict:
+    """Map list-item ``bbox`` values read from a crop to page coordinates (in place)."""
+    left, top, right, bottom = region
+    width, height = right - left, bottom - top
+    for value in sections.values():
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            if isinstance(item, dict) and _valid_bbox(item.get('bbox')):
+                x0, y0, x1, y1 = item['bbox']
+                item['bbox'] = [
+                    round(left + x0 * width, 4), round(top + y0 * height, 4),
+                    round(left + x1 * width, 4), round(top + y1 * height, 4),
+                ]
+    return sections
+
+
+def _bbox_in_region(bbox, region: List[float]) -> bool:
+    """Whether a page ``bbox`` is centred inside a normalized region."""
+    if not _valid_bbox(bbox):
+        return False
+    left, top, right, bottom = region
+    center_x, center_y = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+    return left <= center_x <= right and top <= center_y <= bottom
+
+
+def _merge_region_sections(sections: Dict, region_sections: Dict, region: Optional[List[float]] = None) -> List[str]:
+    """
+    Merge sections read from a changed region into a page's sections (in place).
+    
+    Numbered list items (keynotes, revisions) replace the item with the same
+    number or are appended; objects are updated key by key; anything else is
+    replaced. List items whose ``bbox`` lies inside ``region`` but that the
+    region no longer shows are dropped, so deleted keynotes go away. Returns
+    the section keys that were re-derived.
+    """
+    updated = []
+    for key in list(region_sections) + [key for key in sections if key not in region_sections]:
+        value = region_sections.get(key)
+        current = sections.get(key)
+        stale = set()
+        if region is not None and isinstance(current, list):
+            stale = {
+                index for index, item in enumerate(current)
+                if isinstance(item, dict) and _bbox_in_region(item.get('bbox'), region)
+            }
+        if value in (None, '', [], {}):
+            if stale:
+                sections[key] = [item for index, item in enumerate(current) if index not in stale]
+                updated.append(key)
+            continue
+        if isinstance(value, list) and isinstance(current, list):
+            merged = list(current)
+            positions = {_item_key(item): index for index, item in enumerate(merged) if _item_key(item)}
+            for item in value:
+                item_key = _item_key(item)
+                if item_key in positions:
+                    merged[positions[item_key]] = item
+                    stale.discard(positions[item_key])
+                else:
+                    merged.append(item)
+            sections[key] = [item for index, item in enumerate(merged) if index not in stale]
+        elif isinstance(value, dict) and isinstance(current, dict):
+            sections[key] = {**current, **value}
+        else:
+            sections[key] = value
+        updated.append(key)
+    return updated
+
+
+def page_tiles(overlap: float) -> List[Tuple[str, Tuple[float, float, float, float]]]:
+    """Named normalized crops for tiled OCR: the title block, then four overlapping quadrants."""
+    low, high = 0.5 - overlap / 2, 0.5 + overlap / 2
+    return [
+        ('title block', TITLE_BLOCK_TILE),
+        ('top-left quadrant', (0.0, 0.0, high, high)),
+        ('top-right quadrant', (low, 0.0, 1.0, high)),
+        ('bottom-left quadrant', (0.0, low, high, 1.0)),
+        ('bottom-right quadrant', (low, low, 1.0, 1.0)),
+    ]
+
+
+def _merge_tile_sections(tile_sections: List[Dict]) -> Dict:
+    """
+    Merge sections read from overlapping tiles, earlier tiles taking precedence.
+    
+    List items seen in several tiles (keynotes in an overlap band) are kept
+    once, preferring the most complete copy since tile edges can cut text.
+    """
+    merged: Dict = {}
+    for sections in tile_sections:
+        for key, value in sections.items():
+            if value in (None, '', [], {}):
+                continue
+            current = merged.get(key)
+            if current is None:
+                merged[key] = copy.deepcopy(value)
+            elif isinstance(current, list) and isinstance(value, list):
+                items: Dict[str, object] = {}
+                for item in current + value:
+                    if isinstance(item, str):
+                        item_key = f"value:{' '.join(item.lower().split())}"
+                    else:
+                        item_key = _item_key(item) or f"value:{json.dumps(item, sort_keys=True)}"
+                    existing = items.get(item_key)
+                    if existing is None or len(json.dumps(item)) > len(json.dumps(existing)):
+                        items[item_key] = item
+                merged[key] = list(items.values())
+            elif isinstance(current, dict) and isinstance(value, dict):
+                merged[key] = {**value, **current}
+    return merged
+
+
+def ocr_log_path(drawing_version_id: str) -> str:
+    """Storage path of the NDJSON OCR progress log for a drawing version."""
+    return f"ocr_logs/{drawing_version_id}/ocr_log.ndjson"
+
+
 class OCRPipeline:
     """Extracts drawing names, converts PDF to PNG, and extracts detailed information from each page."""
 
@@ -55,16 +242,19 @@ class OCRPipeline:
         self.storage = storage_service or StorageService()
         self.session_factory = session_factory or get_db_session
         self.dpi = dpi
+        self.page_concurrency = max(1, config.OCR_PAGE_CONCURRENCY)
+        
+        # Clients are pooled, rate limited and retried by the shared LLM gateway
+        self.llm = get_llm_gateway()
         
         # Initialize Gemini client (primary) - using Gemini 2.5 Pro
         self.gemini_model = None
         gemini_api_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
         if GEMINI_AVAILABLE and gemini_api_key:
             try:
-                genai.configure(api_key=gemini_api_key)
                 # Use gemini-2.5-pro-preview or gemini-2.0-flash-exp for structured output
                 model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')
-                self.gemini_model = genai.GenerativeModel(model_name)
+                self.gemini_model = self.llm.gemini_model(model_name, api_key=gemini_api_key)
                 logger.info(f"Gemini client initialized with model: {model_name}")
             except Exception as e:
                 logger.warning(f"Failed to initialize Gemini: {e}")
@@ -75,12 +265,26 @@ class OCRPipeline:
         self.model = None
         api_key = os.getenv('OPENAI_API_KEY') or config.OPENAI_API_KEY
         if OPENAI_AVAILABLE and api_key:
-            self.openai_client = OpenAI(api_key=api_key, timeout=180.0)
+            self.openai_client = self.llm.openai_client(api_key, timeout=180.0)
             self.model = os.getenv('OPENAI_MODEL') or config.OPENAI_MODEL or "gpt-4o"
             logger.info(f"OpenAI client initialized as fallback with model: {self.model}")
         
         if not self.gemini_model and not self.openai_client:
             logger.warning("No AI client initialized - detailed OCR will be limited")
+        
+        # Content-addressed cache of page extractions (shared across jobs and versions)
+        self.result_store = None
+        if os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true':
+            self.result_store = OCRResultStore(self.storage)
+        
+        # Read title block / notes / revisions from the PDF text layer before calling a vision model
+        self.text_layer_enabled = os.getenv('OCR_TEXT_LAYER_ENABLED', 'true').lower() == 'true'
+        
+        # Re-extract only the changed regions of a page whose previous revision is in the result store
+        self.incremental_enabled = os.getenv('OCR_INCREMENTAL_ENABLED', 'true').lower() == 'true'
+        
+        # Read very large sheets as concurrent overlapping tiles instead of one downsampled image
+        self.tiling_enabled = os.getenv('OCR_TILING_ENABLED', 'false').lower() == 'true'
 
     def run(self, drawing_version_id: str) -> Dict:
         """Process a drawing version: extract names, convert to PNG, extract text."""
@@ -164,74 +368,72 @@ class OCRPipeline:
                     # Step 3: Extract detailed information from each page using OpenAI Vision
                     logger.info("Extracting detailed information from each page...")
                     
-                    ocr_log_file = Path(temp_dir) / f"ocr_log_{drawing_version_id}.json"
-                    ocr_log = {
+                    # One NDJSON record per page, pushed to storage periodically so progress can be followed
+                    ocr_log = NDJSONLogWriter(
+                        self.storage,
+                        str(Path(temp_dir) / f"ocr_log_{drawing_version_id}.ndjson"),
+                        ocr_log_path(drawing_version_id),
+                    )
+                    ocr_log.append({
+                        'type': 'start',
                         'drawing_version_id': drawing_version_id,
                         'started_at': datetime.utcnow().isoformat(),
-                        'pages': [],
-                        'summary': None
-                    }
+                    })
+                    
+                    text_layers = read_pdf_text_layers(tmp_pdf_path) if self.text_layer_enabled else []
                     
-                    ocr_results = []
+                    pages = []
                     for i, (png_path, drawing_info) in enumerate(zip(png_paths, drawing_names_data)):
                         drawing_name = drawing_info.get('drawing_name') or f"Page_{i+1}"
                         page_num = drawing_info.get('page', i + 1)
+                        text_layer = text_layers[page_num - 1] if 0 < page_num <= len(text_layers) else None
+                        pages.append((png_path, drawing_name, page_num, text_layer))
+                    
+                    # Pages finish out of order when extracted concurrently; slot them back by index
+                    ocr_results: List[Optional[Dict]] = [None] * len(pages)
+                    for completed, (index, page_info) in enumerate(self._extract_pages(pages), start=1):
+                        png_path, drawing_name, page_num = pages[index][:3]
                         
-                        logger.info(f"Processing page {page_num}/{len(png_paths)}: {drawing_name}")
-                        
-                        # Extract detailed information from this page
-                        page_info = self._extract_page_information(png_path, drawing_name, page_num)
-                        
-                        ocr_result = {
+                        ocr_results[index] = {
                             'drawing_name': drawing_name,
                             'page_number': page_num,
                             'png_path': png_path,
                             'extracted_info': page_info,
                             'processed_at': datetime.utcnow().isoformat()
                         }
-                        ocr_results.append(ocr_result)
                         
-                        # Update log file after each page
-                        ocr_log['pages'].append({
+                        # Pages are logged in completion order; readers sort by page_number
+                        ocr_log.append({
+                            'type': 'page',
                             'page_number': page_num,
                             'drawing_name': drawing_name,
                             'extracted_info': page_info,
                             'processed_at': datetime.utcnow().isoformat()
                         })
                         
-                        # Write log file after each page (for real-time updates)
-                        with open(ocr_log_file, 'w') as f:
-                            json.dump(ocr_log, f, indent=2)
-                        
-                        logger.info(f"✓ Page {page_num} processed: {len(page_info.get('sections', {}))} sections extracted")
+                        logger.info(
+                            f"✓ Page {page_num} processed ({completed}/{len(pages)}): "
+                            f"{len(page_info.get('sections', {}))} sections extracted"
+                        )
                     
                     # Step 4: Generate summary after all pages are processed
                     logger.info("Generating summary from all pages...")
                     summary = self._generate_summary(ocr_results)
-                    ocr_log['summary'] = summary
-                    ocr_log['completed_at'] = datetime.utcnow().isoformat()
+                    ocr_log.append({
+                        'type': 'summary',
+                        'summary': summary,
+                        'completed_at': datetime.utcnow().isoformat(),
+                    })
                     
-                    # Final log file write
-                    with open(ocr_log_file, 'w') as f:
-                        json.dump(ocr_log, f, indent=2)
+                    # Final upload of the complete log
+                    log_file_ref = ocr_log.close()
+                    logger.info(f"OCR log file uploaded: {log_file_ref}")
                     
                     logger.info("✓ Summary generated")
                 
                 # Calculate file hash
                 fingerprint = hashlib.sha256(pdf_bytes).hexdigest()
                 
-                # Upload log file to storage
-                log_file_ref = None
-                if ocr_log_file.exists():
-                    with open(ocr_log_file, 'rb') as f:
-                        log_bytes = f.read()
-                    log_file_ref = self.storage.upload_file(
-                        log_bytes,
-                        f"ocr_logs/{drawing_version_id}/ocr_log.json",
-                        content_type='application/json'
-                    )
-                    logger.info(f"OCR log file uploaded: {log_file_ref}")
-                
                 # Prepare OCR payload
                 ocr_payload = {
                     "drawing_version_id": drawing_version_id,
@@ -277,20 +479,107 @@ class OCRPipeline:
                 # Cleanup temp file
                 Path(tmp_pdf_path).unlink(missing_ok=True)
     
-    def _extract_page_information(self, png_path: str, drawing_name: str, page_num: int) -> Dict:
-        """Extract detailed information from a single page using Gemini 2.5 Pro (primary) or OpenAI Vision API (fallback)"""
+    def _extract_pages(self, pages: List[tuple]):
+        """
+        Extract information for ``(png_path, drawing_name, page_num[, text_layer])`` tuples.
+        
+        Yields ``(index, page_info)`` as each page finishes. Up to
+        ``self.page_concurrency`` pages are in flight at once; provider request
+        rates are enforced by the shared rate limiters. A page that raises is
+        reported as an error result instead of aborting the rest.
+        """
+        workers = min(self.page_concurrency, len(pages))
+        if workers <= 1:
+            for index, page in enumerate(pages):
+                logger.info(f"Processing page {page[2]}/{len(pages)}: {page[1]}")
+                yield index, self._extract_page(*page)
+            return
+        
+        logger.info(f"Extracting {len(pages)} pages with concurrency {workers}")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr-page') as executor:
+            futures = {
+                executor.submit(self._extract_page, *page): index
+                for index, page in enumerate(pages)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    page_info = future.result()
+                except Exception as e:
+                    _, drawing_name, page_num = pages[index][:3]
+                    logger.error(f"Page {page_num} extraction failed: {e}", exc_info=True)
+                    page_info = self._error_page_info(drawing_name, page_num, e)
+                yield index, page_info
+    
+    @staticmethod
+    def _error_page_info(drawing_name: str, page_num: int, error: Exception) -> Dict:
+        return {
+            'drawing_name': drawing_name,
+            'page_number': page_num,
+            'sections': {},
+            'extraction_method': 'error',
+            'raw_response': f'Error: {str(error)}'
+        }
+    
+    def _extract_page(
+        self,
+        png_path: str,
+        drawing_name: str,
+        page_num: int,
+        text_layer: Optional[Dict] = None,
+    ) -> Dict:
+        """
+        Extract a page, reading the PDF text layer first.
+        
+        Vector pages whose sections all parse from the text layer never reach a
+        vision model. Otherwise the vision model is asked only for the residual
+        sections and the sections parsed exactly from text override its reading
+        of them.
+        """
+        extraction = self._text_layer_sections(text_layer)
+        if extraction and extraction.complete:
+            logger.info(f"Page {page_num} ({drawing_name}) extracted from text layer, skipping vision model")
+            return extraction.to_page_info(drawing_name, page_num)
+        
+        sections = extraction.requested_sections if extraction else None
+        page_info = self._extract_page_information(png_path, drawing_name, page_num, sections=sections)
+        if extraction and page_info.get('extraction_method') != 'error':
+            page_info = extraction.merge_into(page_info)
+        return page_info
+    
+    def _extract_page_information(
+        self,
+        png_path: str,
+        drawing_name: str,
+        page_num: int,
+        sections: Optional[List[str]] = None,
+    ) -> Dict:
+        """
+        Extract detailed information from a single page using Gemini 2.5 Pro (primary) or OpenAI Vision API (fallback)
+        
+        ``sections`` limits the extraction to those page sections (the ones a
+        text layer could not supply); None extracts everything.
+        """
         try:
             # Read image bytes
             with open(png_path, 'rb') as f:
                 image_bytes = f.read()
             
+            # Tiles read every section; a focused extraction is small enough for one call
+            if not sections and self._should_tile(image_bytes):
+                result = self._extract_tiled(image_bytes, drawing_name, page_num)
+                if result:
+                    return result
+            
             # Try Gemini first (primary)
             gemini_api_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
             if GEMINI_AVAILABLE and gemini_api_key:
                 try:
-                    result = self._extract_with_gemini(image_bytes, drawing_name, page_num)
+                    result = self._extract_with_gemini(image_bytes, drawing_name, page_num, sections=sections)
                     if result:
                         return result
+                except JobCancelled:
+                    raise
                 except Exception as e:
                     logger.warning(f"Gemini extraction failed, falling back to OpenAI: {e}")
             
@@ -305,17 +594,87 @@ class OCRPipeline:
                     'extraction_method': 'basic'
                 }
             
-            # Re-initialize OpenAI client with current API key if needed
-            if not self.openai_client or api_key != getattr(self, '_last_api_key', None):
-                self.openai_client = OpenAI(api_key=api_key, timeout=180.0)
-                self._last_api_key = api_key
-                logger.info(f"OpenAI client re-initialized with key length: {len(api_key)}")
+            # Pooled client for the current API key (the gateway caches one per key)
+            openai_client = self.llm.openai_client(api_key, timeout=180.0)
             
-            # Convert to base64 for OpenAI
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+            api_params = self._openai_page_request(image_bytes, drawing_name, page_num, sections=sections)
+            response = self.llm.chat_completion(openai_client, **api_params)
             
-            # Expert-level extraction prompt designed by prompt engineers for construction managers and architects
-            extraction_prompt = f"""You are an expert architectural drawing analyst with deep expertise in construction documentation, building codes, and project management. Your task is to extract EVERY piece of information from this architectural drawing page ({drawing_name}, page {page_num}) that would be critical for construction managers, architects, engineers, and project stakeholders.
+            # Get full raw response (don't parse - store as-is in log file)
+            response_text = response.choices[0].message.content
+            return self._page_info_from_response(response_text, drawing_name, page_num)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Error extracting page information: {e}", exc_info=True)
+            return self._error_page_info(drawing_name, page_num, e)
+    
+    def _openai_page_request(
+        self,
+        image_bytes: bytes,
+        drawing_name: str,
+        page_num: int,
+        sections: Optional[List[str]] = None,
+    ) -> Dict:
+        """Chat completion request body for a page extraction (synchronous or batch)."""
+        # Downscale/re-encode to what the model actually reads at detail=high
+        prepared_image = get_image_budgeter().prepare(image_bytes, 'openai')
+        
+        if sections:
+            extraction_prompt = self._focused_prompt(drawing_name, page_num, sections)
+        else:
+            extraction_prompt = self._full_openai_prompt(drawing_name, page_num)
+        
+        # Call OpenAI Vision API
+        model_to_use = os.getenv('OPENAI_MODEL') or self.model or 'gpt-4o'
+        
+        api_params = {
+            "model": model_to_use,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an expert architectural drawing analyst with 20+ years of experience in construction documentation, building codes, and project management. You have worked extensively with construction managers, architects, engineers, and contractors. Your expertise includes reading and interpreting architectural drawings, construction documents, specifications, and technical drawings. You understand the critical information needed for cost estimation, scheduling, coordination, code compliance, and construction execution. Always extract information with the precision and thoroughness expected by construction professionals. Always respond with valid, comprehensive JSON."
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": extraction_prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": prepared_image.data_url(),
+                                "detail": "high"  # Use high detail for maximum accuracy
+                            }
+                        }
+                    ]
+                }
+            ],
+            "response_format": {"type": "json_object"}  # Request JSON response
+        }
+        
+        api_params["max_completion_tokens"] = 4000
+        
+        return api_params
+    
+    @staticmethod
+    def _focused_prompt(drawing_name: str, page_num: int, sections: List[str]) -> str:
+        """Extraction prompt asking only for ``sections`` (the rest came from the text layer)."""
+        section_list = "\n".join(
+            f"{index}. {key}: {SECTION_DESCRIPTIONS[key]}" for index, key in enumerate(sections, 1)
+        )
+        return FOCUSED_EXTRACTION_PROMPT.format(drawing_name=drawing_name, page_num=page_num, section_list=section_list)
+    
+    @staticmethod
+    def _sections_model_key(model_key: Optional[str], sections: Optional[List[str]]) -> Optional[str]:
+        """Result store key for an extraction, kept apart from full-page results when focused."""
+        if not model_key or not sections:
+            return model_key
+        return f"{model_key}|sections={','.join(sections)}"
+    
+    @staticmethod
+    def _full_openai_prompt(drawing_name: str, page_num: int) -> str:
+        # Expert-level extraction prompt designed by prompt engineers for construction managers and architects
+        extraction_prompt = f"""You are an expert architectural drawing analyst with deep expertise in construction documentation, building codes, and project management. Your task is to extract EVERY piece of information from this architectural drawing page ({drawing_name}, page {page_num}) that would be critical for construction managers, architects, engineers, and project stakeholders.
 
 ANALYZE THE ENTIRE DRAWING SYSTEMATICALLY:
 
@@ -376,7 +735,7 @@ ANALYZE THE ENTIRE DRAWING SYSTEMATICALLY:
 
 6. **KEYNOTES & ANNOTATIONS** (CRITICAL - Extract EVERY numbered or lettered note on the drawing)
    - ALL keynote numbers (1, 2, 3, A, B, C, etc.) and their EXACT corresponding text descriptions
-   - Keynote locations (if visible, note where on the drawing they appear)
+   - Keynote locations: a "bbox" on each keynote and revision entry, [left, top, right, bottom] as fractions (0-1) of the page width and height
    - General notes (any text blocks with instructions, numbered lists, bullet points)
    - Detail callouts (section markers like "SECTION A-A", detail markers like "DETAIL 1")
    - Reference drawings (other sheets referenced, e.g., "SEE SHEET S-5", "REFER TO C-2")
@@ -495,93 +854,57 @@ CRITICAL INSTRUCTIONS:
 
 OUTPUT FORMAT:
 Return a comprehensive JSON object with all sections above. Use arrays for lists (revisions, keynotes, dimensions, etc.) and objects for structured data. Ensure the JSON is valid and complete."""
-            
-            # Call OpenAI Vision API
-            model_to_use = os.getenv('OPENAI_MODEL') or self.model or 'gpt-4o'
-            
-            api_params = {
-                "model": model_to_use,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert architectural drawing analyst with 20+ years of experience in construction documentation, building codes, and project management. You have worked extensively with construction managers, architects, engineers, and contractors. Your expertise includes reading and interpreting architectural drawings, construction documents, specifications, and technical drawings. You understand the critical information needed for cost estimation, scheduling, coordination, code compliance, and construction execution. Always extract information with the precision and thoroughness expected by construction professionals. Always respond with valid, comprehensive JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": extraction_prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}",
-                                    "detail": "high"  # Use high detail for maximum accuracy
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "response_format": {"type": "json_object"}  # Request JSON response
-            }
-            
-            api_params["max_completion_tokens"] = 4000
-            
-            response = self.openai_client.chat.completions.create(**api_params)
-            
-            # Get full raw response (don't parse - store as-is in log file)
-            response_text = response.choices[0].message.content
-            
-            # Parse response for structured data (but keep raw response intact)
-            try:
-                extracted_data = json.loads(response_text)
-            except json.JSONDecodeError:
-                # If JSON parsing fails, try to extract structured info from text
-                extracted_data = self._parse_text_response(response_text)
-            
-            return {
-                'drawing_name': drawing_name,
-                'page_number': page_num,
-                'sections': extracted_data,
-                'extraction_method': 'openai_vision',
-                'raw_response': response_text  # Store FULL raw response (not truncated)
-            }
-        except Exception as e:
-            logger.error(f"Error extracting page information: {e}", exc_info=True)
-            return {
-                'drawing_name': drawing_name,
-                'page_number': page_num,
-                'sections': {},
-                'extraction_method': 'error',
-                'raw_response': f'Error: {str(e)}'
-            }
+        return extraction_prompt
+    
+    def _page_info_from_response(self, response_text: str, drawing_name: str, page_num: int) -> Dict:
+        """Page info for a full-page extraction response."""
+        # Parse response for structured data (but keep raw response intact)
+        try:
+            extracted_data = json.loads(response_text)
+        except json.JSONDecodeError:
+            # If JSON parsing fails, try to extract structured info from text
+            extracted_data = self._parse_text_response(response_text)
+        
+        return {
+            'drawing_name': drawing_name,
+            'page_number': page_num,
+            'sections': extracted_data,
+            'extraction_method': 'openai_vision',
+            'raw_response': response_text  # Store FULL raw response (not truncated)
+        }
     
-    def _extract_with_gemini(self, image_bytes: bytes, drawing_name: str, page_num: int) -> Optional[Dict]:
+    def _extract_with_gemini(
+        self,
+        image_bytes: bytes,
+        drawing_name: str,
+        page_num: int,
+        sections: Optional[List[str]] = None,
+    ) -> Optional[Dict]:
         """Extract information using Google Gemini 2.5 Pro with structured output"""
         try:
             gemini_api_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
             if not gemini_api_key:
                 return None
             
-            # Re-configure if needed
-            genai.configure(api_key=gemini_api_key)
-            
-            # Use the latest Gemini model with vision capabilities
+            # Use the latest Gemini model with vision capabilities (pooled per key and model)
             model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')
-            model = genai.GenerativeModel(model_name)
+            model = self.llm.gemini_model(model_name, api_key=gemini_api_key)
             
-            # Create image part for Gemini
-            import PIL.Image
-            import io
-            image = PIL.Image.open(io.BytesIO(image_bytes))
+            # Create image part for Gemini, sized to the OCR budget
+            image = get_image_budgeter().prepare(image_bytes, 'gemini-ocr').as_pil()
             
             # Structured extraction prompt
-            extraction_prompt = f"""Analyze this architectural/construction drawing page ({drawing_name}, page {page_num}) and extract ALL information in a structured JSON format.
+            if sections:
+                extraction_prompt = self._focused_prompt(drawing_name, page_num, sections)
+            else:
+                extraction_prompt = f"""Analyze this architectural/construction drawing page ({drawing_name}, page {page_num}) and extract ALL information in a structured JSON format.
 
 Extract the following information if present:
 
 1. TITLE_BLOCK: project_name, project_address, project_number, sheet_number, drawing_title, scale, date, revision
 2. DESIGN_TEAM: architect_firm, architect_name, engineer_firms, consultants (list all with names, addresses, phones, emails)
-3. REVISIONS: list of {{revision_number, date, description}}
-4. KEYNOTES: list of {{number, description}} - EXTRACT ALL numbered keynotes visible
+3. REVISIONS: list of {{revision_number, date, description, bbox}}
+4. KEYNOTES: list of {{number, description, bbox}} - EXTRACT ALL numbered keynotes visible
 5. DIMENSIONS: overall_dimensions, room_dimensions, key_measurements
 6. SPECIFICATIONS: materials, finishes, equipment mentioned
 7. SCHEDULES: any door/window/room schedules as structured data
@@ -589,11 +912,14 @@ Extract the following information if present:
 9. DRAWING_TYPE: floor_plan, elevation, section, detail, schedule, site_plan, etc.
 10. GRID_LINES: list of grid line labels (A, B, C, 1, 2, 3, etc.)
 
+Each bbox is [left, top, right, bottom] as fractions (0-1) of the page width and height.
 Return ONLY valid JSON with these keys. If a section is not visible, use null or empty array.
 Be thorough - construction managers need every detail for cost estimation and coordination."""
 
             # Generate with Gemini
-            response = model.generate_content(
+            response = self.llm.generate_content(
+                model,
+                model_name,
                 [extraction_prompt, image],
                 generation_config=genai.types.GenerationConfig(
                     temperature=0.1,
@@ -626,6 +952,8 @@ Be thorough - construction managers need every detail for cost estimation and co
                 'raw_response': response_text
             }
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Gemini extraction error: {e}", exc_info=True)
             return None
@@ -730,13 +1058,28 @@ Be thorough - construction managers need every detail for cost estimation and co
     # STREAMING MODE: Process single page from pre-extracted PNG
     # =========================================================================
     
-    def run_page(self, page_gcs_path: str, page_identifier: str) -> Dict:
+    def run_page(
+        self,
+        page_gcs_path: str,
+        page_identifier: str,
+        base_page_gcs: Optional[str] = None,
+        batch_job_id: Optional[str] = None,
+        drawing_name: Optional[str] = None,
+    ) -> Dict:
         """
         Process a single page image for OCR (streaming mode).
         
         Args:
             page_gcs_path: GCS path to the PNG image
             page_identifier: Identifier for this page (e.g., "old_page_1", "new_page_2")
+            base_page_gcs: GCS path to the previous revision of this page. When
+                its extraction is in the result store, only the changed regions
+                are sent to the vision model and merged into that result.
+            batch_job_id: Job of a batch-priority comparison. A page that needs a
+                model call is queued for the job's provider batch instead, and a
+                pending payload is written until ``apply_batch_result`` replaces it.
+            drawing_name: Sheet name of the page, kept with a queued batch request
+                so the batch service can report the page once it comes back.
             
         Returns:
             Dict with result_ref and extracted info
@@ -746,46 +1089,357 @@ Be thorough - construction managers need every detail for cost estimation and co
             extra={"page_gcs_path": page_gcs_path, "page_identifier": page_identifier}
         )
         
-        # Download page image
-        page_bytes = self.storage.download_file(page_gcs_path)
+        # Text layer written next to the PNG by the page extractor (vector PDFs only)
+        text_layer = self._load_text_layer(page_gcs_path)
+        extraction = self._text_layer_sections(text_layer)
+        text_layer_only = bool(extraction and extraction.complete)
+        # Sections the text layer could not supply are all the vision model is asked for
+        sections = extraction.requested_sections if extraction else None
         
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Save locally for processing
-            png_path = Path(temp_dir) / f"{page_identifier}.png"
-            png_path.write_bytes(page_bytes)
+        page_info = None
+        model_key = None
+        if not text_layer_only:
+            # Download page image
+            page_bytes = self.storage.download_file(page_gcs_path)
+            checkpoint("after page download")
             
-            # Extract information from the page
-            page_info = self._extract_page_information(
-                str(png_path),
-                page_identifier,
-                1  # Single page
-            )
+            # Same raster already extracted by this model and prompt (other job or revision)?
+            model_key = self._sections_model_key(self._ocr_model_key(), sections)
+            if self.result_store and model_key:
+                # An incremental result answers for the same raster too (e.g. this revision
+                # coming back as the baseline of the next comparison)
+                page_info = self.result_store.get(
+                    page_bytes, model_key, OCR_PROMPT_VERSION,
+                    fallback_models=(model_key + INCREMENTAL_KEY_SUFFIX,),
+                )
+        cache_hit = page_info is not None
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            if text_layer_only:
+                page_info = extraction.to_page_info(page_identifier, 1)
+            elif cache_hit:
+                page_info = dict(page_info, drawing_name=page_identifier)
+            else:
+                if batch_job_id and self.model:
+                    page_info = self._queue_batch_page(
+                        page_bytes, page_gcs_path, page_identifier, batch_job_id,
+                        drawing_name=drawing_name, sections=sections,
+                    )
+                elif base_page_gcs and self.incremental_enabled and self.result_store and model_key:
+                    page_info = self._extract_incremental(page_bytes, base_page_gcs, page_identifier, model_key)
+                
+                if page_info is None:
+                    # Save locally for processing
+                    png_path = Path(temp_dir) / f"{page_identifier}.png"
+                    png_path.write_bytes(page_bytes)
+                    
+                    # Extract information from the page
+                    page_info = self._extract_page_information(
+                        str(png_path),
+                        page_identifier,
+                        1,  # Single page
+                        sections=sections,
+                    )
+                checkpoint("before storing result")
+                if (
+                    self.result_store
+                    and model_key
+                    and page_info.get('extraction_method') not in ('error', 'basic', 'batch_pending')
+                ):
+                    store_key = model_key
+                    if page_info.get('extraction_method', '').startswith('incremental+'):
+                        store_key += INCREMENTAL_KEY_SUFFIX
+                    self.result_store.put(page_bytes, store_key, OCR_PROMPT_VERSION, page_info)
             
-            # Create OCR result payload
-            ocr_payload = {
-                "page_identifier": page_identifier,
-                "page_gcs_path": page_gcs_path,
-                "extracted_info": page_info,
-                "processed_at": datetime.utcnow().isoformat(),
-            }
+            batch_pending = page_info.get('extraction_method') == 'batch_pending'
+            if extraction and not text_layer_only and page_info.get('extraction_method') not in ('error', 'batch_pending'):
+                page_info = extraction.merge_into(page_info)
             
-            # Upload result to GCS
-            result_ref = self.storage.upload_file(
-                json.dumps(ocr_payload).encode('utf-8'),
-                f"ocr_pages/{page_identifier}.json",
-                content_type='application/json'
-            )
+            result_ref = self._write_page_result(page_identifier, page_gcs_path, page_info, cache_hit)
             
             logger.info(
                 "Page OCR complete",
-                extra={"page_identifier": page_identifier, "result_ref": result_ref}
+                extra={
+                    "page_identifier": page_identifier,
+                    "result_ref": result_ref,
+                    "cache_hit": cache_hit,
+                    "cache_stats": self.result_store.stats() if self.result_store else None,
+                }
             )
             
             return {
                 "result_ref": result_ref,
                 "page_identifier": page_identifier,
-                "extracted_info": page_info
+                "extracted_info": page_info,
+                "cache_hit": cache_hit,
+                "batch_pending": batch_pending,
             }
+    
+    def _write_page_result(self, page_identifier: str, page_gcs_path: str, page_info: Dict, cache_hit: bool) -> str:
+        """Upload the OCR result payload for a single page and return its ref."""
+        ocr_payload = {
+            "page_identifier": page_identifier,
+            "page_gcs_path": page_gcs_path,
+            "extracted_info": page_info,
+            "processed_at": datetime.utcnow().isoformat(),
+            "cache_hit": cache_hit,
+        }
+        return self.storage.upload_file(
+            json.dumps(ocr_payload).encode('utf-8'),
+            f"ocr_pages/{page_identifier}.json",
+            content_type='application/json'
+        )
+    
+    def _queue_batch_page(
+        self,
+        page_bytes: bytes,
+        page_gcs_path: str,
+        page_identifier: str,
+        job_id: str,
+        drawing_name: Optional[str] = None,
+        sections: Optional[List[str]] = None,
+    ) -> Dict:
+        """Queue a page's OpenAI extraction for the job's provider batch."""
+        request_body = self._openai_page_request(page_bytes, page_identifier, 1, sections=sections)
+        with self.session_factory() as db:
+            batch_request = BatchRequest(
+                job_id=job_id,
+                kind='ocr',
+                request_body=request_body,
+                target={
+                    'page_identifier': page_identifier,
+                    'page_gcs_path': page_gcs_path,
+                    'model_key': self._sections_model_key(f"openai:{request_body['model']}", sections),
+                    'drawing_name': drawing_name,
+                },
+            )
+            db.add(batch_request)
+            db.commit()
+            batch_request_id = batch_request.id
+        
+        logger.info(f"Queued batch OCR for {page_identifier}", extra={"job_id": job_id, "batch_request_id": batch_request_id})
+        return {
+            'drawing_name': page_identifier,
+            'page_number': 1,
+            'sections': {},
+            'extraction_method': 'batch_pending',
+            'batch_request_id': batch_request_id,
+        }
+    
+    def apply_batch_result(self, target: Dict, response_text: Optional[str], error: Optional[str] = None) -> str:
+        """
+        Replace a page's pending payload with its batch extraction (or an error
+        result) and return the result ref. Successful results go into the
+        result store like any synchronous extraction.
+        """
+        page_identifier = target['page_identifier']
+        page_gcs_path = target['page_gcs_path']
+        if error:
+            page_info = self._error_page_info(page_identifier, 1, RuntimeError(error))
+        else:
+            page_info = self._page_info_from_response(response_text, page_identifier, 1)
+            if self.result_store:
+                page_bytes = self.storage.download_file(page_gcs_path)
+                self.result_store.put(page_bytes, target['model_key'], OCR_PROMPT_VERSION, page_info)
+            extraction = self._text_layer_sections(self._load_text_layer(page_gcs_path))
+            if extraction:
+                page_info = extraction.merge_into(page_info)
+        return self._write_page_result(page_identifier, page_gcs_path, page_info, False)
+    
+    def _extract_incremental(
+        self,
+        page_bytes: bytes,
+        base_page_gcs: str,
+        page_identifier: str,
+        model_key: str,
+    ) -> Optional[Dict]:
+        """
+        Update the previous revision's extraction from crops of the changed regions.
+        
+        Only a full extraction of the previous revision is used as the base, so
+        patches never stack on patches. Returns None (caller does a full-page
+        extraction) when the previous revision was never fully extracted by
+        this model, the change is too large to be worth cropping, or a region
+        extraction fails.
+        """
+        try:
+            base_bytes = self.storage.download_file(base_page_gcs)
+        except Exception as e:
+            logger.warning(f"Could not load base page {base_page_gcs} for incremental OCR: {e}")
+            return None
+        
+        base_info = self.result_store.get(base_bytes, model_key, OCR_PROMPT_VERSION)
+        if base_info is None:
+            return None
+        
+        regions = find_change_regions(base_bytes, page_bytes)
+        if regions is None:
+            return None
+        coverage = region_coverage(regions)
+        if len(regions) > config.OCR_INCREMENTAL_MAX_REGIONS or coverage > config.OCR_INCREMENTAL_MAX_COVERAGE:
+            logger.info(
+                f"Changes on {page_identifier} too large for incremental OCR "
+                f"({len(regions)} regions, {coverage:.0%} of page); extracting full page"
+            )
+            return None
+        
+        base_method = base_info.get('extraction_method', 'unknown')
+        
+        sections = copy.deepcopy(base_info.get('sections') or {})
+        re_derived = set()
+        for region in regions:
+            region_sections = self._extract_region_information(page_bytes, page_identifier, region)
+            if region_sections is None:
+                return None
+            re_derived.update(_merge_region_sections(sections, region_sections, region))
+        
+        logger.info(
+            f"Incremental OCR for {page_identifier}: {len(regions)} regions "
+            f"({coverage:.1%} of page), re-derived {sorted(re_derived) or 'nothing'}"
+        )
+        return {
+            'drawing_name': page_identifier,
+            'page_number': 1,
+            'sections': sections,
+            'extraction_method': f"incremental+{base_method}",
+            'incremental': {
+                'base_page_gcs': base_page_gcs,
+                'base_raster_hash': hashlib.sha256(base_bytes).hexdigest(),
+                'regions': regions,
+                'coverage': round(coverage, 4),
+                're_derived_sections': sorted(re_derived),
+            },
+        }
+    
+    def _should_tile(self, image_bytes: bytes) -> bool:
+        if not self.tiling_enabled or config.OCR_TILE_MIN_DIMENSION <= 0:
+            return False
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as image:
+                return max(image.size) > config.OCR_TILE_MIN_DIMENSION
+        except Exception:
+            return False
+    
+    def _extract_tiled(self, image_bytes: bytes, drawing_name: str, page_num: int) -> Optional[Dict]:
+        """
+        Extract a page as overlapping tiles read concurrently, then merge them.
+        
+        Each tile is sent at the model's full resolution budget, so small text
+        stays legible; wall-clock time is about one tile call. Returns None
+        (caller sends the full sheet) if any tile fails, rather than a result
+        with a hole in it.
+        """
+        tiles = page_tiles(config.OCR_TILE_OVERLAP)
+        logger.info(f"Tiled OCR for {drawing_name} page {page_num}: {len(tiles)} tiles")
+        with ThreadPoolExecutor(max_workers=len(tiles), thread_name_prefix='ocr-tile') as executor:
+            futures = [
+                submit_with_context(
+                    executor,
+                    self._extract_region_information,
+                    image_bytes,
+                    drawing_name,
+                    list(region),
+                    region_description=f"the {name} of the sheet",
+                )
+                for name, region in tiles
+            ]
+            tile_sections = [future.result() for future in futures]
+        
+        failed = [name for (name, _), sections in zip(tiles, tile_sections) if sections is None]
+        if failed:
+            logger.warning(f"Tiled OCR failed for {drawing_name} tiles {failed}; extracting full sheet")
+            return None
+        
+        return {
+            'drawing_name': drawing_name,
+            'page_number': page_num,
+            'sections': _merge_tile_sections(tile_sections),
+            'extraction_method': f"tiled+{self._ocr_model_key() or 'unknown'}",
+            'tiles': [{'name': name, 'region': list(region)} for name, region in tiles],
+        }
+    
+    def _extract_region_information(
+        self,
+        image_bytes: bytes,
+        drawing_name: str,
+        region: List[float],
+        region_description: str = "an area that changed since the previous revision",
+    ) -> Optional[Dict]:
+        """Extract the sections visible in one normalized crop of a page (None on failure)."""
+        prompt = REGION_EXTRACTION_PROMPT.format(drawing_name=drawing_name, region_description=region_description)
+        crop = tuple(region)
+        try:
+            gemini_api_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
+            if GEMINI_AVAILABLE and gemini_api_key:
+                model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')
+                model = self.llm.gemini_model(model_name, api_key=gemini_api_key)
+                image = get_image_budgeter().prepare(image_bytes, 'gemini-ocr', crop=crop).as_pil()
+                response = self.llm.generate_content(
+                    model,
+                    model_name,
+                    [prompt, image],
+                    generation_config=genai.types.GenerationConfig(temperature=0.1, max_output_tokens=1500),
+                )
+                response_text = response.text
+            else:
+                api_key = os.getenv('OPENAI_API_KEY') or config.OPENAI_API_KEY
+                if not api_key or not OPENAI_AVAILABLE:
+                    return None
+                prepared_image = get_image_budgeter().prepare(image_bytes, 'openai', crop=crop)
+                response = self.llm.chat_completion(
+                    self.llm.openai_client(api_key, timeout=180.0),
+                    model=os.getenv('OPENAI_MODEL') or self.model or 'gpt-4o',
+                    messages=[{
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt},
+                            {"type": "image_url", "image_url": {"url": prepared_image.data_url(), "detail": "high"}},
+                        ],
+                    }],
+                    response_format={"type": "json_object"},
+                    max_completion_tokens=1500,
+                )
+                response_text = response.choices[0].message.content
+            
+            if '```json' in response_text:
+                response_text = response_text.split('```json')[1].split('```')[0]
+            elif '```' in response_text:
+                response_text = response_text.split('```')[1].split('```')[0]
+            extracted = json.loads(response_text.strip())
+            return _bbox_to_page(extracted, region) if isinstance(extracted, dict) else None
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Region extraction failed for {drawing_name} {region}: {e}")
+            return None
+    
+    def uses_base_page(self) -> bool:
+        """Whether ``run_page`` can patch a page from its stored base (the base must finish first)."""
+        return bool(self.incremental_enabled and self.result_store)
+    
+    @staticmethod
+    def _text_layer_sections(text_layer: Optional[Dict]):
+        """Sections parsed from a page's text layer (None without one)."""
+        if not text_layer:
+            return None
+        return extract_sections(text_layer, include_unread=config.OCR_TEXT_LAYER_UNREAD_SECTIONS)
+    
+    def _load_text_layer(self, page_gcs_path: str) -> Optional[Dict]:
+        """Load the ``.text.json`` sidecar for a page image, if one was extracted."""
+        if not self.text_layer_enabled or not page_gcs_path.endswith('.png'):
+            return None
+        try:
+            return json.loads(self.storage.download_file(page_gcs_path[:-len('.png')] + '.text.json'))
+        except Exception:
+            return None
+    
+    def _ocr_model_key(self) -> Optional[str]:
+        """Identify the model that will answer extractions (None = no AI, nothing to cache)."""
+        if GEMINI_AVAILABLE and (os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')):
+            return f"gemini:{os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')}"
+        if OPENAI_AVAILABLE and (os.getenv('OPENAI_API_KEY') or config.OPENAI_API_KEY):
+            return f"openai:{os.getenv('OPENAI_MODEL') or self.model or 'gpt-4o'}"
+        return None
 
 
-__all__ = ["OCRPipeline"]
+__all__ = ["OCRPipeline", "ocr_log_path"]
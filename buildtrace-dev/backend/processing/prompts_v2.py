@@ -189,3 +189,50 @@ Provide your analysis in the same detailed JSON format as specified for 3-image
 
 Analyze the image systematically and return ONLY valid JSON."""
 
+
+USER_PROMPT_V2_REGIONS = """Analyze the changes on {drawing_name} (Page {page_number}).
+
+The automated diff already located every changed area of the sheet. You are given:
+1. OVERVIEW - a low-resolution overlay of the whole sheet for orientation (RED = removed, GREEN = added, GREY = unchanged)
+2. For each of the {region_count} changed regions, a high-resolution BEFORE crop and AFTER crop of the same area
+
+**Changed regions** (position on the sheet):
+{region_list}
+
+**ANALYSIS REQUIREMENTS:**
+- Compare each region's BEFORE and AFTER crops and describe exactly what changed there
+- Return at least one entry in "changes" for every region, with its "region_id"; when a region holds several unrelated changes, add one entry per change with the same "region_id"
+- If a region shows no meaningful change (rendering noise, shifted hatching), return one entry with "change_type": "none"
+- Read keynote numbers, note text, dimensions and tags from the crops; do not guess text you cannot read
+- Use the OVERVIEW only to name locations (grid lines, rooms, sheet areas)
+
+Provide your analysis in this EXACT JSON format:
+
+{{
+  "drawing_code": "{drawing_name}",
+  "page_number": {page_number},
+  "ai_summary": "Brief 1-2 sentence summary of the main changes",
+  "changes": [
+    {{
+      "id": "1",
+      "region_id": "R1",
+      "title": "Short descriptive title",
+      "description": "Detailed description of what changed in this region",
+      "change_type": "added|modified|removed|none",
+      "location": "Specific grid/room reference",
+      "trade_affected": "Electrical/Plumbing/HVAC/Structural/Architectural"
+    }}
+  ],
+  "added_keynotes": [],
+  "removed_keynotes": [],
+  "modified_keynotes": [],
+  "general_notes_changes": [],
+  "critical_change": {{
+    "title": "Most impactful change",
+    "reason": "Why this is critical"
+  }},
+  "recommendations": ["Recommendation 1"],
+  "total_changes": 0
+}}
+
+Return ONLY valid JSON."""
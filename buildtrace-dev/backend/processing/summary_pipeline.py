@@ -9,18 +9,27 @@ from __future__ import annotations
 import json
 import logging
 import uuid
-import base64
 import os
-import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Dict, Optional, List, Tuple
 from pathlib import Path
 
 from gcp.database import get_db_session
-from gcp.database.models import ChangeSummary, DiffResult
+from gcp.database.models import BatchRequest, ChangeSummary, DiffResult
 from gcp.storage import StorageService
+from services.change_metrics import attach_change_metrics
 from config import config
-from processing.prompts_v2 import SYSTEM_PROMPT_V2, USER_PROMPT_V2_3IMAGE, USER_PROMPT_V2_OVERLAY_ONLY
+from processing.prompts_v2 import (
+    SYSTEM_PROMPT_V2,
+    USER_PROMPT_V2_3IMAGE,
+    USER_PROMPT_V2_OVERLAY_ONLY,
+    USER_PROMPT_V2_REGIONS,
+)
+from utils.artifact_cache import RunArtifacts, get_artifact_lru
+from utils.cancellation import JobCancelled, checkpoint, submit_with_context
+from utils.change_regions import region_coverage
+from utils.llm_gateway import get_llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -53,10 +62,12 @@ class SummaryPipeline:
     ) -> None:
         self.storage = storage_service or StorageService()
         self.session_factory = session_factory or get_db_session
+        # Clients are pooled, rate limited and retried by the shared LLM gateway
+        self.llm = get_llm_gateway()
         
         # Initialize OpenAI client if available (AI-2: GPT)
         if OPENAI_AVAILABLE and config.OPENAI_API_KEY:
-            self.openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
+            self.openai_client = self.llm.openai_client(config.OPENAI_API_KEY)
             self.openai_model = config.OPENAI_MODEL or "gpt-4o"
             logger.info(f"OpenAI client initialized with model: {self.openai_model}")
         else:
@@ -70,10 +81,9 @@ class SummaryPipeline:
         gemini_api_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY') or getattr(config, 'GEMINI_API_KEY', None)
         if GEMINI_AVAILABLE and gemini_api_key:
             try:
-                genai.configure(api_key=gemini_api_key)
                 # Use gemini-2.5-pro for best results
                 self.gemini_model_name = os.getenv('GEMINI_MODEL', 'gemini-2.5-pro')
-                self.gemini_model = genai.GenerativeModel(self.gemini_model_name)
+                self.gemini_model = self.llm.gemini_model(self.gemini_model_name, api_key=gemini_api_key)
                 logger.info(f"Gemini client initialized with model: {self.gemini_model_name}")
             except Exception as e:
                 logger.warning(f"Failed to initialize Gemini client: {e}")
@@ -81,6 +91,9 @@ class SummaryPipeline:
         else:
             logger.warning("Gemini client not initialized - Gemini summaries will not be available")
         
+        # Summarise the diff's change regions (overview + crops) instead of whole sheets when they are few
+        self.region_mode = os.getenv('SUMMARY_REGION_MODE', 'true').lower() == 'true'
+        
         # Legacy compatibility
         self.model = self.openai_model
 
@@ -92,6 +105,8 @@ class SummaryPipeline:
         overlay_ref: Optional[str] = None,
         metadata: Optional[Dict] = None,
         overlay_id: Optional[str] = None,
+        defer_to_batch: bool = False,
+        page_number: Optional[int] = None,
     ) -> Dict:
         """
         Generate DUAL AI summaries (Gemini as AI-1, GPT as AI-2).
@@ -99,6 +114,10 @@ class SummaryPipeline:
         Both summaries are stored as separate ChangeSummary records.
         Gemini summary is set as active (is_active=True).
         GPT summary is stored as inactive (is_active=False) for frontend toggle.
+        
+        With ``defer_to_batch`` (batch-priority jobs) only the GPT request is
+        queued for the provider batch; an active 'batch_pending' placeholder
+        stands in until ``apply_batch_result`` stores the real summary.
         """
         logger.info(
             "Starting DUAL AI summary pipeline",
@@ -110,10 +129,10 @@ class SummaryPipeline:
             if not diff_result:
                 raise ValueError(f"DiffResult {diff_result_id} not found")
 
-            # Download diff payload
-            diff_payload = json.loads(
-                self.storage.download_file(diff_result.machine_generated_overlay_ref).decode("utf-8")
-            )
+            # Both models read the same overlay/page images; download and decode each once
+            artifacts = RunArtifacts(self.storage, shared=get_artifact_lru())
+            diff_payload = artifacts.json(diff_result.machine_generated_overlay_ref)
+            checkpoint("after diff download")
             
             change_count = diff_payload.get("change_count", 0)
             alignment_score = diff_payload.get("alignment_score", 1.0)
@@ -121,121 +140,117 @@ class SummaryPipeline:
             # Deactivate all old summaries first
             db.query(ChangeSummary).filter_by(diff_result_id=diff_result_id, is_active=True).update({'is_active': False})
             
+            # ========== BATCH PRIORITY: GPT request goes to the provider batch ==========
+            if defer_to_batch and self.model and overlay_ref:
+                return self._queue_batch_summary(
+                    db, job_id, diff_result, diff_payload, overlay_ref,
+                    metadata=metadata, overlay_id=overlay_id, page_number=page_number,
+                    artifacts=artifacts,
+                )
+            
             summaries_created = []
             primary_summary_id = None
             primary_summary_text = None
             
-            # ========== AI-1: GEMINI SUMMARY ==========
-            gemini_summary = None
-            if self.gemini_model and overlay_ref:
-                try:
+            # Both models are called at once. The generators only read diff_metadata from
+            # worker threads, so detach the row: the commits below must not expire it.
+            db.expunge(diff_result)
+            # Gemini and GPT summaries are generated side by side, on threads of this run
+            # (the summary worker handles several messages at once)
+            summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='summary-ai')
+            try:
+                futures = {}
+                if self.gemini_model and overlay_ref:
                     logger.info(f"Generating Gemini summary (AI-1) with model: {self.gemini_model_name}")
-                    gemini_text, gemini_json = self._generate_gemini_summary(
-                        diff_result, diff_payload, overlay_ref
+                    futures["gemini"] = submit_with_context(
+                        summary_executor, self._generate_gemini_summary, diff_result, diff_payload, overlay_ref, artifacts=artifacts
                     )
-                    
-                    gemini_summary = ChangeSummary(
-                        id=str(uuid.uuid4()),
-                        diff_result_id=diff_result_id,
-                        summary_text=gemini_text,
-                        summary_json=gemini_json,
-                        source="gemini",
-                        ai_model_used=self.gemini_model_name,
-                        created_by=diff_result.created_by,
-                        summary_metadata=metadata or {},
-                        overlay_id=overlay_id,
-                        is_active=True,  # Gemini is the primary/active summary
-                    )
-                    db.add(gemini_summary)
-                    summaries_created.append({"id": gemini_summary.id, "model": self.gemini_model_name})
-                    primary_summary_id = gemini_summary.id
-                    primary_summary_text = gemini_text
-                    logger.info(f"Gemini summary (AI-1) created: {gemini_summary.id}")
-                    
-                except Exception as e:
-                    logger.error(f"Gemini summary generation failed: {e}", exc_info=True)
-                    # Create failed Gemini summary entry
-                    gemini_summary = ChangeSummary(
-                        id=str(uuid.uuid4()),
-                        diff_result_id=diff_result_id,
-                        summary_text=f"Gemini analysis failed: {str(e)}",
-                        summary_json={
-                            "ai_analysis_failed": True,
-                            "error": str(e),
-                            "change_count": change_count,
-                            "alignment_score": alignment_score
-                        },
-                        source="gemini-failed",
-                        ai_model_used=self.gemini_model_name,
-                        created_by=diff_result.created_by,
-                        summary_metadata=metadata or {},
-                        overlay_id=overlay_id,
-                        is_active=False,
-                    )
-                    db.add(gemini_summary)
-            else:
-                logger.warning("Gemini summary skipped - client not available or no overlay_ref")
+                else:
+                    logger.warning("Gemini summary skipped - client not available or no overlay_ref")
             
-            # ========== AI-2: GPT SUMMARY ==========
-            gpt_summary = None
-            if self.openai_client and overlay_ref:
-                try:
+                if self.openai_client and overlay_ref:
                     logger.info(f"Generating GPT summary (AI-2) with model: {self.openai_model}")
-                    gpt_text, gpt_json = self._generate_ai_summary(
-                        diff_result, diff_payload, overlay_ref
+                    futures["gpt"] = submit_with_context(
+                        summary_executor, self._generate_ai_summary, diff_result, diff_payload, overlay_ref, artifacts=artifacts
                     )
+                else:
+                    logger.warning("GPT summary skipped - client not available or no overlay_ref")
+            
+                # ========== COLLECT: Gemini (AI-1) is primary, GPT (AI-2) the fallback ==========
+                # Results are stored as they arrive. The primary is committed as active as soon
+                # as it succeeds, or the fallback as soon as it succeeds with the primary failed,
+                # so progress shows a summary after one round trip; the other is attached later.
+                models = {
+                    "gemini": ("Gemini", "gemini", self.gemini_model_name),
+                    "gpt": ("GPT", "gpt-4-vision", self.openai_model),
+                }
+                providers = {future: provider for provider, future in futures.items()}
+                outcomes: Dict[str, Optional[ChangeSummary]] = {}  # None: the model failed
+                for future in as_completed(providers):
+                    provider = providers[future]
+                    label, source, model_name = models[provider]
+                    try:
+                        summary_text, summary_json = future.result()
+                        summary = ChangeSummary(
+                            id=str(uuid.uuid4()),
+                            diff_result_id=diff_result_id,
+                            summary_text=summary_text,
+                            summary_json=summary_json,
+                            source=source,
+                            ai_model_used=model_name,
+                            created_by=diff_result.created_by,
+                            summary_metadata=metadata or {},
+                            overlay_id=overlay_id,
+                            is_active=False,
+                        )
+                        summaries_created.append({"id": summary.id, "model": model_name})
+                        outcomes[provider] = summary
+                        logger.info(f"{label} summary created: {summary.id}")
                     
-                    # GPT is inactive if Gemini succeeded, otherwise active
-                    gpt_is_active = (gemini_summary is None or gemini_summary.source == "gemini-failed")
-                    
-                    gpt_summary = ChangeSummary(
-                        id=str(uuid.uuid4()),
-                        diff_result_id=diff_result_id,
-                        summary_text=gpt_text,
-                        summary_json=gpt_json,
-                        source="gpt-4-vision",
-                        ai_model_used=self.openai_model,
-                        created_by=diff_result.created_by,
-                        summary_metadata=metadata or {},
-                        overlay_id=overlay_id,
-                        is_active=gpt_is_active,
-                    )
-                    db.add(gpt_summary)
-                    summaries_created.append({"id": gpt_summary.id, "model": self.openai_model})
-                    
-                    # If Gemini failed, use GPT as primary
-                    if gpt_is_active:
-                        primary_summary_id = gpt_summary.id
-                        primary_summary_text = gpt_text
-                    
-                    logger.info(f"GPT summary (AI-2) created: {gpt_summary.id}, active: {gpt_is_active}")
-                    
-                except Exception as e:
-                    logger.error(f"GPT summary generation failed: {e}", exc_info=True)
-                    # Create failed GPT summary entry
-                    gpt_summary = ChangeSummary(
-                        id=str(uuid.uuid4()),
-                        diff_result_id=diff_result_id,
-                        summary_text=f"GPT analysis failed: {str(e)}",
-                        summary_json={
-                            "ai_analysis_failed": True,
-                            "error": str(e),
-                            "change_count": change_count,
-                            "alignment_score": alignment_score
-                        },
-                        source="gpt-failed",
-                        ai_model_used=self.openai_model,
-                        created_by=diff_result.created_by,
-                        summary_metadata=metadata or {},
-                        overlay_id=overlay_id,
-                        is_active=False,
-                    )
-                    db.add(gpt_summary)
-            else:
-                logger.warning("GPT summary skipped - client not available or no overlay_ref")
+                    except JobCancelled:
+                        raise
+                    except Exception as e:
+                        logger.error(f"{label} summary generation failed: {e}", exc_info=True)
+                        summary = ChangeSummary(
+                            id=str(uuid.uuid4()),
+                            diff_result_id=diff_result_id,
+                            summary_text=f"{label} analysis failed: {str(e)}",
+                            summary_json={
+                                "ai_analysis_failed": True,
+                                "error": str(e),
+                                "change_count": change_count,
+                                "alignment_score": alignment_score
+                            },
+                            source=f"{provider}-failed",
+                            ai_model_used=model_name,
+                            created_by=diff_result.created_by,
+                            summary_metadata=metadata or {},
+                            overlay_id=overlay_id,
+                            is_active=False,
+                        )
+                        outcomes[provider] = None
+                    attach_change_metrics(summary)
+                    db.add(summary)
+
+                    if primary_summary_id is None:
+                        for preferred in (p for p in models if p in futures):
+                            if preferred not in outcomes:
+                                break  # a preferred model is still running
+                            chosen = outcomes[preferred]
+                            if chosen is not None:
+                                chosen.is_active = True
+                                primary_summary_id = chosen.id
+                                primary_summary_text = chosen.summary_text
+                                db.commit()
+                                logger.info(f"{models[preferred][0]} summary {chosen.id} is active")
+                                break
+            finally:
+                # A cancelled job does not wait for the other model's call
+                summary_executor.shutdown(wait=False, cancel_futures=True)
             
             # ========== FALLBACK: No AI available ==========
             if not summaries_created:
+                checkpoint("before placeholder summary")
                 logger.warning("No AI summaries could be generated - creating placeholder")
                 placeholder_summary = ChangeSummary(
                     id=str(uuid.uuid4()),
@@ -253,6 +268,7 @@ class SummaryPipeline:
                     overlay_id=overlay_id,
                     is_active=True,
                 )
+                attach_change_metrics(placeholder_summary)
                 db.add(placeholder_summary)
                 primary_summary_id = placeholder_summary.id
                 primary_summary_text = placeholder_summary.summary_text
@@ -272,11 +288,123 @@ class SummaryPipeline:
             return {
                 "summary_id": primary_summary_id, 
                 "summary_text": primary_summary_text,
-                "summaries_created": summaries_created
+                "summaries_created": summaries_created,
+                "placeholder": not summaries_created,
             }
     
+    def _queue_batch_summary(
+        self,
+        db,
+        job_id: str,
+        diff_result: DiffResult,
+        diff_payload: Dict,
+        overlay_ref: str,
+        *,
+        metadata: Optional[Dict],
+        overlay_id: Optional[str],
+        page_number: Optional[int],
+        artifacts: Optional[RunArtifacts] = None,
+    ) -> Dict:
+        """Queue the GPT summary request and store an active placeholder in its place."""
+        placeholder = ChangeSummary(
+            id=str(uuid.uuid4()),
+            diff_result_id=diff_result.id,
+            summary_text="Queued for batch AI analysis. The summary will appear when the batch completes.",
+            summary_json={
+                "pending_ai_analysis": True,
+                "change_count": diff_payload.get("change_count", 0),
+                "alignment_score": diff_payload.get("alignment_score", 1.0),
+            },
+            source="batch_pending",
+            ai_model_used=self.openai_model,
+            created_by=diff_result.created_by,
+            summary_metadata=metadata or {},
+            overlay_id=overlay_id,
+            is_active=True,
+        )
+        attach_change_metrics(placeholder)
+        db.add(placeholder)
+        db.add(BatchRequest(
+            job_id=job_id,
+            kind='summary',
+            request_body=self._build_summary_request(diff_result, overlay_ref, artifacts=artifacts),
+            target={
+                'diff_result_id': diff_result.id,
+                'placeholder_summary_id': placeholder.id,
+                'page_number': page_number,
+                # Streaming pages report back to the stage graph, legacy jobs count summaries
+                'streaming': bool((metadata or {}).get('streaming')),
+                'change_regions': self._change_regions(diff_result),
+            },
+        ))
+        db.commit()
+        
+        logger.info(
+            "Queued GPT summary for batch",
+            extra={"job_id": job_id, "diff_result_id": diff_result.id, "placeholder_summary_id": placeholder.id},
+        )
+        return {
+            "summary_id": placeholder.id,
+            "summary_text": placeholder.summary_text,
+            "summaries_created": [],
+            "batch_pending": True,
+        }
+    
+    def apply_batch_result(self, target: Dict, response_text: Optional[str], error: Optional[str] = None) -> str:
+        """
+        Store the batch GPT summary for a queued diff and retire its placeholder.
+        
+        Returns the id of the summary that is now active. A failed request is
+        kept as an inactive 'gpt-failed' record and the placeholder becomes a
+        regular 'pending' summary, as when no AI client is available.
+        """
+        with self.session_factory() as db:
+            diff_result = db.query(DiffResult).filter_by(id=target['diff_result_id']).first()
+            if not diff_result:
+                raise ValueError(f"DiffResult {target['diff_result_id']} not found")
+            placeholder = db.query(ChangeSummary).filter_by(id=target['placeholder_summary_id']).first()
+            placeholder_json = (placeholder.summary_json if placeholder else None) or {}
+            
+            summary = ChangeSummary(
+                id=str(uuid.uuid4()),
+                diff_result_id=diff_result.id,
+                source="gpt-4-vision",
+                ai_model_used=placeholder.ai_model_used if placeholder else self.openai_model,
+                created_by=diff_result.created_by,
+                summary_metadata=placeholder.summary_metadata if placeholder else {},
+                overlay_id=placeholder.overlay_id if placeholder else None,
+                is_active=not error,
+            )
+            if error:
+                summary.summary_text = f"GPT analysis failed: {error}"
+                summary.summary_json = dict(placeholder_json, ai_analysis_failed=True, error=error)
+                summary.source = "gpt-failed"
+            else:
+                drawing_name = (diff_result.diff_metadata or {}).get('drawing_name', 'Unknown')
+                summary.summary_text, summary.summary_json = self._parse_summary_response(
+                    response_text, drawing_name, regions=target.get('change_regions')
+                )
+            attach_change_metrics(summary)
+            db.add(summary)
+            
+            active_id = summary.id
+            if placeholder:
+                if error:
+                    placeholder.source = "pending"
+                    placeholder.summary_text = "Awaiting AI analysis. Please regenerate summary when AI service is available."
+                    attach_change_metrics(placeholder)
+                    active_id = placeholder.id
+                else:
+                    placeholder.is_active = False
+            db.commit()
+            return active_id
+    
     def _generate_ai_summary(
-        self, diff_result: DiffResult, diff_payload: Dict, overlay_ref: str
+        self,
+        diff_result: DiffResult,
+        diff_payload: Dict,
+        overlay_ref: str,
+        artifacts: Optional[RunArtifacts] = None,
     ) -> Tuple[str, Dict]:
         """Generate AI summary using Vision API with 3 images (old, new, overlay)
         
@@ -284,40 +412,85 @@ class SummaryPipeline:
         Returns structured change data for better frontend display
         """
         try:
-            # Download overlay image
-            overlay_bytes = self.storage.download_file(overlay_ref)
-            overlay_base64 = base64.b64encode(overlay_bytes).decode('utf-8')
+            request_body = self._build_summary_request(diff_result, overlay_ref, artifacts=artifacts)
             
-            # Get drawing metadata
-            metadata = diff_result.diff_metadata or {}
-            drawing_name = metadata.get('drawing_name', 'Unknown')
-            page_number = metadata.get('page_number', 1)
+            # Call OpenAI Vision API with higher token limit
+            response = self.llm.chat_completion(self.openai_client, **request_body)
             
-            # Try to get old and new page images for 3-image analysis
-            old_page_ref = metadata.get('baseline_image_ref')
-            new_page_ref = metadata.get('revised_image_ref')
+            # Log full response details for debugging
+            choice = response.choices[0]
+            finish_reason = choice.finish_reason
+            response_text = choice.message.content
             
-            old_base64 = None
-            new_base64 = None
+            logger.info(f"OpenAI response - model: {response.model}, finish_reason: {finish_reason}, "
+                       f"content_length: {len(response_text) if response_text else 0}")
             
-            if old_page_ref and new_page_ref:
-                try:
-                    old_bytes = self.storage.download_file(old_page_ref)
-                    new_bytes = self.storage.download_file(new_page_ref)
-                    old_base64 = base64.b64encode(old_bytes).decode('utf-8')
-                    new_base64 = base64.b64encode(new_bytes).decode('utf-8')
-                    logger.info("Using 3-image analysis (old, new, overlay)")
-                except Exception as e:
-                    logger.warning(f"Could not load old/new images, using overlay only: {e}")
+            # Check for content filter or other issues
+            if finish_reason != "stop":
+                logger.warning(f"OpenAI finish_reason was '{finish_reason}' (expected 'stop')")
+                if hasattr(choice.message, 'refusal') and choice.message.refusal:
+                    logger.warning(f"OpenAI refusal: {choice.message.refusal}")
             
-            # System prompt for structured output
-            system_prompt = """You are an expert construction project manager analyzing architectural drawing changes.
+            if response_text:
+                logger.debug(f"OpenAI response (first 500 chars): {response_text[:500]}")
+            
+            drawing_name = (diff_result.diff_metadata or {}).get('drawing_name', 'Unknown')
+            return self._parse_summary_response(
+                response_text, drawing_name, regions=self._change_regions(diff_result)
+            )
+            
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"AI summary generation failed: {e}", exc_info=True)
+            # Re-raise to indicate AI analysis failed - caller should retry or handle
+            # Don't fall back to manual count, user wants AI-only summary
+            raise RuntimeError(f"AI summary generation failed: {e}")
+    
+    def _build_summary_request(
+        self, diff_result: DiffResult, overlay_ref: str, artifacts: Optional[RunArtifacts] = None
+    ) -> Dict:
+        """Chat completion request body for the GPT summary.
+
+        Shared by the synchronous call and batch submissions, so both send the
+        same prompt and images.
+        """
+        artifacts = artifacts or RunArtifacts(self.storage, shared=get_artifact_lru())
+        regions = self._change_regions(diff_result)
+        if regions:
+            return self._build_region_summary_request(diff_result, overlay_ref, regions, artifacts)
+        
+        # Overlays keep colour (red/green carries the meaning); pages may go grayscale
+        overlay_image = artifacts.prepared(overlay_ref, 'openai', keep_color=True)
+        
+        # Get drawing metadata
+        metadata = diff_result.diff_metadata or {}
+        drawing_name = metadata.get('drawing_name', 'Unknown')
+        page_number = metadata.get('page_number', 1)
+        
+        # Try to get old and new page images for 3-image analysis
+        old_page_ref = metadata.get('baseline_image_ref')
+        new_page_ref = metadata.get('revised_image_ref')
+        
+        old_image = None
+        new_image = None
+        
+        if old_page_ref and new_page_ref:
+            try:
+                old_image = artifacts.prepared(old_page_ref, 'openai')
+                new_image = artifacts.prepared(new_page_ref, 'openai')
+                logger.info("Using 3-image analysis (old, new, overlay)")
+            except Exception as e:
+                logger.warning(f"Could not load old/new images, using overlay only: {e}")
+        
+        # System prompt for structured output
+        system_prompt = """You are an expert construction project manager analyzing architectural drawing changes.
 Your task is to identify ALL changes between old and new drawing versions and provide structured, actionable output.
 Be precise, specific, and focus on construction-relevant details like keynotes, general notes, and specific elements."""
-            
-            # User prompt - different based on whether we have 3 images or just overlay
-            if old_base64 and new_base64:
-                user_prompt = f"""Analyze these THREE architectural drawings for {drawing_name} (Page {page_number}):
+        
+        # User prompt - different based on whether we have 3 images or just overlay
+        if old_image and new_image:
+            user_prompt = f"""Analyze these THREE architectural drawings for {drawing_name} (Page {page_number}):
 
 1. BEFORE drawing - the original design
 2. AFTER drawing - the updated design  
@@ -360,8 +533,8 @@ Provide a detailed analysis in this EXACT JSON format:
 }}
 
 Be thorough - identify EVERY keynote change, general note change, and visual change."""
-            else:
-                user_prompt = f"""Analyze this drawing overlay comparing old vs new versions.
+        else:
+            user_prompt = f"""Analyze this drawing overlay comparing old vs new versions.
 Drawing: {drawing_name} (Page {page_number})
 Color coding: RED = removed (old only), GREEN = added (new only), GREY = unchanged.
 
@@ -387,189 +560,273 @@ Provide your analysis as a JSON object with this structure:
 }}
 
 Analyze the image and return ONLY valid JSON."""
+        
+        # Build message content with images
+        message_content = [{"type": "text", "text": user_prompt}]
+        
+        if old_image and new_image:
+            # 3-image mode: old, new, overlay
+            message_content.extend([
+                {
+                    "type": "image_url",
+                    "image_url": {"url": old_image.data_url()}
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {"url": new_image.data_url()}
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {"url": overlay_image.data_url()}
+                }
+            ])
+        else:
+            # Single overlay image mode
+            message_content.append({
+                "type": "image_url",
+                "image_url": {"url": overlay_image.data_url()}
+            })
+        
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": message_content}
+            ],
+            "max_completion_tokens": 16000,  # Increased from 4000 to handle larger responses
+            "response_format": {"type": "json_object"},
+        }
+    
+    # =========================================================================
+    # Change-region summaries
+    # =========================================================================
+    
+    def _change_regions(self, diff_result: DiffResult) -> Optional[Dict[str, List[float]]]:
+        """
+        The diff's change regions labelled R1..Rn, or None to send whole sheets.
+        
+        Whole sheets are used when region mode is off, the diff has no regions
+        or page images, or the changes are too many/large for crops to pay off.
+        """
+        if not self.region_mode:
+            return None
+        metadata = diff_result.diff_metadata or {}
+        regions = metadata.get('change_regions') or []
+        if not regions or not (metadata.get('baseline_image_ref') and metadata.get('revised_image_ref')):
+            return None
+        coverage = region_coverage(regions)
+        if len(regions) > config.SUMMARY_REGION_MAX_REGIONS or coverage > config.SUMMARY_REGION_MAX_COVERAGE:
+            logger.info(
+                f"Change regions too broad for crops ({len(regions)} regions, {coverage:.0%} of page); "
+                "summarising whole sheets"
+            )
+            return None
+        return {f"R{index}": list(region) for index, region in enumerate(regions, 1)}
+    
+    def _region_prompt_parts(
+        self,
+        diff_result: DiffResult,
+        overlay_ref: str,
+        regions: Dict[str, List[float]],
+        provider: str,
+        artifacts: RunArtifacts,
+    ) -> List:
+        """Prompt text, overview thumbnail, then labelled BEFORE/AFTER crops of each region."""
+        metadata = diff_result.diff_metadata or {}
+        region_list = "\n".join(
+            f"- {label}: {left:.0%}-{right:.0%} across, {top:.0%}-{bottom:.0%} down"
+            for label, (left, top, right, bottom) in regions.items()
+        )
+        prompt = USER_PROMPT_V2_REGIONS.format(
+            drawing_name=metadata.get('drawing_name', 'Unknown'),
+            page_number=metadata.get('page_number', 1),
+            region_count=len(regions),
+            region_list=region_list,
+        )
+        parts = [prompt, "OVERVIEW:", artifacts.prepared(overlay_ref, 'overview', keep_color=True)]
+        # Regions come from the overlay, i.e. the new sheet's frame: crop the aligned baseline
+        # (diffs stored before it was kept fall back to the raw baseline)
+        baseline_ref = metadata.get('aligned_baseline_image_ref') or metadata['baseline_image_ref']
+        for label, region in regions.items():
+            crop = tuple(region)
+            parts.extend([
+                f"{label} BEFORE:",
+                artifacts.prepared(baseline_ref, provider, crop=crop),
+                f"{label} AFTER:",
+                artifacts.prepared(metadata['revised_image_ref'], provider, crop=crop),
+            ])
+        logger.info(f"Using change-region analysis ({len(regions)} regions) with {provider}")
+        return parts
+    
+    def _build_region_summary_request(
+        self,
+        diff_result: DiffResult,
+        overlay_ref: str,
+        regions: Dict[str, List[float]],
+        artifacts: RunArtifacts,
+    ) -> Dict:
+        """Chat completion request body for a change-region GPT summary."""
+        message_content = []
+        parts = self._region_prompt_parts(diff_result, overlay_ref, regions, 'openai', artifacts)
+        overview = parts[2]
+        for part in parts:
+            if isinstance(part, str):
+                message_content.append({"type": "text", "text": part})
+            else:
+                # The overview is orientation only; crops are read at full detail
+                detail = "low" if part is overview else "high"
+                message_content.append({"type": "image_url", "image_url": {"url": part.data_url(), "detail": detail}})
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT_V2},
+                {"role": "user", "content": message_content}
+            ],
+            "max_completion_tokens": 16000,
+            "response_format": {"type": "json_object"},
+        }
+    
+    @staticmethod
+    def _attach_change_regions(summary_json: Dict, regions: Optional[Dict[str, List[float]]]) -> None:
+        """Give each change the box of the region it was reported for."""
+        if not regions:
+            return
+        summary_json['summary_mode'] = 'change_regions'
+        summary_json['change_regions'] = regions
+        for change in summary_json.get('changes') or []:
+            if isinstance(change, dict) and change.get('region_id') in regions:
+                change['region'] = regions[change['region_id']]
+    
+    def _parse_summary_response(
+        self,
+        response_text: Optional[str],
+        drawing_name: str,
+        regions: Optional[Dict[str, List[float]]] = None,
+    ) -> Tuple[str, Dict]:
+        """Turn the GPT response text into (summary_text, summary_json)."""
+        # Parse JSON response
+        try:
+            # Handle None or empty response
+            if not response_text:
+                raise json.JSONDecodeError("Empty response", "", 0)
             
-            # Build message content with images
-            message_content = [{"type": "text", "text": user_prompt}]
+            # Clean response - remove any markdown code blocks if present
+            cleaned_response = response_text.strip()
+            if cleaned_response.startswith('```'):
+                # Remove markdown code blocks
+                lines = cleaned_response.split('\n')
+                if lines[0].startswith('```'):
+                    lines = lines[1:]
+                if lines and lines[-1].strip() == '```':
+                    lines = lines[:-1]
+                cleaned_response = '\n'.join(lines)
             
-            if old_base64 and new_base64:
-                # 3-image mode: old, new, overlay
-                message_content.extend([
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{old_base64}"}
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{new_base64}"}
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{overlay_base64}"}
-                    }
-                ])
-            else:
-                # Single overlay image mode
-                message_content.append({
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{overlay_base64}"}
-                })
+            summary_json = json.loads(cleaned_response)
             
-            # Call OpenAI Vision API with higher token limit
-            response = self.openai_client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message_content}
-                ],
-                max_completion_tokens=16000,  # Increased from 4000 to handle larger responses
-                response_format={"type": "json_object"}
-            )
+            # Ensure required fields exist
+            if 'changes' not in summary_json:
+                summary_json['changes'] = []
+            if 'total_changes' not in summary_json:
+                summary_json['total_changes'] = len(summary_json.get('changes', []))
+            self._attach_change_regions(summary_json, regions)
             
-            # Log full response details for debugging
-            choice = response.choices[0]
-            finish_reason = choice.finish_reason
-            response_text = choice.message.content
+            # Generate readable summary text from structured data
+            changes = summary_json.get('changes', [])
+            ai_summary = summary_json.get('ai_summary') or summary_json.get('overall_summary', 'Changes detected.')
             
-            logger.info(f"OpenAI response - model: {response.model}, finish_reason: {finish_reason}, "
-                       f"content_length: {len(response_text) if response_text else 0}")
+            summary_lines = []
             
-            # Check for content filter or other issues
-            if finish_reason != "stop":
-                logger.warning(f"OpenAI finish_reason was '{finish_reason}' (expected 'stop')")
-                if hasattr(choice.message, 'refusal') and choice.message.refusal:
-                    logger.warning(f"OpenAI refusal: {choice.message.refusal}")
+            # AI Summary section
+            summary_lines.append(f'**"{drawing_name}":**')
+            summary_lines.append(f"**AI Summary:** {ai_summary}")
             
-            if response_text:
-                logger.debug(f"OpenAI response (first 500 chars): {response_text[:500]}")
+            # Added Keynotes
+            added_keynotes = summary_json.get('added_keynotes', [])
+            if added_keynotes:
+                summary_lines.append("")
+                summary_lines.append("**Added Keynotes:**")
+                for kn in added_keynotes:
+                    num = kn.get('number', '?')
+                    desc = kn.get('description', '')
+                    summary_lines.append(f"{num}. {desc}")
             
-            # Parse JSON response
-            try:
-                # Handle None or empty response
-                if not response_text:
-                    raise json.JSONDecodeError("Empty response", "", 0)
-                
-                # Clean response - remove any markdown code blocks if present
-                cleaned_response = response_text.strip()
-                if cleaned_response.startswith('```'):
-                    # Remove markdown code blocks
-                    lines = cleaned_response.split('\n')
-                    if lines[0].startswith('```'):
-                        lines = lines[1:]
-                    if lines and lines[-1].strip() == '```':
-                        lines = lines[:-1]
-                    cleaned_response = '\n'.join(lines)
-                
-                summary_json = json.loads(cleaned_response)
-                
-                # Ensure required fields exist
-                if 'changes' not in summary_json:
-                    summary_json['changes'] = []
-                if 'total_changes' not in summary_json:
-                    summary_json['total_changes'] = len(summary_json.get('changes', []))
-                
-                # Generate readable summary text from structured data
-                changes = summary_json.get('changes', [])
-                ai_summary = summary_json.get('ai_summary') or summary_json.get('overall_summary', 'Changes detected.')
-                
-                summary_lines = []
-                
-                # AI Summary section
-                summary_lines.append(f'**"{drawing_name}":**')
-                summary_lines.append(f"**AI Summary:** {ai_summary}")
-                
-                # Added Keynotes
-                added_keynotes = summary_json.get('added_keynotes', [])
-                if added_keynotes:
-                    summary_lines.append("")
-                    summary_lines.append("**Added Keynotes:**")
-                    for kn in added_keynotes:
-                        num = kn.get('number', '?')
-                        desc = kn.get('description', '')
-                        summary_lines.append(f"{num}. {desc}")
-                
-                # Removed Keynotes
-                removed_keynotes = summary_json.get('removed_keynotes', [])
-                if removed_keynotes:
-                    summary_lines.append("")
-                    summary_lines.append("**Removed Keynotes:**")
-                    for kn in removed_keynotes:
-                        num = kn.get('number', '?')
-                        desc = kn.get('description', '')
-                        summary_lines.append(f"{num}. {desc}")
-                
-                # Modified Keynotes
-                modified_keynotes = summary_json.get('modified_keynotes', [])
-                if modified_keynotes:
-                    summary_lines.append("")
-                    summary_lines.append("**Modified Keynotes:**")
-                    for kn in modified_keynotes:
-                        num = kn.get('number', '?')
-                        old_text = kn.get('old_text', '')
-                        new_text = kn.get('new_text', '')
-                        summary_lines.append(f"{num}. Changed from \"{old_text}\" to \"{new_text}\"")
-                
-                # General Notes Changes
-                general_notes = summary_json.get('general_notes_changes', [])
-                if general_notes:
-                    summary_lines.append("")
-                    summary_lines.append("**General Notes:**")
-                    for note in general_notes:
-                        num = note.get('note_number', '?')
-                        change_type = note.get('change_type', 'modified')
-                        desc = note.get('description', '')
-                        summary_lines.append(f"{num}) [{change_type.upper()}] {desc}")
-                
-                # Changes list
-                if changes:
-                    summary_lines.append("")
-                    summary_lines.append(f"**{len(changes)} Changes Detected:**")
-                    for i, change in enumerate(changes, 1):
-                        title = change.get('title', 'Change')
-                        desc = change.get('description', '')
-                        change_type = change.get('change_type', 'modified').capitalize()
-                        summary_lines.append(f"{i}. [{change_type}] {title}: {desc}")
-                
-                # Critical Change
-                if summary_json.get('critical_change'):
-                    crit = summary_json['critical_change']
-                    summary_lines.append("")
-                    summary_lines.append(f"**Critical Change:** {crit.get('title', 'N/A')} - {crit.get('reason', '')}")
-                
-                # Recommendations
-                if summary_json.get('recommendations'):
-                    summary_lines.append("")
-                    summary_lines.append("**Recommendations:**")
-                    for rec in summary_json['recommendations']:
-                        summary_lines.append(f"• {rec}")
-                
-                summary_text = "\n".join(summary_lines)
-                
-                # Add legacy fields for backward compatibility
-                summary_json['changes_found'] = [c.get('title', '') for c in changes]
-                summary_json['analysis_summary'] = summary_text
-                summary_json['change_count'] = len(changes)
-                
-                return summary_text, summary_json
-                
-            except json.JSONDecodeError as e:
-                logger.warning(f"Failed to parse JSON response: {e}")
-                logger.warning(f"Response was: {response_text[:1000] if response_text else 'None'}...")
-                # Fallback to text parsing
-                changes_found, critical_change, recommendations = self._parse_analysis_response(response_text)
-                summary_json = {
-                    "changes_found": changes_found,
-                    "critical_change": critical_change,
-                    "recommendations": recommendations,
-                    "analysis_summary": response_text,
-                    "change_count": len(changes_found),
-                }
-                return response_text, summary_json
+            # Removed Keynotes
+            removed_keynotes = summary_json.get('removed_keynotes', [])
+            if removed_keynotes:
+                summary_lines.append("")
+                summary_lines.append("**Removed Keynotes:**")
+                for kn in removed_keynotes:
+                    num = kn.get('number', '?')
+                    desc = kn.get('description', '')
+                    summary_lines.append(f"{num}. {desc}")
             
-        except Exception as e:
-            logger.error(f"AI summary generation failed: {e}", exc_info=True)
-            # Re-raise to indicate AI analysis failed - caller should retry or handle
-            # Don't fall back to manual count, user wants AI-only summary
-            raise RuntimeError(f"AI summary generation failed: {e}")
+            # Modified Keynotes
+            modified_keynotes = summary_json.get('modified_keynotes', [])
+            if modified_keynotes:
+                summary_lines.append("")
+                summary_lines.append("**Modified Keynotes:**")
+                for kn in modified_keynotes:
+                    num = kn.get('number', '?')
+                    old_text = kn.get('old_text', '')
+                    new_text = kn.get('new_text', '')
+                    summary_lines.append(f"{num}. Changed from \"{old_text}\" to \"{new_text}\"")
+            
+            # General Notes Changes
+            general_notes = summary_json.get('general_notes_changes', [])
+            if general_notes:
+                summary_lines.append("")
+                summary_lines.append("**General Notes:**")
+                for note in general_notes:
+                    num = note.get('note_number', '?')
+                    change_type = note.get('change_type', 'modified')
+                    desc = note.get('description', '')
+                    summary_lines.append(f"{num}) [{change_type.upper()}] {desc}")
+            
+            # Changes list
+            if changes:
+                summary_lines.append("")
+                summary_lines.append(f"**{len(changes)} Changes Detected:**")
+                for i, change in enumerate(changes, 1):
+                    title = change.get('title', 'Change')
+                    desc = change.get('description', '')
+                    change_type = change.get('change_type', 'modified').capitalize()
+                    summary_lines.append(f"{i}. [{change_type}] {title}: {desc}")
+            
+            # Critical Change
+            if summary_json.get('critical_change'):
+                crit = summary_json['critical_change']
+                summary_lines.append("")
+                summary_lines.append(f"**Critical Change:** {crit.get('title', 'N/A')} - {crit.get('reason', '')}")
+            
+            # Recommendations
+            if summary_json.get('recommendations'):
+                summary_lines.append("")
+                summary_lines.append("**Recommendations:**")
+                for rec in summary_json['recommendations']:
+                    summary_lines.append(f"• {rec}")
+            
+            summary_text = "\n".join(summary_lines)
+            
+            # Add legacy fields for backward compatibility
+            summary_json['changes_found'] = [c.get('title', '') for c in changes]
+            summary_json['analysis_summary'] = summary_text
+            summary_json['change_count'] = len(changes)
+            
+            return summary_text, summary_json
+            
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to parse JSON response: {e}")
+            logger.warning(f"Response was: {response_text[:1000] if response_text else 'None'}...")
+            # Fallback to text parsing
+            changes_found, critical_change, recommendations = self._parse_analysis_response(response_text)
+            summary_json = {
+                "changes_found": changes_found,
+                "critical_change": critical_change,
+                "recommendations": recommendations,
+                "analysis_summary": response_text,
+                "change_count": len(changes_found),
+            }
+            return response_text, summary_json
     
     def _parse_analysis_response(self, analysis_text: str) -> Tuple[List[str], str, List[str]]:
         """Parse OpenAI response to extract structured information
@@ -616,7 +873,11 @@ Analyze the image and return ONLY valid JSON."""
         return changes_found, critical_change, recommendations
     
     def _generate_gemini_summary(
-        self, diff_result: DiffResult, diff_payload: Dict, overlay_ref: str
+        self,
+        diff_result: DiffResult,
+        diff_payload: Dict,
+        overlay_ref: str,
+        artifacts: Optional[RunArtifacts] = None,
     ) -> Tuple[str, Dict]:
         """Generate AI summary using Gemini Vision API with 3 images (old, new, overlay)
         
@@ -626,10 +887,8 @@ Analyze the image and return ONLY valid JSON."""
         if not self.gemini_model:
             raise RuntimeError("Gemini client not initialized")
         
+        artifacts = artifacts or RunArtifacts(self.storage, shared=get_artifact_lru())
         try:
-            # Download overlay image
-            overlay_bytes = self.storage.download_file(overlay_ref)
-            
             # Get drawing metadata
             metadata = diff_result.diff_metadata or {}
             drawing_name = metadata.get('drawing_name', 'Unknown')
@@ -639,37 +898,36 @@ Analyze the image and return ONLY valid JSON."""
             old_page_ref = metadata.get('baseline_image_ref')
             new_page_ref = metadata.get('revised_image_ref')
             
-            # Load images with PIL and resize if needed (Gemini has size limits)
-            MAX_DIMENSION = 1600
-            PIL.Image.MAX_IMAGE_PIXELS = 200000000
+            regions = self._change_regions(diff_result)
             
-            def load_and_resize_image(img_bytes: bytes) -> 'PIL.Image.Image':
-                """Load image and resize if too large for Gemini"""
-                img = PIL.Image.open(io.BytesIO(img_bytes))
-                if max(img.size) > MAX_DIMENSION:
-                    ratio = MAX_DIMENSION / max(img.size)
-                    new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-                    img = img.resize(new_size, PIL.Image.Resampling.LANCZOS)
-                    logger.info(f"Resized image to {new_size}")
-                return img
-            
-            overlay_img = load_and_resize_image(overlay_bytes)
+            # Fit images to the Gemini payload budget; decoded once per run
+            overlay_img = None if regions else artifacts.pil(overlay_ref, 'gemini', keep_color=True)
             
             old_img = None
             new_img = None
             
-            if old_page_ref and new_page_ref:
+            if old_page_ref and new_page_ref and not regions:
                 try:
-                    old_bytes = self.storage.download_file(old_page_ref)
-                    new_bytes = self.storage.download_file(new_page_ref)
-                    old_img = load_and_resize_image(old_bytes)
-                    new_img = load_and_resize_image(new_bytes)
+                    old_img = artifacts.pil(old_page_ref, 'gemini')
+                    new_img = artifacts.pil(new_page_ref, 'gemini')
                     logger.info("Using 3-image analysis (old, new, overlay) with Gemini")
                 except Exception as e:
                     logger.warning(f"Could not load old/new images for Gemini, using overlay only: {e}")
             
             # Build prompt using prompts_v2.py
-            if old_img and new_img:
+            if regions:
+                parts = self._region_prompt_parts(diff_result, overlay_ref, regions, 'gemini', artifacts)
+                parts[0] = f"{SYSTEM_PROMPT_V2}\n\n{parts[0]}"
+                response = self.llm.generate_content(
+                    self.gemini_model,
+                    self.gemini_model_name,
+                    [part if isinstance(part, str) else part.as_pil() for part in parts],
+                    generation_config=genai.types.GenerationConfig(
+                        response_mime_type="application/json",
+                        temperature=0.1,
+                    )
+                )
+            elif old_img and new_img:
                 user_prompt = USER_PROMPT_V2_3IMAGE.format(
                     drawing_name=drawing_name,
                     page_number=page_number
@@ -677,7 +935,9 @@ Analyze the image and return ONLY valid JSON."""
                 full_prompt = f"{SYSTEM_PROMPT_V2}\n\n{user_prompt}"
                 
                 # Send all 3 images to Gemini
-                response = self.gemini_model.generate_content(
+                response = self.llm.generate_content(
+                    self.gemini_model,
+                    self.gemini_model_name,
                     [full_prompt, old_img, new_img, overlay_img],
                     generation_config=genai.types.GenerationConfig(
                         response_mime_type="application/json",
@@ -692,7 +952,9 @@ Analyze the image and return ONLY valid JSON."""
                 full_prompt = f"{SYSTEM_PROMPT_V2}\n\n{user_prompt}"
                 
                 # Send overlay only
-                response = self.gemini_model.generate_content(
+                response = self.llm.generate_content(
+                    self.gemini_model,
+                    self.gemini_model_name,
                     [full_prompt, overlay_img],
                     generation_config=genai.types.GenerationConfig(
                         response_mime_type="application/json",
@@ -729,6 +991,7 @@ Analyze the image and return ONLY valid JSON."""
                     summary_json['changes'] = []
                 if 'total_changes' not in summary_json:
                     summary_json['total_changes'] = len(summary_json.get('changes', []))
+                self._attach_change_regions(summary_json, regions)
                 
                 # Generate readable summary text from structured data
                 summary_text = self._format_summary_text(summary_json, drawing_name)
@@ -755,6 +1018,8 @@ Analyze the image and return ONLY valid JSON."""
                 }
                 return response_text or "Analysis completed.", summary_json
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Gemini summary generation failed: {e}", exc_info=True)
             raise RuntimeError(f"Gemini summary generation failed: {e}")
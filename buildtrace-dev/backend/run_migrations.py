@@ -135,6 +135,38 @@ def run_migrations():
             else:
                 logger.info("✓ Column drawing_name already exists in diff_results")
 
+            # Migration 6: Add completed_pages counter to jobs if it doesn't exist
+            logger.info("Checking for completed_pages column in jobs...")
+
+            result = conn.execute(text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_name='jobs'
+                AND column_name='completed_pages'
+            """))
+
+            if not result.fetchone():
+                logger.info("Adding completed_pages column to jobs table...")
+                conn.execute(text("""
+                    ALTER TABLE jobs
+                    ADD COLUMN completed_pages INTEGER DEFAULT 0
+                """))
+                # Jobs still streaming keep counting from the pages they already finished
+                conn.execute(text("""
+                    UPDATE jobs SET completed_pages = (
+                        SELECT COUNT(*) FROM job_stages
+                        WHERE job_stages.job_id = jobs.id
+                        AND job_stages.stage = 'summary'
+                        AND job_stages.page_number IS NOT NULL
+                        AND job_stages.status IN ('completed', 'skipped')
+                    )
+                    WHERE status = 'in_progress'
+                """))
+                conn.commit()
+                logger.info("✓ Successfully added completed_pages column to jobs")
+            else:
+                logger.info("✓ Column completed_pages already exists in jobs")
+
         engine.dispose()
         logger.info("✓ All migrations completed successfully")
 
@@ -0,0 +1,284 @@
+"""
+Batch Service
+Submits the OCR and summary requests of batch-priority jobs as provider batches
+and fans the results back into the pipeline.
+
+Pipelines queue ``BatchRequest`` rows instead of calling the model; this service
+groups queued rows into provider batches, polls them, and on completion:
+
+- OCR: rewrites the page's OCR payload, completes the page's OCR stage once both
+  pages are in, and chains to diff exactly like a synchronous OCR worker
+- Summary: stores the GPT ``ChangeSummary``, retires the placeholder and records
+  summary-stage progress like the summary worker
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+
+from gcp.database import get_db_session
+from gcp.database.models import BatchRequest, JobStage
+from config import config
+from services.stage_graph import BATCH_PENDING
+from utils.batch_provider import TERMINAL_STATUSES, get_batch_provider
+
+logger = logging.getLogger(__name__)
+
+
+class BatchService:
+    """Submit queued batch requests, poll provider batches and apply their results."""
+
+    def __init__(
+        self,
+        provider=None,
+        session_factory=None,
+        ocr_pipeline=None,
+        summary_pipeline=None,
+        orchestrator=None,
+    ) -> None:
+        self.provider = provider or get_batch_provider()
+        self.session_factory = session_factory or get_db_session
+        # Pipelines and orchestrator are built on first use (they set up LLM clients)
+        self._ocr_pipeline = ocr_pipeline
+        self._summary_pipeline = summary_pipeline
+        self._orchestrator = orchestrator
+
+    @property
+    def ocr_pipeline(self):
+        if self._ocr_pipeline is None:
+            from processing import OCRPipeline
+            self._ocr_pipeline = OCRPipeline()
+        return self._ocr_pipeline
+
+    @property
+    def summary_pipeline(self):
+        if self._summary_pipeline is None:
+            from processing import SummaryPipeline
+            self._summary_pipeline = SummaryPipeline()
+        return self._summary_pipeline
+
+    @property
+    def orchestrator(self):
+        if self._orchestrator is None:
+            from services.orchestrator import OrchestratorService
+            self._orchestrator = OrchestratorService()
+        return self._orchestrator
+
+    # =========================================================================
+    # Submission
+    # =========================================================================
+
+    def submit_queued(self) -> List[str]:
+        """Submit every queued request, BATCH_MAX_REQUESTS per provider batch."""
+        self._requeue_stale_submissions()
+        batch_ids = []
+        while True:
+            with self.session_factory() as db:
+                candidates = [
+                    row[0]
+                    for row in db.query(BatchRequest.id)
+                    .filter_by(status='queued')
+                    .order_by(BatchRequest.created_at)
+                    .limit(config.BATCH_MAX_REQUESTS)
+                    .all()
+                ]
+                if not candidates:
+                    return batch_ids
+                # Claim the rows first so a concurrent submitter never sends them again
+                claimed = db.execute(
+                    update(BatchRequest)
+                    .where(BatchRequest.id.in_(candidates), BatchRequest.status == 'queued')
+                    .values(status='submitting', submitted_at=datetime.utcnow())
+                    .returning(BatchRequest.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                db.commit()
+                if not claimed:
+                    continue
+                queued = (
+                    db.query(BatchRequest)
+                    .filter(BatchRequest.id.in_(claimed))
+                    .order_by(BatchRequest.created_at)
+                    .all()
+                )
+                try:
+                    batch_id = self.provider.submit(
+                        [{"custom_id": request.id, "body": request.request_body} for request in queued]
+                    )
+                except Exception as e:
+                    # Back to queued; the next cycle retries the submission
+                    logger.error(f"Batch submission failed for {len(queued)} requests: {e}", exc_info=True)
+                    db.rollback()
+                    self._requeue(db, claimed)
+                    db.commit()
+                    return batch_ids
+                now = datetime.utcnow()
+                for request in queued:
+                    request.status = 'submitted'
+                    request.provider = self.provider.name
+                    request.provider_batch_id = batch_id
+                    request.submitted_at = now
+                db.commit()
+            logger.info(f"Submitted batch {batch_id} with {len(queued)} requests")
+            batch_ids.append(batch_id)
+
+    def _requeue_stale_submissions(self) -> None:
+        """Queue again the requests a submitter claimed but never recorded (it died mid-submit)."""
+        cutoff = datetime.utcnow() - timedelta(seconds=config.BATCH_SUBMIT_TIMEOUT_SECONDS)
+        with self.session_factory() as db:
+            stale = [
+                row[0]
+                for row in db.query(BatchRequest.id).filter(
+                    BatchRequest.status == 'submitting',
+                    BatchRequest.submitted_at < cutoff,
+                )
+            ]
+            if stale:
+                logger.warning(f"Re-queueing {len(stale)} batch requests left in submission")
+                self._requeue(db, stale)
+            db.commit()
+
+    @staticmethod
+    def _requeue(db, request_ids: List[str]) -> None:
+        db.execute(
+            update(BatchRequest)
+            .where(BatchRequest.id.in_(request_ids), BatchRequest.status == 'submitting')
+            .values(status='queued', submitted_at=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    # =========================================================================
+    # Polling and fan-out
+    # =========================================================================
+
+    def poll(self) -> int:
+        """Apply the results of every finished batch; returns the number of requests applied."""
+        with self.session_factory() as db:
+            batch_ids = [
+                row[0]
+                for row in db.query(BatchRequest.provider_batch_id)
+                .filter_by(status='submitted')
+                .distinct()
+                .all()
+            ]
+
+        applied = 0
+        for batch_id in batch_ids:
+            try:
+                status = self.provider.status(batch_id)
+                if status not in TERMINAL_STATUSES:
+                    continue
+                results = self.provider.results(batch_id) if status == 'completed' else {}
+            except Exception as e:
+                logger.warning(f"Could not poll batch {batch_id}: {e}")
+                continue
+
+            with self.session_factory() as db:
+                requests = [
+                    {"id": r.id, "job_id": r.job_id, "kind": r.kind, "target": r.target or {}}
+                    for r in db.query(BatchRequest).filter_by(provider_batch_id=batch_id, status='submitted').all()
+                ]
+            ocr_jobs = set()
+            for request in requests:
+                result = results.get(request["id"]) or {"error": f"Batch {batch_id} ended '{status}' without a result"}
+                self._apply(request, result)
+                if request["kind"] == 'ocr':
+                    ocr_jobs.add(request["job_id"])
+                applied += 1
+            for job_id in ocr_jobs:
+                self._advance_ocr_stages(job_id)
+        return applied
+
+    def _apply(self, request: Dict, result: Dict) -> None:
+        error = result.get("error")
+        content = result.get("content")
+        summary_id = None
+        try:
+            if request["kind"] == 'ocr':
+                self.ocr_pipeline.apply_batch_result(request["target"], content, error=error)
+            else:
+                summary_id = self.summary_pipeline.apply_batch_result(request["target"], content, error=error)
+        except Exception as e:
+            logger.error(f"Applying batch result {request['id']} failed: {e}", exc_info=True)
+            error = error or str(e)
+
+        with self.session_factory() as db:
+            batch_request = db.query(BatchRequest).filter_by(id=request["id"]).first()
+            batch_request.status = 'failed' if error else 'completed'
+            batch_request.error_message = error
+            batch_request.completed_at = datetime.utcnow()
+            db.commit()
+
+        if summary_id:
+            target = request["target"]
+            if target.get('streaming') and target.get('page_number'):
+                self.orchestrator.on_page_summary_complete(request["job_id"], target['page_number'], summary_id)
+                return
+            from workers.summary_worker import record_summary_completion
+            if record_summary_completion(self.session_factory, request["job_id"], summary_id):
+                self.orchestrator.on_summary_complete(request["job_id"])
+
+    def _advance_ocr_stages(self, job_id: str) -> None:
+        """Complete the job's deferred OCR stages whose pages have all come back, then chain to diff."""
+        with self.session_factory() as db:
+            outstanding = set()
+            drawing_names = {}
+            for status, target in db.query(BatchRequest.status, BatchRequest.target).filter(
+                BatchRequest.job_id == job_id,
+                BatchRequest.kind == 'ocr',
+            ):
+                target = target or {}
+                if status in ('queued', 'submitting', 'submitted'):
+                    outstanding.add(target.get('page_identifier'))
+                if target.get('drawing_name'):
+                    drawing_names[target.get('page_identifier')] = target['drawing_name']
+            ready = []
+            for stage in db.query(JobStage).filter_by(job_id=job_id, stage='ocr', status=BATCH_PENDING).all():
+                stage_meta = stage.stage_metadata or {}
+                page = stage.page_number
+                if {f"old_page_{page}", f"new_page_{page}"} & outstanding:
+                    continue
+                # Guarded so concurrent pollers chain each page to diff once
+                claimed = db.execute(
+                    update(JobStage)
+                    .where(JobStage.id == stage.id, JobStage.status == BATCH_PENDING)
+                    .values(status='in_progress')
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if not claimed:
+                    continue
+                drawing_name = (
+                    drawing_names.get(f"new_page_{page}")
+                    or drawing_names.get(f"old_page_{page}")
+                    or stage_meta.get('drawing_name')
+                )
+                ready.append((page, stage_meta, drawing_name))
+            db.commit()
+
+        for page_number, stage_meta, drawing_name in ready:
+            self.orchestrator.on_page_ocr_complete(
+                job_id=job_id,
+                page_number=page_number,
+                old_ocr_ref=stage_meta.get('old_ocr_ref', ''),
+                new_ocr_ref=stage_meta.get('new_ocr_ref', ''),
+                drawing_name=drawing_name or f"Page_{page_number:03d}",
+            )
+
+    def run_forever(self, interval: Optional[float] = None) -> None:
+        """Submit, poll and pump the stage scheduler until interrupted (batch worker loop)."""
+        interval = interval if interval is not None else config.BATCH_POLL_SECONDS
+        while True:
+            try:
+                self.submit_queued()
+                self.poll()
+                # Slots freed without a completion event (deferred or stale pages) are refilled here
+                self.orchestrator.pump_scheduled()
+            except Exception as e:
+                logger.error(f"Batch cycle failed: {e}", exc_info=True)
+            time.sleep(interval)
+
+
+__all__ = ['BatchService']
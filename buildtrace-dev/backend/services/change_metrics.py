@@ -0,0 +1,193 @@
+"""
+Change Metrics
+Structured change counts for summaries, computed once when a summary is written.
+
+The results, cost-impact and schedule-impact endpoints report added/modified/
+removed counts, per-category counts and keynote deltas for a job. Each
+``ChangeSummary`` carries these as ``ChangeSummaryMetric`` rows, so the
+endpoints aggregate them with SQL instead of re-scanning summary text on
+every poll.
+
+Structured summaries (a ``changes`` list in ``summary_json``) are counted per
+change: by ``change_type``, and once per category whose keywords the change
+mentions. Text-only summaries (placeholders, unparseable model output) keep
+the original line/keyword scan of the summary text.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+
+from gcp.database.models import ChangeSummary, ChangeSummaryMetric, DiffResult
+
+logger = logging.getLogger(__name__)
+
+CHANGE_TYPES = ('added', 'modified', 'removed')
+
+CATEGORY_KEYWORDS = {
+    'MEP': ['mep', 'mechanical', 'plumbing', 'hvac', 'duct', 'pipe', 'ventilation'],
+    'Drywall': ['drywall', 'gypsum', 'sheetrock', 'partition', 'wall board'],
+    'Electrical': ['electrical', 'wiring', 'conduit', 'outlet', 'switch', 'panel', 'circuit'],
+    'Architectural': ['architectural', 'floor plan', 'elevation', 'section', 'detail', 'room'],
+    'Structural': ['structural', 'beam', 'column', 'foundation', 'steel', 'concrete structure'],
+    'Concrete': ['concrete', 'slab', 'pour', 'cement', 'rebar'],
+    'Site Work': ['site', 'excavation', 'grading', 'landscaping', 'paving', 'utilities'],
+}
+
+KEYNOTE_FIELDS = {
+    'keynotes_added': 'added_keynotes',
+    'keynotes_removed': 'removed_keynotes',
+    'keynotes_modified': 'modified_keynotes',
+    'general_notes_changed': 'general_notes_changes',
+}
+
+CATEGORY_PREFIX = 'category:'
+
+
+def empty_categories() -> Dict[str, int]:
+    return {category: 0 for category in CATEGORY_KEYWORDS}
+
+
+def _text_change_types(summary_text: str) -> Dict[str, int]:
+    lines = [line.lower() for line in summary_text.split('\n')]
+    counts = {
+        'added': sum(1 for line in lines if 'added' in line or 'addition' in line),
+        'removed': sum(1 for line in lines if 'removed' in line or 'removal' in line),
+        'modified': sum(1 for line in lines if 'modified' in line or 'modification' in line),
+    }
+    if not any(counts.values()):
+        # No explicit wording: count the summary as one modification
+        counts['modified'] = 1
+    return counts
+
+
+def _keyword_categories(texts: Iterable[str], per_text: bool) -> Dict[str, int]:
+    categories = empty_categories()
+    for text in texts:
+        lower_text = text.lower()
+        for category, keywords in CATEGORY_KEYWORDS.items():
+            matches = sum(1 for keyword in keywords if keyword in lower_text)
+            categories[category] += min(matches, 1) if per_text else matches
+    return categories
+
+
+def compute_change_metrics(summary_text: Optional[str], summary_json: Optional[Dict]) -> Dict[str, int]:
+    """Metric name -> count for one summary (every metric present, zeros included)."""
+    summary_json = summary_json if isinstance(summary_json, dict) else {}
+    changes = summary_json.get('changes')
+
+    if isinstance(changes, list):
+        changes = [change for change in changes if isinstance(change, dict)]
+        metrics = {change_type: 0 for change_type in CHANGE_TYPES}
+        for change in changes:
+            change_type = str(change.get('change_type') or 'modified').lower()
+            if change_type in metrics:
+                metrics[change_type] += 1
+        categories = _keyword_categories(
+            (
+                " ".join(str(change.get(field) or '') for field in ('title', 'description', 'location', 'trade_affected'))
+                for change in changes
+            ),
+            per_text=True,
+        )
+    elif summary_text:
+        metrics = _text_change_types(summary_text)
+        categories = _keyword_categories([summary_text], per_text=False)
+    else:
+        metrics = {change_type: 0 for change_type in CHANGE_TYPES}
+        categories = empty_categories()
+
+    for metric, field in KEYNOTE_FIELDS.items():
+        entries = summary_json.get(field)
+        metrics[metric] = len(entries) if isinstance(entries, list) else 0
+    metrics.update({f"{CATEGORY_PREFIX}{category}": count for category, count in categories.items()})
+    return metrics
+
+
+def attach_change_metrics(summary: ChangeSummary) -> None:
+    """(Re)compute ``summary``'s metric rows from its text and JSON; saved with the summary.
+
+    Existing rows are updated in place: replacing the collection would insert
+    the new rows before the old ones are deleted and break the unique metric.
+    """
+    existing = {row.metric: row for row in summary.metrics}
+    for metric, value in compute_change_metrics(summary.summary_text, summary.summary_json).items():
+        row = existing.pop(metric, None)
+        if row is None:
+            summary.metrics.append(ChangeSummaryMetric(metric=metric, value=value))
+        else:
+            row.value = value
+    for row in existing.values():
+        summary.metrics.remove(row)
+
+
+def backfill_change_metrics(db, job_id: str) -> int:
+    """Compute metrics for the job's active summaries written before metrics existed."""
+    has_metrics = (
+        db.query(ChangeSummaryMetric.id)
+        .filter(ChangeSummaryMetric.summary_id == ChangeSummary.id)
+        .exists()
+    )
+    missing = (
+        db.query(ChangeSummary)
+        .join(DiffResult, DiffResult.id == ChangeSummary.diff_result_id)
+        .filter(DiffResult.job_id == job_id, ChangeSummary.is_active == True, ~has_metrics)
+        .all()
+    )
+    for summary in missing:
+        attach_change_metrics(summary)
+    if missing:
+        db.commit()
+        logger.info(f"Backfilled change metrics for {len(missing)} summaries of job {job_id}")
+    return len(missing)
+
+
+def _active_metrics_query(db, job_id: str, *group_by):
+    return (
+        db.query(*group_by, ChangeSummaryMetric.metric, func.sum(ChangeSummaryMetric.value))
+        .join(ChangeSummary, ChangeSummary.id == ChangeSummaryMetric.summary_id)
+        .join(DiffResult, DiffResult.id == ChangeSummary.diff_result_id)
+        .filter(DiffResult.job_id == job_id, ChangeSummary.is_active == True)
+        .group_by(*group_by, ChangeSummaryMetric.metric)
+    )
+
+
+def split_metrics(metrics: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    """Shape flat metrics as the API reports them: kpis, categories and keynotes."""
+    categories = empty_categories()
+    for metric, value in metrics.items():
+        if metric.startswith(CATEGORY_PREFIX):
+            categories[metric[len(CATEGORY_PREFIX):]] = int(value)
+    return {
+        'kpis': {change_type: int(metrics.get(change_type, 0)) for change_type in CHANGE_TYPES},
+        'categories': categories,
+        'keynotes': {metric: int(metrics.get(metric, 0)) for metric in KEYNOTE_FIELDS},
+    }
+
+
+def job_change_metrics(db, job_id: str) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """Per-diff metrics of the job's active summaries: diff_result_id -> split_metrics()."""
+    backfill_change_metrics(db, job_id)
+    per_diff: Dict[str, Dict[str, int]] = {}
+    for diff_result_id, metric, value in _active_metrics_query(db, job_id, ChangeSummary.diff_result_id):
+        per_diff.setdefault(diff_result_id, {})[metric] = value or 0
+    return {diff_result_id: split_metrics(metrics) for diff_result_id, metrics in per_diff.items()}
+
+
+def job_change_totals(db, job_id: str) -> Dict[str, Dict[str, int]]:
+    """Job-wide totals across active summaries, shaped by split_metrics()."""
+    backfill_change_metrics(db, job_id)
+    return split_metrics({metric: value or 0 for metric, value in _active_metrics_query(db, job_id)})
+
+
+__all__ = [
+    'CATEGORY_KEYWORDS',
+    'attach_change_metrics',
+    'backfill_change_metrics',
+    'compute_change_metrics',
+    'empty_categories',
+    'job_change_metrics',
+    'job_change_totals',
+    'split_metrics',
+]
@@ -15,6 +15,7 @@ from dataclasses import dataclass
 from datetime import datetime
 
 from config import config
+from utils.llm_gateway import get_llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -65,7 +66,8 @@ class ConstructionChatBot:
         if not self.api_key:
             raise ValueError("OpenAI API key not provided")
         
-        self.client = OpenAI(api_key=self.api_key)
+        self.llm = get_llm_gateway()
+        self.client = self.llm.openai_client(self.api_key)
         # Use GPT-4o which has built-in web search capabilities
         self.model = os.getenv('OPENAI_MODEL') or getattr(config, 'OPENAI_MODEL', 'gpt-4o')
 
@@ -425,7 +427,8 @@ This is a multi-turn conversation - remember previous messages and build upon th
 
             # Generate response with GPT-4o (has built-in web search)
             # GPT will automatically use web search when it detects the need for current information
-            response = self.client.chat.completions.create(
+            response = self.llm.chat_completion(
+                self.client,
                 model=self.model,
                 messages=messages,
                 max_completion_tokens=2000  # Use max_completion_tokens for newer models
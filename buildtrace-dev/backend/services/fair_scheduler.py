@@ -0,0 +1,294 @@
+"""
+Fair scheduling of streaming page tasks across jobs and organizations.
+
+Without it every ready page goes straight to its stage's queue, so a
+2-page comparison waits behind whatever 500-page set was published first.
+With a stage limit configured (SCHEDULER_MAX_IN_FLIGHT_<STAGE>), the stage
+graph inserts ready pages as ``queued`` JobStage rows and calls ``pump``
+whenever a slot may have freed (and the batch worker pumps periodically, for
+slots freed without an event). Pages waiting for a provider batch
+(``batch_pending``) hold no slot. ``pump`` fills the free slots by weighted
+fair share:
+
+- a *flow* is one tenant (the project's organization, or the project
+  itself) in one priority class; its weight is the tenant weight
+  (SCHEDULER_TENANT_WEIGHTS) times the class weight
+  (SCHEDULER_PRIORITY_WEIGHTS, interactive well above batch)
+- the next page goes to the flow with the least in-flight work per unit of
+  weight, and within it to the job with the fewest pages in flight (oldest
+  job first on ties), so a small job gets the next free slot no matter how
+  deep the backlog is
+
+The queues are the job_stages table itself: nothing is held in memory, any
+API or worker process can pump, and claims are guarded UPDATEs so a page is
+dispatched once. Concurrent pumps may briefly overshoot a limit by a few
+pages, never double-dispatch one.
+"""
+
+import json
+import logging
+import math
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+
+from config import config
+from gcp.database.models import Job, JobStage, Project
+from services.stage_graph import IN_FLIGHT, QUEUED
+
+logger = logging.getLogger(__name__)
+
+ESTIMATE_WINDOW = 200  # queued pages per job considered for position estimates
+DURATION_SAMPLE = 100  # recent completions averaged for ETA estimates
+
+
+@dataclass(frozen=True)
+class QueuedPage:
+    """A page's stage row waiting for a slot."""
+    id: str
+    job_id: str
+    page_number: int
+
+
+@dataclass(frozen=True)
+class JobShare:
+    """What the scheduler needs to know about a job."""
+    tenant: str
+    priority: str
+    created_at: datetime
+
+    @property
+    def flow(self) -> Tuple[str, str]:
+        return (self.tenant, self.priority)
+
+
+def _parse_weights(raw: str, name: str) -> Dict[str, float]:
+    if not raw:
+        return {}
+    try:
+        return {key: float(value) for key, value in json.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.warning(f"Ignoring invalid {name}: {e}")
+        return {}
+
+
+class FairScheduler:
+    """Weighted fair dispatch of queued page stages (see module docstring)."""
+
+    def __init__(self, limits: Dict[str, int], priority_weights: Optional[Dict[str, float]] = None,
+                 tenant_weights: Optional[Dict[str, float]] = None, stale_seconds: int = 3600):
+        self.limits = {stage: limit for stage, limit in limits.items() if limit > 0}
+        self.priority_weights = priority_weights or {'interactive': 8.0, 'batch': 1.0}
+        self.tenant_weights = tenant_weights or {}
+        self.stale_seconds = stale_seconds
+
+    @classmethod
+    def from_config(cls) -> 'FairScheduler':
+        return cls(
+            limits={
+                'ocr': config.SCHEDULER_MAX_IN_FLIGHT_OCR,
+                'diff': config.SCHEDULER_MAX_IN_FLIGHT_DIFF,
+                'summary': config.SCHEDULER_MAX_IN_FLIGHT_SUMMARY,
+            },
+            priority_weights=_parse_weights(config.SCHEDULER_PRIORITY_WEIGHTS, 'SCHEDULER_PRIORITY_WEIGHTS'),
+            tenant_weights=_parse_weights(config.SCHEDULER_TENANT_WEIGHTS, 'SCHEDULER_TENANT_WEIGHTS'),
+            stale_seconds=config.SCHEDULER_STALE_SECONDS,
+        )
+
+    def limit(self, stage: str) -> int:
+        """Max pages of ``stage`` in flight across all jobs (0 = not scheduled)."""
+        return self.limits.get(stage, 0)
+
+    def weight(self, flow: Tuple[str, str]) -> float:
+        tenant, priority = flow
+        weight = self.tenant_weights.get(tenant, 1.0) * self.priority_weights.get(priority, 1.0)
+        return max(weight, 1e-6)
+
+    def pump(self, db, stage: str, status: str, per_job_limit: int = 0) -> List[QueuedPage]:
+        """Claim queued pages of ``stage`` for the free slots; returns the pages to dispatch.
+
+        Claimed rows move to ``status`` in the caller's transaction (caller commits).
+        """
+        limit = self.limit(stage)
+        if not limit:
+            return []
+        active = self._active(db, stage)
+        free = limit - sum(active.values())
+        if free <= 0:
+            return []
+        queued = self._queued(db, stage, per_job=free)
+        if not queued:
+            return []
+        jobs = self._jobs(db, set(active) | {page.job_id for page in queued})
+        picks = self.order(queued, active, jobs, free, per_job_limit)
+        if not picks:
+            return []
+        claimed = set(db.execute(
+            update(JobStage)
+            .where(JobStage.id.in_([page.id for page in picks]), JobStage.status == QUEUED)
+            .values(status=status, started_at=datetime.utcnow())
+            .returning(JobStage.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        return [page for page in picks if page.id in claimed]
+
+    def order(self, queued: Iterable[QueuedPage], active: Dict[str, int], jobs: Dict[str, JobShare],
+              limit: int, per_job_limit: int = 0) -> List[QueuedPage]:
+        """The next ``limit`` pages in fair-share order, given the pages in flight per job.
+
+        ``queued`` is in page order within each job.
+        """
+        queues: Dict[str, deque] = defaultdict(deque)
+        for page in queued:
+            if page.job_id in jobs:
+                queues[page.job_id].append(page)
+        job_load: Dict[str, int] = defaultdict(int, active)
+        flow_load: Dict[Tuple[str, str], int] = defaultdict(int)
+        for job_id, count in active.items():
+            if job_id in jobs:
+                flow_load[jobs[job_id].flow] += count
+
+        picks: List[QueuedPage] = []
+        while len(picks) < limit:
+            flows: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+            for job_id, pages in queues.items():
+                if pages and not (per_job_limit and job_load[job_id] >= per_job_limit):
+                    flows[jobs[job_id].flow].append(job_id)
+            if not flows:
+                break
+            flow = min(flows, key=lambda f: (
+                flow_load[f] / self.weight(f), min(jobs[j].created_at for j in flows[f]), f,
+            ))
+            job_id = min(flows[flow], key=lambda j: (job_load[j], jobs[j].created_at, j))
+            picks.append(queues[job_id].popleft())
+            job_load[job_id] += 1
+            flow_load[flow] += 1
+        return picks
+
+    def estimate(self, db, job_id: str) -> Dict[str, Dict[str, Any]]:
+        """Queue position and ETA of the job's next waiting page, per scheduled stage.
+
+        ``position`` counts the pages of other jobs dispatched before it if
+        nothing else arrives; ``eta_seconds`` turns that into time using the
+        stage's recent average duration (None until there is history).
+        """
+        estimates: Dict[str, Dict[str, Any]] = {}
+        for stage, limit in self.limits.items():
+            active = self._active(db, stage)
+            queued = self._queued(db, stage, per_job=ESTIMATE_WINDOW)
+            mine = [page for page in queued if page.job_id == job_id]
+            position = None
+            if mine:
+                jobs = self._jobs(db, set(active) | {page.job_id for page in queued})
+                order = self.order(queued, active, jobs, limit=len(queued))
+                position = next((i for i, page in enumerate(order) if page.job_id == job_id), None)
+            eta_seconds = None
+            duration = self._average_duration(db, stage)
+            if position is not None and duration is not None:
+                # Slots free as in-flight pages finish; each round of ``limit`` takes ~one duration
+                eta_seconds = round(math.ceil((position + 1) / limit) * duration, 1)
+            estimates[stage] = {
+                'limit': limit,
+                'in_flight': sum(active.values()),
+                'queued': self._queued_count(db, stage),
+                'job_in_flight': active.get(job_id, 0),
+                'job_queued': self._queued_count(db, stage, job_id),
+                'position': position,
+                'eta_seconds': eta_seconds,
+            }
+        return estimates
+
+    # -------------------------------------------------------------------------
+
+    def _active(self, db, stage: str) -> Dict[str, int]:
+        """Pages of ``stage`` in flight per running job (stale ones no longer count)."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        return dict(db.execute(
+            select(JobStage.job_id, func.count(JobStage.id))
+            .join(Job, Job.id == JobStage.job_id)
+            .where(
+                JobStage.stage == stage,
+                JobStage.page_number.isnot(None),
+                JobStage.status.in_(IN_FLIGHT),
+                Job.status == 'in_progress',
+                func.coalesce(JobStage.started_at, JobStage.created_at) >= cutoff,
+            )
+            .group_by(JobStage.job_id)
+        ).all())
+
+    @staticmethod
+    def _queued(db, stage: str, per_job: int) -> List[QueuedPage]:
+        """The first ``per_job`` queued pages of every running job - no job can need more."""
+        rank = func.row_number().over(
+            partition_by=JobStage.job_id, order_by=JobStage.page_number
+        ).label('rank')
+        waiting = (
+            select(JobStage.id, JobStage.job_id, JobStage.page_number, rank)
+            .join(Job, Job.id == JobStage.job_id)
+            .where(
+                JobStage.stage == stage,
+                JobStage.status == QUEUED,
+                JobStage.page_number.isnot(None),
+                Job.status == 'in_progress',
+            )
+            .subquery()
+        )
+        rows = db.execute(
+            select(waiting.c.id, waiting.c.job_id, waiting.c.page_number)
+            .where(waiting.c.rank <= per_job)
+            .order_by(waiting.c.job_id, waiting.c.page_number)
+        ).all()
+        return [QueuedPage(row_id, job_id, page) for row_id, job_id, page in rows]
+
+    @staticmethod
+    def _queued_count(db, stage: str, job_id: Optional[str] = None) -> int:
+        query = (
+            select(func.count(JobStage.id))
+            .join(Job, Job.id == JobStage.job_id)
+            .where(JobStage.stage == stage, JobStage.status == QUEUED, Job.status == 'in_progress')
+        )
+        if job_id:
+            query = query.where(JobStage.job_id == job_id)
+        return db.execute(query).scalar() or 0
+
+    @staticmethod
+    def _jobs(db, job_ids: Iterable[str]) -> Dict[str, JobShare]:
+        job_ids = list(job_ids)
+        if not job_ids:
+            return {}
+        rows = db.execute(
+            select(Job.id, Job.project_id, Job.job_metadata, Job.created_at, Project.organization_id)
+            .outerjoin(Project, Project.id == Job.project_id)
+            .where(Job.id.in_(job_ids))
+        ).all()
+        return {
+            job_id: JobShare(
+                tenant=organization_id or f"project:{project_id}",
+                priority=(metadata or {}).get('priority', 'interactive'),
+                created_at=created_at or datetime.min,
+            )
+            for job_id, project_id, metadata, created_at, organization_id in rows
+        }
+
+    @staticmethod
+    def _average_duration(db, stage: str) -> Optional[float]:
+        rows = db.execute(
+            select(JobStage.started_at, JobStage.completed_at)
+            .where(
+                JobStage.stage == stage,
+                JobStage.status == 'completed',
+                JobStage.page_number.isnot(None),
+                JobStage.started_at.isnot(None),
+                JobStage.completed_at.isnot(None),
+            )
+            .order_by(JobStage.completed_at.desc())
+            .limit(DURATION_SAMPLE)
+        ).all()
+        durations = [(completed - started).total_seconds() for started, completed in rows if completed >= started]
+        return sum(durations) / len(durations) if durations else None
+
+
+__all__ = ['FairScheduler', 'JobShare', 'QueuedPage']
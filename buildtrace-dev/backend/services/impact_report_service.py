@@ -9,6 +9,8 @@ import logging
 from typing import Dict, Any, Optional
 import os
 
+from utils.llm_gateway import get_llm_gateway
+
 logger = logging.getLogger(__name__)
 
 # Try to import OpenAI
@@ -24,10 +26,11 @@ class ImpactReportService:
     """Generate AI-powered cost and schedule impact reports from detected changes."""
     
     def __init__(self):
+        self.llm = get_llm_gateway()
         if OPENAI_AVAILABLE:
             api_key = os.getenv('OPENAI_API_KEY')
             if api_key:
-                self.client = OpenAI(api_key=api_key)
+                self.client = self.llm.openai_client(api_key)
                 self.model = os.getenv('OPENAI_MODEL', 'gpt-4o')
             else:
                 self.client = None
@@ -118,7 +121,8 @@ Guidelines:
 Respond ONLY with valid JSON matching the format above."""
 
         try:
-            response = self.client.chat.completions.create(
+            response = self.llm.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -231,7 +235,8 @@ Guidelines:
 Respond ONLY with valid JSON matching the format above."""
 
         try:
-            response = self.client.chat.completions.create(
+            response = self.llm.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
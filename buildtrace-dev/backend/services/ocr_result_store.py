@@ -0,0 +1,106 @@
+"""
+OCR Result Store
+Content-addressed cache of per-page OCR extractions.
+
+Results are keyed by (page raster hash, model, prompt version), so the same
+sheet OCR'd as the baseline of many comparisons, or carried unchanged into a
+new revision, is only sent to the vision model once. Entries live in storage
+(GCS or local) and are shared by every worker.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, Optional, Sequence
+
+from gcp.storage import StorageService
+
+logger = logging.getLogger(__name__)
+
+
+class OCRResultStore:
+    """Storage-backed OCR result cache with hit/miss accounting."""
+
+    PREFIX = "ocr_cache"
+
+    def __init__(self, storage_service: Optional[StorageService] = None):
+        self.storage = storage_service or StorageService()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_hash(page_bytes: bytes) -> str:
+        return hashlib.sha256(page_bytes).hexdigest()
+
+    def _path(self, page_hash: str, model: str, prompt_version: str) -> str:
+        safe_model = model.replace("/", "_").replace(":", "_")
+        return f"{self.PREFIX}/{safe_model}/{prompt_version}/{page_hash}.json"
+
+    def get(
+        self,
+        page_bytes: bytes,
+        model: str,
+        prompt_version: str,
+        fallback_models: Sequence[str] = (),
+    ) -> Optional[Dict]:
+        """
+        Return the stored extraction for this page raster, or None on a miss.
+
+        ``fallback_models`` are tried in order when ``model`` has no entry; the
+        whole call counts as one lookup.
+        """
+        page_hash = self.content_hash(page_bytes)
+        for candidate in (model, *fallback_models):
+            path = self._path(page_hash, candidate, prompt_version)
+            try:
+                entry = json.loads(self.storage.download_file(path).decode("utf-8"))
+            except Exception:
+                continue
+            self._record(hit=True)
+            logger.debug(f"OCR cache hit: {path}")
+            return entry.get("extracted_info")
+        self._record(hit=False)
+        return None
+
+    def put(self, page_bytes: bytes, model: str, prompt_version: str, extracted_info: Dict) -> Optional[str]:
+        """Store an extraction; failures are logged and never break the caller."""
+        page_hash = self.content_hash(page_bytes)
+        path = self._path(page_hash, model, prompt_version)
+        entry = {
+            "page_hash": page_hash,
+            "model": model,
+            "prompt_version": prompt_version,
+            "extracted_info": extracted_info,
+        }
+        try:
+            return self.storage.upload_file(
+                json.dumps(entry).encode("utf-8"),
+                path,
+                content_type="application/json",
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store OCR cache entry {path}: {e}")
+            return None
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "lookups": lookups,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+__all__ = ["OCRResultStore"]
@@ -7,37 +7,63 @@ import uuid
 import logging
 import threading
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Callable, Dict, List, Optional, Tuple
 
 from sqlalchemy.orm.attributes import flag_modified
 
 from gcp.database import get_db_session
-from gcp.database.models import Job, JobStage, DrawingVersion, DiffResult
-from gcp.pubsub import PubSubPublisher
+from gcp.database.models import ChangeSummary, Job, JobStage, DrawingVersion, DiffResult
+from gcp.pubsub import LocalQueuePublisher, PubSubPublisher
+from services.fair_scheduler import FairScheduler
+from services.stage_graph import Dispatch, ResumeReport, StageGraphEngine, mark_page_stage, page_pipeline
+from utils.cancellation import CancellationRegistry
 from config import config
 
 logger = logging.getLogger(__name__)
 
 
 def _run_in_background(func, *args, **kwargs):
-    """Run a function in a background thread"""
+    """Run a function in a background thread (QUEUE_BACKEND=thread)"""
     thread = threading.Thread(target=func, args=args, kwargs=kwargs, daemon=True)
     thread.start()
     return thread
 
 
+def _job_priority(job: Job) -> str:
+    """'interactive' (default) or 'batch' - set when the job is created."""
+    return (job.job_metadata or {}).get('priority', 'interactive')
+
+
 class OrchestratorService:
     """Orchestrates job creation and stage progression with streaming support."""
     
-    def __init__(self):
-        self.pubsub = PubSubPublisher() if config.USE_PUBSUB else None
+    def __init__(self, publisher=None):
+        # ``publisher`` overrides the configured queue (e.g. gcp.pubsub.InMemoryPublisher in tests)
+        if publisher is not None:
+            self.pubsub = publisher
+        elif config.USE_PUBSUB:
+            self.pubsub = PubSubPublisher()
+        elif config.QUEUE_BACKEND == 'local':
+            # Durable local queues, drained by workers.local_pool
+            self.pubsub = LocalQueuePublisher()
+        else:
+            self.pubsub = None
+        # Per-page stage DAG of streaming jobs (get_db_session resolved per call). With a
+        # queue, pages share the stage slots fairly across jobs; inline workers run them as they come
+        self.stage_engine = StageGraphEngine(
+            page_pipeline(),
+            session_factory=lambda: get_db_session(),
+            scheduler=FairScheduler.from_config() if self.pubsub else None,
+        )
+        # Completions racing a cancel must not publish the job's next stages
+        self.cancellation = CancellationRegistry(lambda: get_db_session())
         # Initialize workers to None first to avoid circular dependency
         self.ocr_worker = None
         self.diff_worker = None
         self.summary_worker = None
         
         # Import workers for synchronous processing fallback
-        if not config.USE_PUBSUB:
+        if not self.pubsub:
             try:
                 from workers.ocr_worker import OCRWorker
                 from workers.diff_worker import DiffWorker
@@ -46,7 +72,7 @@ class OrchestratorService:
                 self.ocr_worker = OCRWorker(orchestrator=self)
                 self.diff_worker = DiffWorker(orchestrator=self)
                 self.summary_worker = SummaryWorker(orchestrator=self)
-                logger.info("Synchronous processing fallback enabled (Pub/Sub disabled)")
+                logger.info("Synchronous processing fallback enabled (QUEUE_BACKEND=thread)")
             except ImportError as e:
                 logger.warning(f"Workers not available for synchronous processing: {e}")
     
@@ -62,12 +88,15 @@ class OrchestratorService:
         user_id: str,
         old_pdf_gcs_path: str,
         new_pdf_gcs_path: str,
+        priority: str = 'interactive',
     ) -> str:
         """
         Create a streaming comparison job that processes pages independently.
         
-        Each page flows through OCR → Diff → Summary immediately,
+        Each page flows through the stage graph (OCR → Diff → Summary) on its own,
         allowing users to see results as soon as each page completes.
+        ``priority='batch'`` sends OCR and summary model calls through
+        provider batches (hours, not seconds) for non-urgent comparisons.
         
         Returns:
             str: The job ID
@@ -89,8 +118,20 @@ class OrchestratorService:
         # Use the larger page count (they should match, but handle edge cases)
         total_pages = max(old_result.total_pages, new_result.total_pages)
         
+        # Seed values of each page's root stages
+        old_pages = {p.page_number: p for p in old_result.pages}
+        new_pages = {p.page_number: p for p in new_result.pages}
+        pages = {}
+        for page_num in range(1, total_pages + 1):
+            old_page = old_pages.get(page_num)
+            new_page = new_pages.get(page_num)
+            pages[page_num] = {
+                'drawing_name': new_page.drawing_name if new_page else f"Page_{page_num:03d}",
+                'old_page_gcs': old_page.gcs_path if old_page else None,
+                'new_page_gcs': new_page.gcs_path if new_page else None,
+            }
+        
         with get_db_session() as db:
-            # Create job record
             job = Job(
                 id=job_id,
                 project_id=project_id,
@@ -99,33 +140,11 @@ class OrchestratorService:
                 total_pages=total_pages,
                 status='in_progress',
                 started_at=datetime.utcnow(),
-                created_by=user_id
+                created_by=user_id,
+                job_metadata={'priority': priority},
             )
             db.add(job)
-            
-            # Create per-page stages for OCR (one per page, both versions processed together)
-            for page_num in range(1, total_pages + 1):
-                # Get drawing names for this page
-                old_page = next((p for p in old_result.pages if p.page_number == page_num), None)
-                new_page = next((p for p in new_result.pages if p.page_number == page_num), None)
-                
-                drawing_name = new_page.drawing_name if new_page else f"Page_{page_num:03d}"
-                
-                # OCR stage for this page (processes both old and new)
-                ocr_stage = JobStage(
-                    id=str(uuid.uuid4()),
-                    job_id=job_id,
-                    stage='ocr',
-                    page_number=page_num,
-                    status='pending',
-                    stage_metadata={
-                        'drawing_name': drawing_name,
-                        'old_page_gcs': old_page.gcs_path if old_page else None,
-                        'new_page_gcs': new_page.gcs_path if new_page else None,
-                    }
-                )
-                db.add(ocr_stage)
-            
+            dispatches = self.stage_engine.start_job(db, job, pages)
             db.commit()
             
             logger.info(
@@ -133,83 +152,79 @@ class OrchestratorService:
                 extra={"job_id": job_id, "total_pages": total_pages}
             )
         
-        # Publish OCR tasks for each page
         if self.pubsub:
-            for page_num in range(1, total_pages + 1):
-                old_page = next((p for p in old_result.pages if p.page_number == page_num), None)
-                new_page = next((p for p in new_result.pages if p.page_number == page_num), None)
-                
-                message = {
-                    'job_id': job_id,
-                    'page_number': page_num,
-                    'old_page_gcs': old_page.gcs_path if old_page else None,
-                    'new_page_gcs': new_page.gcs_path if new_page else None,
-                    'old_version_id': old_version_id,
-                    'new_version_id': new_drawing_version_id,
-                    'drawing_name': new_page.drawing_name if new_page else f"Page_{page_num:03d}",
-                    'metadata': {
-                        'project_id': project_id,
-                        'total_pages': total_pages,
-                    }
-                }
-                
-                self.pubsub.publish_ocr_task(
-                    job_id=job_id,
-                    drawing_version_id=f"{old_version_id}:{new_drawing_version_id}",
-                    metadata=message
-                )
+            # One publish batch per stage (one wait, not one round trip per page)
+            self._dispatch(dispatches)
         elif self.ocr_worker:
-            # Synchronous fallback - run in background thread
-            messages = []
-            for page_num in range(1, total_pages + 1):
-                old_page = next((p for p in old_result.pages if p.page_number == page_num), None)
-                new_page = next((p for p in new_result.pages if p.page_number == page_num), None)
-                
-                messages.append({
-                    'job_id': job_id,
-                    'page_number': page_num,
-                    'old_page_gcs': old_page.gcs_path if old_page else None,
-                    'new_page_gcs': new_page.gcs_path if new_page else None,
-                    'old_version_id': old_version_id,
-                    'new_version_id': new_drawing_version_id,
-                    'drawing_name': new_page.drawing_name if new_page else f"Page_{page_num:03d}",
-                    'metadata': {
-                        'project_id': project_id,
-                        'total_pages': total_pages,
-                    }
-                })
-            
-            # Run all pages in background thread
-            _run_in_background(self._process_streaming_pages_sync, job_id, messages)
+            # Synchronous fallback - run all pages in a background thread
+            _run_in_background(self._dispatch, dispatches)
             logger.info(f"Background streaming processing started for job {job_id}")
         
         return job_id
     
-    def _process_streaming_pages_sync(self, job_id: str, messages: List[Dict]):
-        """Process streaming pages synchronously in background thread"""
+    def _dispatch(self, dispatches: List[Dispatch]):
+        """Publish ready page stages to their queues (or run them inline without a queue)."""
+        if not dispatches:
+            return
+        cancelled = [d for d in dispatches if self.cancellation.is_cancelled(d.job_id)]
+        if cancelled:
+            self._skip_cancelled(cancelled)
+            dispatches = [d for d in dispatches if not self.cancellation.is_cancelled(d.job_id)]
+            if not dispatches:
+                return
+        if self.pubsub:
+            by_queue: Dict[str, List[Dispatch]] = {}
+            for dispatch in dispatches:
+                by_queue.setdefault(dispatch.stage.queue, []).append(dispatch)
+            for queue, group in by_queue.items():
+                published = self.pubsub.publish_batch(queue, [dispatch.task for dispatch in group])
+                for index, error in published.errors.items():
+                    failed = group[index]
+                    self._dispatch(self.stage_engine.fail(
+                        failed.job_id, failed.page_number, failed.stage.name, f"Failed to publish {queue} task: {error}"
+                    ))
+            return
+        
+        workers = {'ocr': self.ocr_worker, 'diff': self.diff_worker, 'summary': self.summary_worker}
+        for dispatch in dispatches:
+            worker = workers.get(dispatch.stage.queue)
+            if not worker:
+                logger.warning(f"No synchronous worker for {dispatch.stage.queue} - page {dispatch.page_number} left queued")
+                continue
+            try:
+                logger.info(f"Processing streaming {dispatch.stage.name} for page {dispatch.page_number} of job {dispatch.job_id}")
+                worker.process_message(dispatch.task)
+            except Exception as e:
+                logger.error(f"Streaming {dispatch.stage.name} failed for page {dispatch.page_number}: {e}", exc_info=True)
+                self._dispatch(self.stage_engine.fail(dispatch.job_id, dispatch.page_number, dispatch.stage.name, str(e)))
+    
+    def _skip_cancelled(self, dispatches: List[Dispatch]):
+        """Settle ready stages of cancelled jobs as skipped instead of publishing them."""
+        logger.info(f"Not dispatching {len(dispatches)} page stage(s) of cancelled jobs")
         try:
-            logger.info(f"Background streaming processing starting for job {job_id} with {len(messages)} pages")
-            
-            for message in messages:
-                page_num = message.get('page_number', 0)
-                try:
-                    logger.info(f"Processing streaming page {page_num} for job {job_id}")
-                    self.ocr_worker.process_streaming_message(message)
-                except Exception as e:
-                    logger.error(f"Streaming OCR failed for page {page_num}: {e}", exc_info=True)
-            
-            logger.info(f"Background streaming processing completed for job {job_id}")
+            with get_db_session() as db:
+                for dispatch in dispatches:
+                    mark_page_stage(
+                        db, dispatch.job_id, dispatch.stage.name, dispatch.page_number,
+                        status='skipped',
+                        error_message='Job cancelled',
+                        completed_at=datetime.utcnow(),
+                    )
+                db.commit()
         except Exception as e:
-            logger.error(f"Background streaming processing failed for job {job_id}: {e}", exc_info=True)
-            try:
-                with get_db_session() as db:
-                    job = db.query(Job).filter_by(id=job_id).first()
-                    if job:
-                        job.status = 'failed'
-                        job.error_message = str(e)
-                        db.commit()
-            except Exception as db_err:
-                logger.error(f"Failed to update job status: {db_err}")
+            logger.warning(f"Failed to skip stages of cancelled jobs: {e}")
+    
+    def on_page_stage_complete(self, job_id: str, page_number: int, stage: str, **outputs):
+        """
+        Called when any stage of the page graph completes for a page.
+        Immediately dispatches the stages this unblocks (no waiting for other pages)
+        and finishes the job once every page has settled.
+        """
+        logger.info(
+            f"Page {stage} complete",
+            extra={"job_id": job_id, "page_number": page_number, "stage": stage}
+        )
+        self._dispatch(self.stage_engine.complete(job_id, page_number, stage, outputs))
     
     def on_page_ocr_complete(
         self,
@@ -219,83 +234,11 @@ class OrchestratorService:
         new_ocr_ref: str,
         drawing_name: str,
     ):
-        """
-        Called when OCR completes for a specific page.
-        Immediately triggers diff for this page (no waiting for other pages).
-        """
-        logger.info(
-            "Page OCR complete, triggering diff",
-            extra={"job_id": job_id, "page_number": page_number, "drawing_name": drawing_name}
+        """Called when OCR completes for a specific page."""
+        self.on_page_stage_complete(
+            job_id, page_number, 'ocr',
+            old_ocr_ref=old_ocr_ref, new_ocr_ref=new_ocr_ref, drawing_name=drawing_name,
         )
-        
-        with get_db_session() as db:
-            # Update OCR stage status
-            ocr_stage = db.query(JobStage).filter_by(
-                job_id=job_id,
-                stage='ocr',
-                page_number=page_number
-            ).first()
-            
-            if ocr_stage:
-                ocr_stage.status = 'completed'
-                ocr_stage.completed_at = datetime.utcnow()
-                ocr_stage.result_ref = f"{old_ocr_ref}|{new_ocr_ref}"
-            
-            # Create diff stage for this page
-            diff_stage = JobStage(
-                id=str(uuid.uuid4()),
-                job_id=job_id,
-                stage='diff',
-                page_number=page_number,
-                status='in_progress',
-                started_at=datetime.utcnow(),
-                stage_metadata={'drawing_name': drawing_name}
-            )
-            db.add(diff_stage)
-            
-            job = db.query(Job).filter_by(id=job_id).first()
-            old_version_id = job.old_drawing_version_id
-            new_version_id = job.new_drawing_version_id
-            project_id = job.project_id
-            total_pages = job.total_pages
-            
-            # Get page GCS paths from OCR stage metadata
-            stage_meta = ocr_stage.stage_metadata or {}
-            old_page_gcs = stage_meta.get('old_page_gcs')
-            new_page_gcs = stage_meta.get('new_page_gcs')
-            
-            db.commit()
-        
-        # Publish diff task for this page
-        message = {
-            'job_id': job_id,
-            'page_number': page_number,
-            'old_version_id': old_version_id,
-            'new_version_id': new_version_id,
-            'old_page_gcs': old_page_gcs,
-            'new_page_gcs': new_page_gcs,
-            'old_ocr_ref': old_ocr_ref,
-            'new_ocr_ref': new_ocr_ref,
-            'drawing_name': drawing_name,
-            'metadata': {
-                'project_id': project_id,
-                'total_pages': total_pages,
-            }
-        }
-        
-        if self.pubsub:
-            self.pubsub.publish_diff_task(
-                job_id=job_id,
-                old_version_id=old_version_id,
-                new_version_id=new_version_id,
-                metadata=message
-            )
-        elif self.diff_worker:
-            try:
-                self.diff_worker.process_streaming_message(message)
-            except Exception as e:
-                logger.error(f"Streaming diff failed for page {page_number}: {e}")
-                self._mark_page_stage_failed(job_id, 'diff', page_number, str(e))
     
     def on_page_diff_complete(
         self,
@@ -304,131 +247,118 @@ class OrchestratorService:
         diff_result_id: str,
         overlay_ref: str,
         drawing_name: str,
+        change_count: Optional[int] = None,
     ):
+        """Called when diff completes for a specific page."""
+        self.on_page_stage_complete(
+            job_id, page_number, 'diff',
+            diff_result_id=diff_result_id, overlay_ref=overlay_ref,
+            drawing_name=drawing_name, change_count=change_count,
+        )
+    
+    def on_page_summary_complete(self, job_id: str, page_number: int, summary_id: str):
+        """Called when summary completes for a specific page."""
+        self.on_page_stage_complete(job_id, page_number, 'summary', summary_id=summary_id)
+    
+    def on_page_failed(self, job_id: str, stage: str, page_number: int, error: str):
         """
-        Called when diff completes for a specific page.
-        Immediately triggers summary for this page (no waiting for other pages).
+        Called when a worker gives up on a single page (e.g. an isolated diff child was
+        killed for exceeding its memory limit). Only that page's stage is failed, after
+        the stage's retry policy is used up.
         """
-        logger.info(
-            "Page diff complete, triggering summary",
-            extra={"job_id": job_id, "page_number": page_number, "diff_result_id": diff_result_id}
+        logger.warning(
+            "Page stage failed",
+            extra={"job_id": job_id, "stage": stage, "page_number": page_number, "error": error}
         )
-        
-        with get_db_session() as db:
-            # Update diff stage status
-            diff_stage = db.query(JobStage).filter_by(
-                job_id=job_id,
-                stage='diff',
-                page_number=page_number
-            ).first()
-            
-            if diff_stage:
-                diff_stage.status = 'completed'
-                diff_stage.completed_at = datetime.utcnow()
-                diff_stage.result_ref = diff_result_id
-            
-            # Create summary stage for this page
-            summary_stage = JobStage(
-                id=str(uuid.uuid4()),
-                job_id=job_id,
-                stage='summary',
-                page_number=page_number,
-                status='in_progress',
-                started_at=datetime.utcnow(),
-                stage_metadata={'drawing_name': drawing_name, 'diff_result_id': diff_result_id}
-            )
-            db.add(summary_stage)
-            
-            job = db.query(Job).filter_by(id=job_id).first()
-            project_id = job.project_id
-            total_pages = job.total_pages
-            
-            db.commit()
-        
-        # Publish summary task for this page
-        message = {
-            'job_id': job_id,
-            'page_number': page_number,
-            'diff_result_id': diff_result_id,
-            'overlay_ref': overlay_ref,
-            'drawing_name': drawing_name,
-            'metadata': {
-                'project_id': project_id,
-                'total_pages': total_pages,
-            }
-        }
-        
-        if self.pubsub:
-            self.pubsub.publish_summary_task(
-                job_id=job_id,
-                diff_result_id=diff_result_id,
-                overlay_ref=overlay_ref,
-                metadata=message
-            )
-        elif self.summary_worker:
-            try:
-                self.summary_worker.process_message(message)
-            except Exception as e:
-                logger.error(f"Streaming summary failed for page {page_number}: {e}")
-                self._mark_page_stage_failed(job_id, 'summary', page_number, str(e))
+        self._dispatch(self.stage_engine.fail(job_id, page_number, stage, error))
     
-    def on_page_summary_complete(self, job_id: str, page_number: int, summary_id: str):
+    def on_page_batch_pending(self, job_id: str, stage: str, page_number: int):
         """
-        Called when summary completes for a specific page.
-        Checks if all pages are done and marks job complete if so.
+        Called when a worker deferred a page's model calls to a provider batch.
+        The page no longer holds a stage slot, so queued pages take it; the batch
+        service completes the stage once the batch comes back.
         """
         logger.info(
-            "Page summary complete",
-            extra={"job_id": job_id, "page_number": page_number, "summary_id": summary_id}
+            "Page stage waiting for provider batch",
+            extra={"job_id": job_id, "stage": stage, "page_number": page_number}
         )
+        self._dispatch(self.stage_engine.release(job_id, stage))
+    
+    def pump_scheduled(self):
+        """Dispatch queued pages into free scheduler slots (run periodically)."""
+        self._dispatch(self.stage_engine.pump())
+    
+    def resume_job(self, job_id: str) -> Dict:
+        """
+        Resume a failed or interrupted job from its recorded stage state.
+        
+        Only the stages that did not finish run again: settled pages keep their
+        OCR, diff and summary, and a stage whose artifact was stored before the
+        interruption (a page's DiffResult or summary) is completed from it.
+        Each failed stage is resumed at most JOB_RESUME_MAX_ATTEMPTS times.
+        A completed job can be resumed while summaries are still placeholders
+        awaiting AI analysis (e.g. every model call timed out); only those run again.
         
+        Returns:
+            Dict: job_id, status, mode and the (page, stage) pairs per outcome
+        """
         with get_db_session() as db:
-            # Update summary stage status
-            summary_stage = db.query(JobStage).filter_by(
-                job_id=job_id,
-                stage='summary',
-                page_number=page_number
-            ).first()
-            
-            if summary_stage:
-                summary_stage.status = 'completed'
-                summary_stage.completed_at = datetime.utcnow()
-                summary_stage.result_ref = summary_id
-            
-            # Check if all pages have completed summaries
             job = db.query(Job).filter_by(id=job_id).first()
             if not job:
-                return
-            
-            completed_summaries = db.query(JobStage).filter_by(
-                job_id=job_id,
-                stage='summary',
-                status='completed'
-            ).count()
-            
-            if completed_summaries >= job.total_pages:
-                job.status = 'completed'
-                job.completed_at = datetime.utcnow()
-                logger.info(f"All {job.total_pages} pages complete. Job {job_id} finished!")
-            
-            db.commit()
-    
-    def _mark_page_stage_failed(self, job_id: str, stage: str, page_number: int, error: str):
-        """Mark a specific page's stage as failed."""
-        with get_db_session() as db:
-            stage_record = db.query(JobStage).filter_by(
-                job_id=job_id,
-                stage=stage,
-                page_number=page_number
-            ).first()
-            
-            if stage_record:
-                stage_record.status = 'failed'
-                stage_record.error_message = error
-                stage_record.completed_at = datetime.utcnow()
-                stage_record.retry_count = (stage_record.retry_count or 0) + 1
-            
+                raise ValueError(f"Job {job_id} not found")
+            if job.status == 'cancelled':
+                raise ValueError(f"Job is already {job.status}")
+            
+            previous_status = job.status
+            job.status = 'in_progress'
+            job.error_message = None
+            job.completed_at = None
+            job.started_at = job.started_at or datetime.utcnow()
+            streaming = db.query(JobStage.id).filter(
+                JobStage.job_id == job_id,
+                JobStage.stage == 'ocr',
+                JobStage.page_number.isnot(None),
+            ).first() is not None
+            
+            action = None
+            if streaming:
+                dispatches, report = self.stage_engine.resume_job(db, job, config.JOB_RESUME_MAX_ATTEMPTS)
+                if dispatches:
+                    action = lambda: self._dispatch(dispatches)
+            else:
+                action, report = self._resume_legacy(db, job)
+            
+            if not report.resumed and previous_status == 'completed' and not report.exhausted:
+                db.rollback()
+                raise ValueError("Job is already completed")
+            if not report.resumed:
+                job.status = 'failed' if report.exhausted else previous_status
+                if report.exhausted:
+                    job.error_message = f"Resume limit reached for {len(report.exhausted)} stage(s)"
+            status = job.status
             db.commit()
+        
+        logger.info(
+            "Resumed job",
+            extra={
+                "job_id": job_id,
+                "redispatched": len(report.redispatched),
+                "recovered": len(report.recovered),
+                "exhausted": len(report.exhausted),
+            }
+        )
+        if action and self.pubsub:
+            action()
+        elif action:
+            # Synchronous fallback - run the resumed stages in a background thread
+            _run_in_background(action)
+        
+        return {
+            'job_id': job_id,
+            'status': status,
+            'mode': 'streaming' if streaming else 'legacy',
+            **report.as_dict(),
+        }
     
     # =========================================================================
     # LEGACY: Batch processing (kept for backward compatibility)
@@ -439,10 +369,14 @@ class OrchestratorService:
         old_version_id: str,
         new_drawing_version_id: str,
         project_id: str,
-        user_id: str
+        user_id: str,
+        priority: str = 'interactive',
     ) -> str:
         """Create a new comparison job and enqueue OCR tasks (legacy batch mode)
 
+        With ``priority='batch'`` the summaries go through provider batches;
+        legacy OCR runs whole PDFs and stays synchronous.
+
         Returns:
             str: The job ID
         """
@@ -454,7 +388,8 @@ class OrchestratorService:
                 old_drawing_version_id=old_version_id,
                 new_drawing_version_id=new_drawing_version_id,
                 status='created',
-                created_by=user_id
+                created_by=user_id,
+                job_metadata={'priority': priority},
             )
             db.add(job)
             db.flush()  # Get job.id
@@ -497,23 +432,24 @@ class OrchestratorService:
                 
                 if old_version and new_version:
                     try:
-                        self.pubsub.publish_ocr_task(
-                            job_id=job.id,
-                            drawing_version_id=old_version_id,
-                            metadata={
-                                'project_id': project_id,
-                                'storage_path': old_version.drawing.storage_path if old_version.drawing else None
-                            }
-                        )
-                        
-                        self.pubsub.publish_ocr_task(
-                            job_id=job.id,
-                            drawing_version_id=new_drawing_version_id,
-                            metadata={
-                                'project_id': project_id,
-                                'storage_path': new_version.drawing.storage_path if new_version.drawing else None
-                            }
-                        )
+                        self.pubsub.publish_batch('ocr', [
+                            self.pubsub.ocr_task_message(
+                                job_id=job.id,
+                                drawing_version_id=old_version_id,
+                                metadata={
+                                    'project_id': project_id,
+                                    'storage_path': old_version.drawing.storage_path if old_version.drawing else None
+                                }
+                            ),
+                            self.pubsub.ocr_task_message(
+                                job_id=job.id,
+                                drawing_version_id=new_drawing_version_id,
+                                metadata={
+                                    'project_id': project_id,
+                                    'storage_path': new_version.drawing.storage_path if new_version.drawing else None
+                                }
+                            ),
+                        ]).raise_for_failures()
                         
                         # Update job status
                         job.status = 'in_progress'
@@ -595,6 +531,9 @@ class OrchestratorService:
             if not job:
                 logger.error(f"Job {job_id} not found")
                 return
+            if job.status == 'cancelled':
+                logger.info(f"Job {job_id} was cancelled - not starting diff")
+                return
             
             ocr_stages = db.query(JobStage).filter_by(
                 job_id=job_id,
@@ -651,8 +590,12 @@ class OrchestratorService:
         if not diff_results:
             logger.warning(f"No diff results provided for job {job_id}")
             return
+        if self.cancellation.is_cancelled(job_id):
+            logger.info(f"Job {job_id} was cancelled - not starting summaries")
+            return
 
         project_id = None
+        priority = 'interactive'
         with get_db_session() as db:
             diff_stage = db.query(JobStage).filter_by(
                 job_id=job_id,
@@ -664,6 +607,7 @@ class OrchestratorService:
                 diff_stage.completed_at = datetime.utcnow()
                 if diff_stage.job:
                     project_id = diff_stage.job.project_id
+                    priority = _job_priority(diff_stage.job)
             
             summary_stage = db.query(JobStage).filter_by(
                 job_id=job_id,
@@ -681,6 +625,7 @@ class OrchestratorService:
             
             db.commit()
 
+        summary_messages = []
         for diff_entry in diff_results:
             diff_result_id = diff_entry.get("diff_result_id")
             overlay_ref = diff_entry.get("overlay_ref")
@@ -689,28 +634,16 @@ class OrchestratorService:
                 'page_number': diff_entry.get("page_number"),
                 'total_pages': diff_entry.get("total_pages"),
                 'drawing_name': diff_entry.get("drawing_name"),
+                'priority': priority,
             }
             
             if self.pubsub:
-                try:
-                    self.pubsub.publish_summary_task(
-                        job_id=job_id,
-                        diff_result_id=diff_result_id,
-                        overlay_ref=overlay_ref,
-                        metadata=metadata,
-                    )
-                    logger.info(
-                        "Published summary task for page",
-                        extra={
-                            "job_id": job_id,
-                            "diff_result_id": diff_result_id,
-                            "page_number": diff_entry.get("page_number"),
-                        },
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to publish summary task for {diff_result_id}: {e}")
-                    self._mark_summary_stage_failed(job_id, str(e))
-                    break
+                summary_messages.append(self.pubsub.summary_task_message(
+                    job_id=job_id,
+                    diff_result_id=diff_result_id,
+                    overlay_ref=overlay_ref,
+                    metadata=metadata,
+                ))
             elif self.summary_worker:
                 try:
                     logger.info(
@@ -729,6 +662,16 @@ class OrchestratorService:
                     logger.error(f"Synchronous summary processing failed: {e}", exc_info=True)
                     self._mark_summary_stage_failed(job_id, str(e))
                     break
+        
+        if summary_messages:
+            published = self.pubsub.publish_batch('summary', summary_messages)
+            logger.info(
+                "Published summary tasks",
+                extra={"job_id": job_id, "published": len(summary_messages) - published.failed, "failed": published.failed},
+            )
+            if published.errors:
+                error = next(iter(published.errors.values()))
+                self._mark_summary_stage_failed(job_id, f"Failed to publish {published.failed} summary tasks: {error}")
     
     def on_summary_complete(self, job_id: str):
         """Called when summary stage completes - mark job complete (legacy)"""
@@ -755,6 +698,124 @@ class OrchestratorService:
                 job.completed_at = datetime.utcnow()
             db.commit()
     
+    def _resume_legacy(self, db, job: Job) -> Tuple[Optional[Callable[[], None]], ResumeReport]:
+        """
+        Re-open the first unfinished legacy stage (caller commits, then runs the action).
+        
+        OCR re-runs only the versions that did not finish. The diff pipeline reuses
+        page pairs it already diffed, and summaries are requested only for diffs
+        without a finished one.
+        """
+        report = ResumeReport()
+        stages = db.query(JobStage).filter(JobStage.job_id == job.id, JobStage.page_number.is_(None)).all()
+        ocr_stages = [stage for stage in stages if stage.stage == 'ocr']
+        diff_stage = next((stage for stage in stages if stage.stage == 'diff'), None)
+        summary_stage = next((stage for stage in stages if stage.stage == 'summary'), None)
+        
+        def reopen(stage: JobStage, status: str = 'pending') -> bool:
+            stage_meta = dict(stage.stage_metadata or {})
+            if stage_meta.get('resumes', 0) >= config.JOB_RESUME_MAX_ATTEMPTS:
+                report.exhausted.append((None, stage.stage))
+                return False
+            stage_meta['resumes'] = stage_meta.get('resumes', 0) + 1
+            stage.stage_metadata = stage_meta
+            stage.status = status
+            stage.error_message = None
+            stage.completed_at = None
+            stage.retry_count = 0
+            report.redispatched.append((None, stage.stage))
+            return True
+        
+        job_id, project_id, new_version_id = job.id, job.project_id, job.new_drawing_version_id
+        unfinished_ocr = [stage for stage in ocr_stages if stage.status != 'completed']
+        if unfinished_ocr:
+            version_ids = [stage.drawing_version_id for stage in unfinished_ocr if reopen(stage)]
+            if diff_stage and diff_stage.status != 'completed':
+                diff_stage.status = 'pending'  # on_ocr_complete only starts a pending diff
+            if not version_ids:
+                return None, report
+            return lambda: self._rerun_legacy_ocr(job_id, project_id, version_ids), report
+        
+        if diff_stage and diff_stage.status != 'completed':
+            if not reopen(diff_stage):
+                return None, report
+            return lambda: self.on_ocr_complete(job_id, new_version_id), report
+        
+        if summary_stage:
+            # A completed stage is only re-run for placeholders left by failed AI calls
+            completed = summary_stage.status == 'completed'
+            unfinished_sources = ('pending',) if completed else ('pending', 'batch_pending')
+            summarized = {
+                diff_result_id for (diff_result_id,) in db.query(ChangeSummary.diff_result_id).join(
+                    DiffResult, DiffResult.id == ChangeSummary.diff_result_id
+                ).filter(
+                    DiffResult.job_id == job_id,
+                    ChangeSummary.is_active.is_(True),
+                    ChangeSummary.source.notin_(unfinished_sources),
+                )
+            }
+            missing = [
+                {
+                    'diff_result_id': result.id,
+                    'overlay_ref': (result.diff_metadata or {}).get('overlay_image_ref'),
+                    'page_number': result.page_number,
+                    'drawing_name': result.drawing_name,
+                }
+                for result in db.query(DiffResult).filter_by(job_id=job_id).order_by(DiffResult.page_number)
+                if result.id not in summarized
+            ]
+            if not missing and completed:
+                return None, report
+            if not missing:
+                summary_stage.status = 'completed'
+                summary_stage.completed_at = datetime.utcnow()
+                job.status = 'completed'
+                job.completed_at = datetime.utcnow()
+                report.recovered.append((None, 'summary'))
+                return None, report
+            if not reopen(summary_stage, status='in_progress'):
+                return None, report
+            stage_meta = dict(summary_stage.stage_metadata)
+            stage_meta['completed_summaries'] = 0  # on_diff_complete expects the missing ones only
+            summary_stage.stage_metadata = stage_meta
+            return lambda: self.on_diff_complete(job_id, missing), report
+        
+        return None, report
+    
+    def _rerun_legacy_ocr(self, job_id: str, project_id: str, version_ids: List[str]):
+        """Run OCR again for the given drawing versions of a legacy job."""
+        if self.pubsub:
+            published = self.pubsub.publish_batch('ocr', [
+                self.pubsub.ocr_task_message(
+                    job_id=job_id,
+                    drawing_version_id=version_id,
+                    metadata={'project_id': project_id},
+                )
+                for version_id in version_ids
+            ])
+            if published.errors:
+                logger.error(f"Failed to publish {published.failed} OCR tasks for resumed job {job_id}")
+            return
+        if not self.ocr_worker:
+            logger.warning("Synchronous processing not available - workers not initialized")
+            return
+        try:
+            for version_id in version_ids:
+                logger.info(f"Processing OCR for version {version_id} of resumed job {job_id}")
+                self.ocr_worker.process_message({
+                    'job_id': job_id,
+                    'drawing_version_id': version_id,
+                    'metadata': {'project_id': project_id},
+                })
+        except Exception as e:
+            logger.error(f"Resumed OCR failed for job {job_id}: {e}", exc_info=True)
+            with get_db_session() as db:
+                job = db.query(Job).filter_by(id=job_id).first()
+                if job:
+                    job.status = 'failed'
+                    job.error_message = str(e)
+                    db.commit()
+    
     def trigger_summary_regeneration(self, diff_result_id: str, overlay_id: Optional[str] = None):
         """Trigger summary regeneration with optional manual overlay"""
         with get_db_session() as db:
@@ -793,6 +854,8 @@ class OrchestratorService:
                 'page_number': diff_result.page_number,
                 'use_manual_overlay': overlay_id is not None,
                 'overlay_id': overlay_id,
+                # Each regeneration is a new stage execution, not a redelivery of the last one
+                'regeneration_id': summary_stage.id,
             }
 
             if self.pubsub:
@@ -3,6 +3,7 @@ Page Extractor Service
 Extracts pages from PDFs and uploads them individually to GCS for streaming pipeline.
 """
 
+import json
 import logging
 import tempfile
 import uuid
@@ -13,6 +14,7 @@ from typing import List, Optional
 from gcp.storage import StorageService
 from utils.pdf_parser import pdf_to_png, get_pdf_page_count
 from utils.drawing_extraction import extract_drawing_names
+from utils.text_layer import read_pdf_text_layers
 
 logger = logging.getLogger(__name__)
 
@@ -103,6 +105,7 @@ class PageExtractorService:
             
             # Extract and upload each page
             extracted_pages: List[ExtractedPage] = []
+            text_layers = read_pdf_text_layers(str(pdf_path))
             
             for page_num in range(1, total_pages + 1):
                 drawing_name = drawing_names.get(page_num, f"Page_{page_num:03d}")
@@ -115,6 +118,7 @@ class PageExtractorService:
                 gcs_path = f"pages/{job_id}/{version_type}/page_{page_num:03d}.png"
                 png_bytes = output_path.read_bytes()
                 self.storage.upload_file(png_bytes, gcs_path, content_type="image/png")
+                self._upload_text_layer(text_layers, page_num, gcs_path)
                 
                 extracted_pages.append(ExtractedPage(
                     page_number=page_num,
@@ -181,6 +185,7 @@ class PageExtractorService:
                     drawing_names[page_num] = f"Page_{page_num:03d}"
             
             extracted_pages: List[ExtractedPage] = []
+            text_layers = read_pdf_text_layers(str(pdf_path))
             
             for page_num in range(1, total_pages + 1):
                 drawing_name = drawing_names.get(page_num, f"Page_{page_num:03d}")
@@ -191,6 +196,7 @@ class PageExtractorService:
                 gcs_path = f"pages/{job_id}/{version_type}/page_{page_num:03d}.png"
                 png_bytes = output_path.read_bytes()
                 self.storage.upload_file(png_bytes, gcs_path, content_type="image/png")
+                self._upload_text_layer(text_layers, page_num, gcs_path)
                 
                 extracted_pages.append(ExtractedPage(
                     page_number=page_num,
@@ -204,6 +210,17 @@ class PageExtractorService:
                 pdf_gcs_path=""  # Not stored as full PDF in this case
             )
 
+    def _upload_text_layer(self, text_layers: List[Optional[dict]], page_num: int, png_gcs_path: str) -> None:
+        """Store the page's text layer next to its PNG so OCR can skip the vision model."""
+        text_layer = text_layers[page_num - 1] if page_num <= len(text_layers) else None
+        if not text_layer or not text_layer.get('lines'):
+            return  # Raster-only page: nothing to read without a vision model
+        self.storage.upload_file(
+            json.dumps(text_layer).encode('utf-8'),
+            png_gcs_path[:-len('.png')] + '.text.json',
+            content_type="application/json",
+        )
+
 
 # Singleton instance
 _page_extractor: Optional[PageExtractorService] = None
@@ -0,0 +1,781 @@
+"""
+Declarative per-page stage graph for streaming comparison jobs.
+
+Each page of a job flows through a DAG of stages. A ``StageSpec`` declares:
+
+- ``inputs``: the stages that must settle (complete or be skipped) first (fan-in)
+- ``outputs``: the values its completion hands to downstream stages
+- ``concurrency``: max pages of the stage in flight per job (0 = unlimited)
+- ``retry``: how often a page given up by its worker is re-dispatched
+- ``skip_if``: a predicate on the page context that settles it without running
+- ``recover``: looks up the outputs a previous run already stored, so a
+  resumed job completes the stage from them instead of running it again
+- ``placeholder``: tells whether a completed stage only stored a stand-in
+  (e.g. a summary awaiting AI analysis), so a resume runs it again
+
+``StageGraphEngine`` keeps the state in JobStage rows (one per job/stage/page).
+Whenever a page's stage settles it opens every downstream stage whose inputs
+have all settled, so independent stages of a page fan out together. It also
+moves queued pages into freed concurrency slots and completes the job once
+every page has settled its terminal stages. ``resume_job`` re-opens only the
+unfinished stages of a failed or interrupted job. With a ``FairScheduler`` the
+slots of its stages are shared by all jobs (services.fair_scheduler). A page
+whose model calls were deferred to a provider batch waits as ``batch_pending``
+and holds no slot until the batch service completes it. The engine only returns
+``Dispatch`` tasks. The orchestrator publishes them (or runs them inline), so
+a new stage is a new spec, not a new set of callbacks.
+"""
+
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, insert, update
+
+from config import config
+from gcp.database.models import ChangeSummary, DiffResult, Job, JobStage
+from gcp.pubsub.publisher import TaskPublisher
+from services.stage_ledger import expire_leases
+
+logger = logging.getLogger(__name__)
+
+SETTLED = ('completed', 'skipped')
+IN_FLIGHT = ('pending', 'in_progress')
+QUEUED = 'queued'  # waiting for a concurrency slot
+BATCH_PENDING = 'batch_pending'  # waiting for a provider batch, holds no slot
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Attempts per page before a stage given up by its worker stays failed."""
+    max_attempts: int = 1
+
+
+@dataclass
+class PageContext:
+    """What a stage sees of its page: job fields plus the outputs of settled stages."""
+    job_id: str
+    page_number: int
+    job: Dict[str, Any]
+    values: Dict[str, Any]
+
+    @property
+    def drawing_name(self) -> str:
+        return self.values.get('drawing_name') or f"Page_{self.page_number:03d}"
+
+
+@dataclass(frozen=True)
+class StageSpec:
+    name: str
+    queue: str  # task queue the stage's work is published to
+    build_task: Callable[[PageContext], Dict[str, Any]]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    concurrency: int = 0
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+    skip_if: Optional[Callable[[PageContext], bool]] = None
+    result_ref: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None
+    recover: Optional[Callable[[Any, PageContext], Optional[Dict[str, Any]]]] = None
+    placeholder: Optional[Callable[[Any, PageContext], bool]] = None
+
+
+@dataclass
+class Dispatch:
+    """A stage of one page that is ready to run."""
+    job_id: str
+    page_number: int
+    stage: StageSpec
+    task: Dict[str, Any]
+
+
+@dataclass
+class ResumeReport:
+    """What a resume did with the unfinished stages, as (page, stage) pairs (page None: whole job)."""
+    redispatched: List[Tuple[Optional[int], str]] = field(default_factory=list)
+    recovered: List[Tuple[Optional[int], str]] = field(default_factory=list)
+    exhausted: List[Tuple[Optional[int], str]] = field(default_factory=list)  # out of resume attempts
+    missing_pages: List[int] = field(default_factory=list)  # no stage rows to resume from
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.redispatched or self.recovered)
+
+    def as_dict(self) -> Dict[str, Any]:
+        def pairs(items):
+            return [{'page_number': page, 'stage': stage} for page, stage in items]
+        return {
+            'redispatched': pairs(self.redispatched),
+            'recovered': pairs(self.recovered),
+            'exhausted': pairs(self.exhausted),
+            'missing_pages': self.missing_pages,
+        }
+
+
+class StageGraph:
+    """Validated, topologically ordered set of stages."""
+
+    def __init__(self, stages: Iterable[StageSpec]):
+        pending = {spec.name: spec for spec in stages}
+        for spec in pending.values():
+            unknown = set(spec.inputs) - set(pending)
+            if unknown:
+                raise ValueError(f"Stage {spec.name} depends on unknown stages {sorted(unknown)}")
+        ordered: List[StageSpec] = []
+        while pending:
+            ready = [spec for spec in pending.values() if all(i not in pending for i in spec.inputs)]
+            if not ready:
+                raise ValueError(f"Stage graph has a cycle among {sorted(pending)}")
+            for spec in ready:
+                ordered.append(pending.pop(spec.name))
+        self.stages = ordered
+        self._by_name = {spec.name: spec for spec in ordered}
+
+    def get(self, name: str) -> StageSpec:
+        return self._by_name[name]
+
+    @property
+    def roots(self) -> List[StageSpec]:
+        return [spec for spec in self.stages if not spec.inputs]
+
+    @property
+    def terminals(self) -> List[str]:
+        upstream = {name for spec in self.stages for name in spec.inputs}
+        return [spec.name for spec in self.stages if spec.name not in upstream]
+
+
+def _job_fields(job) -> Dict[str, Any]:
+    return {
+        'project_id': job.project_id,
+        'old_version_id': job.old_drawing_version_id,
+        'new_version_id': job.new_drawing_version_id,
+        'total_pages': job.total_pages,
+        'priority': (job.job_metadata or {}).get('priority', 'interactive'),
+    }
+
+
+@dataclass
+class _PageRow:
+    """Snapshot of one JobStage row of a page (read once per transition)."""
+    id: str
+    status: str
+    metadata: Dict[str, Any]
+
+
+def mark_page_stage(db, job_id: str, stage: str, page_number: int, **values) -> int:
+    """Single-statement UPDATE of a page's stage row; returns the number of rows changed."""
+    return db.execute(
+        update(JobStage)
+        .where(JobStage.job_id == job_id, JobStage.stage == stage, JobStage.page_number == page_number)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+class StageGraphEngine:
+    """Moves pages through a StageGraph, persisting progress as JobStage rows.
+
+    Transitions are single UPDATE statements guarded by the row's current
+    status, new rows are inserted in bulk, and job completion is detected
+    with an atomic ``jobs.completed_pages`` counter instead of re-counting
+    stage rows after every page.
+    """
+
+    JOB_CACHE_SIZE = 256
+
+    def __init__(self, graph: StageGraph, session_factory: Callable, scheduler=None):
+        self.graph = graph
+        self.session_factory = session_factory
+        self.scheduler = scheduler
+        self._terminals = set(graph.terminals)
+        # Job fields the tasks are built from never change after creation
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+    def start_job(self, db, job: Job, pages: Dict[int, Dict[str, Any]]) -> List[Dispatch]:
+        """Insert the root stages of every page in one statement (caller commits)."""
+        job_info = self._remember(job.id, _job_fields(job))
+        db.flush()  # the job row goes in before its stages
+        now = datetime.utcnow()
+        in_flight = {spec.name: 0 for spec in self.graph.roots}
+        rows: List[Dict[str, Any]] = []
+        page_rows: Dict[int, Dict[str, _PageRow]] = {}
+        dispatches: List[Dispatch] = []
+        for page_number in sorted(pages):
+            values = dict(pages[page_number])
+            context = PageContext(job.id, page_number, job_info, values)
+            page_rows[page_number] = {}
+            for spec in self.graph.roots:
+                status = self._initial_status(spec, context, in_flight[spec.name])
+                row = self._new_row(job.id, spec, page_number, status, values, now)
+                rows.append(row)
+                page_rows[page_number][spec.name] = _PageRow(row['id'], status, values)
+                if status in IN_FLIGHT:
+                    in_flight[spec.name] += 1
+                    dispatches.append(Dispatch(job.id, page_number, spec, spec.build_task(context)))
+        if rows:
+            db.execute(insert(JobStage), rows)
+
+        # Skipped roots settle at once: open what they unblock
+        settled_pages = 0
+        for page_number, page in page_rows.items():
+            if any(row.status == 'skipped' for row in page.values()):
+                page_dispatches = self._advance(db, job.id, job_info, page_number, page, pump=False)
+                dispatches += page_dispatches
+            settled_pages += int(self._settled(page))
+        if settled_pages:
+            self._count_settled_pages(db, job.id, job_info, settled_pages)
+
+        known = {(job.id, page_number): page for page_number, page in page_rows.items()}
+        for spec in self.graph.stages:
+            if any(page.get(spec.name) and page[spec.name].status == QUEUED for page in page_rows.values()):
+                dispatches += self._pump(db, spec, known)
+        return dispatches
+
+    def complete(self, job_id: str, page_number: int, stage: str, outputs: Dict[str, Any]) -> List[Dispatch]:
+        """Record a finished stage and return the stages that became ready."""
+        spec = self.graph.get(stage)
+        declared = {key: outputs[key] for key in spec.outputs if key in outputs}
+        with self.session_factory() as db:
+            job_info = self._job_info(db, job_id)
+            if job_info is None:
+                logger.error(f"Job {job_id} not found")
+                return []
+            rows = self._page_rows(db, job_id, page_number)
+            was_settled = self._settled(rows)
+            current = rows.get(stage)
+            metadata = {**(current.metadata if current else {}), **declared}
+            values = {'status': 'completed', 'completed_at': datetime.utcnow(), 'stage_metadata': metadata}
+            if spec.result_ref:
+                values['result_ref'] = spec.result_ref(declared)
+
+            if current is None:
+                row = self._new_row(job_id, spec, page_number, 'completed', metadata, values['completed_at'])
+                row.update(values)
+                db.execute(insert(JobStage), [row])
+                rows[stage] = _PageRow(row['id'], 'completed', metadata)
+            else:
+                changed = db.execute(
+                    update(JobStage)
+                    .where(JobStage.id == current.id, JobStage.status != 'completed')
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if not changed:
+                    # Redelivered completion: recorded and advanced the first time
+                    db.rollback()
+                    return []
+                rows[stage] = _PageRow(current.id, 'completed', metadata)
+
+            dispatches = self._advance(db, job_id, job_info, page_number, rows)
+            dispatches += self._release(db, job_id, job_info, spec)
+            if not was_settled and self._settled(rows):
+                self._count_settled_pages(db, job_id, job_info, 1)
+            db.commit()
+        return dispatches
+
+    def fail(self, job_id: str, page_number: int, stage: str, error: str) -> List[Dispatch]:
+        """Record a page given up by its worker: re-dispatch it while retries remain."""
+        spec = self.graph.get(stage)
+        with self.session_factory() as db:
+            job_info = self._job_info(db, job_id)
+            if job_info is None:
+                return []
+            attempts = func.coalesce(JobStage.retry_count, 0) + 1
+            retry = attempts < spec.retry.max_attempts
+            retry_count = db.execute(
+                update(JobStage)
+                .where(JobStage.job_id == job_id, JobStage.stage == stage, JobStage.page_number == page_number)
+                .values(
+                    retry_count=attempts,
+                    error_message=error,
+                    status=case((retry, 'in_progress'), else_='failed'),
+                    completed_at=case((retry, None), else_=datetime.utcnow()),
+                )
+                .returning(JobStage.retry_count)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if retry_count is None:
+                return []
+            if retry_count < spec.retry.max_attempts:
+                logger.warning(
+                    f"Retrying {stage} for page {page_number} ({retry_count}/{spec.retry.max_attempts})",
+                    extra={"job_id": job_id, "error": error},
+                )
+                context = self._context(job_id, job_info, page_number, self._page_rows(db, job_id, page_number))
+                dispatches = [Dispatch(job_id, page_number, spec, spec.build_task(context))]
+            else:
+                dispatches = self._release(db, job_id, job_info, spec)
+            db.commit()
+        return dispatches
+
+    def resume_job(self, db, job: Job, max_resumes: int) -> Tuple[List[Dispatch], ResumeReport]:
+        """Re-open the unfinished stages of a job's pages (caller commits).
+
+        Settled stages are kept, except completed ones whose output is only a
+        ``placeholder``: those count as unfinished and the page as unsettled
+        again. An unfinished stage whose outputs a previous run already stored
+        (``recover``) is completed from them. A failed stage
+        runs again with a fresh retry budget, at most ``max_resumes`` times.
+        In-flight stages are dispatched again and their ledger leases expired,
+        so the copy takes over from a worker that died mid-stage. Stages whose inputs have settled
+        but that were never opened are opened as usual.
+        """
+        job_info = self._remember(job.id, _job_fields(job))
+        report = ResumeReport()
+        pages: Dict[int, Dict[str, _PageRow]] = {}
+        for row_id, stage, page_number, status, metadata in db.query(
+            JobStage.id, JobStage.stage, JobStage.page_number, JobStage.status, JobStage.stage_metadata
+        ).filter(JobStage.job_id == job.id, JobStage.page_number.isnot(None)):
+            pages.setdefault(page_number, {})[stage] = _PageRow(row_id, status, metadata or {})
+        report.missing_pages = [page for page in range(1, (job.total_pages or 0) + 1) if page not in pages]
+
+        now = datetime.utcnow()
+        in_flight = {
+            spec.name: sum(1 for rows in pages.values() if spec.name in rows and rows[spec.name].status in IN_FLIGHT)
+            for spec in self.graph.stages
+        }
+        dispatches: List[Dispatch] = []
+        interrupted: List[Tuple[int, str]] = []
+        settled_pages = 0
+        for page_number in sorted(pages):
+            rows = pages[page_number]
+            was_settled = self._settled(rows)
+            for spec in self.graph.stages:
+                row = rows.get(spec.name)
+                if row is None or row.status in (QUEUED, BATCH_PENDING):
+                    continue
+                context = self._context(job.id, job_info, page_number, rows)
+                if row.status in SETTLED and not (
+                    row.status == 'completed' and spec.placeholder and spec.placeholder(db, context)
+                ):
+                    continue
+                stored = spec.recover(db, context) if spec.recover else None
+                if stored:
+                    metadata = {**row.metadata, **{key: stored[key] for key in spec.outputs if key in stored}}
+                    values = {'status': 'completed', 'completed_at': now, 'error_message': None, 'stage_metadata': metadata}
+                    if spec.result_ref:
+                        values['result_ref'] = spec.result_ref(metadata)
+                    mark_page_stage(db, job.id, spec.name, page_number, **values)
+                    if row.status in IN_FLIGHT:
+                        in_flight[spec.name] -= 1
+                    rows[spec.name] = _PageRow(row.id, 'completed', metadata)
+                    report.recovered.append((page_number, spec.name))
+                    continue
+                if row.status in IN_FLIGHT:
+                    dispatches.append(Dispatch(job.id, page_number, spec, spec.build_task(context)))
+                    report.redispatched.append((page_number, spec.name))
+                    interrupted.append((page_number, spec.name))
+                    continue
+
+                resumes = row.metadata.get('resumes', 0)
+                if resumes >= max_resumes:
+                    report.exhausted.append((page_number, spec.name))
+                    continue
+                status = self._initial_status(spec, context, in_flight[spec.name])
+                metadata = {**row.metadata, 'resumes': resumes + 1}
+                mark_page_stage(
+                    db, job.id, spec.name, page_number,
+                    status=status,
+                    retry_count=0,
+                    error_message=None,
+                    started_at=now if status == 'in_progress' else None,
+                    completed_at=now if status == 'skipped' else None,
+                    stage_metadata=metadata,
+                )
+                rows[spec.name] = _PageRow(row.id, status, metadata)
+                if status in IN_FLIGHT:
+                    in_flight[spec.name] += 1
+                    dispatches.append(Dispatch(job.id, page_number, spec, spec.build_task(context)))
+                if status != 'skipped':
+                    report.redispatched.append((page_number, spec.name))
+            dispatches += self._advance(db, job.id, job_info, page_number, rows, pump=False)
+            settled_pages += int(self._settled(rows)) - int(was_settled)
+        if settled_pages:
+            self._count_settled_pages(db, job.id, job_info, settled_pages)
+        if interrupted:
+            expire_leases(db, job.id, interrupted)
+
+        known = {(job.id, page_number): rows for page_number, rows in pages.items()}
+        for spec in self.graph.stages:
+            if any(rows.get(spec.name) and rows[spec.name].status == QUEUED for rows in pages.values()):
+                if self._scheduled(spec):
+                    dispatches += self._pump(db, spec, known)
+                else:
+                    dispatches += self._release(db, job.id, job_info, spec)
+        return dispatches, report
+
+    def release(self, job_id: str, stage: str) -> List[Dispatch]:
+        """Dispatch queued pages into slots freed outside complete/fail (e.g. a page deferred to a batch)."""
+        spec = self.graph.get(stage)
+        with self.session_factory() as db:
+            job_info = self._job_info(db, job_id)
+            if job_info is None:
+                return []
+            dispatches = self._release(db, job_id, job_info, spec)
+            db.commit()
+        return dispatches
+
+    def pump(self) -> List[Dispatch]:
+        """Fill the free slots of every scheduled stage from all running jobs.
+
+        Completions and failures pump as they happen; this catches slots freed
+        without either (stale pages, pages deferred to a batch, lost events).
+        """
+        if not self.scheduler:
+            return []
+        dispatches: List[Dispatch] = []
+        with self.session_factory() as db:
+            for spec in self.graph.stages:
+                if self._scheduled(spec):
+                    dispatches += self._pump(db, spec)
+            db.commit()
+        return dispatches
+
+    # -------------------------------------------------------------------------
+
+    def _remember(self, job_id: str, job_info: Dict[str, Any]) -> Dict[str, Any]:
+        with self._jobs_lock:
+            self._jobs[job_id] = job_info
+            self._jobs.move_to_end(job_id)
+            while len(self._jobs) > self.JOB_CACHE_SIZE:
+                self._jobs.popitem(last=False)
+        return job_info
+
+    def _job_info(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._jobs_lock:
+            cached = self._jobs.get(job_id)
+        if cached is not None:
+            return cached
+        job = db.query(Job).filter_by(id=job_id).first()
+        return self._remember(job_id, _job_fields(job)) if job else None
+
+    @staticmethod
+    def _page_rows(db, job_id: str, page_number: int) -> Dict[str, _PageRow]:
+        return {
+            stage: _PageRow(row_id, status, metadata or {})
+            for row_id, stage, status, metadata in db.query(
+                JobStage.id, JobStage.stage, JobStage.status, JobStage.stage_metadata
+            ).filter(JobStage.job_id == job_id, JobStage.page_number == page_number)
+        }
+
+    def _context(self, job_id: str, job_info: Dict[str, Any], page_number: int,
+                 rows: Dict[str, _PageRow]) -> PageContext:
+        values: Dict[str, Any] = {}
+        for spec in self.graph.stages:
+            if spec.name in rows:
+                values.update(rows[spec.name].metadata)
+        return PageContext(job_id, page_number, job_info, values)
+
+    def _scheduled(self, spec: StageSpec) -> bool:
+        return self.scheduler is not None and self.scheduler.limit(spec.name) > 0
+
+    @staticmethod
+    def _new_row(job_id: str, spec: StageSpec, page_number: int, status: str,
+                 metadata: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        return {
+            'id': str(uuid.uuid4()),
+            'job_id': job_id,
+            'stage': spec.name,
+            'page_number': page_number,
+            'status': status,
+            # Roots stay pending until their worker picks them up (as OCR always has)
+            'started_at': now if status == 'in_progress' else None,
+            'completed_at': now if status == 'skipped' else None,
+            'retry_count': 0,
+            'stage_metadata': metadata,
+            'created_at': now,
+        }
+
+    def _initial_status(self, spec: StageSpec, context: PageContext, in_flight: int) -> str:
+        if spec.skip_if and spec.skip_if(context):
+            logger.info(f"Skipping {spec.name} for page {context.page_number}", extra={"job_id": context.job_id})
+            return 'skipped'
+        if self._scheduled(spec):
+            return QUEUED  # the scheduler hands out the slots
+        if spec.concurrency and in_flight >= spec.concurrency:
+            return QUEUED
+        return 'in_progress' if spec.inputs else 'pending'
+
+    @staticmethod
+    def _in_flight(db, job_id: str, stage: str) -> int:
+        return db.query(func.count(JobStage.id)).filter(
+            JobStage.job_id == job_id,
+            JobStage.stage == stage,
+            JobStage.status.in_(IN_FLIGHT),
+        ).scalar()
+
+    def _settled(self, rows: Dict[str, _PageRow]) -> bool:
+        """Whether all terminal stages of a page have settled."""
+        return all(name in rows and rows[name].status in SETTLED for name in self._terminals)
+
+    def _advance(self, db, job_id: str, job_info: Dict[str, Any], page_number: int,
+                 rows: Dict[str, _PageRow], pump: bool = True) -> List[Dispatch]:
+        """Open every stage of the page whose inputs have all settled (skips cascade).
+
+        ``rows`` is updated in place; the new rows are inserted in one statement.
+        Scheduled stages are queued and pumped afterwards unless ``pump`` is off.
+        """
+        dispatches: List[Dispatch] = []
+        new_rows: List[Dict[str, Any]] = []
+        now = datetime.utcnow()
+        opened = True
+        while opened:
+            opened = False
+            context = self._context(job_id, job_info, page_number, rows)
+            for spec in self.graph.stages:
+                if spec.name in rows or not spec.inputs:
+                    continue
+                if not all(name in rows and rows[name].status in SETTLED for name in spec.inputs):
+                    continue
+                metadata = {'drawing_name': context.drawing_name}
+                for name in spec.inputs:
+                    metadata.update({
+                        key: context.values[key] for key in self.graph.get(name).outputs if key in context.values
+                    })
+                stage_context = PageContext(job_id, page_number, job_info, {**context.values, **metadata})
+                in_flight = self._in_flight(db, job_id, spec.name) if spec.concurrency and not self._scheduled(spec) else 0
+                status = self._initial_status(spec, stage_context, in_flight)
+                row = self._new_row(job_id, spec, page_number, status, metadata, now)
+                new_rows.append(row)
+                rows[spec.name] = _PageRow(row['id'], status, metadata)
+                if status in IN_FLIGHT:
+                    dispatches.append(Dispatch(job_id, page_number, spec, spec.build_task(stage_context)))
+                opened = opened or status == 'skipped'
+        if new_rows:
+            db.execute(insert(JobStage), new_rows)
+        if pump:
+            for spec in self.graph.stages:
+                if spec.name in rows and rows[spec.name].status == QUEUED and self._scheduled(spec):
+                    dispatches += self._pump(db, spec, {(job_id, page_number): rows})
+        return dispatches
+
+    def _pump(self, db, spec: StageSpec,
+              known: Optional[Dict[Tuple[str, int], Dict[str, _PageRow]]] = None) -> List[Dispatch]:
+        """Let the scheduler fill the free slots of ``spec`` from every job's queued pages."""
+        known = known or {}
+        status = 'in_progress' if spec.inputs else 'pending'
+        dispatches: List[Dispatch] = []
+        for page in self.scheduler.pump(db, spec.name, status, per_job_limit=spec.concurrency):
+            job_info = self._job_info(db, page.job_id)
+            if job_info is None:
+                continue
+            rows = known.get((page.job_id, page.page_number)) or self._page_rows(db, page.job_id, page.page_number)
+            context = self._context(page.job_id, job_info, page.page_number, rows)
+            dispatches.append(Dispatch(page.job_id, page.page_number, spec, spec.build_task(context)))
+        return dispatches
+
+    def _release(self, db, job_id: str, job_info: Dict[str, Any], spec: StageSpec) -> List[Dispatch]:
+        """Dispatch queued pages of ``spec`` into the slots that are free now."""
+        if self._scheduled(spec):
+            return self._pump(db, spec)
+        if not spec.concurrency:
+            return []
+        free = spec.concurrency - self._in_flight(db, job_id, spec.name)
+        if free <= 0:
+            return []
+        queued = db.query(JobStage.id, JobStage.page_number).filter_by(
+            job_id=job_id, stage=spec.name, status=QUEUED
+        ).order_by(JobStage.page_number).limit(free).all()
+        if not queued:
+            return []
+        status = 'in_progress' if spec.inputs else 'pending'
+        db.execute(
+            update(JobStage)
+            .where(JobStage.id.in_([row_id for row_id, _ in queued]), JobStage.status == QUEUED)
+            .values(status=status, started_at=datetime.utcnow() if spec.inputs else None)
+            .execution_options(synchronize_session=False)
+        )
+        return [
+            Dispatch(job_id, page, spec, spec.build_task(
+                self._context(job_id, job_info, page, self._page_rows(db, job_id, page))
+            ))
+            for _, page in queued
+        ]
+
+    def _count_settled_pages(self, db, job_id: str, job_info: Dict[str, Any], pages: int) -> None:
+        """Atomically add settled pages to the job and complete it with the last one."""
+        completed_pages = db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(completed_pages=func.coalesce(Job.completed_pages, 0) + pages)
+            .returning(Job.completed_pages)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        total_pages = job_info['total_pages']
+        if total_pages and completed_pages is not None and completed_pages >= total_pages:
+            finished = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status != 'completed')
+                .values(status='completed', completed_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if finished:
+                logger.info(f"All {total_pages} pages complete. Job {job_id} finished!")
+
+
+# =============================================================================
+# Streaming comparison pipeline: OCR -> Diff -> Summary per page
+# =============================================================================
+
+def _task_metadata(context: PageContext) -> Dict[str, Any]:
+    return {
+        'project_id': context.job['project_id'],
+        'total_pages': context.job['total_pages'],
+        'priority': context.job['priority'],
+    }
+
+
+def _ocr_task(context: PageContext) -> Dict[str, Any]:
+    job = context.job
+    return TaskPublisher.ocr_task_message(
+        job_id=context.job_id,
+        drawing_version_id=f"{job['old_version_id']}:{job['new_version_id']}",
+        metadata={
+            'job_id': context.job_id,
+            'page_number': context.page_number,
+            'old_page_gcs': context.values.get('old_page_gcs'),
+            'new_page_gcs': context.values.get('new_page_gcs'),
+            'old_version_id': job['old_version_id'],
+            'new_version_id': job['new_version_id'],
+            'drawing_name': context.drawing_name,
+            'metadata': _task_metadata(context),
+        },
+    )
+
+
+def _diff_task(context: PageContext) -> Dict[str, Any]:
+    job = context.job
+    return TaskPublisher.diff_task_message(
+        job_id=context.job_id,
+        old_version_id=job['old_version_id'],
+        new_version_id=job['new_version_id'],
+        metadata={
+            'job_id': context.job_id,
+            'page_number': context.page_number,
+            'old_version_id': job['old_version_id'],
+            'new_version_id': job['new_version_id'],
+            'old_page_gcs': context.values.get('old_page_gcs'),
+            'new_page_gcs': context.values.get('new_page_gcs'),
+            'old_ocr_ref': context.values.get('old_ocr_ref'),
+            'new_ocr_ref': context.values.get('new_ocr_ref'),
+            'drawing_name': context.drawing_name,
+            'metadata': _task_metadata(context),
+        },
+    )
+
+
+def _summary_task(context: PageContext) -> Dict[str, Any]:
+    return TaskPublisher.summary_task_message(
+        job_id=context.job_id,
+        diff_result_id=context.values.get('diff_result_id'),
+        overlay_ref=context.values.get('overlay_ref'),
+        metadata={
+            'job_id': context.job_id,
+            'page_number': context.page_number,
+            'diff_result_id': context.values.get('diff_result_id'),
+            'overlay_ref': context.values.get('overlay_ref'),
+            'drawing_name': context.drawing_name,
+            'streaming': True,  # summary worker reports back per page
+            'metadata': _task_metadata(context),
+        },
+    )
+
+
+def _stored_diff(db, context: PageContext) -> Optional[Dict[str, Any]]:
+    """The page's DiffResult from an earlier run (written before its completion was reported)."""
+    result = db.query(DiffResult).filter_by(
+        job_id=context.job_id, page_number=context.page_number
+    ).order_by(DiffResult.created_at.desc()).first()
+    if result is None:
+        return None
+    return {
+        'diff_result_id': result.id,
+        'overlay_ref': (result.diff_metadata or {}).get('overlay_image_ref'),
+        'change_count': result.change_count,
+    }
+
+
+def _placeholder_summary(db, context: PageContext) -> bool:
+    """Whether the page's active summary is still the placeholder left when the AI calls failed."""
+    diff_result_id = context.values.get('diff_result_id')
+    if not diff_result_id:
+        return False
+    return db.query(ChangeSummary.id).filter(
+        ChangeSummary.diff_result_id == diff_result_id,
+        ChangeSummary.is_active.is_(True),
+        ChangeSummary.source == 'pending',
+    ).first() is not None
+
+
+def _stored_summary(db, context: PageContext) -> Optional[Dict[str, Any]]:
+    """The active summary of the page's diff, unless it is a placeholder awaiting AI analysis."""
+    diff_result_id = context.values.get('diff_result_id')
+    if not diff_result_id:
+        return None
+    summary_id = db.query(ChangeSummary.id).filter(
+        ChangeSummary.diff_result_id == diff_result_id,
+        ChangeSummary.is_active.is_(True),
+        ChangeSummary.source.notin_(('pending', 'batch_pending')),
+    ).scalar()
+    return {'summary_id': summary_id} if summary_id else None
+
+
+def unchanged_page(context: PageContext) -> bool:
+    """The diff found nothing to summarise (only with SKIP_UNCHANGED_PAGE_SUMMARY)."""
+    return config.SKIP_UNCHANGED_PAGE_SUMMARY and context.values.get('change_count') == 0
+
+
+def page_pipeline(concurrency: Optional[Dict[str, int]] = None) -> StageGraph:
+    """The per-page comparison pipeline; ``concurrency`` caps in-flight pages per stage and job."""
+    limits = concurrency or {}
+    return StageGraph([
+        StageSpec(
+            name='ocr',
+            queue='ocr',
+            build_task=_ocr_task,
+            outputs=('old_ocr_ref', 'new_ocr_ref'),
+            concurrency=limits.get('ocr', 0),
+            result_ref=lambda out: f"{out.get('old_ocr_ref', '')}|{out.get('new_ocr_ref', '')}",
+        ),
+        StageSpec(
+            name='diff',
+            queue='diff',
+            build_task=_diff_task,
+            inputs=('ocr',),
+            outputs=('diff_result_id', 'overlay_ref', 'change_count'),
+            concurrency=limits.get('diff', 0),
+            result_ref=lambda out: out.get('diff_result_id'),
+            recover=_stored_diff,
+        ),
+        StageSpec(
+            name='summary',
+            queue='summary',
+            build_task=_summary_task,
+            inputs=('diff',),
+            outputs=('summary_id',),
+            concurrency=limits.get('summary', 0),
+            retry=RetryPolicy(max_attempts=2),
+            skip_if=unchanged_page,
+            result_ref=lambda out: out.get('summary_id'),
+            recover=_stored_summary,
+            placeholder=_placeholder_summary,
+        ),
+    ])
+
+
+__all__ = [
+    'Dispatch',
+    'PageContext',
+    'ResumeReport',
+    'RetryPolicy',
+    'StageGraph',
+    'StageGraphEngine',
+    'StageSpec',
+    'mark_page_stage',
+    'page_pipeline',
+    'unchanged_page',
+]
@@ -0,0 +1,213 @@
+"""
+Idempotent stage execution ledger.
+
+Pub/Sub (and the local queue) deliver at least once, and a redelivered OCR
+or summary task used to repeat its model calls and write duplicate
+DiffResult/ChangeSummary rows. Workers now claim a ledger entry keyed by
+(job, stage, page, input hash) before doing any work:
+
+- ``acquired``: this worker runs the stage and calls ``complete`` with its
+  result (or ``release`` on failure so a retry can take over at once)
+- ``completed``: an earlier delivery already ran it - replay ``result``
+- ``busy``: another worker holds a live lease - ack and let it finish; if
+  it dies its own message is redelivered and takes over the expired lease
+  (resuming the job expires it at once, see ``expire_leases``)
+
+Claims are a single INSERT against the unique claim key, or a guarded
+UPDATE of an expired lease, so two deliveries never both acquire.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import config
+from gcp.database.models import StageExecution
+
+logger = logging.getLogger(__name__)
+
+ACQUIRED = 'acquired'
+COMPLETED = 'completed'
+BUSY = 'busy'
+
+
+def input_hash(inputs: Any) -> str:
+    """Stable hash of a task's inputs (key order does not matter)."""
+    payload = json.dumps(inputs, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _json_safe(result: Dict[str, Any]) -> Dict[str, Any]:
+    return json.loads(json.dumps(result, default=str))
+
+
+@dataclass
+class Claim:
+    key: str
+    state: str  # acquired, completed, busy
+    owner: str
+    job_id: str
+    stage: str
+    page_number: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    attempts: int = 1
+
+    @property
+    def acquired(self) -> bool:
+        return self.state == ACQUIRED
+
+    @property
+    def completed(self) -> bool:
+        return self.state == COMPLETED
+
+
+class StageLedger:
+    """Claims, leases and stored results of stage executions."""
+
+    def __init__(self, session_factory: Callable, lease_seconds: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds if lease_seconds is not None else config.STAGE_LEDGER_LEASE_SECONDS
+        self.enabled = enabled if enabled is not None else config.STAGE_LEDGER_ENABLED
+        self._worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    def claim(self, job_id: str, stage: str, page_number: Optional[int], inputs: Any) -> Claim:
+        """Claim the execution of ``stage`` for these inputs."""
+        digest = input_hash(inputs)
+        key = hashlib.sha256(f"{job_id}|{stage}|{page_number}|{digest}".encode('utf-8')).hexdigest()
+        claim = Claim(key, ACQUIRED, f"{self._worker}:{uuid.uuid4().hex[:12]}", job_id, stage, page_number)
+        if not self.enabled:
+            return claim
+
+        now = datetime.utcnow()
+        lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+        with self.session_factory() as db:
+            try:
+                db.execute(insert(StageExecution).values(
+                    id=str(uuid.uuid4()),
+                    claim_key=key,
+                    job_id=job_id,
+                    stage=stage,
+                    page_number=page_number,
+                    input_hash=digest,
+                    status='running',
+                    owner=claim.owner,
+                    lease_expires_at=lease_expires_at,
+                    attempts=1,
+                    created_at=now,
+                ))
+                db.commit()
+                return claim
+            except IntegrityError:
+                db.rollback()
+
+            # Seen before: take over an expired lease, else report what is there
+            attempts = db.execute(
+                update(StageExecution)
+                .where(
+                    StageExecution.claim_key == key,
+                    StageExecution.status == 'running',
+                    StageExecution.lease_expires_at < now,
+                )
+                .values(owner=claim.owner, lease_expires_at=lease_expires_at, attempts=StageExecution.attempts + 1)
+                .returning(StageExecution.attempts)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if attempts is not None:
+                db.commit()
+                logger.warning(
+                    f"Took over expired {stage} claim for page {page_number} (attempt {attempts})",
+                    extra={"job_id": job_id},
+                )
+                claim.attempts = attempts
+                return claim
+
+            row = db.execute(
+                select(StageExecution.status, StageExecution.result, StageExecution.attempts)
+                .where(StageExecution.claim_key == key)
+            ).first()
+            db.rollback()
+        if row is None:
+            # Deleted between our INSERT and SELECT (job removed) - nothing to deduplicate against
+            return claim
+        status, result, attempts = row
+        claim.state = COMPLETED if status == 'completed' else BUSY
+        claim.result, claim.attempts = result, attempts or 1
+        logger.info(
+            f"Redelivered {stage} for page {page_number}: {claim.state}",
+            extra={"job_id": job_id},
+        )
+        return claim
+
+    def complete(self, claim: Claim, result: Dict[str, Any]) -> bool:
+        """Store the result; False if the lease was lost to another worker meanwhile."""
+        if not self.enabled:
+            return True
+        with self.session_factory() as db:
+            changed = db.execute(
+                update(StageExecution)
+                .where(StageExecution.claim_key == claim.key, StageExecution.owner == claim.owner)
+                .values(status='completed', result=_json_safe(result), completed_at=datetime.utcnow(),
+                        lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        if not changed:
+            logger.warning(
+                f"Lost the {claim.stage} claim for page {claim.page_number} before completing",
+                extra={"job_id": claim.job_id},
+            )
+        return bool(changed)
+
+    def release(self, claim: Claim) -> None:
+        """Give up an acquired claim (the run failed) so the next delivery takes over at once."""
+        if not self.enabled or not claim.acquired:
+            return
+        with self.session_factory() as db:
+            db.execute(
+                update(StageExecution)
+                .where(
+                    StageExecution.claim_key == claim.key,
+                    StageExecution.owner == claim.owner,
+                    StageExecution.status == 'running',
+                )
+                .values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+
+def expire_leases(db, job_id: str, stages: Iterable[Tuple[int, str]]) -> int:
+    """Expire the running claims of these (page, stage) pairs (caller commits).
+
+    Used when resume dispatches in-flight stages again: their worker may have
+    died inside its lease, and the new copy must take the claim over instead of
+    finding it busy. A worker that is in fact still running loses its claim.
+    """
+    expired = 0
+    expires_at = datetime.utcnow() - timedelta(seconds=1)
+    for page_number, stage in stages:
+        expired += db.execute(
+            update(StageExecution)
+            .where(
+                StageExecution.job_id == job_id,
+                StageExecution.stage == stage,
+                StageExecution.page_number == page_number,
+                StageExecution.status == 'running',
+            )
+            .values(lease_expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return expired
+
+
+__all__ = ['Claim', 'StageLedger', 'expire_leases', 'input_hash']
@@ -1,5 +1,7 @@
 """Shared pytest fixtures for backend tests."""
 
+from contextlib import contextmanager
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -38,6 +40,33 @@ def db(engine):
         connection.close()
 
 
+@pytest.fixture
+def session_config():
+    """Config overrides for ``session_scope``; a module overrides this fixture to set its own."""
+    return {}
+
+
+@pytest.fixture
+def session_scope(engine, monkeypatch, session_config):
+    """Session factory on ``engine`` that the orchestrator uses as ``get_db_session``."""
+    from services import orchestrator as orchestrator_module
+
+    SessionLocal = sessionmaker(bind=engine)
+
+    @contextmanager
+    def scope():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setattr(orchestrator_module, "get_db_session", scope)
+    for name, value in session_config.items():
+        monkeypatch.setattr(config, name, value, raising=False)
+    return scope
+
+
 @pytest.fixture(autouse=True)
 def neutral_config(monkeypatch):
     """Ensure sensitive config-driven keys are blank during tests."""
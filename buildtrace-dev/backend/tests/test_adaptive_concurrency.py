@@ -0,0 +1,74 @@
+"""Tests for the adaptive per-instance concurrency limit of queue subscribers."""
+
+from utils.adaptive_concurrency import PROFILES, AdaptiveConcurrency
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _gate(profile, resources, clock, **kwargs):
+    return AdaptiveConcurrency(PROFILES[profile], interval=10, sampler=lambda: resources["sample"],
+                               clock=clock, **kwargs)
+
+
+def test_io_profile_grows_with_backlog_and_backs_off_under_pressure():
+    clock, resources = _Clock(), {"sample": (0.2, 500.0)}
+    gate = _gate("io", resources, clock, target_rss_mb=4000)
+    assert gate.limit == 4
+
+    # Every slot busy and messages arrive 30s late: raise by the profile step
+    for _ in range(4):
+        gate.acquire(lag_seconds=30)
+    clock.now += 10
+    gate.release()
+    assert gate.limit == 6
+
+    # Idle and current: hold
+    for _ in range(3):
+        gate.release()
+    clock.now += 10
+    assert gate.adjust() == 6
+
+    resources["sample"] = (0.95, 500.0)
+    assert gate.adjust() == 4  # CPU above target: multiplicative decrease
+
+    resources["sample"] = (0.2, 500.0)
+    for _ in range(5):
+        gate.acquire()
+        gate.release(ok=False)
+    assert gate.adjust() == 3  # most messages failing upstream
+
+
+def test_cpu_profile_starts_at_one_and_respects_memory():
+    clock, resources = _Clock(), {"sample": (0.3, 100.0)}
+    gate = _gate("cpu", resources, clock, target_rss_mb=1000)
+    assert gate.limit == 1
+    gate.acquire(lag_seconds=120)
+    assert gate.adjust() == 2
+
+    resources["sample"] = (0.3, 1500.0)
+    assert gate.adjust() == 1
+    assert gate.adjust() == 1  # never below the profile minimum
+
+
+def test_provider_throttling_lowers_the_limit():
+    clock, resources = _Clock(), {"sample": (0.2, 500.0)}
+    stats = {"openai:gpt": {"calls": 40, "transient_errors": 2, "rejected": 0, "hedged": 0}}
+    gate = _gate("io", resources, clock, target_rss_mb=4000, provider_stats=lambda: stats)
+    assert gate.limit == 4
+
+    # Every message succeeds after retries, but 4 of 10 model calls were throttled
+    stats["openai:gpt"].update(calls=50, transient_errors=6)
+    assert gate.adjust() == 3
+
+    stats["openai:gpt"].update(calls=60, transient_errors=7)
+    assert gate.adjust() == 3  # throttling back under target: hold
+
+    # Calls rejected by an open circuit count as throttled too
+    stats["gemini:flash"] = {"calls": 0, "transient_errors": 0, "rejected": 5, "hedged": 0}
+    assert gate.adjust() == 2
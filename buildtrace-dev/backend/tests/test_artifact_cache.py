@@ -0,0 +1,65 @@
+"""Tests for the per-run summary artifact cache."""
+
+import io
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from utils.artifact_cache import ArtifactLRU, RunArtifacts
+
+
+class CountingStorage:
+    def __init__(self, files):
+        self.files = files
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def download_file(self, path: str) -> bytes:
+        with self._lock:
+            self.calls[path] += 1
+        threading.Event().wait(0.02)  # widen the window for concurrent callers
+        return self.files[path]
+
+
+def _png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_both_models_share_one_download_per_ref():
+    refs = {'overlays/o.png': _png('red'), 'pages/old.png': _png('white'), 'pages/new.png': _png('gray')}
+    storage = CountingStorage(dict(refs))
+    artifacts = RunArtifacts(storage)
+
+    def gpt():
+        return [artifacts.prepared(ref, 'openai', keep_color=ref.startswith('overlays')) for ref in refs]
+
+    def gemini():
+        return [artifacts.pil(ref, 'gemini', keep_color=ref.startswith('overlays')) for ref in refs]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        gpt_future, gemini_future = pool.submit(gpt), pool.submit(gemini)
+        gpt_images, gemini_images = gpt_future.result(), gemini_future.result()
+
+    assert storage.calls == Counter({ref: 1 for ref in refs})
+    assert artifacts.downloads == 3
+    assert gpt_images[0].data_url().startswith('data:image/')
+    assert gemini_images[0].size == (64, 48)
+    # Repeated asks return the memoized object rather than re-decoding
+    assert artifacts.pil('overlays/o.png', 'gemini', keep_color=True) is gemini_images[0]
+
+
+def test_shared_lru_skips_download_across_runs_and_evicts_by_size():
+    storage = CountingStorage({'a': b'x' * 60, 'b': b'y' * 60})
+    shared = ArtifactLRU(max_bytes=100)
+
+    RunArtifacts(storage, shared=shared).download('a')
+    assert RunArtifacts(storage, shared=shared).download('a') == b'x' * 60
+    assert storage.calls['a'] == 1
+
+    RunArtifacts(storage, shared=shared).download('b')  # evicts 'a'
+    assert shared.get('a') is None
+    assert shared.get('b') == b'y' * 60
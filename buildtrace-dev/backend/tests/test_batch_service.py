@@ -0,0 +1,336 @@
+"""Tests for batch-priority OCR and summaries submitted through provider batches."""
+
+from __future__ import annotations
+
+import io
+import json
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from uuid import uuid4
+
+import pytest
+from PIL import Image
+from sqlalchemy.orm import sessionmaker
+
+from gcp.database.models import BatchRequest, ChangeSummary, DiffResult, Job, JobStage
+from processing import OCRPipeline, SummaryPipeline
+from services.batch_service import BatchService
+from utils.batch_provider import LocalBatchProvider
+from workers import OCRWorker, SummaryWorker
+
+
+class InMemoryStorage:
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+
+    def download_file(self, path: str) -> bytes:
+        return self.files[path]
+
+    def upload_file(self, file_content: bytes, destination_path: str, content_type: str | None = None, **_) -> str:
+        self.files[destination_path] = bytes(file_content)
+        return destination_path
+
+
+class RecordingOrchestrator:
+    def __init__(self):
+        self.events = []
+
+    def on_page_ocr_complete(self, **kwargs):
+        self.events.append(("page_ocr", kwargs))
+
+    def on_page_batch_pending(self, job_id, stage, page_number):
+        self.events.append(("batch_pending", stage))
+
+    def on_summary_complete(self, job_id):
+        self.events.append(("summary", job_id))
+
+    def on_page_summary_complete(self, job_id, page_number, summary_id):
+        self.events.append(("page_summary", page_number))
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def session_factory(engine):
+    SessionLocal = sessionmaker(bind=engine)
+    # The engine shares one SQLite connection; the OCR worker queues both pages from threads
+    lock = threading.RLock()
+
+    @contextmanager
+    def _session_scope():
+        with lock:
+            session = SessionLocal()
+            try:
+                yield session
+                session.commit()
+            finally:
+                session.close()
+
+    return _session_scope
+
+
+def _seed_job(session_factory, **stage_kwargs) -> str:
+    job_id = str(uuid4())
+    with session_factory() as session:
+        session.add(Job(
+            id=job_id,
+            project_id=str(uuid4()),
+            old_drawing_version_id=str(uuid4()),
+            new_drawing_version_id=str(uuid4()),
+            status="in_progress",
+            created_by=str(uuid4()),
+            job_metadata={"priority": "batch"},
+        ))
+        session.add(JobStage(id=str(uuid4()), job_id=job_id, **stage_kwargs))
+    return job_id
+
+
+def test_batch_ocr_completes_stage_and_chains_to_diff(session_factory, tmp_path):
+    storage = InMemoryStorage()
+    storage.files["pages/old/page_001.png"] = _png()
+    storage.files["pages/new/page_001.png"] = _png() + b"revised"
+    job_id = _seed_job(
+        session_factory,
+        stage="ocr",
+        page_number=1,
+        status="pending",
+    )
+
+    pipeline = OCRPipeline(storage_service=storage, session_factory=session_factory)
+    pipeline.model = "gpt-4o"
+    orchestrator = RecordingOrchestrator()
+    worker = OCRWorker(pipeline=pipeline, orchestrator=orchestrator, session_factory=session_factory)
+
+    result = worker.process_streaming_message({
+        "job_id": job_id,
+        "page_number": 1,
+        "old_page_gcs": "pages/old/page_001.png",
+        "new_page_gcs": "pages/new/page_001.png",
+        "drawing_name": "A-101",
+        "metadata": {"priority": "batch"},
+    })
+    assert result["status"] == "batch_pending"
+    assert orchestrator.events == [("batch_pending", "ocr")]
+    with session_factory() as session:
+        assert session.query(JobStage).filter_by(job_id=job_id, stage="ocr").one().status == "batch_pending"
+    orchestrator.events.clear()
+
+    provider = LocalBatchProvider(str(tmp_path / "batches"))
+    service = BatchService(
+        provider=provider, session_factory=session_factory, ocr_pipeline=pipeline, orchestrator=orchestrator
+    )
+    batch_ids = service.submit_queued()
+    assert len(batch_ids) == 1
+    assert len(provider.pending_requests(batch_ids[0])) == 2
+    assert service.poll() == 0  # provider has not answered yet
+
+    provider.complete(batch_ids[0], lambda body: json.dumps({"title_block": {"sheet_number": "A-101"}}))
+    assert service.poll() == 2
+
+    payload = json.loads(storage.files["ocr_pages/new_page_1.json"])
+    assert payload["extracted_info"]["sections"]["title_block"]["sheet_number"] == "A-101"
+    assert [event for event, _ in orchestrator.events] == ["page_ocr"]
+    assert orchestrator.events[0][1]["new_ocr_ref"] == "ocr_pages/new_page_1.json"
+    assert orchestrator.events[0][1]["drawing_name"] == "A-101"  # carried by the batch request
+    with session_factory() as session:
+        statuses = {r.status for r in session.query(BatchRequest).filter_by(job_id=job_id)}
+    assert statuses == {"completed"}
+
+
+def test_batch_summary_replaces_placeholder_and_completes_stage(session_factory, tmp_path):
+    storage = InMemoryStorage()
+    storage.files["diffs/d.json"] = json.dumps({"change_count": 2, "alignment_score": 0.9}).encode()
+    storage.files["overlays/d.png"] = _png()
+    job_id = _seed_job(session_factory, stage="summary", status="in_progress")
+    diff_result_id = str(uuid4())
+    with session_factory() as session:
+        session.add(DiffResult(
+            id=diff_result_id,
+            job_id=job_id,
+            old_drawing_version_id=str(uuid4()),
+            new_drawing_version_id=str(uuid4()),
+            machine_generated_overlay_ref="diffs/d.json",
+            diff_metadata={"drawing_name": "A-101", "page_number": 1},
+        ))
+
+    pipeline = SummaryPipeline(storage_service=storage, session_factory=session_factory)
+    pipeline.model = pipeline.openai_model = "gpt-4o"
+    orchestrator = RecordingOrchestrator()
+    worker = SummaryWorker(pipeline=pipeline, orchestrator=orchestrator, session_factory=session_factory)
+
+    queued = worker.process_message({
+        "job_id": job_id,
+        "diff_result_id": diff_result_id,
+        "overlay_ref": "overlays/d.png",
+        "metadata": {"priority": "batch", "page_number": 1},
+    })
+    assert queued["batch_pending"] is True
+    with session_factory() as session:
+        assert session.query(JobStage).filter_by(job_id=job_id).first().status == "in_progress"
+
+    provider = LocalBatchProvider(str(tmp_path / "batches"))
+    service = BatchService(
+        provider=provider, session_factory=session_factory, summary_pipeline=pipeline, orchestrator=orchestrator
+    )
+    (batch_id,) = service.submit_queued()
+    provider.complete(batch_id, lambda body: json.dumps({
+        "ai_summary": "Door moved.",
+        "changes": [{"title": "Door 101 relocated", "change_type": "modified"}],
+    }))
+    assert service.poll() == 1
+
+    with session_factory() as session:
+        summaries = session.query(ChangeSummary).filter_by(diff_result_id=diff_result_id).all()
+        active = [s for s in summaries if s.is_active]
+        assert len(active) == 1 and active[0].source == "gpt-4-vision"
+        assert "Door 101 relocated" in active[0].summary_text
+        stage = session.query(JobStage).filter_by(job_id=job_id).first()
+        assert stage.status == "completed"
+        assert stage.result_ref == active[0].id
+    assert orchestrator.events == [("summary", job_id)]
+
+
+def test_failed_batch_summary_keeps_placeholder_and_completes_stage(session_factory, tmp_path):
+    storage = InMemoryStorage()
+    storage.files["diffs/e.json"] = json.dumps({"change_count": 1, "alignment_score": 0.8}).encode()
+    storage.files["overlays/e.png"] = _png()
+    job_id = _seed_job(session_factory, stage="summary", status="in_progress")
+    diff_result_id = str(uuid4())
+    with session_factory() as session:
+        session.add(DiffResult(
+            id=diff_result_id,
+            job_id=job_id,
+            old_drawing_version_id=str(uuid4()),
+            new_drawing_version_id=str(uuid4()),
+            machine_generated_overlay_ref="diffs/e.json",
+            diff_metadata={"drawing_name": "A-102", "page_number": 1},
+        ))
+
+    pipeline = SummaryPipeline(storage_service=storage, session_factory=session_factory)
+    pipeline.model = pipeline.openai_model = "gpt-4o"
+    orchestrator = RecordingOrchestrator()
+    worker = SummaryWorker(pipeline=pipeline, orchestrator=orchestrator, session_factory=session_factory)
+    worker.process_message({
+        "job_id": job_id,
+        "diff_result_id": diff_result_id,
+        "overlay_ref": "overlays/e.png",
+        "metadata": {"priority": "batch", "page_number": 1},
+    })
+
+    provider = LocalBatchProvider(str(tmp_path / "batches"))
+    service = BatchService(
+        provider=provider, session_factory=session_factory, summary_pipeline=pipeline, orchestrator=orchestrator
+    )
+    (batch_id,) = service.submit_queued()
+
+    def rate_limited(body):
+        raise RuntimeError("rate limited")
+
+    provider.complete(batch_id, rate_limited)
+    assert service.poll() == 1
+
+    with session_factory() as session:
+        active = session.query(ChangeSummary).filter_by(diff_result_id=diff_result_id, is_active=True).one()
+        # The placeholder's metric rows are recomputed in place, one per metric
+        assert active.source == "pending"
+        assert len({row.metric for row in active.metrics}) == len(active.metrics) > 0
+        assert session.query(JobStage).filter_by(job_id=job_id).first().status == "completed"
+        requests = [(r.status, r.error_message) for r in session.query(BatchRequest).filter_by(job_id=job_id)]
+    assert requests == [("failed", "rate limited")]
+    assert orchestrator.events == [("summary", job_id)]
+
+
+def test_streaming_batch_summaries_report_each_page(session_factory, tmp_path):
+    storage = InMemoryStorage()
+    storage.files["overlays/p.png"] = _png()
+    job_id = _seed_job(session_factory, stage="summary", page_number=1, status="in_progress")
+    diff_ids = {}
+    with session_factory() as session:
+        session.add(JobStage(id=str(uuid4()), job_id=job_id, stage="summary", page_number=2, status="in_progress"))
+        for page in (1, 2):
+            storage.files[f"diffs/p{page}.json"] = json.dumps({"change_count": 1}).encode()
+            diff_ids[page] = str(uuid4())
+            session.add(DiffResult(
+                id=diff_ids[page],
+                job_id=job_id,
+                old_drawing_version_id=str(uuid4()),
+                new_drawing_version_id=str(uuid4()),
+                page_number=page,
+                machine_generated_overlay_ref=f"diffs/p{page}.json",
+                diff_metadata={"drawing_name": f"A-10{page}", "page_number": page},
+            ))
+
+    pipeline = SummaryPipeline(storage_service=storage, session_factory=session_factory)
+    pipeline.model = pipeline.openai_model = "gpt-4o"
+    orchestrator = RecordingOrchestrator()
+    worker = SummaryWorker(pipeline=pipeline, orchestrator=orchestrator, session_factory=session_factory)
+    for page in (1, 2):
+        worker.process_message({
+            "job_id": job_id,
+            "diff_result_id": diff_ids[page],
+            "overlay_ref": "overlays/p.png",
+            "metadata": {"priority": "batch", "page_number": page, "streaming": True},
+        })
+    # The pages wait for the batch without holding summary slots
+    assert orchestrator.events == [("batch_pending", "summary")] * 2
+    with session_factory() as session:
+        statuses = {r.status for r in session.query(JobStage).filter_by(job_id=job_id, stage="summary")}
+    assert statuses == {"batch_pending"}
+    orchestrator.events.clear()
+
+    provider = LocalBatchProvider(str(tmp_path / "batches"))
+    service = BatchService(
+        provider=provider, session_factory=session_factory, summary_pipeline=pipeline, orchestrator=orchestrator
+    )
+    (batch_id,) = service.submit_queued()
+    provider.complete(batch_id, lambda body: json.dumps({"ai_summary": "Wall moved.", "changes": []}))
+    assert service.poll() == 2
+
+    # Each page goes to the stage graph; the job is not completed by the first summary
+    assert sorted(orchestrator.events) == [("page_summary", 1), ("page_summary", 2)]
+
+
+def test_submission_claims_queued_requests_before_calling_the_provider(session_factory, tmp_path):
+    job_id = _seed_job(session_factory, stage="summary", page_number=1, status="batch_pending")
+    with session_factory() as session:
+        session.add_all([
+            BatchRequest(job_id=job_id, kind="summary", request_body={"model": "gpt-4o", "n": n}) for n in range(3)
+        ])
+
+    class ConcurrentSubmitterProvider(LocalBatchProvider):
+        """A second submitter runs while the first is still talking to the provider."""
+
+        def __init__(self, root):
+            super().__init__(root)
+            self.other = None
+            self.fail = False
+            self.nested = []
+
+        def submit(self, requests):
+            if self.other:
+                self.nested.append(self.other.submit_queued())
+            if self.fail:
+                raise RuntimeError("provider unavailable")
+            return super().submit(requests)
+
+    provider = ConcurrentSubmitterProvider(str(tmp_path / "batches"))
+    service = BatchService(provider=provider, session_factory=session_factory)
+
+    provider.fail = True
+    assert service.submit_queued() == []
+    with session_factory() as session:
+        assert {r.status for r in session.query(BatchRequest).filter_by(job_id=job_id)} == {"queued"}
+
+    provider.fail = False
+    provider.other = BatchService(provider=LocalBatchProvider(str(tmp_path / "other")), session_factory=session_factory)
+    (batch_id,) = service.submit_queued()
+    assert provider.nested == [[]]  # every request was already claimed
+    assert len(provider.pending_requests(batch_id)) == 3
+    with session_factory() as session:
+        rows = session.query(BatchRequest).filter_by(job_id=job_id).all()
+        assert {(r.status, r.provider_batch_id) for r in rows} == {("submitted", batch_id)}
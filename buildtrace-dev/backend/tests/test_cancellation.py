@@ -0,0 +1,93 @@
+"""Tests for cooperative cancellation of in-flight page work."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+import pytest
+
+from config import config
+from gcp.database.models import Job, JobStage
+from gcp.pubsub import InMemoryPublisher
+from services.orchestrator import OrchestratorService
+from utils.cancellation import (
+    CancellationRegistry,
+    JobCancelled,
+    cancellation_scope,
+    checkpoint,
+    submit_with_context,
+)
+
+
+def _job(scope, status="in_progress"):
+    with scope() as session:
+        job = Job(
+            id=str(uuid4()),
+            project_id=str(uuid4()),
+            old_drawing_version_id=str(uuid4()),
+            new_drawing_version_id=str(uuid4()),
+            total_pages=2,
+            status=status,
+            created_by=str(uuid4()),
+        )
+        session.add(job)
+        session.commit()
+        return job.id
+
+
+def _cancel(scope, job_id):
+    with scope() as session:
+        session.get(Job, job_id).status = "cancelled"
+        session.commit()
+
+
+def test_checkpoints_raise_once_the_cached_lookup_sees_the_cancel(session_scope):
+    job_id = _job(session_scope)
+    registry = CancellationRegistry(session_scope, ttl=0.05)
+    token = registry.token(job_id)
+
+    with cancellation_scope(token):
+        checkpoint("after page download")
+        _cancel(session_scope, job_id)
+        checkpoint("before alignment")  # still within the TTL of the first lookup
+
+        time.sleep(0.06)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = submit_with_context(pool, checkpoint, "before gpt call")
+            with pytest.raises(JobCancelled) as raised:
+                future.result()
+    assert (raised.value.job_id, raised.value.step) == (job_id, "before gpt call")
+    checkpoint("outside any task")  # no scope, no check
+
+    # Jobs are never un-cancelled, so the answer is kept without further lookups
+    with session_scope() as session:
+        session.get(Job, job_id).status = "in_progress"
+        session.commit()
+    assert token.cancelled
+
+
+def test_dispatches_of_a_cancelled_job_are_skipped_not_published(session_scope, monkeypatch):
+    for stage in ("OCR", "DIFF", "SUMMARY"):  # rows from other tests must not hold the stage slots
+        monkeypatch.setattr(config, f"SCHEDULER_MAX_IN_FLIGHT_{stage}", 0, raising=False)
+    publisher = InMemoryPublisher()
+    orchestrator = OrchestratorService(publisher=publisher)
+    job_id = _job(session_scope)
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+        dispatches = orchestrator.stage_engine.start_job(session, job, {
+            page: {"drawing_name": f"A-10{page}", "old_page_gcs": f"old/{page}.png", "new_page_gcs": f"new/{page}.png"}
+            for page in (1, 2)
+        })
+        session.commit()
+    orchestrator._dispatch(dispatches)
+    assert len(publisher.messages("ocr")) == 2
+
+    # A page finishing OCR after the cancel must not start its diff
+    _cancel(session_scope, job_id)
+    orchestrator.cancellation.mark_cancelled(job_id)
+    orchestrator.on_page_ocr_complete(job_id, 1, "ocr/old-1", "ocr/new-1", "A-101")
+
+    assert publisher.messages("diff") == []
+    with session_scope() as session:
+        diff = session.query(JobStage).filter_by(job_id=job_id, stage="diff", page_number=1).one()
+        assert (diff.status, diff.error_message) == ("skipped", "Job cancelled")
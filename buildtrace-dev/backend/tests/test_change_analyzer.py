@@ -10,7 +10,7 @@ import shutil
 from pathlib import Path
 import cv2
 import numpy as np
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import patch, MagicMock
 
 from processing.change_analyzer import (
     ChangeAnalyzer,
@@ -65,33 +65,30 @@ class TestChangeAnalysisResult:
         assert result_dict['critical_change'] == "Critical change"
 
 
+@pytest.fixture
+def gateway():
+    """LLM gateway stand-in handing out a mock Gemini model"""
+    with patch('processing.change_analyzer.get_llm_gateway') as get_gateway:
+        yield get_gateway.return_value
+
+
 class TestChangeAnalyzer:
     """Test ChangeAnalyzer class"""
     
-    @patch('processing.change_analyzer.genai')
-    def test_init_with_api_key(self, mock_genai):
+    def test_init_with_api_key(self, gateway):
         """Test initializing analyzer with API key"""
-        mock_genai.configure = Mock()
-        mock_model = MagicMock()
-        mock_genai.GenerativeModel.return_value = mock_model
-        
         analyzer = ChangeAnalyzer(api_key="test-key", model="models/gemini-2.5-pro")
         
-        assert analyzer.model == mock_model
-        mock_genai.configure.assert_called_once_with(api_key="test-key")
+        assert analyzer.model == gateway.gemini_model.return_value
+        gateway.gemini_model.assert_called_once_with("models/gemini-2.5-pro", api_key="test-key")
     
-    @patch('processing.change_analyzer.genai')
     @patch.dict('os.environ', {'GEMINI_API_KEY': 'env-key'})
-    def test_init_from_env(self, mock_genai):
+    def test_init_from_env(self, gateway):
         """Test initializing analyzer from environment"""
-        mock_genai.configure = Mock()
-        mock_model = MagicMock()
-        mock_genai.GenerativeModel.return_value = mock_model
-        
         analyzer = ChangeAnalyzer()
         
-        assert analyzer.model == mock_model
-        mock_genai.configure.assert_called_once_with(api_key="env-key")
+        assert analyzer.model == gateway.gemini_model.return_value
+        assert gateway.gemini_model.call_args.kwargs == {"api_key": "env-key"}
     
     def test_init_missing_api_key(self):
         """Test error when API key is missing"""
@@ -99,13 +96,8 @@ class TestChangeAnalyzer:
             with pytest.raises(ValueError, match="GEMINI_API_KEY"):
                 ChangeAnalyzer()
     
-    @patch('processing.change_analyzer.genai')
-    def test_validate_overlay_folder(self, mock_genai, sample_overlay_folder):
+    def test_validate_overlay_folder(self, gateway, sample_overlay_folder):
         """Test validating overlay folder"""
-        mock_genai.configure = Mock()
-        mock_model = MagicMock()
-        mock_genai.GenerativeModel.return_value = mock_model
-        
         analyzer = ChangeAnalyzer(api_key="test-key")
         
         old_png, new_png, overlay_png = analyzer._validate_overlay_folder(sample_overlay_folder)
@@ -117,21 +109,17 @@ class TestChangeAnalyzer:
         assert "_new.png" in new_png
         assert "_overlay.png" in overlay_png
     
-    def test_validate_overlay_folder_missing(self, temp_dir):
+    def test_validate_overlay_folder_missing(self, gateway, temp_dir):
         """Test error when overlay folder is missing"""
-        with patch('processing.change_analyzer.genai'):
-            analyzer = ChangeAnalyzer(api_key="test-key")
-            
-            with pytest.raises(FileNotFoundError):
-                analyzer._validate_overlay_folder(str(temp_dir / "nonexistent"))
+        analyzer = ChangeAnalyzer(api_key="test-key")
+        
+        with pytest.raises(FileNotFoundError):
+            analyzer._validate_overlay_folder(str(temp_dir / "nonexistent"))
     
-    @patch('processing.change_analyzer.genai')
     @patch('processing.change_analyzer.Image')
-    def test_analyze_overlay_folder(self, mock_image, mock_genai, sample_overlay_folder):
+    def test_analyze_overlay_folder(self, mock_image, gateway, sample_overlay_folder):
         """Test analyzing overlay folder"""
         # Setup mocks
-        mock_genai.configure = Mock()
-        mock_model = MagicMock()
         mock_response = MagicMock()
         mock_response.text = """
         Most Critical Change: Room extended
@@ -143,8 +131,7 @@ class TestChangeAnalyzer:
         Recommendations:
         - Update foundation plans
         """
-        mock_model.generate_content.return_value = mock_response
-        mock_genai.GenerativeModel.return_value = mock_model
+        gateway.generate_content.return_value = mock_response
         
         # Mock PIL Image
         mock_pil_image = MagicMock()
@@ -157,14 +144,11 @@ class TestChangeAnalyzer:
         assert result.drawing_name == "A-101"
         assert len(result.changes_found) > 0
         assert result.critical_change is not None
+        # The call goes through the gateway with the gateway's model
+        assert gateway.generate_content.call_args.args[0] == gateway.gemini_model.return_value
     
-    @patch('processing.change_analyzer.genai')
-    def test_parse_analysis_response(self, mock_genai):
+    def test_parse_analysis_response(self, gateway):
         """Test parsing Gemini response"""
-        mock_genai.configure = Mock()
-        mock_model = MagicMock()
-        mock_genai.GenerativeModel.return_value = mock_model
-        
         analyzer = ChangeAnalyzer(api_key="test-key")
         
         analysis_text = """
@@ -186,8 +170,7 @@ class TestChangeAnalyzer:
         assert critical is not None
         assert len(recommendations) >= 2
     
-    @patch('processing.change_analyzer.genai')
-    def test_analyze_multiple_overlays(self, mock_genai, temp_dir):
+    def test_analyze_multiple_overlays(self, gateway, temp_dir):
         """Test analyzing multiple overlay folders"""
         # Create multiple overlay folders
         for name in ["A-101", "A-102"]:
@@ -200,12 +183,9 @@ class TestChangeAnalyzer:
             cv2.imwrite(str(overlay_dir / f"{name}_overlay.png"), img)
         
         # Setup mocks
-        mock_genai.configure = Mock()
-        mock_model = MagicMock()
         mock_response = MagicMock()
         mock_response.text = "Analysis text"
-        mock_model.generate_content.return_value = mock_response
-        mock_genai.GenerativeModel.return_value = mock_model
+        gateway.generate_content.return_value = mock_response
         
         with patch('processing.change_analyzer.Image'):
             analyzer = ChangeAnalyzer(api_key="test-key")
@@ -0,0 +1,92 @@
+"""Tests for precomputed summary change metrics and their SQL aggregation."""
+
+from uuid import uuid4
+
+from gcp.database.models import ChangeSummary, ChangeSummaryMetric, DiffResult, Job
+from services.change_metrics import (
+    attach_change_metrics,
+    compute_change_metrics,
+    job_change_metrics,
+    job_change_totals,
+)
+
+
+def test_structured_summary_counts_changes_by_type_category_and_keynote():
+    metrics = compute_change_metrics("ignored", {
+        "changes": [
+            {"title": "Duct rerouted", "change_type": "modified", "trade_affected": "HVAC"},
+            {"title": "Outlet added", "change_type": "added", "description": "New outlet on wall"},
+            {"title": "Door removed", "change_type": "removed", "location": "Room 101"},
+            {"title": "Noise", "change_type": "none"},
+        ],
+        "added_keynotes": [{"number": "6"}],
+        "modified_keynotes": [{"number": "8"}, {"number": "9"}],
+    })
+
+    assert (metrics["added"], metrics["modified"], metrics["removed"]) == (1, 1, 1)
+    assert metrics["category:MEP"] == 1  # "duct" and "hvac" in one change count once
+    assert metrics["category:Electrical"] == 1
+    assert metrics["category:Architectural"] == 1
+    assert (metrics["keynotes_added"], metrics["keynotes_modified"], metrics["keynotes_removed"]) == (1, 2, 0)
+
+
+def test_text_only_summary_keeps_line_scan():
+    metrics = compute_change_metrics("Wall added\nBeam removed\nSlab modified\nBeam added", {"pending_ai_analysis": True})
+    assert (metrics["added"], metrics["modified"], metrics["removed"]) == (2, 1, 1)
+    assert compute_change_metrics("Awaiting AI analysis.", None)["modified"] == 1
+
+
+def _diff(db, job_id):
+    diff = DiffResult(
+        id=str(uuid4()),
+        job_id=job_id,
+        old_drawing_version_id=str(uuid4()),
+        new_drawing_version_id=str(uuid4()),
+        machine_generated_overlay_ref="diffs/x.json",
+    )
+    db.add(diff)
+    return diff
+
+
+def _summary(diff, changes, is_active=True, with_metrics=True):
+    summary = ChangeSummary(
+        id=str(uuid4()),
+        diff_result_id=diff.id,
+        summary_text="structured",
+        summary_json={"changes": changes},
+        source="gemini",
+        is_active=is_active,
+    )
+    if with_metrics:
+        attach_change_metrics(summary)
+    return summary
+
+
+def test_job_metrics_aggregate_active_summaries_and_backfill_old_rows(db):
+    job = Job(
+        id=str(uuid4()),
+        project_id=str(uuid4()),
+        old_drawing_version_id=str(uuid4()),
+        new_drawing_version_id=str(uuid4()),
+        status="completed",
+        created_by=str(uuid4()),
+    )
+    db.add(job)
+    first, second = _diff(db, job.id), _diff(db, job.id)
+    db.add_all([
+        _summary(first, [{"change_type": "added"}, {"change_type": "added"}]),
+        _summary(first, [{"change_type": "removed"}] * 5, is_active=False),  # superseded
+        # Written before metrics existed: computed on first read
+        _summary(second, [{"change_type": "removed", "title": "Rebar"}], with_metrics=False),
+    ])
+    db.commit()
+
+    per_diff = job_change_metrics(db, job.id)
+    totals = job_change_totals(db, job.id)
+
+    assert per_diff[first.id]["kpis"] == {"added": 2, "modified": 0, "removed": 0}
+    assert per_diff[second.id]["kpis"] == {"added": 0, "modified": 0, "removed": 1}
+    assert totals["kpis"] == {"added": 2, "modified": 0, "removed": 1}
+    assert totals["categories"]["Concrete"] == 1
+    backfilled = db.query(ChangeSummary).filter_by(diff_result_id=second.id).one()
+    assert db.query(ChangeSummaryMetric).filter_by(summary_id=backfilled.id).count() > 0
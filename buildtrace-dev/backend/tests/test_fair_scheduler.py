@@ -0,0 +1,136 @@
+"""Tests for fair scheduling of streaming page tasks across jobs and tenants."""
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from config import config
+from gcp.database.models import Base, Job, Organization, Project, User
+from gcp.pubsub import InMemoryPublisher
+from services.fair_scheduler import FairScheduler, JobShare, QueuedPage
+from services.orchestrator import OrchestratorService
+from services.stage_graph import BATCH_PENDING, mark_page_stage
+
+
+@pytest.fixture
+def engine():
+    # Own database: the scheduler looks at every running job, not just this test's
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _project(session, organization_id):
+    user = User(id=str(uuid4()), email=f"{uuid4()}@example.com")
+    session.add_all([user, Organization(id=organization_id, name=organization_id)])
+    project = Project(id=str(uuid4()), user_id=user.id, organization_id=organization_id, name="Tower")
+    session.add(project)
+    return project
+
+
+def _start(orchestrator, scope, project_id, pages, created_at, priority="interactive"):
+    with scope() as session:
+        job = Job(
+            id=str(uuid4()),
+            project_id=project_id,
+            old_drawing_version_id=str(uuid4()),
+            new_drawing_version_id=str(uuid4()),
+            total_pages=pages,
+            status="in_progress",
+            created_by=str(uuid4()),
+            created_at=created_at,
+            job_metadata={"priority": priority},
+        )
+        session.add(job)
+        dispatches = orchestrator.stage_engine.start_job(session, job, {page: {} for page in range(1, pages + 1)})
+        session.commit()
+        job_id = job.id
+    orchestrator._dispatch(dispatches)
+    return job_id
+
+
+def _ocr_sent(publisher):
+    return [(m["job_id"], m["metadata"]["page_number"]) for m in publisher.messages("ocr")]
+
+
+def test_small_job_takes_the_next_free_slot_ahead_of_a_large_backlog(session_scope, monkeypatch):
+    monkeypatch.setattr(config, "SCHEDULER_MAX_IN_FLIGHT_OCR", 2, raising=False)
+    publisher = InMemoryPublisher()
+    orchestrator = OrchestratorService(publisher=publisher)
+    with session_scope() as session:
+        big_project, small_project = _project(session, "org-a").id, _project(session, "org-b").id
+        session.commit()
+
+    now = datetime.utcnow()
+    big = _start(orchestrator, session_scope, big_project, 20, now - timedelta(minutes=5))
+    small = _start(orchestrator, session_scope, small_project, 2, now)
+    assert _ocr_sent(publisher) == [(big, 1), (big, 2)]
+
+    with session_scope() as session:
+        queue = FairScheduler.from_config().estimate(session, small)["ocr"]
+    assert (queue["position"], queue["job_queued"], queue["in_flight"]) == (0, 2, 2)
+
+    # Each freed slot goes to the organization with less in flight, not to page 3 of the backlog
+    orchestrator.on_page_ocr_complete(big, 1, "o", "n", "A")
+    orchestrator.on_page_ocr_complete(big, 2, "o", "n", "A")
+    orchestrator.on_page_ocr_complete(small, 1, "o", "n", "A")
+    assert _ocr_sent(publisher)[2:] == [(small, 1), (big, 3), (small, 2)]
+
+    with session_scope() as session:
+        queue = FairScheduler.from_config().estimate(session, big)["ocr"]
+    assert (queue["position"], queue["job_queued"]) == (0, 17)
+    assert queue["eta_seconds"] is not None
+
+
+def test_pages_waiting_for_a_provider_batch_free_their_slot(session_scope, monkeypatch):
+    monkeypatch.setattr(config, "SCHEDULER_MAX_IN_FLIGHT_OCR", 1, raising=False)
+    publisher = InMemoryPublisher()
+    orchestrator = OrchestratorService(publisher=publisher)
+    with session_scope() as session:
+        project = _project(session, "org-a").id
+        session.commit()
+
+    now = datetime.utcnow()
+    batch = _start(orchestrator, session_scope, project, 2, now, priority="batch")
+    interactive = _start(orchestrator, session_scope, project, 1, now - timedelta(minutes=5))
+    assert _ocr_sent(publisher) == [(batch, 1)]
+
+    # The batch page's OCR went to a provider batch: the interactive page runs meanwhile
+    with session_scope() as session:
+        mark_page_stage(session, batch, "ocr", 1, status=BATCH_PENDING)
+        session.commit()
+    orchestrator.on_page_batch_pending(batch, "ocr", 1)
+    assert _ocr_sent(publisher)[1:] == [(interactive, 1)]
+    with session_scope() as session:
+        queue = FairScheduler.from_config().estimate(session, batch)["ocr"]
+    assert (queue["in_flight"], queue["job_queued"]) == (1, 1)
+
+    # A slot freed without any event (the interactive worker went silent) is refilled by the periodic pump
+    with session_scope() as session:
+        mark_page_stage(session, interactive, "ocr", 1, started_at=now - timedelta(hours=2))
+        session.commit()
+    orchestrator.pump_scheduled()
+    assert _ocr_sent(publisher)[2:] == [(batch, 2)]
+
+
+def test_flows_share_slots_by_weight():
+    scheduler = FairScheduler({"ocr": 6}, priority_weights={"interactive": 8, "batch": 1})
+    older = datetime(2024, 1, 1)
+    jobs = {
+        "interactive": JobShare("org-a", "interactive", older),
+        "batch": JobShare("org-a", "batch", older + timedelta(hours=1)),
+    }
+    queued = [QueuedPage(f"{job}-{page}", job, page) for job in jobs for page in range(1, 10)]
+
+    # 4 interactive pages in flight weigh half of one batch page
+    picks = scheduler.order(queued, {"interactive": 4}, jobs, limit=6)
+    assert [page.job_id for page in picks] == ["batch"] + ["interactive"] * 5
+    assert [page.page_number for page in picks if page.job_id == "interactive"] == [1, 2, 3, 4, 5]
+
+    # A per-job limit caps a job no matter its share
+    picks = scheduler.order(queued, {}, jobs, limit=6, per_job_limit=2)
+    assert sorted(page.id for page in picks) == ["batch-1", "batch-2", "interactive-1", "interactive-2"]
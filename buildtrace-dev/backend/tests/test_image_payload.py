@@ -0,0 +1,69 @@
+"""Tests for the vision-model image payload budgeter."""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.image_payload import ImageBudget, ImagePayloadBudgeter
+
+
+def _png(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def line_drawing() -> bytes:
+    img = np.full((3000, 4200, 3), 255, dtype=np.uint8)
+    img[::150, :, :] = 0  # grid lines
+    img[:, ::150, :] = 0
+    return _png(img)
+
+
+@pytest.fixture
+def overlay() -> bytes:
+    img = np.full((1200, 1600, 3), 150, dtype=np.uint8)
+    img[100:300, 100:300] = (255, 0, 0)
+    img[500:700, 500:700] = (0, 200, 0)
+    return _png(img)
+
+
+def test_large_sheet_is_downscaled_to_budget_and_grayscaled(line_drawing):
+    budgeter = ImagePayloadBudgeter()
+    budget = ImageBudget(max_dimension=2048, max_bytes=4 * 1024 * 1024)
+
+    prepared = budgeter.prepare(line_drawing, 'openai', budget=budget)
+
+    assert max(prepared.width, prepared.height) == 2048
+    assert prepared.grayscale is True
+    assert len(prepared.data) < len(line_drawing)
+    assert prepared.data_url().startswith(f"data:{prepared.mime_type};base64,")
+    assert prepared.as_pil().mode == 'L'
+
+
+def test_overlay_keeps_colour(overlay):
+    prepared = ImagePayloadBudgeter().prepare(overlay, 'gemini', keep_color=True)
+    assert prepared.grayscale is False
+    assert prepared.as_pil().mode == 'RGB'
+
+
+def test_byte_budget_forces_further_shrinking(line_drawing):
+    budget = ImageBudget(max_dimension=4096, max_bytes=20_000)
+    prepared = ImagePayloadBudgeter().prepare(line_drawing, 'openai', budget=budget)
+    assert len(prepared.data) <= 20_000
+    assert max(prepared.width, prepared.height) < 4096
+
+
+def test_crop_box_selects_region(overlay):
+    prepared = ImagePayloadBudgeter().prepare(overlay, 'openai', crop=(0.0, 0.0, 0.25, 0.5), keep_color=True)
+    assert (prepared.width, prepared.height) == (400, 600)
+
+
+def test_prepared_payloads_are_cached_by_source_hash(overlay):
+    budgeter = ImagePayloadBudgeter(cache_size=2)
+    first = budgeter.prepare(overlay, 'openai', keep_color=True)
+    assert budgeter.prepare(overlay, 'openai', keep_color=True) is first
+    assert budgeter.prepare(overlay, 'gemini', keep_color=True) is not first
@@ -0,0 +1,170 @@
+"""Tests for resuming failed or interrupted streaming jobs from their stage state."""
+
+from uuid import uuid4
+
+import pytest
+
+from config import config
+from gcp.database.models import ChangeSummary, DiffResult, Job, JobStage
+from gcp.pubsub import InMemoryPublisher
+from services.orchestrator import OrchestratorService
+from services.stage_ledger import StageLedger
+
+
+@pytest.fixture
+def session_config():
+    overrides = {"SKIP_UNCHANGED_PAGE_SUMMARY": False}
+    for stage in ("OCR", "DIFF", "SUMMARY"):  # rows from other tests must not hold the stage slots
+        overrides[f"SCHEDULER_MAX_IN_FLIGHT_{stage}"] = 0
+    return overrides
+
+
+def _start(scope, orchestrator):
+    with scope() as session:
+        job = Job(
+            id=str(uuid4()),
+            project_id=str(uuid4()),
+            old_drawing_version_id=str(uuid4()),
+            new_drawing_version_id=str(uuid4()),
+            total_pages=2,
+            status="in_progress",
+            created_by=str(uuid4()),
+        )
+        session.add(job)
+        dispatches = orchestrator.stage_engine.start_job(session, job, {
+            page: {"drawing_name": f"A-10{page}", "old_page_gcs": f"old/{page}.png", "new_page_gcs": f"new/{page}.png"}
+            for page in (1, 2)
+        })
+        session.commit()
+        job_id = job.id
+    orchestrator._dispatch(dispatches)
+    return job_id
+
+
+def test_resume_reruns_only_unfinished_stages_and_reuses_stored_diffs(session_scope, monkeypatch):
+    monkeypatch.setattr(config, "JOB_RESUME_MAX_ATTEMPTS", 1, raising=False)
+    publisher = InMemoryPublisher()
+    orchestrator = OrchestratorService(publisher=publisher)
+    job_id = _start(session_scope, orchestrator)
+    for page in (1, 2):
+        orchestrator.on_page_ocr_complete(job_id, page, f"ocr/old-{page}", f"ocr/new-{page}", f"A-10{page}")
+
+    # Page 1: the summary times out until its retries are used up
+    orchestrator.on_page_diff_complete(job_id, 1, "diff-1", "overlay-1", "A-101", change_count=2)
+    for _ in range(2):
+        orchestrator.on_page_failed(job_id, "summary", 1, "LLM timeout")
+    # Page 2: the diff worker stored its result, then died before reporting it
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+        stored = DiffResult(
+            job_id=job_id,
+            old_drawing_version_id=job.old_drawing_version_id,
+            new_drawing_version_id=job.new_drawing_version_id,
+            page_number=2,
+            machine_generated_overlay_ref="diffs/2.json",
+            change_count=1,
+            diff_metadata={"overlay_image_ref": "overlay-2"},
+        )
+        session.add(stored)
+        session.commit()
+        stored_id = stored.id
+
+    publisher.clear()
+    result = orchestrator.resume_job(job_id)
+
+    assert (result["mode"], result["status"]) == ("streaming", "in_progress")
+    assert result["redispatched"] == [{"page_number": 1, "stage": "summary"}]
+    assert result["recovered"] == [{"page_number": 2, "stage": "diff"}]
+    assert publisher.messages("ocr") == [] and publisher.messages("diff") == []
+    summaries = {m["metadata"]["page_number"]: m["diff_result_id"] for m in publisher.messages("summary")}
+    assert summaries == {1: "diff-1", 2: stored_id}
+
+    orchestrator.on_page_summary_complete(job_id, 2, "summary-2")
+    for _ in range(2):
+        orchestrator.on_page_failed(job_id, "summary", 1, "LLM timeout")
+
+    # Out of resume attempts: nothing is dispatched and the job is failed
+    publisher.clear()
+    result = orchestrator.resume_job(job_id)
+    assert result["exhausted"] == [{"page_number": 1, "stage": "summary"}]
+    assert (result["status"], publisher.messages()) == ("failed", [])
+    with session_scope() as session:
+        rows = session.query(JobStage).filter_by(job_id=job_id, stage="diff").order_by(JobStage.page_number)
+        assert [(row.status, row.result_ref) for row in rows] == [("completed", "diff-1"), ("completed", stored_id)]
+
+
+def test_completed_job_resumes_summaries_left_as_placeholders(session_scope):
+    publisher = InMemoryPublisher()
+    orchestrator = OrchestratorService(publisher=publisher)
+    job_id = _start(session_scope, orchestrator)
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+        diffs = [
+            DiffResult(
+                job_id=job_id,
+                old_drawing_version_id=job.old_drawing_version_id,
+                new_drawing_version_id=job.new_drawing_version_id,
+                page_number=page,
+                machine_generated_overlay_ref=f"diffs/{page}.json",
+                change_count=1,
+            )
+            for page in (1, 2)
+        ]
+        session.add_all(diffs)
+        session.flush()
+        # Page 1: every model call timed out, so the pipeline left its placeholder
+        summaries = [
+            ChangeSummary(diff_result_id=diffs[0].id, summary_text="Awaiting AI analysis.", source="pending"),
+            ChangeSummary(diff_result_id=diffs[1].id, summary_text="Door relocated.", source="machine"),
+        ]
+        session.add_all(summaries)
+        session.commit()
+        diff_ids = [diff.id for diff in diffs]
+        summary_ids = [summary.id for summary in summaries]
+    for page in (1, 2):
+        orchestrator.on_page_ocr_complete(job_id, page, f"ocr/old-{page}", f"ocr/new-{page}", f"A-10{page}")
+        orchestrator.on_page_diff_complete(job_id, page, diff_ids[page - 1], f"overlay-{page}", f"A-10{page}", change_count=1)
+        orchestrator.on_page_summary_complete(job_id, page, summary_ids[page - 1])
+    with session_scope() as session:
+        assert session.get(Job, job_id).status == "completed"
+
+    publisher.clear()
+    result = orchestrator.resume_job(job_id)
+
+    assert (result["status"], result["redispatched"]) == ("in_progress", [{"page_number": 1, "stage": "summary"}])
+    assert [m["diff_result_id"] for m in publisher.messages("summary")] == [diff_ids[0]]
+    with session_scope() as session:
+        assert session.get(Job, job_id).completed_pages == 1
+
+    # The real summary finishes the job again, counting the page once
+    with session_scope() as session:
+        session.query(ChangeSummary).filter_by(id=summary_ids[0]).update({"is_active": False})
+        regenerated = ChangeSummary(diff_result_id=diff_ids[0], summary_text="Wall moved.", source="machine")
+        session.add(regenerated)
+        session.commit()
+        regenerated_id = regenerated.id
+    orchestrator.on_page_summary_complete(job_id, 1, regenerated_id)
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+        assert (job.status, job.completed_pages) == ("completed", 2)
+    with pytest.raises(ValueError, match="already completed"):
+        orchestrator.resume_job(job_id)
+
+
+def test_resume_takes_over_the_claim_of_a_worker_that_died_mid_stage(session_scope):
+    publisher = InMemoryPublisher()
+    orchestrator = OrchestratorService(publisher=publisher)
+    job_id = _start(session_scope, orchestrator)
+    ledger = StageLedger(session_scope, lease_seconds=900, enabled=True)
+    # The OCR worker of page 1 claimed its task, then died well inside the lease
+    message = next(m["metadata"] for m in publisher.messages("ocr") if m["metadata"]["page_number"] == 1)
+    assert ledger.claim(job_id, "ocr", 1, message).acquired
+    assert ledger.claim(job_id, "ocr", 1, message).state == "busy"
+
+    publisher.clear()
+    result = orchestrator.resume_job(job_id)
+
+    assert result["redispatched"] == [{"page_number": 1, "stage": "ocr"}, {"page_number": 2, "stage": "ocr"}]
+    resent = next(m["metadata"] for m in publisher.messages("ocr") if m["metadata"]["page_number"] == 1)
+    claim = ledger.claim(job_id, "ocr", 1, resent)
+    assert (claim.state, claim.attempts) == ("acquired", 2)
@@ -0,0 +1,118 @@
+"""Tests for the shared LLM gateway (retries, circuit breaker, hedging, pooling)."""
+
+import time
+
+import pytest
+
+from utils.llm_gateway import CircuitOpenError, LLMGateway, is_retryable_error
+
+
+class RateLimitError(Exception):
+    """Same class name as the OpenAI SDK's 429 error."""
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+def _gateway(**overrides):
+    settings = dict(
+        max_retries=3,
+        base_delay=0,
+        max_delay=0,
+        failure_threshold=3,
+        reset_timeout=60,
+        hedge_after=0,
+        rate_limits={},
+    )
+    settings.update(overrides)
+    return LLMGateway(**settings)
+
+
+def _flaky(failures, exc_type=RateLimitError):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise exc_type("slow down")
+        return "ok"
+
+    return fn, calls
+
+
+def test_transient_errors_are_retried():
+    gateway = _gateway()
+    fn, calls = _flaky(failures=2)
+
+    assert gateway.call('openai', 'gpt-4o', fn) == "ok"
+    assert len(calls) == 3
+    assert gateway.stats()['openai:gpt-4o']['transient_errors'] == 2
+
+
+def test_non_retryable_errors_raise_immediately():
+    gateway = _gateway()
+    fn, calls = _flaky(failures=5, exc_type=BadRequest)
+
+    with pytest.raises(BadRequest):
+        gateway.call('openai', 'gpt-4o', fn)
+    assert len(calls) == 1
+    assert is_retryable_error(BadRequest()) is False
+    assert is_retryable_error(RateLimitError()) is True
+
+
+def test_circuit_opens_and_fails_fast_per_model():
+    gateway = _gateway(max_retries=0, failure_threshold=2)
+    fn, calls = _flaky(failures=100)
+
+    for _ in range(2):
+        with pytest.raises(RateLimitError):
+            gateway.call('gemini', 'gemini-2.5-pro', fn)
+    with pytest.raises(CircuitOpenError):
+        gateway.call('gemini', 'gemini-2.5-pro', fn)
+    assert len(calls) == 2
+
+    # Other models are unaffected by the open circuit
+    assert gateway.call('gemini', 'gemini-2.0-flash', lambda: "ok") == "ok"
+    assert gateway.stats()['gemini:gemini-2.5-pro']['circuit'] == 'open'
+
+
+def test_circuit_half_opens_after_reset_timeout():
+    gateway = _gateway(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    fn, _ = _flaky(failures=1)
+
+    with pytest.raises(RateLimitError):
+        gateway.call('openai', 'gpt-4o', fn)
+    with pytest.raises(CircuitOpenError):
+        gateway.call('openai', 'gpt-4o', fn)
+
+    time.sleep(0.06)
+    assert gateway.call('openai', 'gpt-4o', fn) == "ok"
+    assert gateway.stats()['openai:gpt-4o']['circuit'] == 'closed'
+
+
+def test_hedged_request_returns_first_response():
+    gateway = _gateway(hedge_after=0.05)
+    calls = []
+
+    def slow_then_fast():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+
+    started = time.monotonic()
+    assert gateway.call('openai', 'gpt-4o', slow_then_fast, hedge=True) == "fast"
+    assert time.monotonic() - started < 0.5
+    assert gateway.stats()['openai:gpt-4o']['hedged'] == 1
+
+
+def test_openai_clients_are_pooled_per_key():
+    gateway = _gateway()
+    first = gateway.openai_client("sk-test-1")
+    if first is None:
+        pytest.skip("openai library not installed")
+
+    assert gateway.openai_client("sk-test-1") is first
+    assert gateway.openai_client("sk-test-2") is not first
@@ -0,0 +1,73 @@
+"""Tests for the durable local queue backend and its in-process worker pool."""
+
+import threading
+import time
+
+from config import config
+from gcp.pubsub import LocalQueue, LocalQueuePublisher, LocalQueueSubscriber
+from workers.local_pool import LocalWorkerPool
+
+
+def test_unacked_messages_survive_restart_and_failures_are_parked(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LOCAL_QUEUE_MAX_ATTEMPTS", 2, raising=False)
+    path = str(tmp_path / "tasks.sqlite3")
+    publisher = LocalQueuePublisher(LocalQueue(path))
+    result = publisher.publish_batch("ocr", [
+        publisher.ocr_task_message("job", f"version-{page}", {"page_number": page}) for page in (1, 2)
+    ])
+    assert result.failed == 0 and len(result.message_ids) == 2
+
+    crashed = LocalQueue(path).lease("ocr", lease_seconds=0.05)
+    assert crashed.data["metadata"]["page_number"] == 1
+
+    # A fresh process sees page 2 now and page 1 again once its lease has expired
+    queue = LocalQueue(path)
+    assert queue.lease("ocr").data["drawing_version_id"] == "version-2"
+    time.sleep(0.1)
+    redelivered = queue.lease("ocr")
+    assert (redelivered.id, redelivered.attempts) == (crashed.id, 2)
+
+    queue.nack(redelivered, "boom")
+    assert queue.lease("ocr") is None
+    assert queue.depth("ocr", status="dead") == 1
+
+
+def test_pool_pipelines_pages_across_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LOCAL_QUEUE_POLL_SECONDS", 0.05, raising=False)
+    queue = LocalQueue(str(tmp_path / "tasks.sqlite3"))
+    publisher = LocalQueuePublisher(queue)
+    ocr_running = threading.Barrier(3, timeout=5)
+    summaries, failed_once = [], set()
+    done = threading.Event()
+
+    def ocr(message):
+        ocr_running.wait()  # all three OCR workers hold a page at the same time
+        page = message["metadata"]["page_number"]
+        publisher.publish_diff_task(message["job_id"], "old", "new", {"page_number": page})
+
+    def diff(message):
+        page = message["metadata"]["page_number"]
+        if page == 2 and page not in failed_once:
+            failed_once.add(page)
+            raise RuntimeError("transient")
+        publisher.publish_summary_task(message["job_id"], f"diff-{page}", metadata={"page_number": page})
+
+    def summary(message):
+        summaries.append(message["diff_result_id"])
+        if len(summaries) == 3:
+            done.set()
+
+    monkeypatch.setattr(LocalQueueSubscriber, "_backoff", staticmethod(lambda attempts: 0))
+    pool = LocalWorkerPool(queue, handlers={"ocr": ocr, "diff": diff, "summary": summary},
+                           concurrency={"ocr": 3, "diff": 1, "summary": 2}).start()
+    try:
+        publisher.publish_batch("ocr", [
+            publisher.ocr_task_message("job", "new", {"page_number": page}) for page in (1, 2, 3)
+        ])
+        assert done.wait(10)
+    finally:
+        pool.stop(timeout=5)
+
+    assert sorted(summaries) == ["diff-1", "diff-2", "diff-3"]
+    assert failed_once == {2}
+    assert all(queue.depth(stage) == 0 for stage in ("ocr", "diff", "summary"))
@@ -0,0 +1,64 @@
+"""Tests for the append-only NDJSON log used for OCR progress."""
+
+from utils.ndjson_log import NDJSONLogWriter, read_ndjson
+
+
+class RecordingStorage:
+    def __init__(self):
+        self.files = {}
+        self.uploads = 0
+        self.pushed = []
+
+    def upload_file(self, content, destination_path, content_type=None, **_):
+        self.files[destination_path] = bytes(content)
+        self.uploads += 1
+        self.pushed.append(bytes(content))
+        return destination_path
+
+    def append_file(self, content, destination_path, content_type=None):
+        self.files[destination_path] += bytes(content)
+        self.uploads += 1
+        self.pushed.append(bytes(content))
+        return destination_path
+
+
+def test_writer_flushes_every_n_records_and_on_close(tmp_path):
+    storage = RecordingStorage()
+    log = NDJSONLogWriter(storage, str(tmp_path / "log.ndjson"), "ocr_logs/v1/ocr_log.ndjson", flush_every=2, flush_interval=3600)
+
+    log.append({"type": "page", "page_number": 1})
+    assert storage.uploads == 0
+    log.append({"type": "page", "page_number": 2})
+    assert storage.uploads == 1
+    log.append({"type": "summary", "summary": {"total_pages": 2}})
+
+    assert log.close() == "ocr_logs/v1/ocr_log.ndjson"
+    assert storage.uploads == 2
+    records, _ = read_ndjson(storage.files["ocr_logs/v1/ocr_log.ndjson"])
+    assert [r["type"] for r in records] == ["page", "page", "summary"]
+    # Each flush pushes only what was written since the previous one
+    assert [len(read_ndjson(chunk)[0]) for chunk in storage.pushed] == [2, 1]
+
+
+def test_first_flush_replaces_a_log_left_by_an_earlier_run(tmp_path):
+    storage = RecordingStorage()
+    storage.files["ocr_logs/v1/ocr_log.ndjson"] = b'{"type":"page","page_number":9}\n'
+    log = NDJSONLogWriter(storage, str(tmp_path / "log.ndjson"), "ocr_logs/v1/ocr_log.ndjson", flush_every=1, flush_interval=3600)
+
+    log.append({"type": "start"})
+    log.append({"type": "page", "page_number": 1})
+
+    records, _ = read_ndjson(storage.files["ocr_logs/v1/ocr_log.ndjson"])
+    assert [r["type"] for r in records] == ["start", "page"]
+
+
+def test_read_resumes_from_offset_and_skips_partial_line():
+    data = b'{"page_number":1}\n{"page_number":2}\n{"page_num'
+
+    records, next_offset = read_ndjson(data)
+    assert [r["page_number"] for r in records] == [1, 2]
+
+    tail = b'{"page_num' + b'ber":3}\n'
+    more, final_offset = read_ndjson(tail, next_offset)
+    assert more == [{"page_number": 3}]
+    assert final_offset == next_offset + len(tail)
@@ -0,0 +1,129 @@
+"""Tests for the process-isolated task pool used by the diff worker."""
+
+import os
+import signal
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from utils.process_pool import (
+    IsolatedProcessPool,
+    IsolatedTaskError,
+    WorkerMemoryExceeded,
+    WorkerProcessLost,
+)
+
+
+def _square(value):
+    return value * value
+
+
+def _child_pid(_=None):
+    return os.getpid()
+
+
+def _explode():
+    raise ValueError("bad sheet")
+
+
+def _kill_self(_=None):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _hog_memory(megabytes):
+    blob = b"x" * (megabytes * 1024 * 1024)
+    time.sleep(5)
+    return len(blob)
+
+
+@pytest.fixture
+def pool():
+    pool = IsolatedProcessPool(max_workers=2, max_tasks_per_child=2, rss_limit_mb=200, poll_interval=0.05)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_tasks_in_child_process(pool):
+    assert pool.run(_square, 7) == 49
+    assert pool.run(_child_pid) != os.getpid()
+
+
+def test_task_exception_is_reported_and_child_reused():
+    pool = IsolatedProcessPool(max_workers=1, max_tasks_per_child=10)
+    try:
+        first_pid = pool.run(_child_pid)
+        with pytest.raises(IsolatedTaskError, match="bad sheet"):
+            pool.run(_explode)
+        assert pool.run(_child_pid) == first_pid
+    finally:
+        pool.shutdown()
+
+
+def test_children_recycled_after_max_tasks():
+    pool = IsolatedProcessPool(max_workers=1, max_tasks_per_child=2)
+    try:
+        pids = [pool.run(_child_pid) for _ in range(4)]
+        assert pids[0] == pids[1]
+        assert pids[2] == pids[3]
+        assert pids[0] != pids[2]
+    finally:
+        pool.shutdown()
+
+
+def test_memory_hog_fails_only_its_own_task(pool):
+    hog = pool.submit(_hog_memory, 400)
+    normal = [pool.submit(_square, n) for n in range(3)]
+
+    with pytest.raises(WorkerMemoryExceeded):
+        hog.result(timeout=30)
+    assert [f.result(timeout=30) for f in normal] == [0, 1, 4]
+    # The pool keeps working after a child was killed
+    assert pool.run(_square, 3) == 9
+
+
+def test_killed_child_fails_only_its_diff_page(pool, engine):
+    # Imported here: spawned children import this module and must stay under the RSS limit
+    from services.stage_ledger import StageLedger
+    from workers.diff_worker import DiffWorker
+
+    SessionLocal = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session_factory():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    class KillingExecutor:
+        def run(self, fn, page_kwargs):
+            return pool.run(_kill_self, page_kwargs)
+
+    class Orchestrator:
+        def __init__(self):
+            self.failed = []
+
+        def on_page_failed(self, job_id, stage, page_number, error):
+            self.failed.append((stage, page_number))
+
+    orchestrator = Orchestrator()
+    ledger = StageLedger(session_factory, enabled=True)
+    worker = DiffWorker(
+        pipeline=object(), orchestrator=orchestrator, session_factory=session_factory,
+        executor=KillingExecutor(), ledger=ledger,
+    )
+    message = {"job_id": str(uuid4()), "page_number": 4, "old_page_gcs": "old/4.png", "new_page_gcs": "new/4.png"}
+
+    result = worker.process_streaming_message(message)
+
+    # Acked as a failed page, not raised for redelivery; the claim is free for a retry
+    assert result["status"] == "failed" and "exited" in result["error"]
+    assert orchestrator.failed == [("diff", 4)]
+    assert ledger.claim(message["job_id"], "diff", 4, message).acquired
+    with pytest.raises(WorkerProcessLost):
+        pool.run(_kill_self)
+    assert pool.run(_square, 5) == 25
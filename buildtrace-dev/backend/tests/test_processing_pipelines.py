@@ -26,6 +26,7 @@ from gcp.database.models import (
     User,
 )
 from processing import DiffPipeline, OCRPipeline, SummaryPipeline
+from processing.ocr_pipeline import OCR_PROMPT_VERSION
 from workers import DiffWorker, OCRWorker, SummaryWorker
 
 
@@ -64,6 +65,10 @@ class InMemoryStorage:
         self.files[destination_path] = file_content if isinstance(file_content, (bytes, bytearray)) else bytes(file_content)
         return destination_path
 
+    def append_file(self, content: bytes, destination_path: str, content_type: str | None = None) -> str:
+        self.files[destination_path] = self.files.get(destination_path, b"") + content
+        return destination_path
+
 
 def _seed_graph(session) -> Dict:
     user = User(id=str(uuid4()), email="demo@example.com", name="Test User")
@@ -222,6 +227,300 @@ def test_ocr_pipeline_updates_version_and_storage(session_factory, storage_stub)
         assert updated.ocr_result_ref == result["result_ref"]
 
 
+def test_ocr_extract_pages_concurrently_keeps_order_and_isolates_failures(session_factory, storage_stub, monkeypatch):
+    import threading
+    import time
+
+    monkeypatch.setattr("processing.ocr_pipeline.config.OCR_PAGE_CONCURRENCY", 3)
+    pipeline = OCRPipeline(storage_service=storage_stub, session_factory=session_factory)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_extract(png_path, drawing_name, page_num, sections=None):
+        with lock:
+            in_flight.append(page_num)
+            peak.append(len(in_flight))
+        time.sleep(0.05 * (5 - page_num))  # later pages finish first
+        with lock:
+            in_flight.remove(page_num)
+        if page_num == 2:
+            raise RuntimeError("provider timeout")
+        return {"drawing_name": drawing_name, "page_number": page_num, "sections": {"ok": True}}
+
+    monkeypatch.setattr(pipeline, "_extract_page_information", fake_extract)
+    pages = [(f"page_{n}.png", f"A-10{n}", n) for n in range(1, 5)]
+
+    results = dict(pipeline._extract_pages(pages))
+
+    assert max(peak) == 3
+    assert [results[i]["page_number"] for i in range(4)] == [1, 2, 3, 4]
+    assert results[1]["extraction_method"] == "error"
+    assert all(results[i]["sections"] == {"ok": True} for i in (0, 2, 3))
+
+
+def test_ocr_run_page_reuses_stored_result_for_identical_raster(session_factory, storage_stub, monkeypatch):
+    pipeline = OCRPipeline(storage_service=storage_stub, session_factory=session_factory)
+    calls = []
+
+    def fake_extract(png_path, drawing_name, page_num, sections=None):
+        calls.append(drawing_name)
+        return {"drawing_name": drawing_name, "sections": {"sheet": "A-101"}, "extraction_method": "gemini_2.5_pro"}
+
+    monkeypatch.setattr(pipeline, "_extract_page_information", fake_extract)
+    monkeypatch.setattr(pipeline, "_ocr_model_key", lambda: "gemini:test-model")
+    storage_stub.register_file("pages/job-1/old/page_001.png", b"same raster")
+    storage_stub.register_file("pages/job-2/old/page_001.png", b"same raster")
+
+    first = pipeline.run_page("pages/job-1/old/page_001.png", "old_page_1")
+    second = pipeline.run_page("pages/job-2/old/page_001.png", "new_page_1")
+
+    assert calls == ["old_page_1"]
+    assert first["cache_hit"] is False and second["cache_hit"] is True
+    assert second["extracted_info"]["sections"] == {"sheet": "A-101"}
+    assert second["extracted_info"]["drawing_name"] == "new_page_1"
+    assert pipeline.result_store.stats() == {"hits": 1, "misses": 1, "lookups": 2, "hit_rate": 0.5}
+
+
+def _text_layer(*extra_lines) -> Dict:
+    line = lambda text, x, y, size: {"text": text, "bbox": [x, y - size, x + 6 * len(text), y], "size": size}
+    return {
+        "width": 1224,
+        "height": 792,
+        "rotation": 0,
+        "lines": [
+            line("KEYNOTES", 60, 80, 12),
+            line("1. REMOVE EXISTING STOREFRONT SYSTEM", 60, 100, 9),
+            line("SECOND FLOOR REFLECTED CEILING PLAN", 960, 640, 14),
+            line("A-201", 1080, 760, 24),
+        ] + [line(*extra) for extra in extra_lines],
+    }
+
+
+def test_ocr_run_page_skips_vision_model_when_text_layer_is_complete(session_factory, storage_stub, monkeypatch):
+    pipeline = OCRPipeline(storage_service=storage_stub, session_factory=session_factory)
+    calls = []
+    monkeypatch.setattr(pipeline, "_extract_page_information", lambda *args, **kwargs: calls.append(args))
+    storage_stub.register_file("pages/job-1/new/page_001.png", b"vector sheet raster")
+    storage_stub.register_file("pages/job-1/new/page_001.text.json", json.dumps(_text_layer()).encode())
+
+    result = pipeline.run_page("pages/job-1/new/page_001.png", "new_page_1")
+
+    assert calls == []
+    assert result["cache_hit"] is False
+    info = result["extracted_info"]
+    assert info["extraction_method"] == "text_layer"
+    assert info["sections"]["TITLE_BLOCK"]["sheet_number"] == "A-201"
+    assert info["sections"]["KEYNOTES"] == [{"number": "1", "description": "REMOVE EXISTING STOREFRONT SYSTEM"}]
+
+
+def test_ocr_run_page_asks_vision_model_only_for_text_layer_residuals(session_factory, storage_stub, monkeypatch):
+    # Sections the text layer never reads are requested too when opted in
+    monkeypatch.setattr("processing.ocr_pipeline.config.OCR_TEXT_LAYER_UNREAD_SECTIONS", True)
+    pipeline = OCRPipeline(storage_service=storage_stub, session_factory=session_factory)
+    monkeypatch.setattr(pipeline, "_ocr_model_key", lambda: "gemini:test-model")
+    calls = []
+
+    def fake_extract(png_path, drawing_name, page_num, sections=None):
+        calls.append(sections)
+        return {
+            "drawing_name": drawing_name,
+            "sections": {
+                "TITLE_BLOCK": {"sheet_number": "A-2O1", "project_name": "CLINIC RENOVATION"},
+                "KEYNOTES": [{"number": "1", "description": "REMOVE EXISTING STORE FRONT"}],
+                "GRID_LINES": ["A", "B"],
+            },
+            "extraction_method": "gemini_2.5_pro",
+        }
+
+    monkeypatch.setattr(pipeline, "_extract_page_information", fake_extract)
+    # A general notes header whose rows the text layer cannot read
+    text_layer = _text_layer(("GENERAL NOTES", 60, 300, 12))
+    storage_stub.register_file("pages/job-1/new/page_001.png", b"vector sheet raster")
+    storage_stub.register_file("pages/job-1/new/page_001.text.json", json.dumps(text_layer).encode())
+
+    result = pipeline.run_page("pages/job-1/new/page_001.png", "new_page_1")
+
+    residual = ["DESIGN_TEAM", "DIMENSIONS", "SPECIFICATIONS", "SCHEDULES", "GENERAL_NOTES", "GRID_LINES"]
+    assert calls == [residual]
+    info = result["extracted_info"]
+    assert info["extraction_method"] == "text_layer+gemini_2.5_pro"
+    assert info["sections"]["TITLE_BLOCK"] == {
+        "sheet_number": "A-201",
+        "project_name": "CLINIC RENOVATION",
+        "drawing_title": "SECOND FLOOR REFLECTED CEILING PLAN",
+    }
+    assert info["sections"]["KEYNOTES"] == [{"number": "1", "description": "REMOVE EXISTING STOREFRONT SYSTEM"}]
+    assert info["sections"]["GRID_LINES"] == ["A", "B"]
+    # The focused extraction is cached apart from full-page extractions of the same raster
+    page_bytes = b"vector sheet raster"
+    assert pipeline.result_store.get(page_bytes, "gemini:test-model", OCR_PROMPT_VERSION) is None
+    assert pipeline.result_store.get(page_bytes, f"gemini:test-model|sections={','.join(residual)}", OCR_PROMPT_VERSION) is not None
+
+
+def _sheet_png(keynote_box=None) -> bytes:
+    import cv2
+    import numpy as np
+
+    sheet = np.full((400, 600), 255, np.uint8)
+    cv2.rectangle(sheet, (20, 20), (580, 380), 0, 2)
+    cv2.putText(sheet, "A-101", (470, 360), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2)
+    if keynote_box:
+        cv2.rectangle(sheet, *keynote_box, 0, -1)
+    return cv2.imencode(".png", sheet)[1].tobytes()
+
+
+def test_ocr_run_page_reextracts_only_changed_regions(session_factory, storage_stub, monkeypatch):
+    pipeline = OCRPipeline(storage_service=storage_stub, session_factory=session_factory)
+    full_page_calls, region_calls = [], []
+    monkeypatch.setattr(pipeline, "_ocr_model_key", lambda: "gemini:test-model")
+    monkeypatch.setattr(pipeline, "_extract_page_information", lambda *args, **kwargs: full_page_calls.append(args))
+
+    def fake_region(image_bytes, drawing_name, region):
+        region_calls.append(region)
+        return {"KEYNOTES": [{"number": "2", "description": "NEW STOREFRONT"}]}
+
+    monkeypatch.setattr(pipeline, "_extract_region_information", fake_region)
+    old_png, new_png = _sheet_png(), _sheet_png(keynote_box=((60, 60), (120, 80)))
+    storage_stub.register_file("pages/job-1/old/page_001.png", old_png)
+    storage_stub.register_file("pages/job-1/new/page_001.png", new_png)
+    pipeline.result_store.put(old_png, "gemini:test-model", OCR_PROMPT_VERSION, {
+        "sections": {
+            "TITLE_BLOCK": {"sheet_number": "A-101"},
+            "KEYNOTES": [{"number": "1", "description": "EXISTING WALL"}, {"number": "2", "description": "OLD DOOR"}],
+        },
+        "extraction_method": "gemini_2.5_pro",
+    })
+
+    result = pipeline.run_page("pages/job-1/new/page_001.png", "new_page_1", base_page_gcs="pages/job-1/old/page_001.png")
+
+    assert full_page_calls == []
+    assert len(region_calls) == 1
+    left, top, right, bottom = region_calls[0]
+    assert left < 0.1 < right and top < 0.15 < bottom and (right - left) * (bottom - top) < 0.05
+    info = result["extracted_info"]
+    assert info["extraction_method"] == "incremental+gemini_2.5_pro"
+    assert info["incremental"]["re_derived_sections"] == ["KEYNOTES"]
+    assert info["sections"]["TITLE_BLOCK"] == {"sheet_number": "A-101"}
+    assert info["sections"]["KEYNOTES"] == [
+        {"number": "1", "description": "EXISTING WALL"},
+        {"number": "2", "description": "NEW STOREFRONT"},
+    ]
+    # Kept apart from full extractions so it never becomes the base of a later revision
+    assert pipeline.result_store.get(new_png, "gemini:test-model", OCR_PROMPT_VERSION) is None
+    assert pipeline.result_store.get(new_png, "gemini:test-model|incremental", OCR_PROMPT_VERSION) is not None
+
+
+def test_ocr_incremental_drops_keynotes_deleted_from_a_changed_region(session_factory, storage_stub, monkeypatch):
+    pipeline = OCRPipeline(storage_service=storage_stub, session_factory=session_factory)
+    monkeypatch.setattr(pipeline, "_ocr_model_key", lambda: "gemini:test-model")
+    monkeypatch.setattr(pipeline, "_extract_page_information", lambda *args, **kwargs: None)
+    # The region where keynote 1 stood is blank now
+    monkeypatch.setattr(pipeline, "_extract_region_information", lambda *args, **kwargs: {})
+    old_png, new_png = _sheet_png(keynote_box=((60, 60), (120, 80))), _sheet_png()
+    storage_stub.register_file("pages/job-1/old/page_001.png", old_png)
+    storage_stub.register_file("pages/job-1/new/page_001.png", new_png)
+    pipeline.result_store.put(old_png, "gemini:test-model", OCR_PROMPT_VERSION, {
+        "sections": {
+            "KEYNOTES": [
+                {"number": "1", "description": "DEMOLISH PARTITION", "bbox": [0.1, 0.15, 0.2, 0.2]},
+                {"number": "2", "description": "PATCH SLAB", "bbox": [0.6, 0.1, 0.7, 0.12]},
+                {"number": "3", "description": "NO LOCATION"},
+            ],
+        },
+        "extraction_method": "gemini_2.5_pro",
+    })
+
+    result = pipeline.run_page("pages/job-1/new/page_001.png", "new_page_1", base_page_gcs="pages/job-1/old/page_001.png")
+
+    info = result["extracted_info"]
+    assert info["incremental"]["re_derived_sections"] == ["KEYNOTES"]
+    assert [item["number"] for item in info["sections"]["KEYNOTES"]] == ["2", "3"]
+
+
+def test_streaming_ocr_worker_patches_new_page_from_old_page_of_the_same_message(
+    session_factory, storage_stub, monkeypatch
+):
+    import time
+
+    pipeline = OCRPipeline(storage_service=storage_stub, session_factory=session_factory)
+    full_page_calls, region_calls = [], []
+    monkeypatch.setattr(pipeline, "_ocr_model_key", lambda: "gemini:test-model")
+
+    def fake_extract(png_path, drawing_name, page_num, sections=None):
+        full_page_calls.append(drawing_name)
+        time.sleep(0.2)  # a vision call outlasts the new page's base lookup
+        return {
+            "drawing_name": drawing_name,
+            "sections": {"KEYNOTES": [{"number": "1", "description": "EXISTING WALL"}]},
+            "extraction_method": "gemini_2.5_pro",
+        }
+
+    def fake_region(image_bytes, drawing_name, region):
+        region_calls.append(drawing_name)
+        return {"KEYNOTES": [{"number": "2", "description": "NEW STOREFRONT"}]}
+
+    monkeypatch.setattr(pipeline, "_extract_page_information", fake_extract)
+    monkeypatch.setattr(pipeline, "_extract_region_information", fake_region)
+    storage_stub.register_file("pages/rev1/page_001.png", _sheet_png())
+    storage_stub.register_file("pages/rev2/page_001.png", _sheet_png(keynote_box=((60, 60), (120, 80))))
+    storage_stub.register_file("pages/rev3/page_001.png", _sheet_png(keynote_box=((60, 60), (120, 80))))
+
+    class PageOrchestrator:
+        def on_page_ocr_complete(self, **kwargs):
+            pass
+
+    worker = OCRWorker(pipeline=pipeline, orchestrator=PageOrchestrator(), session_factory=session_factory)
+    job_id, _, _ = _seed_job_with_stages(session_factory)
+    for page_number, (old, new) in enumerate((("rev1", "rev2"), ("rev2", "rev3")), 1):
+        worker.process_streaming_message({
+            "job_id": job_id,
+            "page_number": page_number,
+            "old_page_gcs": f"pages/{old}/page_001.png",
+            "new_page_gcs": f"pages/{new}/page_001.png",
+        })
+
+    # First comparison: only the old page is read in full, the new one is patched from it.
+    # Second: the patched revision is reused as the baseline, and the unchanged page is a hit.
+    assert full_page_calls == ["old_page_1"]
+    assert region_calls == ["new_page_1"]
+
+
+def test_ocr_large_sheet_is_read_as_concurrent_tiles_and_merged(session_factory, storage_stub, monkeypatch, tmp_path):
+    import threading
+
+    monkeypatch.setenv("OCR_TILING_ENABLED", "true")
+    monkeypatch.setattr("processing.ocr_pipeline.config.OCR_TILE_MIN_DIMENSION", 500)
+    pipeline = OCRPipeline(storage_service=storage_stub, session_factory=session_factory)
+    all_tiles_started = threading.Barrier(5, timeout=5)
+    tile_sections = {
+        "title block": {"TITLE_BLOCK": {"sheet_number": "A-101", "scale": "1/8\" = 1'-0\""}},
+        "top-left quadrant": {"KEYNOTES": [{"number": "1", "description": "NEW WALL"}, {"number": "2", "description": "PATCH"}]},
+        "top-right quadrant": {"KEYNOTES": [{"number": "2", "description": "PATCH AND PAINT"}], "GRID_LINES": ["A", "B"]},
+        "bottom-left quadrant": {"GRID_LINES": ["b", "1"], "TITLE_BLOCK": {"sheet_number": "A-1O1", "date": "03/04/2024"}},
+        "bottom-right quadrant": {},
+    }
+
+    def fake_region(image_bytes, drawing_name, region, region_description=""):
+        all_tiles_started.wait()  # BrokenBarrierError if tiles run serially
+        return tile_sections[region_description[len("the "):-len(" of the sheet")]]
+
+    monkeypatch.setattr(pipeline, "_extract_region_information", fake_region)
+    png_path = tmp_path / "large.png"
+    png_path.write_bytes(_sheet_png())
+
+    info = pipeline._extract_page_information(str(png_path), "A-101", 1)
+
+    assert len(info["tiles"]) == 5
+    sections = info["sections"]
+    assert sections["TITLE_BLOCK"] == {"sheet_number": "A-101", "scale": "1/8\" = 1'-0\"", "date": "03/04/2024"}
+    assert sections["KEYNOTES"] == [
+        {"number": "1", "description": "NEW WALL"},
+        {"number": "2", "description": "PATCH AND PAINT"},
+    ]
+    assert sections["GRID_LINES"] == ["A", "B", "1"]
+
+
 def test_diff_and_summary_pipelines(session_factory, storage_stub):
     with session_factory() as session:
         seed = _seed_graph(session)
@@ -283,6 +582,234 @@ def test_diff_and_summary_pipelines(session_factory, storage_stub):
         assert latest.summary_text != ""
 
 
+def _seed_summary_target(session_factory, storage_stub):
+    with session_factory() as session:
+        seed = _seed_graph(session)
+        job = Job(
+            id=str(uuid4()),
+            project_id=seed["project"].id,
+            old_drawing_version_id=str(uuid4()),
+            new_drawing_version_id=str(uuid4()),
+            status="in_progress",
+            created_by=seed["user"].id,
+        )
+        diff_result = DiffResult(
+            id=str(uuid4()),
+            job_id=job.id,
+            old_drawing_version_id=job.old_drawing_version_id,
+            new_drawing_version_id=job.new_drawing_version_id,
+            machine_generated_overlay_ref="diffs/d.json",
+            diff_metadata={"drawing_name": "A-101"},
+        )
+        session.add_all([job, diff_result])
+        session.commit()
+        job_id, diff_result_id = job.id, diff_result.id
+    storage_stub.register_file("diffs/d.json", json.dumps({"change_count": 1}).encode())
+    return job_id, diff_result_id
+
+
+def test_summary_pipeline_calls_both_models_concurrently_and_commits_primary_first(session_factory, storage_stub):
+    import threading
+
+    job_id, diff_result_id = _seed_summary_target(session_factory, storage_stub)
+
+    both_started = threading.Barrier(2, timeout=5)
+    active_when_gpt_returned = []
+
+    def gemini(diff_result, diff_payload, overlay_ref, artifacts=None):
+        both_started.wait()  # deadlocks (BrokenBarrierError) if called serially
+        return "gemini text", {"changes": []}
+
+    def gpt(diff_result, diff_payload, overlay_ref, artifacts=None):
+        both_started.wait()
+        for _ in range(100):
+            with session_factory() as session:
+                active = [
+                    s.source
+                    for s in session.query(ChangeSummary).filter_by(diff_result_id=diff_result_id, is_active=True)
+                ]
+            if active:
+                break
+            threading.Event().wait(0.05)
+        active_when_gpt_returned.extend(active)
+        return "gpt text", {"changes": []}
+
+    pipeline = SummaryPipeline(storage_service=storage_stub, session_factory=session_factory)
+    pipeline.gemini_model, pipeline.gemini_model_name = object(), "gemini-test"
+    pipeline.openai_client, pipeline.openai_model = object(), "gpt-test"
+    pipeline._generate_gemini_summary = gemini
+    pipeline._generate_ai_summary = gpt
+
+    result = pipeline.run(job_id, diff_result_id, overlay_ref="overlays/d.png")
+
+    # The primary summary was already committed while the secondary was still in flight
+    assert active_when_gpt_returned == ["gemini"]
+    assert len(result["summaries_created"]) == 2
+    with session_factory() as session:
+        summaries = {
+            s.source: (s.id, s.is_active)
+            for s in session.query(ChangeSummary).filter_by(diff_result_id=diff_result_id)
+        }
+    assert summaries["gemini"] == (result["summary_id"], True)
+    assert summaries["gpt-4-vision"][1] is False
+
+
+def test_summary_pipeline_stops_waiting_for_the_other_model_when_cancelled(session_factory, storage_stub):
+    import threading
+    import time
+
+    from utils.cancellation import JobCancelled
+
+    job_id, diff_result_id = _seed_summary_target(session_factory, storage_stub)
+    gpt_released = threading.Event()
+
+    def gemini(diff_result, diff_payload, overlay_ref, artifacts=None):
+        raise JobCancelled(job_id)
+
+    def gpt(diff_result, diff_payload, overlay_ref, artifacts=None):
+        gpt_released.wait(5)
+        return "gpt text", {"changes": []}
+
+    pipeline = SummaryPipeline(storage_service=storage_stub, session_factory=session_factory)
+    pipeline.gemini_model, pipeline.gemini_model_name = object(), "gemini-test"
+    pipeline.openai_client, pipeline.openai_model = object(), "gpt-test"
+    pipeline._generate_gemini_summary = gemini
+    pipeline._generate_ai_summary = gpt
+
+    started = time.monotonic()
+    try:
+        with pytest.raises(JobCancelled):
+            pipeline.run(job_id, diff_result_id, overlay_ref="overlays/d.png")
+        assert time.monotonic() - started < 2
+    finally:
+        gpt_released.set()
+
+
+def test_summary_request_sends_overview_and_region_crops(storage_stub):
+    import base64
+    import io
+
+    from PIL import Image
+
+    def png(color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (400, 300), color).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    storage_stub.register_file("overlays/o.png", png("red"))
+    storage_stub.register_file("pages/old.png", png("white"))
+    storage_stub.register_file("diffs/old_aligned.png", png("black"))
+    storage_stub.register_file("pages/new.png", png("gray"))
+    diff_result = DiffResult(
+        id=str(uuid4()),
+        diff_metadata={
+            "drawing_name": "A-101",
+            "baseline_image_ref": "pages/old.png",
+            "aligned_baseline_image_ref": "diffs/old_aligned.png",
+            "revised_image_ref": "pages/new.png",
+            "change_regions": [[0.1, 0.1, 0.2, 0.2], [0.6, 0.5, 0.8, 0.7]],
+        },
+    )
+    pipeline = SummaryPipeline(storage_service=storage_stub, session_factory=None)
+    pipeline.model = "gpt-test"
+    pipeline.region_mode = True
+
+    content = pipeline._build_summary_request(diff_result, "overlays/o.png")["messages"][1]["content"]
+    images = [part["image_url"] for part in content if part["type"] == "image_url"]
+    texts = [part["text"] for part in content if part["type"] == "text"]
+    assert [image["detail"] for image in images] == ["low", "high", "high", "high", "high"]
+    assert texts[1:] == ["OVERVIEW:", "R1 BEFORE:", "R1 AFTER:", "R2 BEFORE:", "R2 AFTER:"]
+    assert "R2: 60%-80% across, 50%-70% down" in texts[0]
+    # BEFORE crops come from the old sheet aligned to the new one, like the regions
+    before = Image.open(io.BytesIO(base64.b64decode(images[1]["url"].split(",", 1)[1])))
+    assert before.convert("L").getpixel((0, 0)) < 50
+
+    _, summary_json = pipeline._parse_summary_response(
+        json.dumps({"changes": [{"region_id": "R2", "title": "Door added", "change_type": "added"}]}),
+        "A-101",
+        regions=pipeline._change_regions(diff_result),
+    )
+    assert summary_json["summary_mode"] == "change_regions"
+    assert summary_json["changes"][0]["region"] == [0.6, 0.5, 0.8, 0.7]
+
+    # Changes covering most of the sheet fall back to whole-sheet analysis
+    diff_result.diff_metadata = dict(diff_result.diff_metadata, change_regions=[[0.0, 0.0, 0.9, 0.9]])
+    content = pipeline._build_summary_request(diff_result, "overlays/o.png")["messages"][1]["content"]
+    assert sum(part["type"] == "image_url" for part in content) == 3
+
+
+def test_diff_run_page_reuses_cached_result_for_identical_pages(session_factory, storage_stub, monkeypatch):
+    import cv2
+    import numpy as np
+
+    with session_factory() as session:
+        seed = _seed_graph(session)
+        old_version = _create_drawing_version(
+            session, seed["project"], seed["session"], storage_path="old.pdf", name="A103"
+        )
+        new_version = _create_drawing_version(
+            session,
+            seed["project"],
+            seed["session"],
+            storage_path="new.pdf",
+            name="A103",
+            drawing_type="new",
+            version_number=2,
+        )
+        old_version_id, new_version_id = old_version.id, new_version.id
+        job_ids = []
+        for _ in range(2):
+            job = Job(
+                id=str(uuid4()),
+                project_id=seed["project"].id,
+                old_drawing_version_id=old_version_id,
+                new_drawing_version_id=new_version_id,
+                status="in_progress",
+                created_by=seed["user"].id,
+            )
+            session.add(job)
+            job_ids.append(job.id)
+        session.commit()
+
+    img = np.full((64, 64, 3), 255, dtype=np.uint8)
+    cv2.rectangle(img, (8, 8), (56, 56), (0, 0, 0), 2)
+    png = cv2.imencode(".png", img)[1].tobytes()
+    storage_stub.register_file("pages/old/page_001.png", png)
+    storage_stub.register_file("pages/new/page_001.png", png)
+
+    align_calls = []
+
+    class _CountingAligner:
+        def align(self, old_img, new_img):
+            align_calls.append(1)
+            return new_img
+
+    monkeypatch.setattr('processing.diff_pipeline.AlignDrawings', lambda *_, **__: _CountingAligner())
+    pipeline = DiffPipeline(storage_service=storage_stub, session_factory=session_factory)
+
+    results = [
+        pipeline.run_page(
+            job_id=job_id,
+            page_number=1,
+            old_page_gcs="pages/old/page_001.png",
+            new_page_gcs="pages/new/page_001.png",
+            old_version_id=old_version_id,
+            new_version_id=new_version_id,
+            drawing_name="A103",
+        )
+        for job_id in job_ids
+    ]
+
+    assert len(align_calls) == 1
+    assert results[1]["cache_hit"] is True
+    assert results[1]["overlay_ref"] == results[0]["overlay_ref"]
+    with session_factory() as session:
+        reused = session.get(DiffResult, results[1]["diff_result_id"])
+        assert reused.job_id == job_ids[1]
+        assert reused.diff_metadata["reused_from_diff_result_id"] == results[0]["diff_result_id"]
+        assert storage_stub.download_file(reused.diff_metadata["aligned_baseline_image_ref"])
+
+
 class FakeOrchestrator:
     def __init__(self):
         self.events = []
@@ -366,6 +893,46 @@ def test_ocr_worker_marks_stage_complete(session_factory):
     assert orchestrator.events == [("ocr", job_id, drawing_version_id)]
 
 
+def test_streaming_ocr_worker_runs_old_and_new_pages_concurrently(session_factory):
+    import threading
+
+    job_id, _, _ = _seed_job_with_stages(session_factory)
+    both_started = threading.Barrier(2, timeout=5)
+
+    class ConcurrentPagePipeline:
+        def uses_base_page(self):
+            return False
+
+        def run_page(self, page_gcs_path, page_identifier, base_page_gcs=None):
+            both_started.wait()  # deadlocks (BrokenBarrierError) if called serially
+            return {"result_ref": f"ocr_pages/{page_identifier}.json"}
+
+    class PageOrchestrator:
+        def __init__(self):
+            self.pages = []
+
+        def on_page_ocr_complete(self, **kwargs):
+            self.pages.append(kwargs)
+
+    orchestrator = PageOrchestrator()
+    worker = OCRWorker(
+        pipeline=ConcurrentPagePipeline(), orchestrator=orchestrator, session_factory=session_factory
+    )
+
+    result = worker.process_streaming_message(
+        {
+            "job_id": job_id,
+            "page_number": 1,
+            "old_page_gcs": "pages/old/page_001.png",
+            "new_page_gcs": "pages/new/page_001.png",
+        }
+    )
+
+    assert result["old_ocr_ref"] == "ocr_pages/old_page_1.json"
+    assert result["new_ocr_ref"] == "ocr_pages/new_page_1.json"
+    assert orchestrator.pages[0]["page_number"] == 1
+
+
 def test_diff_and_summary_workers_update_stages(session_factory):
     job_id, old_version_id, new_version_id = _seed_job_with_stages(session_factory)
     orchestrator = FakeOrchestrator()
@@ -0,0 +1,140 @@
+"""Tests for batched task publishing and the in-memory publisher."""
+
+from concurrent.futures import Future
+from contextlib import contextmanager
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from config import config
+from gcp.database.models import Job, JobStage
+from gcp.pubsub import InMemoryPublisher, PublishError
+from gcp.pubsub import publisher as publisher_module
+from services import orchestrator as orchestrator_module
+from services.orchestrator import OrchestratorService
+
+
+class RecordingClient:
+    """PublisherClient double whose futures resolve when ``flush`` is called."""
+
+    def __init__(self, batch_settings=None):
+        self.batch_settings = batch_settings
+        self.futures = []
+
+    def topic_path(self, project_id, topic):
+        return f"projects/{project_id}/topics/{topic}"
+
+    def publish(self, topic_path, data, **attrs):
+        future = Future()
+        self.futures.append((future, attrs))
+        return future
+
+    def flush(self, fail_job=None):
+        for index, (future, attrs) in enumerate(self.futures):
+            if attrs["job_id"] == fail_job:
+                future.set_exception(RuntimeError("deadline exceeded"))
+            else:
+                future.set_result(f"msg-{index}")
+
+
+@pytest.fixture
+def pubsub_config(monkeypatch):
+    for name, value in {
+        "GCP_PROJECT_ID": "test-project",
+        "PUBSUB_OCR_TOPIC": "ocr",
+        "PUBSUB_DIFF_TOPIC": "diff",
+        "PUBSUB_SUMMARY_TOPIC": "summary",
+        "PUBSUB_BATCH_MAX_MESSAGES": 100,
+        "PUBSUB_BATCH_MAX_BYTES": 1024 * 1024,
+        "PUBSUB_BATCH_MAX_LATENCY": 0.05,
+        "PUBSUB_PUBLISH_TIMEOUT": 1,
+    }.items():
+        monkeypatch.setattr(config, name, value, raising=False)
+    monkeypatch.setattr(publisher_module.pubsub_v1, "PublisherClient", RecordingClient)
+
+
+def test_publish_batch_hands_over_all_messages_before_waiting(pubsub_config, monkeypatch):
+    publisher = publisher_module.PubSubPublisher()
+    client = publisher.publisher
+    assert client.batch_settings.max_messages == 100
+
+    # Resolve the futures only once the last message was handed to the client
+    original_publish = client.publish
+
+    def publish(topic_path, data, **attrs):
+        future = original_publish(topic_path, data, **attrs)
+        if len(client.futures) == 3:
+            client.flush(fail_job="job-2")
+        return future
+
+    monkeypatch.setattr(client, "publish", publish)
+    messages = [publisher.summary_task_message(f"job-{i}", f"diff-{i}") for i in range(3)]
+
+    result = publisher.publish_batch("summary", messages)
+
+    assert result.message_ids == ["msg-0", "msg-1", None]
+    assert result.failed == 1 and "deadline exceeded" in result.errors[2]
+    with pytest.raises(PublishError):
+        result.raise_for_failures()
+
+
+def test_in_memory_publisher_records_single_and_batched_tasks():
+    publisher = InMemoryPublisher(fail_when=lambda stage, message: message.get("diff_result_id") == "bad")
+
+    message_id = publisher.publish_diff_task("job", "old", "new", {"page_number": 1})
+    result = publisher.publish_batch("summary", [
+        publisher.summary_task_message("job", "good"),
+        publisher.summary_task_message("job", "bad"),
+    ])
+
+    assert publisher.published[0]["message_id"] == message_id
+    assert [m["diff_result_id"] for m in publisher.messages("summary")] == ["good"]
+    assert publisher.messages("diff")[0]["new_drawing_version_id"] == "new"
+    assert result.errors == {1: "publish rejected"}
+    assert publisher.batches == [1, 2]
+
+
+def test_legacy_diff_completion_publishes_summaries_in_one_batch(engine, monkeypatch):
+    SessionLocal = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session_scope():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setattr(orchestrator_module, "get_db_session", session_scope)
+    job_id = str(uuid4())
+    with session_scope() as session:
+        session.add(Job(
+            id=job_id,
+            project_id=str(uuid4()),
+            old_drawing_version_id=str(uuid4()),
+            new_drawing_version_id=str(uuid4()),
+            status="in_progress",
+            created_by=str(uuid4()),
+        ))
+        session.add_all([
+            JobStage(id=str(uuid4()), job_id=job_id, stage="diff", status="in_progress"),
+            JobStage(id=str(uuid4()), job_id=job_id, stage="summary", status="pending"),
+        ])
+        session.commit()
+
+    publisher = InMemoryPublisher()
+    orchestrator = OrchestratorService(publisher=publisher)
+    orchestrator.on_diff_complete(job_id, [
+        {"diff_result_id": f"diff-{page}", "overlay_ref": f"overlays/{page}.png", "page_number": page}
+        for page in range(1, 301)
+    ])
+
+    assert publisher.batches == [300]
+    summaries = publisher.messages("summary")
+    assert [m["diff_result_id"] for m in summaries[:2]] == ["diff-1", "diff-2"]
+    assert summaries[0]["metadata"]["priority"] == "interactive"
+    with session_scope() as session:
+        stage = session.query(JobStage).filter_by(job_id=job_id, stage="summary").one()
+        assert stage.status == "in_progress"
+        assert stage.stage_metadata["expected_summaries"] == 300
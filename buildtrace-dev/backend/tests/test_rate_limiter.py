@@ -0,0 +1,45 @@
+"""Tests for the shared provider rate limiter."""
+
+import threading
+import time
+
+from utils.rate_limiter import TokenBucket
+
+
+def test_bucket_allows_burst_up_to_capacity_then_blocks():
+    bucket = TokenBucket(rate_per_minute=600, capacity=3)  # 10 tokens/second
+
+    assert all(bucket.try_acquire() for _ in range(3))
+    assert bucket.try_acquire() is False
+
+    started = time.monotonic()
+    assert bucket.acquire() is True
+    assert time.monotonic() - started >= 0.05
+
+
+def test_acquire_times_out_when_budget_exhausted():
+    bucket = TokenBucket(rate_per_minute=1, capacity=1)
+    assert bucket.acquire() is True
+    assert bucket.acquire(timeout=0.05) is False
+
+
+def test_zero_rate_disables_limiting():
+    bucket = TokenBucket(rate_per_minute=0)
+    assert all(bucket.try_acquire() for _ in range(1000))
+
+
+def test_bucket_is_shared_across_threads():
+    bucket = TokenBucket(rate_per_minute=60, capacity=5)
+    granted = []
+
+    def worker():
+        granted.append(bucket.try_acquire())
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert granted.count(True) == 5
+
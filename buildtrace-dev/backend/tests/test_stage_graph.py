@@ -0,0 +1,164 @@
+"""Tests for the declarative per-page stage graph driving streaming jobs."""
+
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+
+from config import config
+from gcp.database.models import Job, JobStage
+from gcp.pubsub import InMemoryPublisher
+from services.orchestrator import OrchestratorService
+from services.stage_graph import RetryPolicy, StageGraph, StageGraphEngine, StageSpec
+
+
+def _job(session, total_pages):
+    job = Job(
+        id=str(uuid4()),
+        project_id=str(uuid4()),
+        old_drawing_version_id=str(uuid4()),
+        new_drawing_version_id=str(uuid4()),
+        total_pages=total_pages,
+        status="in_progress",
+        created_by=str(uuid4()),
+    )
+    session.add(job)
+    return job
+
+
+def _statuses(scope, job_id, stage):
+    with scope() as session:
+        rows = session.query(JobStage).filter_by(job_id=job_id, stage=stage).order_by(JobStage.page_number)
+        return [row.status for row in rows]
+
+
+def test_pages_flow_through_stages_and_unchanged_pages_skip_summary(session_scope, monkeypatch):
+    monkeypatch.setattr(config, "SKIP_UNCHANGED_PAGE_SUMMARY", True, raising=False)
+    publisher = InMemoryPublisher()
+    orchestrator = OrchestratorService(publisher=publisher)
+    with session_scope() as session:
+        job = _job(session, total_pages=2)
+        job_id = job.id
+        dispatches = orchestrator.stage_engine.start_job(session, job, {
+            page: {"drawing_name": f"A-10{page}", "old_page_gcs": f"old/{page}.png", "new_page_gcs": f"new/{page}.png"}
+            for page in (1, 2)
+        })
+        session.commit()
+    orchestrator._dispatch(dispatches)
+
+    ocr = publisher.messages("ocr")
+    assert [m["metadata"]["page_number"] for m in ocr] == [1, 2]
+    assert ocr[1]["metadata"]["new_page_gcs"] == "new/2.png"
+
+    orchestrator.on_page_ocr_complete(job_id, 2, "ocr/old-2", "ocr/new-2", "A-102")
+    diff = publisher.messages("diff")[0]["metadata"]
+    assert (diff["page_number"], diff["new_ocr_ref"], diff["old_page_gcs"]) == (2, "ocr/new-2", "old/2.png")
+
+    orchestrator.on_page_ocr_complete(job_id, 1, "ocr/old-1", "ocr/new-1", "A-101")
+    orchestrator.on_page_diff_complete(job_id, 1, "diff-1", "overlay-1", "A-101", change_count=0)
+    orchestrator.on_page_diff_complete(job_id, 2, "diff-2", "overlay-2", "A-102", change_count=3)
+
+    summaries = publisher.messages("summary")
+    assert [m["diff_result_id"] for m in summaries] == ["diff-2"]
+    assert summaries[0]["metadata"]["streaming"] is True
+    assert _statuses(session_scope, job_id, "summary") == ["skipped", "in_progress"]
+
+    orchestrator.on_page_summary_complete(job_id, 2, "summary-2")
+    orchestrator.on_page_summary_complete(job_id, 2, "summary-2")  # redelivered
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+        assert (job.status, job.completed_pages) == ("completed", 2)
+        assert session.query(JobStage).filter_by(job_id=job_id, stage="diff").count() == 2
+
+
+def test_stage_rows_are_written_in_bulk_and_pages_counted_atomically(engine, session_scope, monkeypatch):
+    for stage in ("OCR", "DIFF", "SUMMARY"):  # unscheduled: the fair scheduler adds its own reads
+        monkeypatch.setattr(config, f"SCHEDULER_MAX_IN_FLIGHT_{stage}", 0, raising=False)
+    orchestrator = OrchestratorService(publisher=InMemoryPublisher())
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0] + (" many" if executemany else ""))
+
+    with session_scope() as session:
+        job = _job(session, total_pages=200)
+        job_id = job.id
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            dispatches = orchestrator.stage_engine.start_job(session, job, {page: {} for page in range(1, 201)})
+            session.commit()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    assert len(dispatches) == 200
+    assert statements == ["INSERT", "INSERT many"]  # the job, then every page's OCR row
+
+    for page in range(1, 201):
+        orchestrator.on_page_ocr_complete(job_id, page, "o", "n", "A")
+        orchestrator.on_page_diff_complete(job_id, page, f"diff-{page}", None, "A")
+
+    statements.clear()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        orchestrator.on_page_summary_complete(job_id, 7, "summary-7")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # Read the page, flip its row, bump the job counter - no per-job COUNT(*)
+    assert statements == ["SELECT", "UPDATE", "UPDATE"]
+
+    for page in range(1, 201):
+        orchestrator.on_page_summary_complete(job_id, page, f"summary-{page}")
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+        assert (job.completed_pages, job.status) == (200, "completed")
+
+
+def _task(context):
+    return {"job_id": context.job_id, "page": context.page_number, "inputs": dict(context.values)}
+
+
+def test_fan_out_fan_in_concurrency_and_retries(session_scope):
+    graph = StageGraph([
+        StageSpec(name="merge", queue="q", build_task=_task, inputs=("tiles", "fingerprint")),
+        StageSpec(name="fingerprint", queue="q", build_task=_task, inputs=("raster",), outputs=("hash",),
+                  retry=RetryPolicy(max_attempts=2)),
+        StageSpec(name="tiles", queue="q", build_task=_task, inputs=("raster",), outputs=("tile_ref",), concurrency=1),
+        StageSpec(name="raster", queue="q", build_task=_task, outputs=("png",)),
+    ])
+    assert [spec.name for spec in graph.stages][0] == "raster" and graph.terminals == ["merge"]
+    stage_engine = StageGraphEngine(graph, session_factory=session_scope)
+
+    with session_scope() as session:
+        job = _job(session, total_pages=2)
+        job_id = job.id
+        assert len(stage_engine.start_job(session, job, {1: {}, 2: {}})) == 2
+        session.commit()
+
+    # Fan-out: both independent stages of page 1 are ready at once
+    ready = stage_engine.complete(job_id, 1, "raster", {"png": "p1.png", "ignored": True})
+    assert sorted(d.stage.name for d in ready) == ["fingerprint", "tiles"]
+    assert ready[0].task["inputs"]["png"] == "p1.png" and "ignored" not in ready[0].task["inputs"]
+
+    # tiles allows one page in flight per job: page 2 waits for page 1's slot
+    assert [d.stage.name for d in stage_engine.complete(job_id, 2, "raster", {"png": "p2.png"})] == ["fingerprint"]
+    assert _statuses(session_scope, job_id, "tiles") == ["in_progress", "queued"]
+    released = stage_engine.complete(job_id, 1, "tiles", {"tile_ref": "t1"})
+    assert [(d.stage.name, d.page_number) for d in released] == [("tiles", 2)]
+
+    # Fan-in: merge waits for fingerprint; a failed fingerprint is retried once
+    retried = stage_engine.fail(job_id, 1, "fingerprint", "timeout")
+    assert [(d.stage.name, d.page_number) for d in retried] == [("fingerprint", 1)]
+    merge = stage_engine.complete(job_id, 1, "fingerprint", {"hash": "abc"})
+    assert merge[0].stage.name == "merge" and merge[0].task["inputs"]["tile_ref"] == "t1"
+    assert len(stage_engine.fail(job_id, 2, "fingerprint", "bad page")) == 1
+    assert stage_engine.fail(job_id, 2, "fingerprint", "bad page") == []
+    assert _statuses(session_scope, job_id, "fingerprint") == ["completed", "failed"]
+
+
+def test_graph_rejects_cycles_and_unknown_inputs():
+    with pytest.raises(ValueError, match="cycle"):
+        StageGraph([
+            StageSpec(name="a", queue="q", build_task=_task, inputs=("b",)),
+            StageSpec(name="b", queue="q", build_task=_task, inputs=("a",)),
+        ])
+    with pytest.raises(ValueError, match="unknown"):
+        StageGraph([StageSpec(name="a", queue="q", build_task=_task, inputs=("missing",))])
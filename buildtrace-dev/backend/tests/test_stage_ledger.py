@@ -0,0 +1,120 @@
+"""Tests for the idempotent stage execution ledger."""
+
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from services.stage_ledger import StageLedger
+from workers.summary_worker import SummaryWorker
+
+
+@pytest.fixture
+def session_factory(engine):
+    SessionLocal = sessionmaker(bind=engine)
+
+    @contextmanager
+    def scope():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    return scope
+
+
+def test_claims_dedupe_deliveries_and_expired_leases_are_taken_over(session_factory):
+    ledger = StageLedger(session_factory, lease_seconds=60, enabled=True)
+    job_id, task = str(uuid4()), {"page_number": 3, "new_page_gcs": "new/3.png"}
+
+    first = ledger.claim(job_id, "ocr", 3, task)
+    assert first.acquired
+    assert ledger.claim(job_id, "ocr", 3, dict(reversed(list(task.items())))).state == "busy"
+    assert ledger.claim(job_id, "ocr", 3, {**task, "new_page_gcs": "new/3b.png"}).acquired
+
+    assert ledger.complete(first, {"old_ocr_ref": "o", "new_ocr_ref": "n"})
+    replay = ledger.claim(job_id, "ocr", 3, task)
+    assert replay.completed and replay.result == {"old_ocr_ref": "o", "new_ocr_ref": "n"}
+
+    # A failed run releases its claim; a crashed one is taken over once the lease expires
+    failed = ledger.claim(job_id, "summary", 3, task)
+    ledger.release(failed)
+    assert ledger.claim(job_id, "summary", 3, task).attempts == 2
+
+    short = StageLedger(session_factory, lease_seconds=0, enabled=True)
+    crashed = short.claim(job_id, "diff", 3, task)
+    time.sleep(0.01)
+    takeover = short.claim(job_id, "diff", 3, task)
+    assert (takeover.acquired, takeover.attempts) == (True, 2)
+    assert not short.complete(crashed, {"diff_result_id": "late"})  # fenced out
+    assert short.complete(takeover, {"diff_result_id": "d"})
+
+
+class _Pipeline:
+    def __init__(self):
+        self.runs = 0
+
+    def run(self, job_id, diff_result_id, **kwargs):
+        self.runs += 1
+        return {"summary_id": f"summary-{self.runs}", "diff_result_id": diff_result_id}
+
+
+class _Orchestrator:
+    def __init__(self):
+        self.completed = []
+
+    def on_page_summary_complete(self, job_id, page_number, summary_id):
+        self.completed.append((page_number, summary_id))
+
+
+def test_redelivered_summary_replays_the_stored_result(session_factory):
+    pipeline, orchestrator = _Pipeline(), _Orchestrator()
+    worker = SummaryWorker(
+        pipeline=pipeline,
+        orchestrator=orchestrator,
+        session_factory=session_factory,
+        ledger=StageLedger(session_factory, enabled=True),
+    )
+    message = {
+        "job_id": str(uuid4()),
+        "diff_result_id": "diff-5",
+        "metadata": {"page_number": 5, "streaming": True},
+    }
+
+    assert worker.process_message(message)["summary_id"] == "summary-1"
+    assert worker.process_message(message)["summary_id"] == "summary-1"
+    assert pipeline.runs == 1
+    # The page is reported again (the stage graph ignores the repeat), no second summary is written
+    assert orchestrator.completed == [(5, "summary-1"), (5, "summary-1")]
+
+
+def test_placeholder_summaries_and_regenerations_run_again(session_factory):
+    class _FailingPipeline(_Pipeline):
+        def run(self, job_id, diff_result_id, **kwargs):
+            return dict(super().run(job_id, diff_result_id, **kwargs), placeholder=self.runs == 1)
+
+    pipeline, orchestrator = _FailingPipeline(), _Orchestrator()
+    worker = SummaryWorker(
+        pipeline=pipeline,
+        orchestrator=orchestrator,
+        session_factory=session_factory,
+        ledger=StageLedger(session_factory, enabled=True),
+    )
+    message = {
+        "job_id": str(uuid4()),
+        "diff_result_id": "diff-6",
+        "metadata": {"page_number": 6, "streaming": True},
+    }
+
+    # Every AI call failed the first time: the redelivery runs the models again
+    assert worker.process_message(message)["summary_id"] == "summary-1"
+    assert worker.process_message(message)["summary_id"] == "summary-2"
+    assert worker.process_message(message)["summary_id"] == "summary-2"
+    assert pipeline.runs == 2
+
+    # A regeneration request for the same diff carries its own id, so it is not a replay
+    regenerate = {**message, "metadata": {**message["metadata"], "regeneration_id": str(uuid4())}}
+    assert worker.process_message(regenerate)["summary_id"] == "summary-3"
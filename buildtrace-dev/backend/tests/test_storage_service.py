@@ -0,0 +1,75 @@
+"""Tests for appending to storage objects (the growing NDJSON logs)."""
+
+from config import config
+from gcp.storage.storage_service import GCS_MAX_COMPOSE_COMPONENTS, StorageService
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket, self.name = bucket, name
+        self.content_type = None
+
+    @property
+    def size(self):
+        return len(self.bucket.objects[self.name])
+
+    @property
+    def component_count(self):
+        return self.bucket.components.get(self.name)
+
+    def upload_from_file(self, file_obj, rewind=False, content_type=None):
+        self.bucket.objects[self.name] = file_obj.read()
+        self.bucket.components[self.name] = None  # uploaded objects are not composite
+        self.bucket.uploads.append(self.name)
+
+    def reload(self):
+        pass
+
+    def download_as_bytes(self):
+        return self.bucket.objects[self.name]
+
+    def compose(self, sources):
+        self.bucket.objects[self.name] = b"".join(self.bucket.objects[source.name] for source in sources)
+        self.bucket.components[self.name] = sum(source.component_count or 1 for source in sources)
+
+    def delete(self):
+        self.bucket.objects.pop(self.name)
+        self.bucket.components.pop(self.name)
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects, self.components, self.uploads = {}, {}, []
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name):
+        return FakeBlob(self, name) if name in self.objects else None
+
+
+def _gcs_storage(monkeypatch):
+    monkeypatch.setattr(config, "USE_GCS", False)
+    service = StorageService(bucket_name="logs")
+    service.use_gcs, service.bucket = True, FakeBucket()
+    return service
+
+
+def test_gcs_append_composes_and_rewrites_before_the_component_limit(monkeypatch):
+    service = _gcs_storage(monkeypatch)
+    bucket = service.bucket
+
+    service.append_file(b"a\n", "ocr_log.ndjson", "application/x-ndjson")
+    service.append_file(b"b\n", "ocr_log.ndjson", "application/x-ndjson")
+    assert bucket.objects == {"ocr_log.ndjson": b"a\nb\n"}  # the appended chunk is gone
+    assert bucket.components["ocr_log.ndjson"] == 2
+
+    # At the limit the next append rewrites the object as a single component
+    bucket.components["ocr_log.ndjson"] = GCS_MAX_COMPOSE_COMPONENTS
+    bucket.uploads.clear()
+    service.append_file(b"c\n", "ocr_log.ndjson", "application/x-ndjson")
+    assert bucket.objects == {"ocr_log.ndjson": b"a\nb\nc\n"}
+    assert bucket.uploads == ["ocr_log.ndjson"] and bucket.components["ocr_log.ndjson"] is None
+
+    service.append_file(b"d\n", "ocr_log.ndjson", "application/x-ndjson")
+    assert (bucket.objects["ocr_log.ndjson"], bucket.components["ocr_log.ndjson"]) == (b"a\nb\nc\nd\n", 2)
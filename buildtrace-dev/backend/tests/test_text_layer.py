@@ -0,0 +1,95 @@
+"""Tests for reading OCR sections from a PDF text layer."""
+
+import fitz
+
+from utils.text_layer import extract_sections, read_pdf_text_layers, read_text_layer
+
+
+def _vector_sheet(path, with_keynotes=True, keynotes_header="KEYNOTES"):
+    doc = fitz.open()
+    page = doc.new_page(width=1224, height=792)
+    if with_keynotes:
+        page.insert_text((60, 80), keynotes_header, fontsize=12)
+        page.insert_text((60, 100), "1. PROVIDE NEW GYPSUM BOARD PARTITION", fontsize=9)
+        page.insert_text((60, 114), "2. EXISTING DOOR TO REMAIN", fontsize=9)
+        page.insert_text((60, 128), "PROTECT DURING CONSTRUCTION", fontsize=9)
+    page.insert_text((960, 620), "PROJECT NO. 2024-118", fontsize=8)
+    page.insert_text((960, 640), "FIRST FLOOR PLAN", fontsize=14)
+    page.insert_text((960, 660), "SCALE: 1/8\" = 1'-0\"", fontsize=8)
+    page.insert_text((960, 690), "1 03/04/2024 ISSUED FOR PERMIT", fontsize=7)
+    page.insert_text((1080, 760), "A-101", fontsize=24)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def test_vector_sheet_sections_are_read_from_text_layer(tmp_path):
+    layers = read_pdf_text_layers(str(_vector_sheet(tmp_path / "sheet.pdf", keynotes_header="KEYED NOTES")))
+
+    extraction = extract_sections(layers[0])
+
+    # Every section the text layer owns parsed (the sheet has no general notes table)
+    assert extraction.complete
+    assert extraction.residual_sections == []
+    # Sections it never reads go to the vision model only on request
+    assert extract_sections(layers[0], include_unread=True).requested_sections == [
+        "DESIGN_TEAM", "DIMENSIONS", "SPECIFICATIONS", "SCHEDULES", "GRID_LINES",
+    ]
+    sections = extraction.sections
+    assert sections["TITLE_BLOCK"]["sheet_number"] == "A-101"
+    assert sections["TITLE_BLOCK"]["project_number"] == "2024-118"
+    assert sections["TITLE_BLOCK"]["drawing_title"] == "FIRST FLOOR PLAN"
+    assert sections["DRAWING_TYPE"] == "floor_plan"
+    assert sections["KEYNOTES"] == [
+        {"number": "1", "description": "PROVIDE NEW GYPSUM BOARD PARTITION"},
+        {"number": "2", "description": "EXISTING DOOR TO REMAIN PROTECT DURING CONSTRUCTION"},
+    ]
+    assert sections["REVISIONS"] == [
+        {"revision_number": "1", "date": "03/04/2024", "description": "ISSUED FOR PERMIT"}
+    ]
+
+
+def test_raster_only_page_is_left_to_vision_model():
+    doc = fitz.open()
+    page = doc.new_page(width=1224, height=792)
+    layer = read_text_layer(page)
+    doc.close()
+
+    extraction = extract_sections(layer)
+
+    assert extraction.is_raster_only
+    assert not extraction.complete
+    assert extraction.requested_sections is None
+    page_info = {"sections": {"KEYNOTES": []}, "extraction_method": "gemini_2.5_pro"}
+    assert extraction.merge_into(page_info) is page_info
+
+
+def test_unparsed_header_is_residual_and_parsed_sections_override_llm(tmp_path):
+    doc = fitz.open()
+    page = doc.new_page(width=1224, height=792)
+    page.insert_text((60, 80), "KEYNOTES", fontsize=12)
+    page.insert_text((60, 300), "GENERAL NOTES", fontsize=12)
+    page.insert_text((960, 640), "ENLARGED TOILET ROOM PLAN AND INTERIOR ELEVATIONS", fontsize=14)
+    page.insert_text((1080, 760), "A-501", fontsize=24)
+    layer = read_text_layer(page)
+    doc.close()
+
+    extraction = extract_sections(layer)
+
+    assert "KEYNOTES" in extraction.residual_sections and "GENERAL_NOTES" in extraction.residual_sections
+    assert "TITLE_BLOCK" not in extraction.residual_sections
+    assert not extraction.complete
+    merged = extraction.merge_into({
+        "sections": {
+            "KEYNOTES": [{"number": "1", "description": "NEW SINK"}],
+            "GENERAL_NOTES": ["VERIFY ALL DIMENSIONS IN FIELD"],
+            "TITLE_BLOCK": {"sheet_number": "A-5O1", "project_name": "CLINIC RENOVATION"},
+        },
+        "extraction_method": "gemini_2.5_pro",
+    })
+    assert merged["sections"]["KEYNOTES"] == [{"number": "1", "description": "NEW SINK"}]
+    # Empty text-layer sections and title block fields never replace what the model read
+    assert merged["sections"]["GENERAL_NOTES"] == ["VERIFY ALL DIMENSIONS IN FIELD"]
+    assert merged["sections"]["TITLE_BLOCK"]["sheet_number"] == "A-501"
+    assert merged["sections"]["TITLE_BLOCK"]["project_name"] == "CLINIC RENOVATION"
+    assert merged["extraction_method"] == "text_layer+gemini_2.5_pro"
@@ -0,0 +1,229 @@
+"""
+Adaptive Concurrency Limit
+Decides how many queue messages a worker instance handles at once.
+
+A fixed ``PUBSUB_MAX_MESSAGES=1`` leaves I/O-bound workers (OCR, summary:
+mostly waiting on model APIs) idle, while a high fixed value lets CPU-bound
+diff workers thrash or run out of memory. The limit here moves AIMD-style
+once per interval:
+
+- *pressure* (CPU or RSS above target, too many failed messages, or too
+  many model calls throttled or failing at the provider, from the LLM
+  gateway's counters) cuts it by the profile's backoff factor
+- *backlog* (handlers waiting for a slot, or messages older than the lag
+  target on arrival) with every slot busy raises it by one step
+- otherwise it holds
+
+Messages beyond the limit wait in ``acquire``; the subscriber's own flow
+control caps how many are leased at the profile maximum.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from config import config
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ConcurrencyProfile:
+    min_concurrency: int
+    max_concurrency: int
+    initial: int
+    target_cpu: float  # fraction of the machine's CPU
+    target_error_rate: float  # failed / handled messages per interval
+    target_lag_seconds: float  # publish-to-receive delay that counts as backlog
+    step: int = 1
+    backoff: float = 0.5
+
+
+PROFILES = {
+    # OCR/summary: waiting on vision/LLM APIs, cheap to run many at once
+    'io': ConcurrencyProfile(min_concurrency=1, max_concurrency=16, initial=4, target_cpu=0.75,
+                             target_error_rate=0.2, target_lag_seconds=5.0, step=2, backoff=0.75),
+    # Diff: alignment and overlays saturate a core each and hold large images
+    'cpu': ConcurrencyProfile(min_concurrency=1, max_concurrency=4, initial=1, target_cpu=0.85,
+                              target_error_rate=0.2, target_lag_seconds=30.0, step=1, backoff=0.5),
+}
+
+
+def _cpu_count() -> int:
+    if PSUTIL_AVAILABLE:
+        return psutil.cpu_count() or 1
+    return os.cpu_count() or 1
+
+
+def profile_for(name: str) -> ConcurrencyProfile:
+    """The named profile with the PUBSUB_* overrides applied."""
+    profile = PROFILES[config.PUBSUB_CONCURRENCY_PROFILE or name]
+    if profile is PROFILES['cpu']:
+        profile = replace(profile, max_concurrency=min(profile.max_concurrency, _cpu_count()))
+    if config.PUBSUB_MAX_CONCURRENCY:
+        profile = replace(
+            profile,
+            max_concurrency=config.PUBSUB_MAX_CONCURRENCY,
+            initial=min(profile.initial, config.PUBSUB_MAX_CONCURRENCY),
+        )
+    return profile
+
+
+def sample_resources() -> Tuple[Optional[float], Optional[float]]:
+    """(CPU utilisation 0..1 since the last call, RSS MB of this process and its children)."""
+    if not PSUTIL_AVAILABLE:
+        return None, None
+    try:
+        cpu = psutil.cpu_percent(interval=None) / 100.0
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return cpu, rss / (1024 * 1024)
+    except (psutil.Error, OSError):
+        return None, None
+
+
+class AdaptiveConcurrency:
+    """Concurrency gate whose limit follows resource pressure and backlog."""
+
+    def __init__(
+        self,
+        profile: ConcurrencyProfile,
+        target_rss_mb: Optional[float] = None,
+        interval: Optional[float] = None,
+        sampler: Callable[[], Tuple[Optional[float], Optional[float]]] = sample_resources,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = 'worker',
+        provider_stats: Optional[Callable[[], Dict[str, Dict[str, Any]]]] = None,
+    ):
+        """``provider_stats`` returns the gateway's per-model counters (``LLMGateway.stats``)."""
+        self.profile = profile
+        self.target_rss_mb = target_rss_mb if target_rss_mb is not None else config.PUBSUB_TARGET_RSS_MB
+        self.interval = interval if interval is not None else config.PUBSUB_CONCURRENCY_INTERVAL
+        self.sampler = sampler
+        self.clock = clock
+        self.name = name
+        self.provider_stats = provider_stats
+        self.limit = max(profile.min_concurrency, min(profile.initial, profile.max_concurrency))
+        self.in_flight = 0
+        self.waiting = 0
+        self._outcomes: Deque[bool] = deque(maxlen=200)
+        self._max_lag = 0.0
+        self._saturated = False
+        self._last_adjust = clock()
+        self._cond = threading.Condition()
+        self._provider_totals: Tuple[int, int] = (0, 0)
+        self._provider_totals = self._read_provider_totals()
+        self.sampler()  # prime CPU accounting (first psutil reading is meaningless)
+
+    def acquire(self, lag_seconds: float = 0.0) -> None:
+        """Wait for a slot; ``lag_seconds`` is how long the message sat in the queue."""
+        with self._cond:
+            self._max_lag = max(self._max_lag, lag_seconds)
+            self.waiting += 1
+            try:
+                while self.in_flight >= self.limit:
+                    self._saturated = True
+                    self._cond.wait(timeout=self.interval)
+                    self._maybe_adjust()
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            if self.in_flight >= self.limit:
+                self._saturated = True
+
+    def release(self, ok: bool = True) -> None:
+        """Free a slot and record whether the message was handled successfully."""
+        with self._cond:
+            self.in_flight -= 1
+            self._outcomes.append(ok)
+            self._maybe_adjust()
+            self._cond.notify()
+
+    def adjust(self) -> int:
+        """Re-evaluate the limit now; returns the new limit."""
+        with self._cond:
+            self._last_adjust = self.clock() - self.interval
+            self._maybe_adjust()
+            return self.limit
+
+    def _maybe_adjust(self) -> None:
+        now = self.clock()
+        if now - self._last_adjust < self.interval:
+            return
+        self._last_adjust = now
+        profile = self.profile
+        cpu, rss_mb = self.sampler()
+        outcomes = list(self._outcomes)
+        error_rate = outcomes.count(False) / len(outcomes) if len(outcomes) >= 5 else 0.0
+        throttle_rate = self._provider_throttle_rate()
+        backlog = self.waiting > 0 or self._max_lag > profile.target_lag_seconds
+        saturated = self._saturated or self.in_flight >= self.limit
+        self._outcomes.clear()
+        self._max_lag = 0.0
+        self._saturated = False
+
+        reason = None
+        if cpu is not None and cpu > profile.target_cpu:
+            reason = f"cpu {cpu:.0%}"
+        elif rss_mb is not None and self.target_rss_mb and rss_mb > self.target_rss_mb:
+            reason = f"rss {rss_mb:.0f}MB"
+        elif error_rate > profile.target_error_rate:
+            reason = f"error rate {error_rate:.0%}"
+        elif throttle_rate > profile.target_error_rate:
+            reason = f"provider throttling {throttle_rate:.0%}"
+
+        previous = self.limit
+        if reason:
+            self.limit = max(profile.min_concurrency, math.floor(self.limit * profile.backoff))
+        elif backlog and saturated:
+            self.limit = min(profile.max_concurrency, self.limit + profile.step)
+        if self.limit != previous:
+            logger.info(
+                f"{self.name} concurrency {previous} -> {self.limit}"
+                + (f" ({reason})" if reason else " (backlog)")
+            )
+            self._cond.notify_all()
+
+    def _read_provider_totals(self) -> Tuple[int, int]:
+        """(model calls attempted, calls throttled/failed transiently or rejected by an open circuit)."""
+        if self.provider_stats is None:
+            return 0, 0
+        try:
+            stats = self.provider_stats()
+        except Exception as e:
+            logger.debug(f"Could not read provider stats: {e}")
+            return self._provider_totals
+        attempts = failures = 0
+        for counts in stats.values():
+            rejected = counts.get('rejected', 0)
+            attempts += counts.get('calls', 0) + rejected
+            failures += counts.get('transient_errors', 0) + rejected
+        return attempts, failures
+
+    def _provider_throttle_rate(self) -> float:
+        """Share of this interval's model calls the provider throttled or failed."""
+        attempts, failures = self._read_provider_totals()
+        delta_attempts = attempts - self._provider_totals[0]
+        delta_failures = failures - self._provider_totals[1]
+        self._provider_totals = (attempts, failures)
+        return delta_failures / delta_attempts if delta_attempts >= 5 else 0.0
+
+
+__all__ = ['AdaptiveConcurrency', 'ConcurrencyProfile', 'PROFILES', 'profile_for', 'sample_resources']
@@ -0,0 +1,131 @@
+"""
+Artifact Cache
+Download-once access to the storage objects a summary run reads.
+
+A summary run reads the diff JSON plus the overlay, baseline and revised page
+images, and each model (Gemini, GPT) needs its own prepared form of the same
+images. ``RunArtifacts`` downloads every ref once per run, prepares each image
+once per model budget and decodes it once, even when both models ask at the
+same moment from different threads.
+
+``ArtifactLRU`` optionally keeps raw bytes across runs (keyed by storage ref),
+so regenerating a page's summary does not download its sheets again. It is
+sized by SUMMARY_ARTIFACT_CACHE_MB (0 disables it).
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from config import config
+from utils.image_payload import CropBox, PreparedImage, get_image_budgeter
+
+
+class ArtifactLRU:
+    """Byte-bounded LRU of raw storage objects keyed by ref."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, ref: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(ref)
+            if data is not None:
+                self._entries.move_to_end(ref)
+            return data
+
+    def put(self, ref: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(ref, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[ref] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class RunArtifacts:
+    """Per-run memo of downloads, prepared payloads and decoded images."""
+
+    def __init__(self, storage, shared: Optional[ArtifactLRU] = None):
+        self.storage = storage
+        self.shared = shared
+        self.downloads = 0
+        self._entries: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def _once(self, key: tuple, loader: Callable[[], Any]) -> Any:
+        # The first caller loads; concurrent callers for the same key wait for its result
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = self._entries[key] = Future()
+        if owner:
+            try:
+                future.set_result(loader())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+    def download(self, ref: str) -> bytes:
+        def load() -> bytes:
+            data = self.shared.get(ref) if self.shared else None
+            if data is None:
+                data = self.storage.download_file(ref)
+                self.downloads += 1
+                if self.shared:
+                    self.shared.put(ref, data)
+            return data
+        return self._once(('bytes', ref), load)
+
+    def json(self, ref: str) -> Dict:
+        return self._once(('json', ref), lambda: json.loads(self.download(ref).decode('utf-8')))
+
+    def prepared(
+        self, ref: str, provider: str, keep_color: bool = False, crop: Optional[CropBox] = None
+    ) -> PreparedImage:
+        """``ref`` (optionally cropped) fitted to ``provider``'s payload budget (see utils.image_payload)."""
+        return self._once(
+            ('prepared', ref, provider, keep_color, crop),
+            lambda: get_image_budgeter().prepare(self.download(ref), provider, keep_color=keep_color, crop=crop),
+        )
+
+    def pil(self, ref: str, provider: str, keep_color: bool = False, crop: Optional[CropBox] = None):
+        """Decoded PIL image of the prepared payload (shared; do not modify)."""
+        return self._once(
+            ('pil', ref, provider, keep_color, crop),
+            lambda: self.prepared(ref, provider, keep_color=keep_color, crop=crop).as_pil(),
+        )
+
+
+_artifact_lru: Optional[ArtifactLRU] = None
+_artifact_lru_lock = threading.Lock()
+
+
+def get_artifact_lru() -> Optional[ArtifactLRU]:
+    """Get the singleton cross-run artifact LRU, or None when it is disabled."""
+    global _artifact_lru
+    max_mb = config.SUMMARY_ARTIFACT_CACHE_MB
+    if max_mb <= 0:
+        return None
+    with _artifact_lru_lock:
+        if _artifact_lru is None:
+            _artifact_lru = ArtifactLRU(max_mb * 1024 * 1024)
+        return _artifact_lru
+
+
+__all__ = [
+    'ArtifactLRU',
+    'RunArtifacts',
+    'get_artifact_lru',
+]
@@ -0,0 +1,181 @@
+"""
+Batch Providers
+Submit many chat completion requests as one provider batch and collect the results.
+
+Batches trade latency (results arrive within hours) for price and for keeping
+bulk work off the interactive rate limits. Requests use the OpenAI Batch JSONL
+format: one ``{"custom_id", "method", "url", "body"}`` object per line, where
+``body`` is exactly what would be passed to ``chat.completions.create``.
+
+- ``OpenAIBatchProvider`` uploads the JSONL file and creates an OpenAI batch
+- ``LocalBatchProvider`` writes batches to a directory; a batch completes when
+  an ``output.jsonl`` appears next to its input (tests and local development)
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+# Provider batch statuses after which no further results will arrive
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_batch_lines(requests: List[Dict]) -> bytes:
+    """JSONL input file for ``[{"custom_id": ..., "body": {...}}, ...]``."""
+    lines = [
+        json.dumps({
+            "custom_id": request["custom_id"],
+            "method": "POST",
+            "url": CHAT_COMPLETIONS_URL,
+            "body": request["body"],
+        })
+        for request in requests
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def parse_batch_output(data: bytes) -> Dict[str, Dict]:
+    """
+    Map custom_id to ``{"content": str}`` or ``{"error": str}`` from a batch
+    output or error file.
+    """
+    results: Dict[str, Dict] = {}
+    for line in data.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        custom_id = entry.get("custom_id")
+        response = entry.get("response") or {}
+        body = response.get("body") or {}
+        if entry.get("error") or response.get("status_code", 200) >= 400:
+            error = entry.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+            results[custom_id] = {"error": error.get("message") if isinstance(error, dict) else str(error)}
+            continue
+        try:
+            results[custom_id] = {"content": body["choices"][0]["message"]["content"]}
+        except (KeyError, IndexError, TypeError):
+            results[custom_id] = {"error": "Malformed batch response"}
+    return results
+
+
+class OpenAIBatchProvider:
+    """OpenAI Batch API (24h completion window)."""
+
+    name = "openai"
+
+    def __init__(self, client=None):
+        if client is None:
+            from utils.llm_gateway import get_llm_gateway
+            client = get_llm_gateway().openai_client(config.OPENAI_API_KEY)
+        if client is None:
+            raise RuntimeError("OpenAI client not available - cannot submit batches")
+        self.client = client
+
+    def submit(self, requests: List[Dict]) -> str:
+        input_file = self.client.files.create(
+            file=(f"batch-{uuid.uuid4()}.jsonl", build_batch_lines(requests)),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window="24h",
+        )
+        logger.info(f"Submitted OpenAI batch {batch.id} with {len(requests)} requests")
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Dict[str, Dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        results: Dict[str, Dict] = {}
+        for file_id in (batch.error_file_id, batch.output_file_id):
+            if file_id:
+                results.update(parse_batch_output(self.client.files.content(file_id).read()))
+        return results
+
+
+class LocalBatchProvider:
+    """File-based stand-in for a batch API: ``{root}/{batch_id}/input.jsonl`` and ``output.jsonl``."""
+
+    name = "local"
+
+    def __init__(self, root_dir: Optional[str] = None):
+        self.root = Path(root_dir or config.BATCH_LOCAL_DIR)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def submit(self, requests: List[Dict]) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch_dir = self.root / batch_id
+        batch_dir.mkdir(parents=True)
+        (batch_dir / "input.jsonl").write_bytes(build_batch_lines(requests))
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        batch_dir = self.root / batch_id
+        if not (batch_dir / "input.jsonl").exists():
+            return "failed"
+        return "completed" if (batch_dir / "output.jsonl").exists() else "in_progress"
+
+    def results(self, batch_id: str) -> Dict[str, Dict]:
+        output = self.root / batch_id / "output.jsonl"
+        return parse_batch_output(output.read_bytes()) if output.exists() else {}
+
+    def pending_requests(self, batch_id: str) -> List[Dict]:
+        """The request lines of a submitted batch."""
+        data = (self.root / batch_id / "input.jsonl").read_text()
+        return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+    def complete(self, batch_id: str, responder: Callable[[Dict], str]) -> None:
+        """
+        Answer every request in a batch with ``responder(body)`` and mark it
+        completed. A responder that raises produces an error line for that request.
+        """
+        lines = []
+        for request in self.pending_requests(batch_id):
+            try:
+                content = responder(request["body"])
+                response = {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}}
+                lines.append({"custom_id": request["custom_id"], "response": response, "error": None})
+            except Exception as e:
+                lines.append({"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}})
+        output = "".join(json.dumps(line) + "\n" for line in lines)
+        (self.root / batch_id / "output.jsonl").write_text(output)
+
+
+_batch_provider = None
+_batch_provider_lock = threading.Lock()
+
+
+def get_batch_provider():
+    """Get singleton batch provider selected by BATCH_PROVIDER."""
+    global _batch_provider
+    with _batch_provider_lock:
+        if _batch_provider is None:
+            provider = os.getenv('BATCH_PROVIDER', config.BATCH_PROVIDER).lower()
+            if provider == 'local':
+                _batch_provider = LocalBatchProvider()
+            else:
+                _batch_provider = OpenAIBatchProvider()
+        return _batch_provider
+
+
+__all__ = [
+    'LocalBatchProvider',
+    'OpenAIBatchProvider',
+    'TERMINAL_STATUSES',
+    'build_batch_lines',
+    'get_batch_provider',
+    'parse_batch_output',
+]
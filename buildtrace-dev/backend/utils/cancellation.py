@@ -0,0 +1,158 @@
+"""
+Cooperative Job Cancellation
+Lets in-flight page work stop soon after a user cancels the job.
+
+Cancelling a job only flips database rows; workers already rendering,
+aligning or calling models for its pages would otherwise finish and publish
+the next stage. Workers run each task inside ``cancellation_scope(token)``
+and the expensive steps call ``checkpoint(step)`` (after downloads, before
+alignment, before every LLM call through the gateway). A cancelled job
+raises ``JobCancelled`` there; the worker acks the message and settles the
+page instead of failing it.
+
+Lookups are cached per job for CANCELLATION_CHECK_TTL_SECONDS, so
+checkpoints cost a dict lookup; a cancellation is cached for good (jobs are
+never un-cancelled). Lookups fail open: a database error never stops work.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(RuntimeError):
+    """The job was cancelled while one of its tasks was running."""
+
+    def __init__(self, job_id: str, step: str = ''):
+        super().__init__(f"Job {job_id} was cancelled" + (f" (stopped {step})" if step else ''))
+        self.job_id = job_id
+        self.step = step
+
+
+def _default_session_factory():
+    from gcp.database import get_db_session
+    return get_db_session()
+
+
+class CancellationRegistry:
+    """TTL-cached view of which jobs are cancelled."""
+
+    CACHE_SIZE = 1024
+
+    def __init__(self, session_factory: Optional[Callable] = None, ttl: Optional[float] = None):
+        self.session_factory = session_factory or _default_session_factory
+        self.ttl = ttl if ttl is not None else config.CANCELLATION_CHECK_TTL_SECONDS
+        self._cache: 'OrderedDict[str, Tuple[bool, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_cancelled(self, job_id: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(job_id)
+        if cached and (cached[0] or now < cached[1]):
+            return cached[0]
+        cancelled = self._lookup(job_id)
+        self._store(job_id, cancelled, now + self.ttl)
+        if cancelled:
+            logger.info(f"Job {job_id} is cancelled")
+        return cancelled
+
+    def mark_cancelled(self, job_id: str) -> None:
+        """Record a cancellation made in this process without waiting for the TTL."""
+        self._store(job_id, True, float('inf'))
+
+    def token(self, job_id: str) -> 'CancellationToken':
+        return CancellationToken(job_id, self)
+
+    def _lookup(self, job_id: str) -> bool:
+        from gcp.database.models import Job
+        try:
+            with self.session_factory() as db:
+                status = db.query(Job.status).filter(Job.id == job_id).scalar()
+        except Exception as e:
+            logger.debug(f"Could not check cancellation of job {job_id}: {e}")
+            return False
+        return status == 'cancelled'
+
+    def _store(self, job_id: str, cancelled: bool, expires_at: float) -> None:
+        with self._lock:
+            self._cache[job_id] = (cancelled, expires_at)
+            self._cache.move_to_end(job_id)
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+
+class CancellationToken:
+    """Cancellation state of one job, checked between expensive steps."""
+
+    def __init__(self, job_id: str, registry: CancellationRegistry):
+        self.job_id = job_id
+        self.registry = registry
+
+    @property
+    def cancelled(self) -> bool:
+        return self.registry.is_cancelled(self.job_id)
+
+    def check(self, step: str = '') -> None:
+        if self.cancelled:
+            logger.info(f"Stopping work for cancelled job {self.job_id} {step}".rstrip())
+            raise JobCancelled(self.job_id, step)
+
+
+_current_token: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar(
+    'cancellation_token', default=None
+)
+
+
+@contextmanager
+def cancellation_scope(token: Optional[CancellationToken]) -> Iterator[Optional[CancellationToken]]:
+    """Make ``token`` the one ``checkpoint`` checks for the code run inside."""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def checkpoint(step: str = '') -> None:
+    """Raise JobCancelled if the task being run belongs to a cancelled job."""
+    token = _current_token.get()
+    if token is not None:
+        token.check(step)
+
+
+def submit_with_context(executor, fn: Callable, *args, **kwargs):
+    """``executor.submit`` that carries the caller's cancellation scope into the pool thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+_registry: Optional[CancellationRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_cancellation_registry() -> CancellationRegistry:
+    """Get the process-wide registry (backed by get_db_session)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = CancellationRegistry()
+        return _registry
+
+
+__all__ = [
+    'CancellationRegistry',
+    'CancellationToken',
+    'JobCancelled',
+    'cancellation_scope',
+    'checkpoint',
+    'get_cancellation_registry',
+    'submit_with_context',
+]
@@ -0,0 +1,100 @@
+"""
+Change Region Utility
+Turns pixel-level differences between two page rasters into a few bounding boxes.
+
+Regions are normalized ``[left, top, right, bottom]`` boxes (0.0-1.0) so they
+can be applied to any rendering of the page (different DPI, downscaled model
+payloads). Nearby strokes are grouped by dilating the difference mask before
+labelling connected components, then overlapping boxes are merged.
+"""
+
+import logging
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Region = List[float]
+
+# Grayscale difference that counts as a changed pixel
+DIFF_THRESHOLD = 40
+# Components smaller than this fraction of the page are noise (anti-aliasing, stray pixels)
+MIN_REGION_AREA = 0.00005
+# Padding around each region, as a fraction of the page size, so crops keep nearby context
+REGION_PADDING = 0.01
+
+
+def _merge_overlapping(regions: List[Region]) -> List[Region]:
+    merged: List[Region] = []
+    for region in sorted(regions):
+        for existing in merged:
+            if (
+                region[0] <= existing[2] and existing[0] <= region[2]
+                and region[1] <= existing[3] and existing[1] <= region[3]
+            ):
+                existing[0] = min(existing[0], region[0])
+                existing[1] = min(existing[1], region[1])
+                existing[2] = max(existing[2], region[2])
+                existing[3] = max(existing[3], region[3])
+                break
+        else:
+            merged.append(list(region))
+    # A merge can make a box overlap one that was already placed; repeat until stable
+    return merged if len(merged) == len(regions) else _merge_overlapping(merged)
+
+
+def regions_from_mask(mask: np.ndarray, padding: float = REGION_PADDING) -> List[Region]:
+    """Bounding boxes (normalized) of the changed areas in a boolean/uint8 mask."""
+    if mask is None or not mask.any():
+        return []
+    height, width = mask.shape[:2]
+    binary = (mask > 0).astype(np.uint8) * 255
+
+    # Group strokes that belong to the same annotation (~0.5% of the page)
+    kernel_size = max(3, int(0.005 * max(width, height)))
+    binary = cv2.dilate(binary, np.ones((kernel_size, kernel_size), np.uint8))
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    regions: List[Region] = []
+    for label in range(1, count):
+        x, y, w, h, area = stats[label]
+        if area < MIN_REGION_AREA * width * height:
+            continue
+        regions.append([
+            max(0.0, x / width - padding),
+            max(0.0, y / height - padding),
+            min(1.0, (x + w) / width + padding),
+            min(1.0, (y + h) / height + padding),
+        ])
+    return [[round(v, 4) for v in region] for region in _merge_overlapping(regions)]
+
+
+def find_change_regions(old_bytes: bytes, new_bytes: bytes) -> Optional[List[Region]]:
+    """
+    Changed regions between two rasters of the same page, without alignment.
+
+    Pages rendered from successive CAD exports share a sheet origin, so a direct
+    comparison is usually enough. Returns None when the images can't be decoded.
+    """
+    old_img = cv2.imdecode(np.frombuffer(old_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    new_img = cv2.imdecode(np.frombuffer(new_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if old_img is None or new_img is None:
+        logger.warning("Could not decode page rasters for change detection")
+        return None
+    if old_img.shape != new_img.shape:
+        old_img = cv2.resize(old_img, (new_img.shape[1], new_img.shape[0]), interpolation=cv2.INTER_AREA)
+    return regions_from_mask(cv2.absdiff(old_img, new_img) > DIFF_THRESHOLD)
+
+
+def region_coverage(regions: List[Region]) -> float:
+    """Fraction of the page covered by ``regions`` (upper bound; overlaps counted once per box)."""
+    return min(1.0, sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions))
+
+
+__all__ = [
+    'find_change_regions',
+    'region_coverage',
+    'regions_from_mask',
+]
@@ -0,0 +1,245 @@
+"""
+Image Payload Budgeter
+Prepares drawing images for vision-model calls within a per-model budget.
+
+Vision models downsample large inputs anyway (OpenAI ``detail: high`` fits the
+image into 2048px, Gemini tiles around ~3000px), so sending 300-DPI sheets only
+costs upload time and latency. For each call this picks:
+
+- resolution: longest side capped at the model's ``max_dimension``
+- colour: grayscale when the sheet has no meaningful colour (overlays keep colour)
+- format: the smallest of the model's accepted formats (PNG for line work,
+  JPEG/WebP when that is smaller), shrinking further until ``max_bytes`` fits
+- region: an optional crop box, so callers can send only the area of interest
+
+Prepared payloads are cached in-process by (source hash, budget, crop).
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+Image.MAX_IMAGE_PIXELS = 200000000
+
+# Crop box in normalized coordinates: (left, top, right, bottom), each 0.0-1.0
+CropBox = Tuple[float, float, float, float]
+
+MIME_TYPES = {'PNG': 'image/png', 'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+
+@dataclass(frozen=True)
+class ImageBudget:
+    """Upper bounds for one image sent to a model."""
+    max_dimension: int
+    max_bytes: int
+    formats: Tuple[str, ...] = ('PNG', 'JPEG')
+    jpeg_quality: int = 85
+    allow_grayscale: bool = True
+
+
+@dataclass
+class PreparedImage:
+    """An encoded image ready to attach to a model request."""
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    source_hash: str
+    grayscale: bool
+
+    def as_base64(self) -> str:
+        return base64.b64encode(self.data).decode('utf-8')
+
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.as_base64()}"
+
+    def as_pil(self) -> Image.Image:
+        image = Image.open(io.BytesIO(self.data))
+        image.load()
+        return image
+
+
+def _budgets() -> Dict[str, ImageBudget]:
+    return {
+        'openai': ImageBudget(
+            max_dimension=config.OPENAI_IMAGE_MAX_DIMENSION,
+            max_bytes=config.IMAGE_PAYLOAD_MAX_BYTES,
+            formats=('PNG', 'JPEG', 'WEBP'),
+        ),
+        'gemini': ImageBudget(
+            max_dimension=config.GEMINI_IMAGE_MAX_DIMENSION,
+            max_bytes=config.IMAGE_PAYLOAD_MAX_BYTES,
+            formats=('PNG', 'JPEG', 'WEBP'),
+        ),
+        # Text extraction needs small annotations legible; Gemini reads larger inputs
+        'gemini-ocr': ImageBudget(
+            max_dimension=config.GEMINI_OCR_IMAGE_MAX_DIMENSION,
+            max_bytes=config.IMAGE_PAYLOAD_MAX_BYTES,
+            formats=('PNG', 'JPEG', 'WEBP'),
+        ),
+        # Whole-sheet orientation thumbnail sent alongside change-region crops
+        'overview': ImageBudget(
+            max_dimension=config.SUMMARY_OVERVIEW_MAX_DIMENSION,
+            max_bytes=config.IMAGE_PAYLOAD_MAX_BYTES,
+            formats=('PNG', 'JPEG', 'WEBP'),
+        ),
+    }
+
+
+def get_image_budget(provider: str) -> ImageBudget:
+    """Budget for ``provider`` ('openai', 'gemini', 'gemini-ocr', 'overview'); unknown providers get the OpenAI budget."""
+    budgets = _budgets()
+    return budgets.get(provider, budgets['openai'])
+
+
+def _is_effectively_grayscale(image: Image.Image, tolerance: int = 12) -> bool:
+    """True when no sampled pixel has channels further apart than ``tolerance``."""
+    if image.mode in ('L', '1', 'I', 'F'):
+        return True
+    sample = image.convert('RGB')
+    sample.thumbnail((256, 256))
+    pixels = np.asarray(sample, dtype=np.int16)
+    return int((pixels.max(axis=2) - pixels.min(axis=2)).max()) <= tolerance
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    elif fmt == 'WEBP':
+        image.save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class ImagePayloadBudgeter:
+    """Resizes, recolours, crops and re-encodes images to fit a model's budget."""
+
+    def __init__(self, cache_size: Optional[int] = None):
+        self.cache_size = config.IMAGE_PAYLOAD_CACHE_SIZE if cache_size is None else cache_size
+        self._cache: "OrderedDict[tuple, PreparedImage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prepare(
+        self,
+        image_bytes: bytes,
+        provider: str,
+        *,
+        budget: Optional[ImageBudget] = None,
+        crop: Optional[CropBox] = None,
+        keep_color: bool = False,
+    ) -> PreparedImage:
+        """
+        Prepare ``image_bytes`` for ``provider``.
+
+        Args:
+            image_bytes: Source image (any PIL-readable format)
+            provider: Model provider whose budget applies
+            budget: Explicit budget (overrides the provider default)
+            crop: Optional normalized crop box applied before resizing
+            keep_color: Never convert to grayscale (e.g. red/green overlays)
+        """
+        budget = budget or get_image_budget(provider)
+        source_hash = hashlib.sha256(image_bytes).hexdigest()
+        cache_key = (source_hash, budget, crop, keep_color)
+
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+
+        prepared = self._prepare(image_bytes, source_hash, budget, crop, keep_color)
+
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[cache_key] = prepared
+                self._cache.move_to_end(cache_key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return prepared
+
+    def _prepare(
+        self,
+        image_bytes: bytes,
+        source_hash: str,
+        budget: ImageBudget,
+        crop: Optional[CropBox],
+        keep_color: bool,
+    ) -> PreparedImage:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
+        original_size = image.size
+
+        if crop:
+            left, top, right, bottom = crop
+            width, height = image.size
+            image = image.crop((
+                int(left * width),
+                int(top * height),
+                max(int(left * width) + 1, int(right * width)),
+                max(int(top * height) + 1, int(bottom * height)),
+            ))
+
+        grayscale = budget.allow_grayscale and not keep_color and _is_effectively_grayscale(image)
+        image = image.convert('L' if grayscale else 'RGB')
+
+        if max(image.size) > budget.max_dimension:
+            image.thumbnail((budget.max_dimension, budget.max_dimension), Image.Resampling.LANCZOS)
+
+        while True:
+            candidates = [(fmt, _encode(image, fmt, budget.jpeg_quality)) for fmt in budget.formats]
+            fmt, data = min(candidates, key=lambda candidate: len(candidate[1]))
+            if len(data) <= budget.max_bytes or max(image.size) <= 256:
+                break
+            # Still over the byte budget: shrink and try again
+            image = image.resize(
+                (max(1, int(image.width * 0.8)), max(1, int(image.height * 0.8))),
+                Image.Resampling.LANCZOS,
+            )
+
+        logger.debug(
+            f"Prepared image {source_hash[:12]}: {original_size} -> {image.size} "
+            f"{fmt}{' grayscale' if grayscale else ''}, {len(image_bytes)} -> {len(data)} bytes"
+        )
+        return PreparedImage(
+            data=data,
+            mime_type=MIME_TYPES[fmt],
+            width=image.width,
+            height=image.height,
+            source_hash=source_hash,
+            grayscale=grayscale,
+        )
+
+
+_image_budgeter: Optional[ImagePayloadBudgeter] = None
+
+
+def get_image_budgeter() -> ImagePayloadBudgeter:
+    """Get singleton image payload budgeter instance."""
+    global _image_budgeter
+    if _image_budgeter is None:
+        _image_budgeter = ImagePayloadBudgeter()
+    return _image_budgeter
+
+
+__all__ = [
+    'ImageBudget',
+    'ImagePayloadBudgeter',
+    'PreparedImage',
+    'get_image_budget',
+    'get_image_budgeter',
+]
@@ -0,0 +1,409 @@
+"""
+LLM Gateway
+Single entry point for OpenAI and Gemini calls made anywhere in the backend.
+
+- Long-lived clients per provider/API key (no per-request client construction)
+- Token-bucket limits per model for requests and tokens per minute
+- Exponential backoff with full jitter on rate limits, timeouts and 5xx errors
+- A circuit breaker per model, so a 429 storm fails fast instead of piling up
+  retries in every stage at once
+- Optional hedged requests: a second identical request is started if the first
+  has not answered after a delay, and the first response wins
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import config
+from utils.cancellation import checkpoint
+from utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OpenAI = None
+    OPENAI_AVAILABLE = False
+
+try:
+    import google.generativeai as genai
+    GEMINI_AVAILABLE = True
+except ImportError:
+    genai = None
+    GEMINI_AVAILABLE = False
+
+
+# HTTP statuses and exception class names (OpenAI SDK, google.api_core) worth retrying
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    'RateLimitError',
+    'APIConnectionError',
+    'APITimeoutError',
+    'InternalServerError',
+    'ResourceExhausted',
+    'TooManyRequests',
+    'ServiceUnavailable',
+    'DeadlineExceeded',
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while a model's circuit is open."""
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """Transient provider errors (throttling, timeouts, server errors)."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if type(exc).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'code', None)
+    return isinstance(status, int) and status in RETRYABLE_STATUS_CODES
+
+
+def _retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Honour a Retry-After header when the provider sends one."""
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after ``failure_threshold`` consecutive transient failures.
+    After ``reset_timeout`` seconds one probe call is let through (half-open);
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class LLMGateway:
+    """Pooled clients plus rate limiting, retries, circuit breaking and hedging."""
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        rate_limits: Optional[Dict[str, Dict[str, float]]] = None,
+    ):
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = config.LLM_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = config.LLM_RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.failure_threshold = (
+            config.LLM_CIRCUIT_FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
+        )
+        self.reset_timeout = config.LLM_CIRCUIT_RESET_SECONDS if reset_timeout is None else reset_timeout
+        self.hedge_after = config.LLM_HEDGE_AFTER_SECONDS if hedge_after is None else hedge_after
+        self.rate_limits = rate_limits if rate_limits is not None else self._configured_rate_limits()
+
+        self._openai_clients: Dict[Tuple[str, float], Any] = {}
+        self._gemini_models: Dict[Tuple[str, str], Any] = {}
+        self._gemini_configured_key: Optional[str] = None
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    # ------------------------------------------------------------------
+    # Client pooling
+    # ------------------------------------------------------------------
+
+    def openai_client(self, api_key: Optional[str] = None, timeout: float = 180.0):
+        """Shared OpenAI client for ``api_key`` (SDK retries disabled - the gateway retries)."""
+        api_key = api_key or config.OPENAI_API_KEY
+        if not OPENAI_AVAILABLE or not api_key:
+            return None
+        key = (api_key, float(timeout))
+        with self._lock:
+            client = self._openai_clients.get(key)
+            if client is None:
+                client = OpenAI(api_key=api_key, timeout=timeout, max_retries=0)
+                self._openai_clients[key] = client
+            return client
+
+    def gemini_model(self, model_name: str, api_key: Optional[str] = None):
+        """Shared Gemini ``GenerativeModel``; ``genai.configure`` runs once per key."""
+        api_key = api_key or config.GEMINI_API_KEY
+        if not GEMINI_AVAILABLE or not api_key:
+            return None
+        key = (api_key, model_name)
+        with self._lock:
+            model = self._gemini_models.get(key)
+            if model is None:
+                if self._gemini_configured_key != api_key:
+                    genai.configure(api_key=api_key)
+                    self._gemini_configured_key = api_key
+                model = genai.GenerativeModel(model_name)
+                self._gemini_models[key] = model
+            return model
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+
+    def call(
+        self,
+        provider: str,
+        model: str,
+        fn: Callable,
+        *args,
+        estimated_tokens: int = 0,
+        hedge: bool = False,
+        **kwargs,
+    ) -> Any:
+        """
+        Call ``fn(*args, **kwargs)`` against ``provider``/``model`` under the
+        gateway's limits. Transient errors are retried with backoff; anything
+        else is raised immediately.
+        """
+        limit_key = f"{provider}:{model}"
+        breaker = self._breaker(limit_key)
+        attempt = 0
+
+        while True:
+            # A cancelled job's task stops here instead of paying for the call
+            checkpoint(f"before {limit_key} call")
+            if not breaker.allow():
+                self._count(limit_key, 'rejected')
+                raise CircuitOpenError(f"Circuit open for {limit_key}; failing fast")
+
+            self._acquire(provider, model, estimated_tokens)
+            self._count(limit_key, 'calls')
+            try:
+                if hedge and self.hedge_after > 0:
+                    result = self._hedged(provider, model, estimated_tokens, fn, args, kwargs)
+                else:
+                    result = fn(*args, **kwargs)
+            except Exception as exc:
+                if not is_retryable_error(exc):
+                    # Caller error (bad request, auth) says nothing about provider health
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                self._count(limit_key, 'transient_errors')
+                if attempt >= self.max_retries:
+                    raise
+                delay = _retry_after_seconds(exc)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                logger.warning(
+                    f"{limit_key} transient error ({type(exc).__name__}: {exc}); "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                continue
+
+            breaker.record_success()
+            return result
+
+    def chat_completion(self, client, hedge: bool = False, **params) -> Any:
+        """``client.chat.completions.create(**params)`` through the gateway."""
+        return self.call(
+            'openai',
+            params.get('model', ''),
+            client.chat.completions.create,
+            estimated_tokens=self._estimate_openai_tokens(params),
+            hedge=hedge,
+            **params,
+        )
+
+    def generate_content(self, model, model_name: str, contents, hedge: bool = False, **kwargs) -> Any:
+        """``model.generate_content(contents, **kwargs)`` through the gateway."""
+        return self.call(
+            'gemini',
+            model_name,
+            model.generate_content,
+            contents,
+            estimated_tokens=self._estimate_gemini_tokens(contents, kwargs.get('generation_config')),
+            hedge=hedge,
+            **kwargs,
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model call counters and circuit state."""
+        with self._lock:
+            return {
+                key: dict(counts, circuit=self._breakers[key].state if key in self._breakers else 'closed')
+                for key, counts in self._stats.items()
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _configured_rate_limits() -> Dict[str, Dict[str, float]]:
+        """Provider defaults, overridden per model via LLM_RATE_LIMITS JSON."""
+        limits = {
+            'openai': {'rpm': config.OPENAI_REQUESTS_PER_MINUTE, 'tpm': config.OPENAI_TOKENS_PER_MINUTE},
+            'gemini': {'rpm': config.GEMINI_REQUESTS_PER_MINUTE, 'tpm': config.GEMINI_TOKENS_PER_MINUTE},
+        }
+        if config.LLM_RATE_LIMITS:
+            try:
+                limits.update(json.loads(config.LLM_RATE_LIMITS))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Ignoring invalid LLM_RATE_LIMITS: {e}")
+        return limits
+
+    def _limits_for(self, provider: str, model: str) -> Dict[str, float]:
+        return self.rate_limits.get(f"{provider}:{model}") or self.rate_limits.get(provider) or {}
+
+    def _bucket(self, name: str, rate_per_minute: float) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                bucket = TokenBucket(rate_per_minute)
+                self._buckets[name] = bucket
+            return bucket
+
+    def _acquire(self, provider: str, model: str, estimated_tokens: int) -> None:
+        """Block until the model has request (and token) budget for one call."""
+        limit_key = f"{provider}:{model}"
+        limits = self._limits_for(provider, model)
+        self._bucket(f"{limit_key}:rpm", limits.get('rpm', 0)).acquire()
+        if estimated_tokens and limits.get('tpm'):
+            self._bucket(f"{limit_key}:tpm", limits['tpm']).acquire(estimated_tokens)
+
+    def _breaker(self, limit_key: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(limit_key)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[limit_key] = breaker
+            return breaker
+
+    def _count(self, limit_key: str, counter: str) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(
+                limit_key, {'calls': 0, 'transient_errors': 0, 'rejected': 0, 'hedged': 0}
+            )
+            counts[counter] += 1
+
+    def _hedged(self, provider: str, model: str, estimated_tokens: int, fn: Callable, args, kwargs) -> Any:
+        """Start a backup request if the primary is slow; return whichever succeeds first."""
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm-hedge')
+        executor = self._hedge_executor
+
+        primary = executor.submit(fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        self._acquire(provider, model, estimated_tokens)
+        self._count(f"{provider}:{model}", 'hedged')
+        backup = executor.submit(fn, *args, **kwargs)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    @staticmethod
+    def _estimate_openai_tokens(params: Dict) -> int:
+        """Rough prompt + completion estimate (4 chars/token, flat cost per image)."""
+        prompt_chars = 0
+        images = 0
+        for message in params.get('messages', []):
+            content = message.get('content')
+            if isinstance(content, str):
+                prompt_chars += len(content)
+            elif isinstance(content, list):
+                for part in content:
+                    if part.get('type') == 'text':
+                        prompt_chars += len(part.get('text', ''))
+                    elif part.get('type') == 'image_url':
+                        images += 1
+        completion = params.get('max_completion_tokens') or params.get('max_tokens') or 1000
+        return prompt_chars // 4 + images * 1000 + completion
+
+    @staticmethod
+    def _estimate_gemini_tokens(contents, generation_config) -> int:
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        prompt_chars = sum(len(part) for part in parts if isinstance(part, str))
+        images = sum(1 for part in parts if not isinstance(part, str))
+        completion = 1000
+        if isinstance(generation_config, dict):
+            completion = generation_config.get('max_output_tokens') or completion
+        elif generation_config is not None:
+            completion = getattr(generation_config, 'max_output_tokens', None) or completion
+        return prompt_chars // 4 + images * 1000 + completion
+
+
+_llm_gateway: Optional[LLMGateway] = None
+_llm_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Get singleton LLM gateway instance."""
+    global _llm_gateway
+    with _llm_gateway_lock:
+        if _llm_gateway is None:
+            _llm_gateway = LLMGateway()
+        return _llm_gateway
+
+
+__all__ = [
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'LLMGateway',
+    'get_llm_gateway',
+    'is_retryable_error',
+]
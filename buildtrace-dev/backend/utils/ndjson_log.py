@@ -0,0 +1,112 @@
+"""
+NDJSON Log Utility
+Append-only, newline-delimited JSON logs that are readable while being written.
+
+Each record is one JSON object on its own line, so writing a record costs only
+its own bytes and readers can resume from a byte offset. The writer appends to
+a local file and pushes the records added since the last push to storage every
+``flush_every`` records or ``flush_interval`` seconds, so progress is visible
+remotely during long runs without re-uploading the whole log each time.
+"""
+
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class NDJSONLogWriter:
+    """Appends JSON records to a local file and periodically appends new ones to storage."""
+
+    def __init__(
+        self,
+        storage,
+        local_path: str,
+        destination_path: str,
+        flush_every: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.storage = storage
+        self.local_path = Path(local_path)
+        self.destination_path = destination_path
+        self.flush_every = max(1, config.OCR_LOG_FLUSH_PAGES if flush_every is None else flush_every)
+        self.flush_interval = config.OCR_LOG_FLUSH_SECONDS if flush_interval is None else flush_interval
+        self.ref: Optional[str] = None
+        self.records_written = 0
+        self._pending = 0
+        self._flushed_bytes = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.local_path.write_bytes(b'')
+
+    def append(self, record: Dict) -> None:
+        """Append one record; uploads when the page or time threshold is reached."""
+        line = json.dumps(record, default=str, separators=(',', ':')) + '\n'
+        with self._lock:
+            with open(self.local_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.records_written += 1
+            self._pending += 1
+            due = (
+                self._pending >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> Optional[str]:
+        """Push the records written since the last flush. Upload failures are logged, not raised."""
+        with self._lock:
+            if self._pending == 0 and self.ref is not None:
+                return self.ref
+            try:
+                with open(self.local_path, 'rb') as f:
+                    f.seek(self._flushed_bytes)
+                    chunk = f.read()
+                if self.ref is None:
+                    # First push replaces any log left by an earlier run of the same version
+                    self.ref = self.storage.upload_file(
+                        chunk, self.destination_path, content_type='application/x-ndjson'
+                    )
+                else:
+                    self.ref = self.storage.append_file(
+                        chunk, self.destination_path, content_type='application/x-ndjson'
+                    )
+                self._flushed_bytes += len(chunk)
+                self._pending = 0
+            except Exception as e:
+                logger.warning(f"Failed to flush log {self.destination_path}: {e}")
+            self._last_flush = time.monotonic()
+            return self.ref
+
+    def close(self) -> Optional[str]:
+        """Final upload; returns the storage reference of the log."""
+        return self.flush()
+
+
+def read_ndjson(data: bytes, offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    Parse complete records from ``data`` (bytes starting at ``offset``).
+
+    Returns the records and the offset to resume from. A trailing partial line
+    (log caught mid-upload) is left for the next read.
+    """
+    end = data.rfind(b'\n') + 1
+    records = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            logger.warning("Skipping malformed log line")
+    return records, offset + end
+
+
+__all__ = ['NDJSONLogWriter', 'read_ndjson']
@@ -0,0 +1,268 @@
+"""
+Process-Isolated Task Pool
+Runs memory-hungry tasks (OpenCV alignment, overlay generation) in child processes.
+
+Each child runs one task at a time. The parent watches the child's RSS while the
+task runs and kills it if it crosses the configured ceiling, so an oversized sheet
+only fails its own task instead of OOM-killing the whole worker. Children are
+recycled after a fixed number of tasks, or when their resident memory stays above
+the ceiling after a task finishes (heap fragmentation).
+"""
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerProcessLost(RuntimeError):
+    """The child process died (crash, kill or timeout) while running a task."""
+
+
+class WorkerMemoryExceeded(WorkerProcessLost):
+    """The child process was killed because it exceeded its RSS ceiling."""
+
+
+class IsolatedTaskError(RuntimeError):
+    """The task raised inside the child process."""
+
+    def __init__(self, message: str, child_traceback: str = ""):
+        super().__init__(message)
+        self.child_traceback = child_traceback
+
+
+def _child_main(conn) -> None:
+    """Child process loop: receive (fn, args, kwargs), run it, send the outcome back."""
+    while True:
+        try:
+            item = conn.recv()
+        except (EOFError, OSError):
+            break
+        if item is None:
+            break
+
+        fn, args, kwargs = item
+        try:
+            result = fn(*args, **kwargs)
+            outcome = ('ok', result, '')
+        except BaseException as exc:  # noqa: BLE001 - everything is reported to the parent
+            outcome = ('error', f"{type(exc).__name__}: {exc}", traceback.format_exc())
+
+        try:
+            conn.send(outcome)
+        except Exception as exc:  # e.g. unpicklable result
+            conn.send(('error', f"Could not return task result: {exc}", traceback.format_exc()))
+
+
+class _ChildProcess:
+    """A single child process and the parent end of its pipe."""
+
+    def __init__(self, ctx):
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_child_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.tasks_run = 0
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid
+
+    def rss_bytes(self) -> int:
+        """Resident set size of the child, or 0 if it cannot be measured."""
+        if not PSUTIL_AVAILABLE or not self.process.is_alive():
+            return 0
+        try:
+            return psutil.Process(self.process.pid).memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return 0
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self) -> None:
+        """Ask the child to exit cleanly, killing it if it does not."""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+class IsolatedProcessPool:
+    """
+    Pool of child processes with per-task RSS limits and recycling.
+
+    Tasks must be picklable, module-level callables (the default start method is
+    ``spawn`` so children never inherit gRPC/DB state from the parent).
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 1,
+        max_tasks_per_child: int = 10,
+        rss_limit_mb: Optional[int] = None,
+        task_timeout: Optional[float] = None,
+        start_method: str = 'spawn',
+        poll_interval: float = 0.25,
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.max_tasks_per_child = max(1, int(max_tasks_per_child))
+        self.rss_limit_bytes = int(rss_limit_mb) * 1024 * 1024 if rss_limit_mb else None
+        self.task_timeout = task_timeout
+        self.poll_interval = poll_interval
+        self._ctx = multiprocessing.get_context(start_method)
+        self._idle: "queue.LifoQueue[_ChildProcess]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._dispatcher: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        if self.rss_limit_bytes and not PSUTIL_AVAILABLE:
+            logger.warning("psutil not available - RSS limits for isolated tasks are disabled")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` in a child process and return its result (blocking)."""
+        if self._closed:
+            raise RuntimeError("IsolatedProcessPool is shut down")
+
+        self._slots.acquire()
+        child = None
+        try:
+            child = self._acquire_child()
+            try:
+                result = self._run_on_child(child, fn, args, kwargs)
+            except IsolatedTaskError:
+                # The task failed but the child is healthy - keep it
+                self._release_child(child)
+                child = None
+                raise
+            self._release_child(child)
+            child = None
+            return result
+        finally:
+            if child is not None:
+                child.kill()
+            self._slots.release()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule a task and return a Future for its result."""
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='isolated-pool'
+                )
+        return self._dispatcher.submit(self.run, fn, *args, **kwargs)
+
+    def shutdown(self) -> None:
+        """Stop all idle children and the dispatcher threads."""
+        self._closed = True
+        if self._dispatcher is not None:
+            self._dispatcher.shutdown(wait=True)
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _acquire_child(self) -> _ChildProcess:
+        while True:
+            try:
+                child = self._idle.get_nowait()
+            except queue.Empty:
+                child = _ChildProcess(self._ctx)
+                logger.info(f"Started isolated worker process {child.pid}")
+                return child
+            if child.process.is_alive():
+                return child
+            child.kill()
+
+    def _release_child(self, child: _ChildProcess) -> None:
+        """Return a child to the idle pool, or recycle it if it is worn out."""
+        rss = child.rss_bytes()
+        if child.tasks_run >= self.max_tasks_per_child:
+            logger.info(f"Recycling worker process {child.pid} after {child.tasks_run} tasks")
+            child.stop()
+        elif self.rss_limit_bytes and rss > self.rss_limit_bytes:
+            logger.info(
+                f"Recycling worker process {child.pid}: RSS {rss // (1024 * 1024)}MB above limit after task"
+            )
+            child.stop()
+        elif self._closed:
+            child.stop()
+        else:
+            self._idle.put(child)
+
+    def _run_on_child(self, child: _ChildProcess, fn: Callable, args, kwargs) -> Any:
+        started = time.monotonic()
+        try:
+            child.conn.send((fn, args, kwargs))
+        except (BrokenPipeError, OSError) as exc:
+            raise WorkerProcessLost(f"Worker process {child.pid} is not accepting tasks: {exc}")
+
+        while not child.conn.poll(self.poll_interval):
+            if not child.process.is_alive():
+                raise WorkerProcessLost(
+                    f"Worker process {child.pid} exited with code {child.process.exitcode}"
+                )
+            if self.rss_limit_bytes:
+                rss = child.rss_bytes()
+                if rss > self.rss_limit_bytes:
+                    logger.error(
+                        f"Killing worker process {child.pid}: RSS {rss // (1024 * 1024)}MB exceeds "
+                        f"{self.rss_limit_bytes // (1024 * 1024)}MB limit"
+                    )
+                    raise WorkerMemoryExceeded(
+                        f"Task exceeded memory limit of {self.rss_limit_bytes // (1024 * 1024)}MB"
+                    )
+            if self.task_timeout and time.monotonic() - started > self.task_timeout:
+                raise WorkerProcessLost(f"Task timed out after {self.task_timeout:.0f}s")
+
+        try:
+            status, payload, child_traceback = child.conn.recv()
+        except (EOFError, OSError):
+            raise WorkerProcessLost(
+                f"Worker process {child.pid} exited with code {child.process.exitcode}"
+            )
+
+        child.tasks_run += 1
+        if status == 'ok':
+            return payload
+        raise IsolatedTaskError(payload, child_traceback)
+
+
+__all__ = [
+    'IsolatedProcessPool',
+    'IsolatedTaskError',
+    'WorkerMemoryExceeded',
+    'WorkerProcessLost',
+]
@@ -0,0 +1,81 @@
+"""
+Rate Limiting Utility
+Thread-safe token buckets for throttling calls to external providers.
+
+Buckets are shared by all threads holding a reference, so concurrent page
+extractions in the same worker draw from the same request budget.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously at ``rate_per_minute``.
+
+    ``acquire`` blocks until enough tokens are available. A rate of 0 (or less)
+    disables limiting.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate_per_minute))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_minute > 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take ``tokens`` if available right now; never blocks."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Block until ``tokens`` are available.
+
+        Returns False if ``timeout`` seconds pass first. Requests larger than the
+        bucket capacity are clamped so they can still eventually proceed.
+        """
+        if not self.enabled:
+            return True
+        tokens = min(tokens, self.capacity)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) * 60.0 / self.rate_per_minute
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+__all__ = ['TokenBucket']
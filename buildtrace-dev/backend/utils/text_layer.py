@@ -0,0 +1,420 @@
+"""
+Text Layer Extraction Utility
+Fills OCR sections straight from a vector PDF's text layer (no vision model).
+
+Most drawing sets are exported from CAD with every annotation as real text, so
+the title block, keynotes, general notes and revision table can be read with
+PyMuPDF in milliseconds. Layout heuristics locate each section:
+
+- title block: text in the bottom-right region (or the right-hand strip)
+- keynotes / general notes: numbered rows under a "KEYNOTES" / "GENERAL NOTES"
+  header, in the header's column, until a large vertical gap or the next header
+- revisions: "<rev> <date> <description>" rows inside the title block
+
+A page is complete, and needs no vision model, when every section the text
+layer owns parsed: a title block with a sheet number, and rows under each
+keynote / general note / revision header present on the sheet (a sheet whose
+text has no such header has no such table). Owned sections that failed are
+reported as residual, so the caller asks the vision model for just those.
+Sections the text layer never reads (DESIGN_TEAM, SCHEDULES, ...) are only
+residual when the caller opts in with ``include_unread``. On a page with
+(almost) no text everything is residual.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from utils.drawing_extraction import DRAWING_RE, normalize_dwg
+
+logger = logging.getLogger(__name__)
+
+# Pages with less text than this are treated as raster-only (scans, flattened exports)
+MIN_TEXT_CHARS = 40
+
+# Sections of a page extraction (the vision prompt's keys), in prompt order
+PAGE_SECTIONS = (
+    'TITLE_BLOCK',
+    'DESIGN_TEAM',
+    'REVISIONS',
+    'KEYNOTES',
+    'DIMENSIONS',
+    'SPECIFICATIONS',
+    'SCHEDULES',
+    'GENERAL_NOTES',
+    'DRAWING_TYPE',
+    'GRID_LINES',
+)
+
+# Sections the text layer reads itself; only these decide whether a page is complete
+TEXT_LAYER_SECTIONS = ('TITLE_BLOCK', 'REVISIONS', 'KEYNOTES', 'GENERAL_NOTES')
+
+KEYNOTES_HEADER_RE = re.compile(
+    r'^\s*(?:(?:SHEET|DRAWING|PLAN|FLOOR\s+PLAN|DEMOLITION|DEMO|CONSTRUCTION)\s+)?'
+    r'(?:KEY(?:ED)?\s*NOTES?|KEYNOTE\s+LEGEND)\b'
+    r'|^\s*(?:SHEET|PLAN|CONSTRUCTION|REFERENCE)\s+NOTES?\b',
+    re.IGNORECASE,
+)
+GENERAL_NOTES_HEADER_RE = re.compile(
+    r'^\s*(?:GENERAL|GEN\.)\s+(?:(?:SHEET|PROJECT|CONSTRUCTION|DEMOLITION)\s+)?NOTES?\b'
+    r'|^\s*NOTES\s*:?\s*$',
+    re.IGNORECASE,
+)
+REVISIONS_HEADER_RE = re.compile(
+    r'^\s*(?:REVISIONS?|ISSUES?(?:\s*/\s*REVISIONS?)?|ISSUE\s+(?:LOG|HISTORY)|'
+    r'REV\.?\s*(?:NO\.?|#|DATE|DESCRIPTION)|MARK\s+DATE\s+DESCRIPTION)\b',
+    re.IGNORECASE,
+)
+ANY_HEADER_RE = re.compile(
+    r'^\s*(?:[A-Z][A-Z &/-]{2,})?(?:NOTES?|LEGEND|SCHEDULE|ABBREVIATIONS|SYMBOLS|REVISIONS?)\s*:?\s*$'
+)
+NUMBERED_ITEM_RE = re.compile(r'^\s*\(?(\d{1,3})[.)]?\s+(\S.*)$')
+LETTERED_ITEM_RE = re.compile(r'^\s*\(?([A-Z])[.)]\s+(\S.*)$')
+DATE_RE = re.compile(r'\b(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4})\b')
+REVISION_ROW_RE = re.compile(r'^\s*([A-Z0-9]{1,3})\s+(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4})\s+(\S.*)$')
+REVISION_ROW_DATE_FIRST_RE = re.compile(r'^\s*(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4})\s+([A-Z0-9]{1,3})\s+(\S.*)$')
+SCALE_RE = re.compile(
+    r'SCALE\s*:?\s*(.+)$|(\d+/\d+"\s*=\s*1\'\s*-?\s*0"|\b1\s*:\s*\d+\b|\bN\.?T\.?S\.?\b)', re.IGNORECASE
+)
+PROJECT_NUMBER_RE = re.compile(
+    r'(?:PROJECT|PROJ\.?|JOB)\s*(?:NO\.?|NUMBER|#)\s*:?\s*([A-Z0-9][\w.-]*)', re.IGNORECASE
+)
+PROJECT_NAME_RE = re.compile(r'PROJECT(?:\s+NAME)?\s*:\s*(.+)$', re.IGNORECASE)
+DRAWING_TYPES = (
+    ('SITE PLAN', 'site_plan'),
+    ('SCHEDULE', 'schedule'),
+    ('ELEVATION', 'elevation'),
+    ('SECTION', 'section'),
+    ('DETAIL', 'detail'),
+    ('PLAN', 'floor_plan'),
+)
+
+
+@dataclass
+class TextLine:
+    text: str
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    size: float
+
+    @property
+    def cy(self) -> float:
+        return 0.5 * (self.y0 + self.y1)
+
+    @property
+    def height(self) -> float:
+        return max(1.0, self.y1 - self.y0)
+
+
+@dataclass
+class TextLayerExtraction:
+    """Sections parsed from a text layer, and what is left for the vision model."""
+    sections: Dict
+    residual_sections: List[str] = field(default_factory=list)
+    text_chars: int = 0
+
+    @property
+    def is_raster_only(self) -> bool:
+        return self.text_chars < MIN_TEXT_CHARS
+
+    @property
+    def complete(self) -> bool:
+        """True when the vision model is not needed for this page."""
+        return not self.is_raster_only and not self.residual_sections
+
+    @property
+    def requested_sections(self) -> Optional[List[str]]:
+        """Sections to ask the vision model for, or None for a full-page extraction."""
+        if self.is_raster_only or set(PAGE_SECTIONS) <= set(self.residual_sections):
+            return None
+        return list(self.residual_sections)
+
+    def to_page_info(self, drawing_name: str, page_num: int) -> Dict:
+        return {
+            'drawing_name': drawing_name,
+            'page_number': page_num,
+            'sections': self.sections,
+            'extraction_method': 'text_layer',
+            'text_layer': {'chars': self.text_chars, 'residual_sections': self.residual_sections},
+        }
+
+    def merge_into(self, page_info: Dict) -> Dict:
+        """Overlay parsed (non-empty) sections onto a vision-model result (exact text wins)."""
+        if self.is_raster_only:
+            return page_info
+        sections = dict(page_info.get('sections') or {})
+        for key, value in self.sections.items():
+            if not value or key in self.residual_sections:
+                continue
+            if isinstance(value, dict) and isinstance(sections.get(key), dict):
+                # Title block fields the text layer did not find keep the model's reading
+                value = {**sections[key], **{field: v for field, v in value.items() if v}}
+            sections[key] = value
+        merged = dict(page_info, sections=sections)
+        merged['extraction_method'] = f"text_layer+{page_info.get('extraction_method', 'unknown')}"
+        merged['text_layer'] = {'chars': self.text_chars, 'residual_sections': self.residual_sections}
+        return merged
+
+
+# =============================================================================
+# Reading the text layer
+# =============================================================================
+
+def read_text_layer(page: "fitz.Page") -> Dict:
+    """Serialize a page's text lines (text, bbox, font size) from ``get_text("dict")``."""
+    lines = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            spans = [span for span in line.get("spans", []) if span.get("text", "").strip()]
+            if not spans:
+                continue
+            text = " ".join(span["text"].strip() for span in spans)
+            x0, y0, x1, y1 = line["bbox"]
+            lines.append({
+                'text': text,
+                'bbox': [round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2)],
+                'size': round(max(span.get("size", 0) for span in spans), 2),
+            })
+    return {
+        'width': page.rect.width,
+        'height': page.rect.height,
+        'rotation': page.rotation,
+        'lines': lines,
+    }
+
+
+def read_pdf_text_layer(pdf_path: str, page_index: int) -> Optional[Dict]:
+    """Text layer for one page (0-indexed) of a PDF file, or None if it can't be read."""
+    try:
+        with fitz.open(pdf_path) as doc:
+            return read_text_layer(doc[page_index])
+    except Exception as e:
+        logger.warning(f"Could not read text layer for page {page_index + 1}: {e}")
+        return None
+
+
+def read_pdf_text_layers(pdf_path: str) -> List[Optional[Dict]]:
+    """Text layers for every page of a PDF file (None for pages that can't be read)."""
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        logger.warning(f"Could not open PDF for text layer extraction: {e}")
+        return []
+    layers: List[Optional[Dict]] = []
+    with doc:
+        for page_index in range(doc.page_count):
+            try:
+                layers.append(read_text_layer(doc[page_index]))
+            except Exception as e:
+                logger.warning(f"Could not read text layer for page {page_index + 1}: {e}")
+                layers.append(None)
+    return layers
+
+
+# =============================================================================
+# Parsing sections
+# =============================================================================
+
+def _to_lines(text_layer: Dict) -> List[TextLine]:
+    return [
+        TextLine(entry['text'], *entry['bbox'], entry.get('size', 0))
+        for entry in text_layer.get('lines', [])
+    ]
+
+
+def _rows(lines: List[TextLine]) -> List[str]:
+    """Cluster lines sharing a baseline into left-to-right row strings."""
+    rows: List[List[TextLine]] = []
+    for line in sorted(lines, key=lambda l: (l.cy, l.x0)):
+        if rows and abs(rows[-1][0].cy - line.cy) <= 0.5 * min(rows[-1][0].height, line.height):
+            rows[-1].append(line)
+        else:
+            rows.append([line])
+    return [" ".join(l.text for l in sorted(row, key=lambda l: l.x0)) for row in rows]
+
+
+def _column_under_header(header: TextLine, lines: List[TextLine], width: float) -> List[TextLine]:
+    """Lines in the header's column, stopping at a large vertical gap or the next header."""
+    band_left = header.x0 - 0.01 * width
+    band_right = header.x0 + 0.35 * width
+    below = sorted(
+        (l for l in lines if l is not header and l.y0 >= header.y1 - 1 and band_left <= l.x0 <= band_right),
+        key=lambda l: (l.cy, l.x0),
+    )
+
+    column: List[TextLine] = []
+    last_bottom = header.y1
+    for line in below:
+        if line.y0 - last_bottom > 3 * max(header.height, line.height):
+            break
+        if ANY_HEADER_RE.match(line.text) and not NUMBERED_ITEM_RE.match(line.text):
+            break
+        column.append(line)
+        last_bottom = max(last_bottom, line.y1)
+    return column
+
+
+def _parse_list_under_header(
+    header: TextLine,
+    lines: List[TextLine],
+    width: float,
+    lettered: bool = False,
+) -> List[Dict]:
+    """Numbered (or lettered) items in the header's column."""
+    items: List[Dict] = []
+    for row in _rows(_column_under_header(header, lines, width)):
+        match = NUMBERED_ITEM_RE.match(row) or (LETTERED_ITEM_RE.match(row) if lettered else None)
+        if match:
+            items.append({'number': match.group(1), 'description': match.group(2).strip()})
+        elif items:
+            # Continuation of the previous item's wrapped text
+            items[-1]['description'] = f"{items[-1]['description']} {row.strip()}"
+    return items
+
+
+def _title_block_lines(lines: List[TextLine], width: float, height: float) -> List[TextLine]:
+    return [
+        l for l in lines
+        if (0.5 * (l.x0 + l.x1) >= 0.70 * width and l.cy >= 0.55 * height)
+        or 0.5 * (l.x0 + l.x1) >= 0.88 * width
+    ]
+
+
+def _parse_title_block(block: List[TextLine]) -> Dict:
+    title_block: Dict = {}
+    if not block:
+        return title_block
+
+    # Sheet number: largest drawing-number-shaped text in the title block
+    candidates = []
+    for line in block:
+        match = DRAWING_RE.search(line.text)
+        if match and len(line.text.strip()) <= 24:
+            candidates.append((line.size, line.x0 + line.y0, normalize_dwg(line.text, match), line))
+    sheet_line = None
+    if candidates:
+        _, _, title_block['sheet_number'], sheet_line = max(candidates, key=lambda c: (c[0], c[1]))
+
+    texts = [line.text for line in block]
+    for text in texts:
+        if 'scale' not in title_block:
+            match = SCALE_RE.search(text)
+            if match:
+                title_block['scale'] = (match.group(1) or match.group(2)).strip()
+        if 'project_number' not in title_block:
+            match = PROJECT_NUMBER_RE.search(text)
+            if match:
+                title_block['project_number'] = match.group(1)
+        if 'project_name' not in title_block:
+            match = PROJECT_NAME_RE.search(text)
+            if match and not PROJECT_NUMBER_RE.search(text):
+                title_block['project_name'] = match.group(1).strip()
+        if 'date' not in title_block and re.search(r'\bDATE\b', text, re.IGNORECASE):
+            match = DATE_RE.search(text)
+            if match:
+                title_block['date'] = match.group(1)
+
+    # Drawing title: the largest wordy line that is not the sheet number or a label
+    title_candidates = [
+        line for line in block
+        if line is not sheet_line
+        and sum(ch.isalpha() for ch in line.text) >= 4
+        and ':' not in line.text
+        and not DATE_RE.search(line.text)
+    ]
+    if title_candidates:
+        title_block['drawing_title'] = max(title_candidates, key=lambda l: (l.size, -l.y0)).text.strip()
+    return title_block
+
+
+def _parse_revisions(block: List[TextLine]) -> List[Dict]:
+    revisions = []
+    for row in _rows(block):
+        match = REVISION_ROW_RE.match(row)
+        if match:
+            revisions.append({'revision_number': match.group(1), 'date': match.group(2), 'description': match.group(3).strip()})
+            continue
+        match = REVISION_ROW_DATE_FIRST_RE.match(row)
+        if match:
+            revisions.append({'revision_number': match.group(2), 'date': match.group(1), 'description': match.group(3).strip()})
+    return revisions
+
+
+def extract_sections(text_layer: Dict, include_unread: bool = False) -> TextLayerExtraction:
+    """
+    Parse title block, keynotes, general notes and revisions from a serialized text layer.
+
+    With ``include_unread`` the sections the text layer never reads (except a
+    drawing type derived from the title) are residual too, so the vision model
+    fills them.
+    """
+    lines = _to_lines(text_layer)
+    text_chars = sum(len(line.text) for line in lines)
+    if text_chars < MIN_TEXT_CHARS:
+        return TextLayerExtraction(sections={}, residual_sections=list(PAGE_SECTIONS), text_chars=text_chars)
+
+    width = float(text_layer.get('width') or max(l.x1 for l in lines))
+    height = float(text_layer.get('height') or max(l.y1 for l in lines))
+    sections: Dict = {}
+
+    block = _title_block_lines(lines, width, height)
+    title_block = _parse_title_block(block)
+    sections['TITLE_BLOCK'] = title_block
+
+    # A header whose rows did not parse means the table is there but unread
+    unparsed = set()
+    for key, header_re, lettered in (
+        ('KEYNOTES', KEYNOTES_HEADER_RE, False),
+        ('GENERAL_NOTES', GENERAL_NOTES_HEADER_RE, True),
+    ):
+        headers = [line for line in lines if header_re.match(line.text)]
+        items: List[Dict] = []
+        for header in headers:
+            items.extend(_parse_list_under_header(header, lines, width, lettered=lettered))
+        sections[key] = items
+        if headers and not items:
+            unparsed.add(key)
+
+    revisions = _parse_revisions(block)
+    if not revisions:
+        # Revision tables placed outside the title block, under their own header
+        headers = [line for line in lines if REVISIONS_HEADER_RE.match(line.text)]
+        for header in headers:
+            revisions.extend(_parse_revisions(_column_under_header(header, lines, width)))
+        if headers and not revisions:
+            unparsed.add('REVISIONS')
+    sections['REVISIONS'] = revisions
+
+    title = (title_block.get('drawing_title') or '').upper()
+    for keyword, drawing_type in DRAWING_TYPES:
+        if keyword in title:
+            sections['DRAWING_TYPE'] = drawing_type
+            break
+
+    residual = []
+    for key in PAGE_SECTIONS:
+        if key == 'TITLE_BLOCK':
+            missing = not title_block.get('sheet_number')
+        elif key in TEXT_LAYER_SECTIONS:
+            missing = key in unparsed
+        else:
+            missing = include_unread and not sections.get(key)
+        if missing:
+            residual.append(key)
+    return TextLayerExtraction(sections=sections, residual_sections=residual, text_chars=text_chars)
+
+
+__all__ = [
+    'PAGE_SECTIONS',
+    'TEXT_LAYER_SECTIONS',
+    'TextLayerExtraction',
+    'extract_sections',
+    'read_pdf_text_layer',
+    'read_pdf_text_layers',
+    'read_text_layer',
+]
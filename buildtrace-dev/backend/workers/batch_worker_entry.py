@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Entry point for the batch worker: submits and polls provider batches for batch-priority jobs."""
+import logging
+import sys
+import os
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+# Add backend directory to path (when running from /app in container)
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from config import config
+from services.batch_service import BatchService
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """Simple health check handler for Cloud Run."""
+    
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain')
+        self.end_headers()
+        self.wfile.write(b'Batch Worker OK')
+    
+    def log_message(self, format, *args):
+        # Suppress HTTP request logs
+        pass
+
+
+def run_health_server(port):
+    """Run HTTP health check server."""
+    server = HTTPServer(('0.0.0.0', port), HealthHandler)
+    logger.info(f"Health check server listening on port {port}")
+    server.serve_forever()
+
+
+def main():
+    # Start health check server in background thread (Cloud Run requirement)
+    port = int(os.getenv('PORT', '8080'))
+    health_thread = threading.Thread(target=run_health_server, args=(port,), daemon=True)
+    health_thread.start()
+    
+    logger.info("Starting Batch worker")
+    logger.info(f"Provider: {config.BATCH_PROVIDER}")
+    logger.info(f"Poll interval: {config.BATCH_POLL_SECONDS}s")
+    
+    try:
+        service = BatchService()
+        
+        logger.info("Batch worker ready, polling provider batches...")
+        service.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down Batch worker...")
+    except Exception as e:
+        logger.exception(f"Fatal error in Batch worker: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
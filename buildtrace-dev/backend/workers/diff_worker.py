@@ -7,10 +7,17 @@ from datetime import datetime
 from typing import Dict, Optional, List
 import json
 
+from sqlalchemy import func
+
 from gcp.database import get_db_session
 from gcp.database.models import JobStage, DiffResult
 from processing import DiffPipeline
+from processing.diff_pipeline import get_diff_executor, run_page_in_child
 from services.orchestrator import OrchestratorService
+from services.stage_graph import mark_page_stage
+from services.stage_ledger import StageLedger
+from utils.cancellation import CancellationRegistry, JobCancelled, cancellation_scope, checkpoint
+from utils.process_pool import WorkerMemoryExceeded, WorkerProcessLost
 
 logger = logging.getLogger(__name__)
 
@@ -23,10 +30,20 @@ class DiffWorker:
         pipeline: Optional[DiffPipeline] = None,
         orchestrator: Optional[OrchestratorService] = None,
         session_factory=None,
+        executor=None,
+        ledger: Optional[StageLedger] = None,
+        cancellation: Optional[CancellationRegistry] = None,
     ) -> None:
+        # Process isolation only applies to the default pipeline - an injected
+        # pipeline instance cannot be shipped to a child process.
+        if executor is None and pipeline is None:
+            executor = get_diff_executor()
         self.pipeline = pipeline or DiffPipeline()
         self.orchestrator = orchestrator or OrchestratorService()
         self.session_factory = session_factory or get_db_session
+        self.executor = executor
+        self.ledger = ledger or StageLedger(self.session_factory)
+        self.cancellation = cancellation or CancellationRegistry(self.session_factory)
     
     # =========================================================================
     # STREAMING MODE: Process single page
@@ -69,83 +86,132 @@ class DiffWorker:
             }
         )
         
-        try:
-            # Update stage to in_progress
-            with self.session_factory() as db:
-                stage = db.query(JobStage).filter_by(
-                    job_id=job_id,
-                    stage="diff",
-                    page_number=page_number
-                ).first()
-                if stage:
-                    stage.status = "in_progress"
-                    stage.started_at = datetime.utcnow()
-                    db.commit()
-            
-            # Run diff on this single page pair
-            diff_result = self.pipeline.run_page(
+        token = self.cancellation.token(job_id)
+        if token.cancelled:
+            return {"job_id": job_id, "page_number": page_number, "status": "cancelled"}
+        
+        # Redeliveries replay the stored result instead of writing another DiffResult
+        claim = self.ledger.claim(job_id, "diff", page_number, message)
+        if claim.completed:
+            stored = claim.result or {}
+            self.orchestrator.on_page_diff_complete(
                 job_id=job_id,
                 page_number=page_number,
-                old_page_gcs=old_page_gcs,
-                new_page_gcs=new_page_gcs,
-                old_version_id=old_version_id,
-                new_version_id=new_version_id,
+                diff_result_id=stored.get("diff_result_id"),
+                overlay_ref=stored.get("overlay_ref"),
                 drawing_name=drawing_name,
-                metadata=metadata
+                change_count=stored.get("change_count"),
             )
+            return stored
+        if not claim.acquired:
+            return {"job_id": job_id, "page_number": page_number, "status": "duplicate"}
+        
+        try:
+            with cancellation_scope(token):
+                # Update stage to in_progress
+                with self.session_factory() as db:
+                    mark_page_stage(db, job_id, "diff", page_number, status="in_progress", started_at=datetime.utcnow())
+                    db.commit()
             
-            diff_result_id = diff_result.get("diff_result_id")
-            overlay_ref = diff_result.get("overlay_ref")
+                # Run diff on this single page pair
+                page_kwargs = {
+                    "job_id": job_id,
+                    "page_number": page_number,
+                    "old_page_gcs": old_page_gcs,
+                    "new_page_gcs": new_page_gcs,
+                    "old_version_id": old_version_id,
+                    "new_version_id": new_version_id,
+                    "drawing_name": drawing_name,
+                    "metadata": metadata,
+                }
+                if self.executor:
+                    # Alignment/overlay run in a child process with an RSS ceiling
+                    diff_result = self.executor.run(run_page_in_child, page_kwargs)
+                    if diff_result.get("status") == "cancelled":
+                        raise JobCancelled(job_id, diff_result.get("step", ""))
+                else:
+                    diff_result = self.pipeline.run_page(**page_kwargs)
             
-            # Update stage to completed
-            with self.session_factory() as db:
-                stage = db.query(JobStage).filter_by(
+                diff_result_id = diff_result.get("diff_result_id")
+                overlay_ref = diff_result.get("overlay_ref")
+                result = {
+                    "job_id": job_id,
+                    "page_number": page_number,
+                    "diff_result_id": diff_result_id,
+                    "overlay_ref": overlay_ref,
+                    "change_count": diff_result.get("change_count"),
+                    "status": "completed"
+                }
+                # Stored before chaining, so a redelivery after a crash still reaches summary
+                checkpoint("before chaining to summary")
+                self.ledger.complete(claim, result)
+            
+                # The orchestrator records the completion and chains to summary for this page
+                self.orchestrator.on_page_diff_complete(
                     job_id=job_id,
-                    stage="diff",
-                    page_number=page_number
-                ).first()
-                if stage:
-                    stage.status = "completed"
-                    stage.completed_at = datetime.utcnow()
-                    stage.result_ref = diff_result_id
-                    db.commit()
+                    page_number=page_number,
+                    diff_result_id=diff_result_id,
+                    overlay_ref=overlay_ref,
+                    drawing_name=drawing_name,
+                    change_count=diff_result.get("change_count"),
+                )
             
-            # Immediately chain to summary for this page
-            self.orchestrator.on_page_diff_complete(
-                job_id=job_id,
-                page_number=page_number,
-                diff_result_id=diff_result_id,
-                overlay_ref=overlay_ref,
-                drawing_name=drawing_name
-            )
+                return result
             
+        except JobCancelled as exc:
+            return self._settle_cancelled(claim, job_id, page_number, exc)
+
+        except WorkerProcessLost as exc:
+            # The child died on this sheet (RSS ceiling, crash, kill or timeout) - fail
+            # the page and ack instead of letting redelivery kill another child with it.
+            logger.error(
+                "Streaming diff exceeded memory limit" if isinstance(exc, WorkerMemoryExceeded)
+                else "Streaming diff child process was lost",
+                extra={"job_id": job_id, "page_number": page_number, "error": str(exc)}
+            )
+            self.ledger.release(claim)
+            self.orchestrator.on_page_failed(job_id, "diff", page_number, str(exc))
             return {
                 "job_id": job_id,
                 "page_number": page_number,
-                "diff_result_id": diff_result_id,
-                "overlay_ref": overlay_ref,
-                "status": "completed"
+                "status": "failed",
+                "error": str(exc)
             }
-            
+
         except Exception as exc:
             logger.exception(
                 "Streaming diff failed",
                 extra={"job_id": job_id, "page_number": page_number}
             )
+            self.ledger.release(claim)
             with self.session_factory() as db:
-                stage = db.query(JobStage).filter_by(
-                    job_id=job_id,
-                    stage="diff",
-                    page_number=page_number
-                ).first()
-                if stage:
-                    stage.status = "failed"
-                    stage.error_message = str(exc)
-                    stage.completed_at = datetime.utcnow()
-                    stage.retry_count = (stage.retry_count or 0) + 1
-                    db.commit()
+                mark_page_stage(
+                    db, job_id, "diff", page_number,
+                    status="failed",
+                    error_message=str(exc),
+                    completed_at=datetime.utcnow(),
+                    retry_count=func.coalesce(JobStage.retry_count, 0) + 1,
+                )
+                db.commit()
             raise
     
+    def _settle_cancelled(self, claim, job_id: str, page_number: int, exc: JobCancelled) -> Dict:
+        """Ack a task whose job was cancelled mid-flight: skip the page instead of failing it."""
+        logger.info(
+            "Streaming diff stopped for cancelled job",
+            extra={"job_id": job_id, "page_number": page_number, "step": exc.step}
+        )
+        self.ledger.release(claim)
+        with self.session_factory() as db:
+            mark_page_stage(
+                db, job_id, "diff", page_number,
+                status="skipped",
+                error_message=str(exc),
+                completed_at=datetime.utcnow(),
+            )
+            db.commit()
+        return {"job_id": job_id, "page_number": page_number, "status": "cancelled"}
+    
     # =========================================================================
     # LEGACY MODE: Process all pages for a job
     # =========================================================================
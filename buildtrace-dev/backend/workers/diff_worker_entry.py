@@ -60,7 +60,8 @@ def main():
     try:
         subscriber = PubSubSubscriber(
             project_id=config.GCP_PROJECT_ID,
-            subscription_name=config.PUBSUB_DIFF_SUBSCRIPTION
+            subscription_name=config.PUBSUB_DIFF_SUBSCRIPTION,
+            profile="cpu"
         )
         worker = DiffWorker()
         
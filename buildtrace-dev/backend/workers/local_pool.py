@@ -0,0 +1,88 @@
+"""
+In-process worker pool for the local queue backend (QUEUE_BACKEND=local).
+
+Runs one LocalQueueSubscriber per stage, each with its own thread count
+(LOCAL_QUEUE_WORKERS_OCR/DIFF/SUMMARY). Workers publish the next stage's
+task through the orchestrator as soon as a page finishes, so page 2's OCR
+overlaps page 1's diff and summary, exactly as with the Pub/Sub workers.
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from config import config
+from gcp.pubsub import LocalQueue, LocalQueueSubscriber, get_local_queue
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('ocr', 'diff', 'summary')
+
+
+def _stage_concurrency() -> Dict[str, int]:
+    return {
+        'ocr': config.LOCAL_QUEUE_WORKERS_OCR,
+        'diff': config.LOCAL_QUEUE_WORKERS_DIFF,
+        'summary': config.LOCAL_QUEUE_WORKERS_SUMMARY,
+    }
+
+
+def _default_handlers() -> Dict[str, Callable]:
+    from services.orchestrator import OrchestratorService
+    from workers.ocr_worker import OCRWorker
+    from workers.diff_worker import DiffWorker
+    from workers.summary_worker import SummaryWorker
+
+    orchestrator = OrchestratorService()
+    return {
+        'ocr': OCRWorker(orchestrator=orchestrator).process_message,
+        'diff': DiffWorker(orchestrator=orchestrator).process_message,
+        'summary': SummaryWorker(orchestrator=orchestrator).process_message,
+    }
+
+
+class LocalWorkerPool:
+    """Consumes every stage queue of a LocalQueue in background threads."""
+
+    def __init__(
+        self,
+        queue: Optional[LocalQueue] = None,
+        handlers: Optional[Dict[str, Callable]] = None,
+        concurrency: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.queue = queue or get_local_queue()
+        self._handlers = handlers
+        self.concurrency = {**_stage_concurrency(), **(concurrency or {})}
+        self.subscribers: Dict[str, LocalQueueSubscriber] = {}
+
+    def start(self) -> 'LocalWorkerPool':
+        handlers = self._handlers or _default_handlers()
+        for stage in STAGES:
+            if stage not in handlers or self.concurrency.get(stage, 0) <= 0:
+                continue
+            subscriber = LocalQueueSubscriber(stage, queue=self.queue, concurrency=self.concurrency[stage])
+            subscriber.start(handlers[stage], block=False)
+            self.subscribers[stage] = subscriber
+        logger.info(f"Local worker pool started: {self.concurrency}")
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        for subscriber in self.subscribers.values():
+            subscriber.stop(timeout)
+        self.subscribers.clear()
+
+
+_pool: Optional[LocalWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def start_local_worker_pool() -> LocalWorkerPool:
+    """Start the process-wide worker pool once (later calls return the running pool)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LocalWorkerPool().start()
+        return _pool
+
+
+__all__ = ['LocalWorkerPool', 'start_local_worker_pool']
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Entry point for a standalone local-queue worker (QUEUE_BACKEND=local, LOCAL_QUEUE_IN_PROCESS=false)."""
+import logging
+import sys
+import os
+import threading
+
+# Add backend directory to path (when running from /app in container)
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from config import config
+from workers.local_pool import LocalWorkerPool
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    if config.QUEUE_BACKEND != 'local':
+        logger.error("QUEUE_BACKEND must be 'local' for the local worker")
+        sys.exit(1)
+
+    logger.info("Starting local queue worker")
+    logger.info(f"Queue: {config.LOCAL_QUEUE_PATH}")
+
+    stopped = threading.Event()
+    try:
+        pool = LocalWorkerPool().start()
+        logger.info("Local worker ready, listening for messages...")
+        stopped.wait()
+    except KeyboardInterrupt:
+        logger.info("Shutting down local worker...")
+        pool.stop()
+    except Exception as e:
+        logger.exception(f"Fatal error in local worker: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
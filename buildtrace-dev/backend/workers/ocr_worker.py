@@ -3,13 +3,25 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Optional
 
+from sqlalchemy import func
+
 from gcp.database import get_db_session
 from gcp.database.models import JobStage
 from processing import OCRPipeline
 from services.orchestrator import OrchestratorService
+from services.stage_graph import BATCH_PENDING, mark_page_stage
+from services.stage_ledger import StageLedger
+from utils.cancellation import (
+    CancellationRegistry,
+    JobCancelled,
+    cancellation_scope,
+    checkpoint,
+    submit_with_context,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +34,14 @@ class OCRWorker:
         pipeline: Optional[OCRPipeline] = None,
         orchestrator: Optional[OrchestratorService] = None,
         session_factory=None,
+        ledger: Optional[StageLedger] = None,
+        cancellation: Optional[CancellationRegistry] = None,
     ) -> None:
         self.pipeline = pipeline or OCRPipeline()
         self.orchestrator = orchestrator or OrchestratorService()
         self.session_factory = session_factory or get_db_session
+        self.ledger = ledger or StageLedger(self.session_factory)
+        self.cancellation = cancellation or CancellationRegistry(self.session_factory)
     
     # =========================================================================
     # STREAMING MODE: Process single page from pre-extracted PNG
@@ -65,75 +81,154 @@ class OCRWorker:
             }
         )
         
+        token = self.cancellation.token(job_id)
+        if token.cancelled:
+            return {"job_id": job_id, "page_number": page_number, "status": "cancelled"}
+        
+        # Redeliveries replay the stored result instead of repeating the vision calls
+        claim = self.ledger.claim(job_id, "ocr", page_number, message)
+        if claim.completed:
+            stored = claim.result or {}
+            if stored.get("status") == "batch_pending":
+                return stored
+            self.orchestrator.on_page_ocr_complete(
+                job_id=job_id,
+                page_number=page_number,
+                old_ocr_ref=stored.get("old_ocr_ref", ""),
+                new_ocr_ref=stored.get("new_ocr_ref", ""),
+                drawing_name=drawing_name
+            )
+            return stored
+        if not claim.acquired:
+            return {"job_id": job_id, "page_number": page_number, "status": "duplicate"}
+        
         try:
-            # Update stage to in_progress
-            with self.session_factory() as db:
-                stage = db.query(JobStage).filter_by(
-                    job_id=job_id,
-                    stage="ocr",
-                    page_number=page_number
-                ).first()
-                if stage:
-                    stage.status = "in_progress"
-                    stage.started_at = datetime.utcnow()
+            with cancellation_scope(token):
+                # Update stage to in_progress
+                with self.session_factory() as db:
+                    mark_page_stage(db, job_id, "ocr", page_number, status="in_progress", started_at=datetime.utcnow())
                     db.commit()
             
-            # Run OCR on both page images
-            old_ocr_result = self.pipeline.run_page(old_page_gcs, f"old_page_{page_number}")
-            new_ocr_result = self.pipeline.run_page(new_page_gcs, f"new_page_{page_number}")
+                # Batch-priority jobs queue model calls for the provider batch instead
+                batch_kwargs = {}
+                if (message.get("metadata") or {}).get("priority") == "batch":
+                    batch_kwargs = {"batch_job_id": job_id, "drawing_name": drawing_name}
             
-            old_ocr_ref = old_ocr_result.get("result_ref", "")
-            new_ocr_ref = new_ocr_result.get("result_ref", "")
+                # Run OCR on both page images; the new page only re-extracts regions that
+                # changed when the old page's extraction is stored, so when it can be patched
+                # that way it starts once the old page is done (a cache hit after the first
+                # comparison). A pair of threads per message: the subscriber runs several at once.
+                wait_for_base = not batch_kwargs and self.pipeline.uses_base_page()
+                with ThreadPoolExecutor(max_workers=2, thread_name_prefix='ocr-page-pair') as page_executor:
+                    old_future = submit_with_context(
+                        page_executor,
+                        self.pipeline.run_page, old_page_gcs, f"old_page_{page_number}", **batch_kwargs
+                    )
+                    
+                    def run_new_page():
+                        if wait_for_base and old_future.exception() is not None:
+                            return None  # the old page's failure is raised below
+                        return self.pipeline.run_page(
+                            new_page_gcs, f"new_page_{page_number}", base_page_gcs=old_page_gcs, **batch_kwargs
+                        )
+                    
+                    new_future = submit_with_context(page_executor, run_new_page)
+                    # Wait for both before surfacing a failure so no OCR call outlives the message
+                    new_exc = new_future.exception()
+                    old_ocr_result = old_future.result()
+                    if new_exc:
+                        raise new_exc
+                    new_ocr_result = new_future.result()
             
-            # Update stage to completed
-            with self.session_factory() as db:
-                stage = db.query(JobStage).filter_by(
-                    job_id=job_id,
-                    stage="ocr",
-                    page_number=page_number
-                ).first()
-                if stage:
-                    stage.status = "completed"
-                    stage.completed_at = datetime.utcnow()
-                    stage.result_ref = f"{old_ocr_ref}|{new_ocr_ref}"
-                    db.commit()
+                old_ocr_ref = old_ocr_result.get("result_ref", "")
+                new_ocr_ref = new_ocr_result.get("result_ref", "")
             
-            # Immediately chain to diff for this page
-            self.orchestrator.on_page_ocr_complete(
-                job_id=job_id,
-                page_number=page_number,
-                old_ocr_ref=old_ocr_ref,
-                new_ocr_ref=new_ocr_ref,
-                drawing_name=drawing_name
-            )
+                if old_ocr_result.get("batch_pending") or new_ocr_result.get("batch_pending"):
+                    # Stage waits for the batch without a slot; the batch service completes it and chains to diff
+                    with self.session_factory() as db:
+                        stage = db.query(JobStage).filter_by(
+                            job_id=job_id,
+                            stage="ocr",
+                            page_number=page_number
+                        ).first()
+                        if stage:
+                            stage_meta = dict(stage.stage_metadata or {})
+                            stage_meta.update({
+                                "old_ocr_ref": old_ocr_ref,
+                                "new_ocr_ref": new_ocr_ref,
+                            })
+                            stage.stage_metadata = stage_meta
+                            stage.status = BATCH_PENDING
+                            db.commit()
+                    result = {
+                        "job_id": job_id,
+                        "page_number": page_number,
+                        "old_ocr_ref": old_ocr_ref,
+                        "new_ocr_ref": new_ocr_ref,
+                        "status": "batch_pending"
+                    }
+                    self.ledger.complete(claim, result)
+                    self.orchestrator.on_page_batch_pending(job_id, "ocr", page_number)
+                    return result
             
-            return {
-                "job_id": job_id,
-                "page_number": page_number,
-                "old_ocr_ref": old_ocr_ref,
-                "new_ocr_ref": new_ocr_ref,
-                "status": "completed"
-            }
+                result = {
+                    "job_id": job_id,
+                    "page_number": page_number,
+                    "old_ocr_ref": old_ocr_ref,
+                    "new_ocr_ref": new_ocr_ref,
+                    "status": "completed"
+                }
+                # Stored before chaining, so a redelivery after a crash still reaches diff
+                checkpoint("before chaining to diff")
+                self.ledger.complete(claim, result)
+            
+                # The orchestrator records the completion and chains to diff for this page
+                self.orchestrator.on_page_ocr_complete(
+                    job_id=job_id,
+                    page_number=page_number,
+                    old_ocr_ref=old_ocr_ref,
+                    new_ocr_ref=new_ocr_ref,
+                    drawing_name=drawing_name
+                )
+            
+                return result
             
+        except JobCancelled as exc:
+            return self._settle_cancelled(claim, job_id, page_number, exc)
         except Exception as exc:
             logger.exception(
                 "Streaming OCR failed",
                 extra={"job_id": job_id, "page_number": page_number}
             )
+            self.ledger.release(claim)
             with self.session_factory() as db:
-                stage = db.query(JobStage).filter_by(
-                    job_id=job_id,
-                    stage="ocr",
-                    page_number=page_number
-                ).first()
-                if stage:
-                    stage.status = "failed"
-                    stage.error_message = str(exc)
-                    stage.completed_at = datetime.utcnow()
-                    stage.retry_count = (stage.retry_count or 0) + 1
-                    db.commit()
+                mark_page_stage(
+                    db, job_id, "ocr", page_number,
+                    status="failed",
+                    error_message=str(exc),
+                    completed_at=datetime.utcnow(),
+                    retry_count=func.coalesce(JobStage.retry_count, 0) + 1,
+                )
+                db.commit()
             raise
     
+    def _settle_cancelled(self, claim, job_id: str, page_number: int, exc: JobCancelled) -> Dict:
+        """Ack a task whose job was cancelled mid-flight: skip the page instead of failing it."""
+        logger.info(
+            "Streaming OCR stopped for cancelled job",
+            extra={"job_id": job_id, "page_number": page_number, "step": exc.step}
+        )
+        self.ledger.release(claim)
+        with self.session_factory() as db:
+            mark_page_stage(
+                db, job_id, "ocr", page_number,
+                status="skipped",
+                error_message=str(exc),
+                completed_at=datetime.utcnow(),
+            )
+            db.commit()
+        return {"job_id": job_id, "page_number": page_number, "status": "cancelled"}
+    
     # =========================================================================
     # LEGACY MODE: Process entire PDF for a drawing version
     # =========================================================================
@@ -60,7 +60,8 @@ def main():
     try:
         subscriber = PubSubSubscriber(
             project_id=config.GCP_PROJECT_ID,
-            subscription_name=config.PUBSUB_OCR_SUBSCRIPTION
+            subscription_name=config.PUBSUB_OCR_SUBSCRIPTION,
+            profile="io"
         )
         worker = OCRWorker()
         
@@ -12,10 +12,42 @@ from gcp.database import get_db_session
 from gcp.database.models import JobStage
 from processing import SummaryPipeline
 from services.orchestrator import OrchestratorService
+from services.stage_graph import BATCH_PENDING, mark_page_stage
+from services.stage_ledger import StageLedger
+from utils.cancellation import CancellationRegistry, JobCancelled, cancellation_scope, checkpoint
 
 logger = logging.getLogger(__name__)
 
 
+def record_summary_completion(session_factory, job_id: str, summary_id: Optional[str]) -> bool:
+    """Count one finished summary on the job's summary stage; True once all expected are done."""
+    with session_factory() as db:
+        stage = db.query(JobStage).filter_by(job_id=job_id, stage="summary").first()
+        if not stage:
+            return False
+        stage_meta = stage.stage_metadata or {}
+        expected = stage_meta.get('expected_summaries', 1)
+        completed = stage_meta.get('completed_summaries', 0) + 1
+        stage_meta['completed_summaries'] = completed
+        stage.stage_metadata = stage_meta
+        # Explicitly mark JSON column as modified for SQLAlchemy to detect
+        flag_modified(stage, 'stage_metadata')
+        
+        logger.info(
+            "Updated summary stage progress",
+            extra={"job_id": job_id, "completed": completed, "expected": expected}
+        )
+
+        all_done = completed >= expected
+        if all_done:
+            stage.status = "completed"
+            stage.completed_at = datetime.utcnow()
+            stage.result_ref = summary_id
+            logger.info(f"All summaries complete for job {job_id}")
+        db.commit()
+        return all_done
+
+
 class SummaryWorker:
     """Worker entrypoint for summary generation tasks."""
 
@@ -24,10 +56,14 @@ class SummaryWorker:
         pipeline: Optional[SummaryPipeline] = None,
         orchestrator: Optional[OrchestratorService] = None,
         session_factory=None,
+        ledger: Optional[StageLedger] = None,
+        cancellation: Optional[CancellationRegistry] = None,
     ) -> None:
         self.pipeline = pipeline or SummaryPipeline()
         self.orchestrator = orchestrator or OrchestratorService()
         self.session_factory = session_factory or get_db_session
+        self.ledger = ledger or StageLedger(self.session_factory)
+        self.cancellation = cancellation or CancellationRegistry(self.session_factory)
 
     def process_message(self, message: Dict) -> Dict:
         job_id = message.get("job_id")
@@ -42,46 +78,86 @@ class SummaryWorker:
             extra={"job_id": job_id, "diff_result_id": diff_result_id, "overlay_ref": overlay_ref},
         )
 
-        try:
-            overlay_id = metadata.get('overlay_id') if metadata else None
-            result = self.pipeline.run(
-                job_id,
-                diff_result_id,
-                overlay_ref=overlay_ref,
-                metadata=metadata,
-                overlay_id=overlay_id,
-            )
-            should_mark_complete = False
-            with self.session_factory() as db:
-                stage = db.query(JobStage).filter_by(job_id=job_id, stage="summary").first()
-                if stage:
-                    stage_meta = stage.stage_metadata or {}
-                    expected = stage_meta.get('expected_summaries', 1)
-                    completed = stage_meta.get('completed_summaries', 0) + 1
-                    stage_meta['completed_summaries'] = completed
-                    stage.stage_metadata = stage_meta
-                    # Explicitly mark JSON column as modified for SQLAlchemy to detect
-                    flag_modified(stage, 'stage_metadata')
-                    
-                    logger.info(
-                        "Updated summary stage progress",
-                        extra={"job_id": job_id, "completed": completed, "expected": expected}
-                    )
+        # Streaming pages report back to the orchestrator's stage graph
+        streaming_page = metadata.get('page_number') if metadata and metadata.get('streaming') else None
+
+        token = self.cancellation.token(job_id)
+        if token.cancelled:
+            return {"job_id": job_id, "diff_result_id": diff_result_id, "status": "cancelled"}
 
-                    if completed >= expected:
-                        stage.status = "completed"
-                        stage.completed_at = datetime.utcnow()
-                        stage.result_ref = result.get("summary_id")
-                        should_mark_complete = True
-                        logger.info(f"All summaries complete for job {job_id}")
-                db.commit()
+        # Redeliveries replay the stored result instead of writing another ChangeSummary
+        page_number = message.get('page_number') or (metadata or {}).get('page_number')
+        claim = self.ledger.claim(job_id, "summary", page_number, message)
+        if claim.completed:
+            stored = claim.result or {}
+            if streaming_page and not stored.get('batch_pending'):
+                self.orchestrator.on_page_summary_complete(job_id, streaming_page, stored.get("summary_id"))
+            return stored
+        if not claim.acquired:
+            return {"job_id": job_id, "diff_result_id": diff_result_id, "status": "duplicate"}
 
-            if should_mark_complete:
+        try:
+            overlay_id = metadata.get('overlay_id') if metadata else None
+            run_kwargs = {}
+            if metadata and metadata.get('priority') == 'batch':
+                # GPT request goes to the provider batch; the batch service records completion
+                run_kwargs = {
+                    'defer_to_batch': True,
+                    'page_number': message.get('page_number') or metadata.get('page_number'),
+                }
+            with cancellation_scope(token):
+                result = self.pipeline.run(
+                    job_id,
+                    diff_result_id,
+                    overlay_ref=overlay_ref,
+                    metadata=metadata,
+                    overlay_id=overlay_id,
+                    **run_kwargs,
+                )
+                checkpoint("before reporting the summary")
+            # Stored before chaining, so a redelivery after a crash still reports the page.
+            # A placeholder (every AI call failed) is not stored: a redelivery tries again
+            if result.get('placeholder'):
+                self.ledger.release(claim)
+            else:
+                self.ledger.complete(claim, result)
+            if result.get('batch_pending'):
+                if streaming_page:
+                    # The page waits for the batch without holding a summary slot
+                    with self.session_factory() as db:
+                        mark_page_stage(db, job_id, "summary", streaming_page, status=BATCH_PENDING)
+                        db.commit()
+                    self.orchestrator.on_page_batch_pending(job_id, "summary", streaming_page)
+                return result
+
+            if streaming_page:
+                self.orchestrator.on_page_summary_complete(job_id, streaming_page, result.get("summary_id"))
+            elif record_summary_completion(self.session_factory, job_id, result.get("summary_id")):
                 self.orchestrator.on_summary_complete(job_id)
             return result
 
+        except JobCancelled as exc:
+            # Ack instead of failing: the page is skipped, not retried
+            logger.info("Summary stopped for cancelled job", extra={"job_id": job_id, "step": exc.step})
+            self.ledger.release(claim)
+            if streaming_page:
+                with self.session_factory() as db:
+                    mark_page_stage(
+                        db, job_id, "summary", streaming_page,
+                        status="skipped",
+                        error_message=str(exc),
+                        completed_at=datetime.utcnow(),
+                    )
+                    db.commit()
+            return {"job_id": job_id, "diff_result_id": diff_result_id, "status": "cancelled"}
+
         except Exception as exc:
             logger.exception("Summary worker failed", extra={"job_id": job_id})
+            self.ledger.release(claim)
+            if streaming_page:
+                # The page's stage retry policy decides whether it is dispatched again
+                self.orchestrator.on_page_failed(job_id, "summary", streaming_page, str(exc))
+                return {"job_id": job_id, "page_number": streaming_page, "status": "failed", "error": str(exc)}
             with self.session_factory() as db:
                 stage = db.query(JobStage).filter_by(job_id=job_id, stage="summary").first()
                 if stage:
@@ -92,4 +168,4 @@ class SummaryWorker:
             raise
 
 
-__all__ = ["SummaryWorker"]
+__all__ = ["SummaryWorker", "record_summary_completion"]
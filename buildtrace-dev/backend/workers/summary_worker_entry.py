@@ -60,7 +60,8 @@ def main():
     try:
         subscriber = PubSubSubscriber(
             project_id=config.GCP_PROJECT_ID,
-            subscription_name=config.PUBSUB_SUMMARY_SUBSCRIPTION
+            subscription_name=config.PUBSUB_SUMMARY_SUBSCRIPTION,
+            profile="io"
         )
         worker = SummaryWorker()
         